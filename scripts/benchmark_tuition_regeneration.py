@@ -0,0 +1,151 @@
+"""
+Benchmark for tuition regeneration on a synthetic catalogue.
+
+Seeds a synthetic catalogue inside one transaction (see generate_synthetic_data.py):
+- N students, one parent per 2 students, one teacher per 50 students
+- 1-3 subjects per student, and every 5th subject shared with the next student
+
+It then times each regeneration phase and reports wall time and peak Python
+memory (tracemalloc):
+1. cold:       full regeneration into empty tuitions (all bulk inserts)
+2. noop:       full regeneration when nothing changed (reads only)
+3. targeted:   regeneration for a single edited student
+4. orm-insert: the same rows as phase 1 written with session.add_all + flush,
+               as a baseline for the bulk path
+
+Everything is rolled back at the end, so the target database is left untouched.
+
+Usage:
+    python scripts/benchmark_tuition_regeneration.py [--students 10000] [--seed 42]
+"""
+
+import asyncio
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+from pathlib import Path
+from sqlalchemy import delete, select, func
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+# --- Path Setup ---
+CURRENT_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = CURRENT_DIR.parent
+
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from scripts.generate_synthetic_data import SyntheticDataConfig, seed_catalogue
+
+def load_env():
+    env_path = PROJECT_ROOT / '.env'
+    if not env_path.exists():
+        print(f"Warning: .env not found at {env_path}")
+        return
+    with open(env_path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'): continue
+            if '=' in line:
+                k, v = line.split('=', 1)
+                k, v = k.strip(), v.strip()
+                if (v.startswith('"') and v.endswith('"')) or (v.startswith("'") and v.endswith("'")):
+                    v = v[1:-1]
+                if k not in os.environ: os.environ[k] = v
+
+
+async def timed(label: str, results: dict, coro_factory):
+    tracemalloc.start()
+    started = time.perf_counter()
+    await coro_factory()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    results[label] = (elapsed, peak)
+    print(f"  {label:<12} {elapsed:8.3f}s   peak {peak / 1_048_576:8.1f} MiB")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark tuition regeneration on a synthetic catalogue.")
+    parser.add_argument("--students", type=int, default=10_000, help="Number of synthetic students.")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed of the synthetic catalogue.")
+    args = parser.parse_args()
+
+    load_env()
+    target_env_var = "DATABASE_URL_TEST_CLI"
+    db_url = os.getenv(target_env_var)
+    if not db_url:
+        print(f"Error: {target_env_var} not set.")
+        return
+
+    if db_url.startswith("postgresql://") and "+asyncpg" not in db_url:
+        db_url = db_url.replace("postgresql://", "postgresql+asyncpg://")
+
+    # Imported late so the .env is loaded before settings are read
+    from src.efficient_tutor_backend.database import models as db_models
+    from src.efficient_tutor_backend.services.user_service import UserService
+    from src.efficient_tutor_backend.services.tuition_service import TuitionService
+
+    print(f"Connecting to database ({target_env_var})...")
+    engine = create_async_engine(db_url)
+    async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with async_session() as session:
+        try:
+            # Only the synthetic catalogue takes part in the benchmark
+            await session.execute(delete(db_models.Tuitions))
+            await session.execute(delete(db_models.StudentSubjects))
+            ids = await seed_catalogue(session, SyntheticDataConfig(
+                teachers=max(1, args.students // 50),
+                parents=max(1, args.students // 2),
+                students_per_parent=2,
+                seed=args.seed
+            ))
+            student_ids = ids.student_ids
+            await session.flush()
+
+            service = TuitionService(db=session, user_service=UserService(db=session))
+            results = {}
+            print("--- Regeneration Phases ---")
+
+            await timed("cold", results, service.regenerate_all_tuitions)
+            tuition_count = (await session.execute(select(func.count()).select_from(db_models.Tuitions))).scalar_one()
+            charge_count = (await session.execute(select(func.count()).select_from(db_models.TuitionTemplateCharges))).scalar_one()
+
+            await timed("noop", results, service.regenerate_all_tuitions)
+
+            edited = student_ids[len(student_ids) // 2]
+            await session.execute(
+                db_models.Students.__table__.update()
+                .where(db_models.Students.__table__.c.id == edited)
+                .values(max_duration_mins=150)
+            )
+            await timed("targeted", results, lambda: service.regenerate_tuitions_for_students({edited}))
+
+            # Baseline: the cold rows again, through the ORM unit of work
+            planned = service._plan_tuitions(await service._load_student_subjects())
+            await session.execute(delete(db_models.Tuitions))
+            session.expunge_all()
+
+            async def orm_insert():
+                for tuition_id, (columns, group_students) in planned.items():
+                    session.add(db_models.Tuitions(id=tuition_id, **columns))
+                    session.add_all(db_models.TuitionTemplateCharges(
+                        tuition_id=tuition_id, student_id=s.id, parent_id=s.parent_id, cost=s.cost
+                    ) for s in group_students)
+                await session.flush()
+            await timed("orm-insert", results, orm_insert)
+
+            print(f"--- {tuition_count} tuitions, {charge_count} charges ---")
+            cold, orm = results["cold"][0], results["orm-insert"][0]
+            print(f"Bulk cold regeneration vs. ORM insert alone: {cold:.3f}s vs {orm:.3f}s")
+        finally:
+            await session.rollback()
+            print("Rolled back the synthetic catalogue.")
+
+    await engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,106 @@
+"""
+Standalone script to build the offline IP geolocation table used by GeoService
+(the "local" provider, see services/geo_service.py).
+
+Input: a CSV of IP ranges, one per line: `first_ip,last_ip,country_code[,timezone]`
+(e.g. the DB-IP "IP to Country Lite" download). Addresses may be dotted or
+integers; IPv6 rows are skipped (those lookups fall back to the HTTP provider).
+Rows without a timezone get their country's principal zone from zone.tab, and
+every country's currency is resolved once here, so the server never reads
+countryinfo for covered addresses.
+
+Usage:
+    python scripts/build_geo_database.py <ranges.csv> <output.bin> [--zone-tab /usr/share/zoneinfo/zone.tab]
+
+Then set GEO_DATABASE_PATH=<output.bin>.
+"""
+
+import argparse
+import csv
+import ipaddress
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+# --- Path Setup ---
+CURRENT_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = CURRENT_DIR.parent
+
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from countryinfo import CountryInfo
+
+from src.efficient_tutor_backend.services.geo_service import GeoLocation, write_geo_database
+
+
+def load_principal_zones(zone_tab: Path) -> dict[str, str]:
+    """Country code -> its first (most populous) zone in zone.tab."""
+    zones: dict[str, str] = {}
+    with open(zone_tab) as f:
+        for line in f:
+            if line.startswith("#") or not line.strip():
+                continue
+            codes, _, zone = line.split("\t")[:3]
+            for code in codes.split(","):
+                zones.setdefault(code, zone.strip())
+    return zones
+
+
+def country_currency(code: str, cache: dict[str, Optional[str]]) -> Optional[str]:
+    if code not in cache:
+        try:
+            currencies = CountryInfo(code).currencies()
+        except Exception:
+            currencies = []
+        cache[code] = currencies[0] if currencies else None
+    return cache[code]
+
+
+def parse_ip(value: str) -> Optional[int]:
+    value = value.strip()
+    address = ipaddress.ip_address(int(value) if value.isdigit() else value)
+    return int(address) if address.version == 4 else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the offline IP geolocation table.")
+    parser.add_argument("ranges", type=Path, help="CSV of first_ip,last_ip,country_code[,timezone]")
+    parser.add_argument("output", type=Path, help="Table file to write")
+    parser.add_argument("--zone-tab", type=Path, default=Path("/usr/share/zoneinfo/zone.tab"))
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    zones = load_principal_zones(args.zone_tab)
+    currencies: dict[str, Optional[str]] = {}
+
+    ranges, skipped = [], 0
+    with open(args.ranges, newline="") as f:
+        for row in csv.reader(f):
+            if len(row) < 3 or row[0].startswith("#"):
+                continue
+            try:
+                first, last = parse_ip(row[0]), parse_ip(row[1])
+            except ValueError:
+                skipped += 1
+                continue
+            if first is None or last is None:
+                skipped += 1
+                continue
+            code = row[2].strip().upper()
+            if len(code) != 2 or code == "ZZ":
+                skipped += 1
+                continue
+            timezone = row[3].strip() if len(row) > 3 and row[3].strip() else zones.get(code)
+            ranges.append((first, last, GeoLocation(code, timezone, country_currency(code, currencies))))
+
+    count = write_geo_database(args.output, ranges)
+    print(
+        f"Wrote {count} ranges of {len(currencies)} countries to {args.output} "
+        f"({args.output.stat().st_size / 1024:.0f} KiB, {skipped} rows skipped) in {time.perf_counter() - started:.1f}s."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,518 @@
+"""
+Deterministic generator of a synthetic dataset at a chosen scale.
+
+Unlike `generate_test_data.py` (which anonymizes a restored production dump),
+this builds everything from parameters with bulk inserts:
+1. N teachers (with every subject/system/grade specialty), M parents and
+   K students per parent.
+2. 1..S subjects per student; every `--share-every`-th subject is shared with
+   the next student, forming group tuitions.
+3. The tuitions, generated by the regular regeneration service.
+4. Years of weekly tuition logs (a few of them void) with their charges.
+5. Monthly payments per parent and teacher, skipping some months.
+6. Notes per student and a history of timetable runs with their solutions.
+7. The materialized payment ledger, rebuilt from the logs and payments.
+
+Every id and value comes from `--seed`, so two runs with the same parameters
+produce the same rows. Dates are laid out backwards from `--until` (default:
+today); pass it explicitly for byte-identical datasets on different days.
+
+The synthetic users share the `@synthetic.example.com` email domain and the
+timetable runs the `synthetic` trigger source, which is how `--delete` finds them.
+
+Usage:
+    python scripts/generate_synthetic_data.py [--teachers 20] [--parents 200]
+        [--students-per-parent 2] [--years 1] [--timetable-runs 3] [--seed 42]
+        [--until 2026-01-01] [--dry-run] [--delete]
+"""
+
+import asyncio
+import os
+import sys
+import time
+import random
+import argparse
+from dataclasses import dataclass, field
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from decimal import Decimal
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator
+from uuid import UUID
+from sqlalchemy import insert, delete, select
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+# --- Path Setup ---
+CURRENT_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = CURRENT_DIR.parent
+
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+def load_env():
+    env_path = PROJECT_ROOT / '.env'
+    if not env_path.exists():
+        print(f"Warning: .env not found at {env_path}")
+        return
+    with open(env_path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'): continue
+            if '=' in line:
+                k, v = line.split('=', 1)
+                k, v = k.strip(), v.strip()
+                if (v.startswith('"') and v.endswith('"')) or (v.startswith("'") and v.endswith("'")):
+                    v = v[1:-1]
+                if k not in os.environ: os.environ[k] = v
+
+
+SUBJECTS = ['Math', 'Physics', 'Chemistry', 'Biology', 'IT', 'Geography']
+SYSTEMS = ['IGCSE', 'SAT', 'National-EG', 'National-KW']
+GRADES = [9, 10, 11, 12]
+NOTE_TYPES = ['STUDY_NOTES', 'HOMEWORK', 'PAST_PAPERS']
+PASSWORD_HASH = "$2b$12$ezyY86d0mZsWLPdJ0V5Jeuf/qFcsGcM8zO5GKEQ7I3KN9d2LNDN1C"
+
+SYNTHETIC_EMAIL_DOMAIN = "synthetic.example.com"
+SYNTHETIC_TRIGGER = "synthetic"
+
+
+@dataclass
+class SyntheticDataConfig:
+    teachers: int = 20
+    parents: int = 200
+    students_per_parent: int = 2
+    max_subjects_per_student: int = 3
+    share_every: int = 5
+    years_of_logs: float = 1.0
+    void_ratio: float = 0.03
+    # Share of (parent, teacher, month) bills that get paid
+    payment_ratio: float = 0.9
+    notes_per_student: int = 2
+    timetable_runs: int = 1
+    seed: int = 42
+    until: date = field(default_factory=lambda: datetime.now(timezone.utc).date())
+    password_hash: str = PASSWORD_HASH
+    # Rows per INSERT statement
+    chunk_size: int = 5_000
+
+
+@dataclass
+class SyntheticIds:
+    teacher_ids: list[UUID] = field(default_factory=list)
+    parent_ids: list[UUID] = field(default_factory=list)
+    student_ids: list[UUID] = field(default_factory=list)
+
+
+def synthetic_uuid(rng: random.Random) -> UUID:
+    return UUID(int=rng.getrandbits(128), version=4)
+
+
+def synthetic_email(role: str, user_id: UUID) -> str:
+    return f"{role}.{user_id.hex[:12]}@{SYNTHETIC_EMAIL_DOMAIN}"
+
+
+def chunked(rows: Iterable[dict], size: int) -> Iterator[list[dict]]:
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+async def bulk_insert(session: AsyncSession, table, rows: Iterable[dict], chunk_size: int) -> int:
+    """Executemany INSERTs of at most `chunk_size` rows; returns the row count."""
+    count = 0
+    for chunk in chunked(rows, chunk_size):
+        await session.execute(insert(table), chunk)
+        count += len(chunk)
+    return count
+
+
+async def seed_catalogue(session: AsyncSession, config: SyntheticDataConfig) -> SyntheticIds:
+    """Users, specialties, students' subjects and sharings (steps 1 and 2)."""
+    from src.efficient_tutor_backend.database import models as db_models
+
+    rng = random.Random(f"{config.seed}-catalogue")
+    ids = SyntheticIds(
+        teacher_ids=[synthetic_uuid(rng) for _ in range(config.teachers)],
+        parent_ids=[synthetic_uuid(rng) for _ in range(config.parents)],
+    )
+    ids.student_ids = [synthetic_uuid(rng) for _ in range(config.parents * config.students_per_parent)]
+
+    users = []
+    for role, role_ids in (("teacher", ids.teacher_ids), ("parent", ids.parent_ids), ("student", ids.student_ids)):
+        users.extend({
+            "id": user_id,
+            "email": synthetic_email(role, user_id),
+            "password": config.password_hash,
+            "role": role,
+            "first_name": "Synthetic",
+            "last_name": role.title(),
+        } for user_id in role_ids)
+    await bulk_insert(session, db_models.Users.__table__, users, config.chunk_size)
+    await bulk_insert(session, db_models.Teachers.__table__, ({"id": t} for t in ids.teacher_ids), config.chunk_size)
+    await bulk_insert(session, db_models.Parents.__table__, ({"id": p} for p in ids.parent_ids), config.chunk_size)
+    await bulk_insert(session, db_models.TeacherSpecialties.__table__, (
+        {"teacher_id": t, "subject": subject, "educational_system": system, "grade": grade}
+        for t in ids.teacher_ids for subject in SUBJECTS for system in SYSTEMS for grade in GRADES
+    ), config.chunk_size)
+
+    students = []
+    for i, student_id in enumerate(ids.student_ids):
+        students.append({
+            "id": student_id,
+            "parent_id": ids.parent_ids[i // config.students_per_parent],
+            "cost": Decimal(rng.choice(["6.00", "8.00", "10.00"])),
+            "min_duration_mins": 60,
+            "max_duration_mins": rng.choice([90, 120]),
+            "grade": rng.choice(GRADES),
+            "educational_system": rng.choice(SYSTEMS),
+        })
+    await bulk_insert(session, db_models.Students.__table__, students, config.chunk_size)
+
+    subjects = []
+    sharings = []
+    student_count = len(ids.student_ids)
+    for i, student in enumerate(students):
+        # Contiguous blocks of students per teacher, like real classes
+        teacher_id = ids.teacher_ids[i * len(ids.teacher_ids) // student_count]
+        for subject in rng.sample(SUBJECTS, rng.randint(1, config.max_subjects_per_student)):
+            subject_id = synthetic_uuid(rng)
+            subjects.append({
+                "id": subject_id,
+                "student_id": student["id"],
+                "subject": subject,
+                "teacher_id": teacher_id,
+                "educational_system": student["educational_system"],
+                "grade": student["grade"],
+                "lessons_per_week": rng.randint(1, 2),
+            })
+            if config.share_every and len(subjects) % config.share_every == 0 and i + 1 < student_count:
+                sharings.append({"student_subject_id": subject_id, "shared_with_student_id": ids.student_ids[i + 1]})
+    await bulk_insert(session, db_models.StudentSubjects.__table__, subjects, config.chunk_size)
+    await bulk_insert(session, db_models.t_student_subject_sharings, sharings, config.chunk_size)
+
+    print(f"Seeded {len(ids.teacher_ids)} teachers, {len(ids.parent_ids)} parents, {student_count} students, "
+          f"{len(subjects)} subjects, {len(sharings)} sharings.")
+    return ids
+
+
+async def generate_tuitions(session: AsyncSession, ids: SyntheticIds) -> None:
+    """Step 3: the regular (targeted) regeneration over the synthetic students."""
+    from src.efficient_tutor_backend.services.user_service import UserService
+    from src.efficient_tutor_backend.services.tuition_service import TuitionService
+
+    service = TuitionService(db=session, user_service=UserService(db=session))
+    await service.regenerate_tuitions_for_students(set(ids.student_ids))
+
+
+async def _load_tuitions(session: AsyncSession, ids: SyntheticIds) -> list[tuple]:
+    """(tuition row, its template charges) of the synthetic teachers, in id order."""
+    from src.efficient_tutor_backend.database import models as db_models
+
+    tuitions = (await session.execute(
+        select(db_models.Tuitions.__table__)
+        .where(db_models.Tuitions.teacher_id.in_(ids.teacher_ids))
+        .order_by(db_models.Tuitions.id)
+    )).all()
+    charges = (await session.execute(
+        select(db_models.TuitionTemplateCharges.__table__)
+        .where(db_models.TuitionTemplateCharges.tuition_id.in_([t.id for t in tuitions]))
+        .order_by(db_models.TuitionTemplateCharges.student_id)
+    )).all()
+    charges_by_tuition: dict[UUID, list] = {}
+    for charge in charges:
+        charges_by_tuition.setdefault(charge.tuition_id, []).append(charge)
+    return [(tuition, charges_by_tuition.get(tuition.id, [])) for tuition in tuitions]
+
+
+async def seed_tuition_logs(session: AsyncSession, config: SyntheticDataConfig, tuitions: list[tuple]) -> tuple[int, int, list[dict]]:
+    """
+    Step 4: one log per tuition per week over `years_of_logs`.
+    Returns the log and charge counts and the ACTIVE charges (for the payments).
+    """
+    from src.efficient_tutor_backend.database import models as db_models
+
+    rng = random.Random(f"{config.seed}-logs")
+    until = datetime.combine(config.until, dt_time.min, tzinfo=timezone.utc)
+    weeks = int(config.years_of_logs * 52)
+    first_week = until - timedelta(weeks=weeks)
+
+    logs, charges, active_charges = [], [], []
+    log_count = charge_count = 0
+
+    async def flush():
+        nonlocal logs, charges, log_count, charge_count
+        log_count += await bulk_insert(session, db_models.TuitionLogs.__table__, logs, config.chunk_size)
+        charge_count += await bulk_insert(session, db_models.TuitionLogCharges.__table__, charges, config.chunk_size)
+        logs, charges = [], []
+
+    for tuition, template_charges in tuitions:
+        if not template_charges:
+            continue
+        # A tuition keeps its weekly slot
+        offset = timedelta(days=rng.randint(0, 6), hours=rng.randint(13, 20))
+        duration = timedelta(minutes=tuition.min_duration_minutes)
+        for week in range(weeks):
+            start_time = first_week + timedelta(weeks=week) + offset
+            if start_time >= until:
+                break
+            status = "VOID" if rng.random() < config.void_ratio else "ACTIVE"
+            log_id = synthetic_uuid(rng)
+            logs.append({
+                "id": log_id,
+                "subject": tuition.subject,
+                "educational_system": tuition.educational_system,
+                "grade": tuition.grade,
+                "start_time": start_time,
+                "end_time": start_time + duration,
+                "status": status,
+                "create_type": "SCHEDULED",
+                "tuition_id": tuition.id,
+                "lesson_index": tuition.lesson_index,
+                "teacher_id": tuition.teacher_id,
+            })
+            for template in template_charges:
+                charge = {
+                    "id": synthetic_uuid(rng),
+                    "tuition_log_id": log_id,
+                    "student_id": template.student_id,
+                    "parent_id": template.parent_id,
+                    "cost": template.cost,
+                }
+                charges.append(charge)
+                if status == "ACTIVE":
+                    active_charges.append({**charge, "teacher_id": tuition.teacher_id, "start_time": start_time})
+
+        if len(charges) >= config.chunk_size:
+            await flush()
+    await flush()
+    return log_count, charge_count, active_charges
+
+
+async def seed_payments(session: AsyncSession, config: SyntheticDataConfig, active_charges: list[dict]) -> int:
+    """Step 5: each (parent, teacher) pays a month's charges early the next month, most months."""
+    from src.efficient_tutor_backend.database import models as db_models
+
+    rng = random.Random(f"{config.seed}-payments")
+    until = datetime.combine(config.until, dt_time.min, tzinfo=timezone.utc)
+
+    bills: dict[tuple[UUID, UUID, int, int], Decimal] = {}
+    for charge in active_charges:
+        key = (charge["parent_id"], charge["teacher_id"], charge["start_time"].year, charge["start_time"].month)
+        bills[key] = bills.get(key, Decimal(0)) + charge["cost"]
+
+    payments = []
+    for (parent_id, teacher_id, year, month), amount in sorted(bills.items()):
+        if rng.random() >= config.payment_ratio:
+            continue
+        next_month = datetime(year + month // 12, month % 12 + 1, 1, tzinfo=timezone.utc)
+        payment_date = next_month + timedelta(days=rng.randint(0, 9), hours=rng.randint(9, 21))
+        if payment_date >= until:
+            continue
+        payments.append({
+            "id": synthetic_uuid(rng),
+            "parent_id": parent_id,
+            "teacher_id": teacher_id,
+            "payment_date": payment_date,
+            "amount_paid": amount,
+            "status": "ACTIVE",
+        })
+    return await bulk_insert(session, db_models.PaymentLogs.__table__, payments, config.chunk_size)
+
+
+async def seed_notes(session: AsyncSession, config: SyntheticDataConfig, tuitions: list[tuple]) -> int:
+    """Step 6a: notes from the teacher of one of the student's tuitions."""
+    from src.efficient_tutor_backend.database import models as db_models
+
+    rng = random.Random(f"{config.seed}-notes")
+    until = datetime.combine(config.until, dt_time.min, tzinfo=timezone.utc)
+    enrollments: dict[UUID, list[tuple[UUID, str]]] = {}
+    for tuition, template_charges in tuitions:
+        for charge in template_charges:
+            enrollments.setdefault(charge.student_id, []).append((tuition.teacher_id, tuition.subject))
+
+    notes = []
+    for student_id in sorted(enrollments):
+        for n in range(config.notes_per_student):
+            teacher_id, subject = rng.choice(enrollments[student_id])
+            notes.append({
+                "id": synthetic_uuid(rng),
+                "teacher_id": teacher_id,
+                "student_id": student_id,
+                "name": f"{subject} note {n + 1}",
+                "subject": subject,
+                "note_type": rng.choice(NOTE_TYPES),
+                "created_at": until - timedelta(days=rng.randint(1, 365)),
+                "url": f"https://example.com/notes/{student_id.hex[:8]}/{n + 1}",
+            })
+    return await bulk_insert(session, db_models.Notes.__table__, notes, config.chunk_size)
+
+
+async def seed_timetable_runs(session: AsyncSession, config: SyntheticDataConfig, tuitions: list[tuple]) -> tuple[int, int]:
+    """
+    Step 6b: `timetable_runs` successful runs, oldest first. Each run places every
+    tuition once a week and gives every participant a copy of the slot.
+    """
+    from src.efficient_tutor_backend.database import models as db_models
+
+    rng = random.Random(f"{config.seed}-timetable")
+    until = datetime.combine(config.until, dt_time.min, tzinfo=timezone.utc)
+    slot_count = 0
+
+    for run_number in range(config.timetable_runs):
+        run_id = (await session.execute(
+            insert(db_models.TimetableRuns.__table__).values(
+                run_started_at=until - timedelta(days=7 * (config.timetable_runs - run_number)),
+                status="SUCCESS",
+                input_version_hash=f"{SYNTHETIC_TRIGGER}-{config.seed}-{run_number}",
+                run_duration_ms=rng.randint(1_000, 60_000),
+                trigger_source=SYNTHETIC_TRIGGER,
+            ).returning(db_models.TimetableRuns.id)
+        )).scalar_one()
+
+        solution_ids: dict[UUID, UUID] = {}
+        slots = []
+        for tuition, template_charges in tuitions:
+            if not template_charges:
+                continue
+            participants = [tuition.teacher_id] + [c.student_id for c in template_charges]
+            start = datetime.combine(config.until, dt_time(rng.randint(13, 20), rng.choice([0, 30])))
+            end = start + timedelta(minutes=tuition.min_duration_minutes)
+            day_of_week = rng.randint(1, 7)
+            name = f"{tuition.subject} (Lesson {tuition.lesson_index})"
+            for user_id in participants:
+                if user_id not in solution_ids:
+                    solution_ids[user_id] = synthetic_uuid(rng)
+                slots.append({
+                    "id": synthetic_uuid(rng),
+                    "solution_id": solution_ids[user_id],
+                    "name": name,
+                    "day_of_week": day_of_week,
+                    "start_time": start.time(),
+                    "end_time": end.time(),
+                    "participant_ids": participants,
+                    "tuition_id": tuition.id,
+                })
+
+        await bulk_insert(session, db_models.TimetableRunUserSolutions.__table__, (
+            {"id": solution_id, "timetable_run_id": run_id, "user_id": user_id}
+            for user_id, solution_id in solution_ids.items()
+        ), config.chunk_size)
+        slot_count += await bulk_insert(session, db_models.TimetableSolutionSlots.__table__, slots, config.chunk_size)
+
+    return config.timetable_runs, slot_count
+
+
+async def generate(session: AsyncSession, config: SyntheticDataConfig, rebuild_ledger: bool = True) -> SyntheticIds:
+    """Runs every step in the caller's transaction (nothing is committed here)."""
+    from src.efficient_tutor_backend.services.ledger_service import LedgerService
+
+    async def step(label, coro):
+        started = time.perf_counter()
+        result = await coro
+        print(f"  {label:<16} {time.perf_counter() - started:8.2f}s")
+        return result
+
+    print("--- Generating the synthetic dataset ---")
+    ids = await step("catalogue", seed_catalogue(session, config))
+    await step("tuitions", generate_tuitions(session, ids))
+    tuitions = await _load_tuitions(session, ids)
+
+    log_count, charge_count, active_charges = await step("tuition logs", seed_tuition_logs(session, config, tuitions))
+    payment_count = await step("payments", seed_payments(session, config, active_charges))
+    note_count = await step("notes", seed_notes(session, config, tuitions))
+    run_count, slot_count = await step("timetable runs", seed_timetable_runs(session, config, tuitions))
+    if rebuild_ledger:
+        await step("ledger", LedgerService(db=session).rebuild())
+
+    print(f"Generated {len(tuitions)} tuitions, {log_count} tuition logs, {charge_count} charges, "
+          f"{payment_count} payments, {note_count} notes, {run_count} timetable runs ({slot_count} slots).")
+    return ids
+
+
+async def delete_synthetic(session: AsyncSession) -> None:
+    """Deletes every synthetic row (in the caller's transaction)."""
+    from src.efficient_tutor_backend.database import models as db_models
+
+    synthetic_teachers = select(db_models.Users.id).where(
+        db_models.Users.email.like(f"teacher.%@{SYNTHETIC_EMAIL_DOMAIN}")
+    )
+    await session.execute(delete(db_models.TimetableRuns).where(db_models.TimetableRuns.trigger_source == SYNTHETIC_TRIGGER))
+    await session.execute(delete(db_models.TuitionLogs).where(db_models.TuitionLogs.teacher_id.in_(synthetic_teachers)))
+    await session.execute(delete(db_models.Tuitions).where(db_models.Tuitions.teacher_id.in_(synthetic_teachers)))
+    # Students, subjects, charges, payments, notes, solutions and wallets cascade from the users
+    await session.execute(delete(db_models.Users).where(db_models.Users.email.like(f"%@{SYNTHETIC_EMAIL_DOMAIN}")))
+
+
+async def main():
+    defaults = SyntheticDataConfig()
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic dataset with bulk inserts.")
+    parser.add_argument("--teachers", type=int, default=defaults.teachers)
+    parser.add_argument("--parents", type=int, default=defaults.parents)
+    parser.add_argument("--students-per-parent", type=int, default=defaults.students_per_parent)
+    parser.add_argument("--max-subjects", type=int, default=defaults.max_subjects_per_student)
+    parser.add_argument("--share-every", type=int, default=defaults.share_every,
+                        help="Every n-th subject is shared with the next student (0 disables sharing).")
+    parser.add_argument("--years", type=float, default=defaults.years_of_logs, help="Years of weekly tuition logs.")
+    parser.add_argument("--notes-per-student", type=int, default=defaults.notes_per_student)
+    parser.add_argument("--timetable-runs", type=int, default=defaults.timetable_runs)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--until", type=date.fromisoformat, default=defaults.until,
+                        help="Date the history ends at (YYYY-MM-DD, default: today).")
+    parser.add_argument("--skip-ledger", action="store_true", help="Do not rebuild the payment ledger.")
+    parser.add_argument("--dry-run", action="store_true", help="Generate, report and roll back.")
+    parser.add_argument("--delete", action="store_true", help="Only delete the synthetic data.")
+    args = parser.parse_args()
+
+    load_env()
+    target_env_var = "DATABASE_URL_TEST_CLI"
+    db_url = os.getenv(target_env_var)
+    if not db_url:
+        print(f"Error: {target_env_var} not set.")
+        return
+
+    if db_url.startswith("postgresql://") and "+asyncpg" not in db_url:
+        db_url = db_url.replace("postgresql://", "postgresql+asyncpg://")
+
+    print(f"Connecting to database ({target_env_var})...")
+    engine = create_async_engine(db_url)
+    async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with async_session() as session:
+        try:
+            # Leftovers of a previous run would collide with the seeded ids
+            await delete_synthetic(session)
+            if args.delete:
+                await session.commit()
+                print("Deleted the synthetic data.")
+                return
+
+            config = SyntheticDataConfig(
+                teachers=args.teachers,
+                parents=args.parents,
+                students_per_parent=args.students_per_parent,
+                max_subjects_per_student=args.max_subjects,
+                share_every=args.share_every,
+                years_of_logs=args.years,
+                notes_per_student=args.notes_per_student,
+                timetable_runs=args.timetable_runs,
+                seed=args.seed,
+                until=args.until,
+            )
+            await generate(session, config, rebuild_ledger=not args.skip_ledger)
+
+            if args.dry_run:
+                await session.rollback()
+                print("Dry run: rolled back.")
+            else:
+                await session.commit()
+                print("Committed.")
+        except Exception as e:
+            await session.rollback()
+            print(f"Error: {e}. Rolled back.")
+            raise
+
+    await engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,334 @@
+"""
+End-to-end load test of the API on a synthetic dataset.
+
+1. Generates the synthetic dataset of `generate_synthetic_data.py` in the TEST
+   database (committed, so the app's own sessions can see it).
+2. Drives the real FastAPI `app` in-process (or a running server with --base-url)
+   with many concurrent authenticated clients, one scenario at a time.
+3. Reports p50/p95/p99 latency, throughput, errors and the mean number of SQL
+   queries per request for every scenario, and saves them as JSON.
+4. Deletes the synthetic data again (unless --keep).
+
+Every router is covered: auth, users, tuitions, timetable, tuition-logs,
+payment-logs, financial-summary and notes.
+
+Usage:
+    python scripts/load_test.py [--parents 1000] [--years 1] [--clients 50] [--requests 500]
+                                [--output results.json] [--compare previous.json]
+"""
+
+import asyncio
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+import subprocess
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Optional
+from uuid import UUID
+
+import httpx
+from sqlalchemy import select
+
+# --- Path Setup ---
+CURRENT_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = CURRENT_DIR.parent
+
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from scripts.generate_synthetic_data import (
+    SyntheticDataConfig,
+    SYNTHETIC_EMAIL_DOMAIN,
+    load_env,
+    generate,
+    delete_synthetic
+)
+
+# Plain-text password of every synthetic user (used by the login scenario)
+LOAD_TEST_PASSWORD = "load-test-password"
+
+
+@dataclass
+class Actors:
+    """Synthetic users the clients act as, with their pre-built auth headers."""
+    teachers: list[tuple[str, dict]] = field(default_factory=list)
+    parents: list[tuple[str, dict]] = field(default_factory=list)
+    students: list[tuple[str, dict]] = field(default_factory=list)
+    tuitions_by_teacher: dict[str, list[UUID]] = field(default_factory=dict)
+
+
+@dataclass
+class Scenario:
+    name: str
+    router: str
+    method: str
+    # Builds (url, request kwargs) for one request
+    build: Callable[[random.Random], tuple[str, dict]]
+
+
+@dataclass
+class ScenarioResult:
+    latencies_ms: list[float] = field(default_factory=list)
+    status_codes: dict[int, int] = field(default_factory=dict)
+    queries: list[int] = field(default_factory=list)
+    errors: int = 0
+    wall_seconds: float = 0.0
+
+
+async def seed(config: SyntheticDataConfig) -> Actors:
+    """Generates and commits the synthetic dataset, returning the actors of the load test."""
+    from src.efficient_tutor_backend.database import engine as db_engine
+    from src.efficient_tutor_backend.database import models as db_models
+    from src.efficient_tutor_backend.services.security import JWTHandler
+
+    async with db_engine.AsyncSessionLocal() as session:
+        async with session.begin():
+            # Leftovers of an interrupted run would collide with the generated ids
+            await delete_synthetic(session)
+            await generate(session, config)
+
+        users = (await session.execute(
+            select(db_models.Users.id, db_models.Users.email, db_models.Users.role)
+            .where(db_models.Users.email.like(f"%@{SYNTHETIC_EMAIL_DOMAIN}"))
+        )).all()
+        tuitions = (await session.execute(
+            select(db_models.Tuitions.id, db_models.Tuitions.teacher_id)
+            .where(db_models.Tuitions.teacher_id.in_([u.id for u in users if u.role == "teacher"]))
+        )).all()
+
+    actors = Actors()
+    for user in users:
+        headers = {"Authorization": f"Bearer {JWTHandler.create_access_token(subject=user.email)}"}
+        getattr(actors, f"{user.role}s").append((user.email, headers))
+    emails_by_id = {u.id: u.email for u in users}
+    for tuition in tuitions:
+        actors.tuitions_by_teacher.setdefault(emails_by_id[tuition.teacher_id], []).append(tuition.id)
+    # Only teachers with tuitions can log lessons or read a tuition
+    actors.teachers = [t for t in actors.teachers if t[0] in actors.tuitions_by_teacher]
+    print(f"Load test actors: {len(actors.teachers)} teachers, {len(actors.parents)} parents, "
+          f"{len(actors.students)} students, {len(tuitions)} tuitions.")
+    return actors
+
+
+def build_scenarios(actors: Actors) -> list[Scenario]:
+    def as_teacher(rng):
+        return rng.choice(actors.teachers)
+
+    def as_parent(rng):
+        return rng.choice(actors.parents)
+
+    def get(path, pick):
+        return lambda rng: (path, {"headers": pick(rng)[1]})
+
+    def get_tuition(rng):
+        email, headers = as_teacher(rng)
+        return f"/tuitions/{rng.choice(actors.tuitions_by_teacher[email])}", {"headers": headers}
+
+    def login(rng):
+        email, _ = as_parent(rng)
+        return "/auth/login", {"data": {"username": email, "password": LOAD_TEST_PASSWORD}}
+
+    def create_tuition_log(rng):
+        email, headers = as_teacher(rng)
+        start_time = datetime.now(timezone.utc) - timedelta(days=rng.randint(1, 365))
+        return "/tuition-logs/", {"headers": headers, "json": {
+            "log_type": "SCHEDULED",
+            "tuition_id": str(rng.choice(actors.tuitions_by_teacher[email])),
+            "start_time": start_time.isoformat(),
+            "end_time": (start_time + timedelta(hours=1)).isoformat(),
+        }}
+
+    return [
+        Scenario("login", "auth", "POST", login),
+        Scenario("users_me_parent", "users", "GET", get("/users/me", as_parent)),
+        Scenario("list_students_parent", "users", "GET", get("/students/", as_parent)),
+        Scenario("list_tuitions_teacher", "tuitions", "GET", get("/tuitions/", as_teacher)),
+        Scenario("list_tuitions_parent", "tuitions", "GET", get("/tuitions/", as_parent)),
+        Scenario("get_tuition_teacher", "tuitions", "GET", get_tuition),
+        Scenario("timetable_teacher", "timetable", "GET", get("/timetable/", as_teacher)),
+        Scenario("create_tuition_log", "tuition-logs", "POST", create_tuition_log),
+        Scenario("list_tuition_logs_teacher", "tuition-logs", "GET", get("/tuition-logs/", as_teacher)),
+        Scenario("list_tuition_logs_parent", "tuition-logs", "GET", get("/tuition-logs/", as_parent)),
+        Scenario("list_payment_logs_parent", "payment-logs", "GET", get("/payment-logs/", as_parent)),
+        Scenario("financial_summary_teacher", "financial-summary", "GET", get("/financial-summary/", as_teacher)),
+        Scenario("financial_summary_parent", "financial-summary", "GET", get("/financial-summary/", as_parent)),
+        Scenario("list_notes_teacher", "notes", "GET", get("/notes/", as_teacher)),
+    ]
+
+
+async def run_scenario(
+    client: httpx.AsyncClient, scenario: Scenario, total: int, clients: int, warmup: int, seed_value: int
+) -> ScenarioResult:
+    """Sends `total` requests from `clients` concurrent workers (after `warmup` unrecorded ones)."""
+    result = ScenarioResult()
+    rng = random.Random(f"{seed_value}-{scenario.name}")
+
+    for _ in range(warmup):
+        url, kwargs = scenario.build(rng)
+        await client.request(scenario.method, url, **kwargs)
+
+    remaining = total
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            url, kwargs = scenario.build(rng)
+            started = time.perf_counter()
+            try:
+                response = await client.request(scenario.method, url, **kwargs)
+            except httpx.HTTPError:
+                result.errors += 1
+                continue
+            result.latencies_ms.append((time.perf_counter() - started) * 1000)
+            result.status_codes[response.status_code] = result.status_codes.get(response.status_code, 0) + 1
+            if response.status_code >= 400:
+                result.errors += 1
+            if "X-DB-Query-Count" in response.headers:
+                result.queries.append(int(response.headers["X-DB-Query-Count"]))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(clients)))
+    result.wall_seconds = time.perf_counter() - started
+    return result
+
+
+def summarize(scenario: Scenario, result: ScenarioResult) -> dict:
+    latencies = result.latencies_ms
+    if len(latencies) >= 2:
+        cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+        p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+    else:
+        p50 = p95 = p99 = latencies[0] if latencies else None
+    return {
+        "router": scenario.router,
+        "method": scenario.method,
+        "requests": len(latencies),
+        "errors": result.errors,
+        "status_codes": {str(code): count for code, count in sorted(result.status_codes.items())},
+        "throughput_rps": len(latencies) / result.wall_seconds if result.wall_seconds else 0.0,
+        "latency_ms": {
+            "p50": p50,
+            "p95": p95,
+            "p99": p99,
+            "mean": statistics.fmean(latencies) if latencies else None,
+            "max": max(latencies, default=None),
+        },
+        "mean_queries": statistics.fmean(result.queries) if result.queries else None,
+    }
+
+
+def print_comparison(results: dict, previous_path: Path) -> None:
+    previous = json.loads(previous_path.read_text())["scenarios"]
+    print(f"--- p95 vs {previous_path.name} ---")
+    for name, current in results.items():
+        before = previous.get(name, {}).get("latency_ms", {}).get("p95")
+        now = current["latency_ms"]["p95"]
+        if before and now:
+            print(f"  {name:<28} {before:9.1f} -> {now:9.1f} ms  ({(now - before) / before:+.1%})")
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Load test the API on a synthetic dataset.")
+    parser.add_argument("--teachers", type=int, default=20, help="Number of synthetic teachers.")
+    parser.add_argument("--parents", type=int, default=1_000, help="Number of synthetic parents.")
+    parser.add_argument("--students-per-parent", type=int, default=2)
+    parser.add_argument("--years", type=float, default=1.0, help="Years of tuition logs and payments.")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed of the dataset and the clients.")
+    parser.add_argument("--clients", type=int, default=50, help="Concurrent clients per scenario.")
+    parser.add_argument("--requests", type=int, default=500, help="Recorded requests per scenario.")
+    parser.add_argument("--warmup", type=int, default=10, help="Unrecorded requests before each scenario.")
+    parser.add_argument("--only", nargs="*", help="Run only these scenarios (by name).")
+    parser.add_argument("--base-url", help="Target a running server instead of the in-process app.")
+    parser.add_argument("--output", type=Path, help="JSON results file (default: load_test_<timestamp>.json).")
+    parser.add_argument("--compare", type=Path, help="A previous results file to compare p95 latencies against.")
+    parser.add_argument("--keep", action="store_true", help="Keep the synthetic data after the run.")
+    args = parser.parse_args()
+
+    load_env()
+    # The synthetic data is committed: never point this at production
+    os.environ["TEST_MODE"] = "True"
+
+    # Imported late so the .env is loaded before settings are read
+    from src.efficient_tutor_backend.main import app
+    from src.efficient_tutor_backend.common.security_utils import HashedPassword
+    from src.efficient_tutor_backend.common.config import settings
+    from src.efficient_tutor_backend.database import engine as db_engine
+
+    settings.DB_QUERY_STATS_HEADER = True
+    started_at = datetime.now(timezone.utc)
+
+    async with app.router.lifespan_context(app):
+        actors = await seed(SyntheticDataConfig(
+            teachers=args.teachers,
+            parents=args.parents,
+            students_per_parent=args.students_per_parent,
+            years_of_logs=args.years,
+            seed=args.seed,
+            password_hash=HashedPassword.get_hash(LOAD_TEST_PASSWORD)
+        ))
+        scenarios = [s for s in build_scenarios(actors) if not args.only or s.name in args.only]
+
+        if args.base_url:
+            transport, base_url = None, args.base_url
+        else:
+            transport, base_url = httpx.ASGITransport(app=app), "http://load-test"
+
+        results = {}
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=60) as client:
+                print(f"--- {len(scenarios)} scenarios, {args.requests} requests each, {args.clients} clients ---")
+                for scenario in scenarios:
+                    result = await run_scenario(client, scenario, args.requests, args.clients, args.warmup, args.seed)
+                    summary = results[scenario.name] = summarize(scenario, result)
+                    latency = summary["latency_ms"]
+                    print(f"  {scenario.name:<28} p50 {latency['p50'] or 0:8.1f}  p95 {latency['p95'] or 0:8.1f}  "
+                          f"p99 {latency['p99'] or 0:8.1f} ms  {summary['throughput_rps']:8.1f} req/s  "
+                          f"errors {summary['errors']}")
+        finally:
+            if not args.keep:
+                async with db_engine.AsyncSessionLocal() as session:
+                    async with session.begin():
+                        await delete_synthetic(session)
+                print("Deleted the synthetic data.")
+
+    output = args.output or Path(f"load_test_{started_at:%Y%m%dT%H%M%SZ}.json")
+    output.write_text(json.dumps({
+        "meta": {
+            "started_at": started_at.isoformat(),
+            "git_commit": git_commit(),
+            "target": args.base_url or "in-process",
+            "teachers": args.teachers,
+            "parents": args.parents,
+            "students_per_parent": args.students_per_parent,
+            "years": args.years,
+            "seed": args.seed,
+            "clients": args.clients,
+            "requests_per_scenario": args.requests,
+            "warmup": args.warmup,
+        },
+        "scenarios": results,
+    }, indent=2))
+    print(f"Saved the results to {output}.")
+
+    if args.compare:
+        print_comparison(results, args.compare)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,161 @@
+"""
+Standalone script to rebuild and/or verify the materialized payment ledger
+(`ledger_wallets`, `ledger_parent_wallets` and `ledger_charge_statuses`).
+
+- Rebuild: recomputes the whole ledger from the tuition and payment logs.
+- Verify: compares the materialized statuses against the full in-memory
+  recompute (`TuitionLogService._calculate_teacher_ledger` / `_calculate_parent_ledger`)
+  for every teacher and parent, and reports any mismatch.
+
+Usage:
+    python scripts/rebuild_ledger.py [--verify] [--verify-only] [--prod]
+"""
+
+import asyncio
+import os
+import sys
+import argparse
+from pathlib import Path
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+# --- Path Setup ---
+CURRENT_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = CURRENT_DIR.parent
+
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+def load_env():
+    env_path = PROJECT_ROOT / '.env'
+    if not env_path.exists():
+        print(f"Warning: .env not found at {env_path}")
+        return
+    with open(env_path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'): continue
+            if '=' in line:
+                k, v = line.split('=', 1)
+                k, v = k.strip(), v.strip()
+                if (v.startswith('"') and v.endswith('"')) or (v.startswith("'") and v.endswith("'")):
+                    v = v[1:-1]
+                if k not in os.environ: os.environ[k] = v
+
+
+async def verify_ledger(session: AsyncSession) -> int:
+    """Returns the number of mismatching entries between the ledger and the full recompute."""
+    from src.efficient_tutor_backend.database import models as db_models
+    from src.efficient_tutor_backend.database.db_enums import LogStatusEnum, PaidStatus
+    from src.efficient_tutor_backend.services.user_service import UserService
+    from src.efficient_tutor_backend.services.tuition_service import TuitionService
+    from src.efficient_tutor_backend.services.ledger_service import LedgerService
+    from src.efficient_tutor_backend.services.finance_service import TuitionLogService
+    from src.efficient_tutor_backend.services.summary_cache import SummaryCache
+    from src.efficient_tutor_backend.common.cache import NullCacheBackend
+
+    user_service = UserService(db=session)
+    ledger_service = LedgerService(db=session)
+    tuition_log_service = TuitionLogService(
+        db=session,
+        user_service=user_service,
+        tuition_service=TuitionService(db=session, user_service=user_service),
+        ledger_service=ledger_service,
+        summary_cache=SummaryCache(db=session, backend=NullCacheBackend())
+    )
+
+    mismatches = 0
+
+    # 1. Teacher side
+    teacher_ids = (await session.execute(
+        select(db_models.TuitionLogs.teacher_id).filter(
+            db_models.TuitionLogs.status == LogStatusEnum.ACTIVE.value,
+            db_models.TuitionLogs.teacher_id.is_not(None)
+        ).distinct()
+    )).scalars().all()
+
+    for teacher_id in teacher_ids:
+        expected = await tuition_log_service._calculate_teacher_ledger(teacher_id)
+        log_ids = list({log_id for log_id, _ in expected})
+        actual = await ledger_service.get_teacher_ledger(log_ids)
+        for key, status in expected.items():
+            if actual.get(key, PaidStatus.UNPAID) != status:
+                mismatches += 1
+                print(f"  Teacher {teacher_id}: charge {key} expected {status.value}, ledger has {actual.get(key)}")
+
+    # 2. Parent side
+    parent_ids = (await session.execute(
+        select(db_models.TuitionLogCharges.parent_id).distinct()
+    )).scalars().all()
+
+    for parent_id in parent_ids:
+        expected = await tuition_log_service._calculate_parent_ledger(parent_id)
+        actual = await ledger_service.get_parent_ledger(parent_id, list(expected.keys()))
+        for log_id, status in expected.items():
+            if actual.get(log_id, PaidStatus.UNPAID) != status:
+                mismatches += 1
+                print(f"  Parent {parent_id}: log {log_id} expected {status.value}, ledger has {actual.get(log_id)}")
+
+    print(f"Checked {len(teacher_ids)} teachers and {len(parent_ids)} parents.")
+    return mismatches
+
+
+async def main() -> int:
+    """Returns the number of mismatching ledger entries (0 when not verifying)."""
+    parser = argparse.ArgumentParser(description="Rebuild and verify the materialized payment ledger.")
+    parser.add_argument("--verify", action="store_true", help="Verify the ledger against the full recompute after rebuilding.")
+    parser.add_argument("--verify-only", action="store_true", help="Only verify; do not rebuild.")
+    parser.add_argument("--prod", action="store_true", help="Run against the PRODUCTION database.")
+    args = parser.parse_args()
+
+    load_env()
+
+    if args.prod:
+        target_env_var = "DATABASE_URL_PROD_CLI"
+        if not args.verify_only:
+            print("⚠️  WARNING: You are about to rebuild the ledger on the PRODUCTION database. ⚠️")
+            confirmation = input("Are you sure you want to proceed? (y/n): ").strip().lower()
+            if confirmation != 'y':
+                print("Operation aborted.")
+                sys.exit(1)
+    else:
+        target_env_var = "DATABASE_URL_TEST_CLI"
+
+    db_url = os.getenv(target_env_var)
+    if not db_url:
+        print(f"Error: {target_env_var} not set.")
+        sys.exit(1)
+
+    if db_url.startswith("postgresql://") and "+asyncpg" not in db_url:
+        db_url = db_url.replace("postgresql://", "postgresql+asyncpg://")
+
+    # Imported late so the .env is loaded before settings are read
+    from src.efficient_tutor_backend.services.ledger_service import LedgerService
+
+    print(f"Connecting to database ({target_env_var})...")
+    engine = create_async_engine(db_url)
+    async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    mismatches = 0
+    async with async_session() as session:
+        if not args.verify_only:
+            print("--- Rebuilding Ledger ---")
+            counts = await LedgerService(db=session).rebuild()
+            await session.commit()
+            print(f"✅ Ledger rebuilt: {counts['wallets']} wallets, {counts['parents']} parents.")
+
+        if args.verify or args.verify_only:
+            print("--- Verifying Ledger Against Full Recompute ---")
+            mismatches = await verify_ledger(session)
+            if mismatches == 0:
+                print("✅ PASS: Ledger matches the full recompute.")
+            else:
+                print(f"❌ FAIL: {mismatches} mismatching entries.")
+
+    await engine.dispose()
+    return mismatches
+
+if __name__ == "__main__":
+    if asyncio.run(main()):
+        sys.exit(1)
@@ -41,7 +41,12 @@ MIGRATION_FILES = [
     'generalize_availability.sql',
     'add_student_educational_system.sql',
     'create_timetable_solutions.sql',
-    'tuition_log_entry_fix.sql'
+    'tuition_log_entry_fix.sql',
+    'create_ledger_tables.sql',
+    'add_tuition_log_indexes.sql',
+    'add_timetable_participant_index.sql',
+    'create_refresh_tokens_table.sql',
+    'add_calendar_feed_version.sql'
 ]
 
 def load_env():
@@ -189,6 +194,19 @@ def run_migrations_sync():
                     print("ERROR: Password Update Failed.")
                     raise
 
+                # --- V0.3 Addition: Build the Payment Ledger ---
+                print("\n--- Building Materialized Payment Ledger ---")
+                ledger_script = PROJECT_ROOT / 'scripts' / 'rebuild_ledger.py'
+                try:
+                    cmd = [sys.executable, str(ledger_script), "--verify"]
+                    if args.prod:
+                        cmd.append("--prod")
+                    subprocess.run(cmd, check=True)
+                    print("Payment Ledger Built Successfully.")
+                except subprocess.CalledProcessError:
+                    print("ERROR: Payment Ledger Build Failed.")
+                    raise
+
     engine.dispose()
 
 
@@ -2,10 +2,11 @@
 API endpoints for Authentication including login and user creation (signup).
 '''
 from typing import Annotated
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
+from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordRequestForm
 
-from ..services.auth_service import LoginService
+from ..services.auth_service import LoginService, RefreshTokenService
 from ..services.user_service import ParentService, TeacherService
 from ..models import token as token_models
 from ..models import user as user_models
@@ -31,6 +32,20 @@ class AuthRoutes:
             response_model=token_models.Token,
             summary="Login for Access Token"
         )
+        self.router.add_api_route(
+            "/refresh",
+            self.refresh_access_token,
+            methods=["POST"],
+            response_model=token_models.Token,
+            summary="Renew the Access Token"
+        )
+        self.router.add_api_route(
+            "/logout",
+            self.logout,
+            methods=["POST"],
+            status_code=status.HTTP_204_NO_CONTENT,
+            summary="Revoke a Refresh Token"
+        )
         self.router.add_api_route(
             "/signup/parent",
             self.signup_parent,
@@ -69,6 +84,37 @@ class AuthRoutes:
                 detail="An internal server error occurred during login.",
             )
 
+    async def refresh_access_token(
+        self,
+        refresh_data: token_models.RefreshTokenRequest,
+        refresh_token_service: Annotated[RefreshTokenService, Depends(RefreshTokenService)]
+    ):
+        """
+        Exchanges a refresh token for a new access token and a new refresh token.
+        The presented refresh token can not be used again.
+        """
+        token = await refresh_token_service.rotate(refresh_data.refresh_token)
+        if token is None:
+            # Reuse of a revoked token: returned (not raised) so the family revocation is committed
+            return JSONResponse(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                content={"detail": "Invalid refresh token."},
+                headers={"WWW-Authenticate": "Bearer"}
+            )
+        return token
+
+    async def logout(
+        self,
+        refresh_data: token_models.RefreshTokenRequest,
+        refresh_token_service: Annotated[RefreshTokenService, Depends(RefreshTokenService)]
+    ):
+        """
+        Revokes the refresh token and every token rotated from the same login.
+        The current access token stays valid until it expires.
+        """
+        await refresh_token_service.revoke(refresh_data.refresh_token)
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+
     async def signup_parent(
         self,
         parent_data: user_models.ParentCreate,
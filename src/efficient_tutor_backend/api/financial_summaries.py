@@ -6,6 +6,7 @@ from uuid import UUID
 from fastapi import APIRouter, Depends, Query
 
 from ..database import models as db_models
+from ..database.engine import read_only
 from ..models import finance as finance_models
 from ..services.security import verify_token_and_get_user
 from ..services.finance_service import FinancialSummaryService
@@ -29,6 +30,7 @@ class FinancialSummariesAPI:
                 methods=["GET"], 
                 response_model=finance_models.FinancialSummaryReadRoleBased)
 
+    @read_only
     async def get_financial_summary(
         self,
         current_user: Annotated[db_models.Users, Depends(verify_token_and_get_user)],
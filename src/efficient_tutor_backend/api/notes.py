@@ -6,6 +6,8 @@ from uuid import UUID
 from fastapi import APIRouter, Depends, status, Response
 
 from ..database import models as db_models
+from ..database.engine import read_only
+from ..common.serialization import fast_json
 from ..models import notes as notes_models
 from ..services.security import verify_token_and_get_user
 from ..services.notes_service import NotesService
@@ -54,6 +56,7 @@ class NotesAPI:
                 methods=["DELETE"], 
                 status_code=status.HTTP_204_NO_CONTENT)
 
+    @read_only
     async def list_notes(
         self,
         current_user: Annotated[db_models.Users, Depends(verify_token_and_get_user)],
@@ -62,8 +65,9 @@ class NotesAPI:
         """
         Retrieves a list of all notes visible to the current user.
         """
-        return await notes_service.get_all_notes_for_api(current_user)
+        return fast_json(await notes_service.get_all_notes_for_api(current_user))
 
+    @read_only
     async def get_note(
         self,
         note_id: UUID,
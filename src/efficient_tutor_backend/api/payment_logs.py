@@ -6,6 +6,8 @@ from uuid import UUID
 from fastapi import APIRouter, Depends, status, Query
 
 from ..database import models as db_models
+from ..database.engine import read_only
+from ..common.serialization import fast_json
 from ..models import finance as finance_models
 from ..services.security import verify_token_and_get_user
 from ..services.finance_service import PaymentLogService
@@ -49,6 +51,7 @@ class PaymentLogsAPI:
                 methods=["POST"], 
                 response_model=finance_models.PaymentLogRead)
 
+    @read_only
     async def list_payment_logs(
         self,
         current_user: Annotated[db_models.Users, Depends(verify_token_and_get_user)],
@@ -59,12 +62,13 @@ class PaymentLogsAPI:
         """
         Retrieves a list of all payment logs relevant to the current user.
         """
-        return await payment_log_service.get_all_payment_logs_for_api(
+        return fast_json(await payment_log_service.get_all_payment_logs_for_api(
             current_user,
             parent_id=parent_id,
             teacher_id=teacher_id
-        )
+        ))
 
+    @read_only
     async def get_payment_log(
         self,
         log_id: UUID,
@@ -0,0 +1,101 @@
+'''
+API endpoints exposing operational metrics of this worker process (Admins only).
+'''
+from typing import Annotated, Any
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from ..database import models as db_models
+from ..database import engine as db_engine
+from ..database.db_enums import UserRole
+from ..database.metrics import db_metrics
+from ..common.config import settings
+from ..common.security_utils import password_hash_pool
+from ..services.security import verify_token_and_get_user
+from ..services.geo_enrichment import geo_enrichment_runner
+
+class SystemAPI:
+    """
+    A class to encapsulate the operational endpoints.
+    """
+    def __init__(self):
+        self.router = APIRouter(
+            prefix="/system",
+            tags=["System"]
+        )
+        self._register_routes()
+
+    def _register_routes(self):
+        """Registers all the API routes for this class."""
+        self.router.add_api_route(
+                "/db-pool",
+                self.get_db_pool_metrics,
+                methods=["GET"])
+        self.router.add_api_route(
+                "/password-hashing",
+                self.get_password_hashing_metrics,
+                methods=["GET"])
+        self.router.add_api_route(
+                "/geo-enrichment",
+                self.get_geo_enrichment_metrics,
+                methods=["GET"])
+
+    def _require_admin(self, current_user: db_models.Users) -> None:
+        if current_user.role != UserRole.ADMIN.value:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="This action is restricted to administrators."
+            )
+
+    async def get_db_pool_metrics(
+        self,
+        current_user: Annotated[db_models.Users, Depends(verify_token_and_get_user)]
+    ) -> dict[str, Any]:
+        """
+        Reports this worker's connection pool: configuration, checked-out and
+        overflow connections, checkout wait times and per-route query counts.
+        Workers x (size + max_overflow) must stay below Postgres `max_connections`.
+        **This endpoint is restricted to Admins only.**
+        """
+        self._require_admin(current_user)
+        metrics = db_metrics.snapshot(db_engine.engine)
+        # None when read-only sessions use the primary
+        metrics["replica_pool"] = db_metrics.pool_state(db_engine.replica_engine)
+        metrics["config"] = {
+            "pool_size": settings.DB_POOL_SIZE,
+            "max_overflow": settings.DB_POOL_MAX_OVERFLOW,
+            "max_connections_per_worker": settings.DB_POOL_SIZE + settings.DB_POOL_MAX_OVERFLOW,
+            "timeout_seconds": settings.DB_POOL_TIMEOUT_SECONDS,
+            "use_lifo": settings.DB_POOL_USE_LIFO,
+            "pre_ping": settings.DB_POOL_PRE_PING,
+        }
+        return metrics
+
+    async def get_password_hashing_metrics(
+        self,
+        current_user: Annotated[db_models.Users, Depends(verify_token_and_get_user)]
+    ) -> dict[str, Any]:
+        """
+        Reports this worker's password hashing pool: threads, calls waiting and
+        running, the deepest queue seen, rejected calls and wait times.
+        A growing queue or any rejection means PASSWORD_HASH_WORKERS is too low.
+        **This endpoint is restricted to Admins only.**
+        """
+        self._require_admin(current_user)
+        return password_hash_pool.snapshot()
+
+    async def get_geo_enrichment_metrics(
+        self,
+        current_user: Annotated[db_models.Users, Depends(verify_token_and_get_user)]
+    ) -> dict[str, Any]:
+        """
+        Reports this worker's background geolocation of new users: users waiting
+        (including retries), batches run, users enriched, unknown, retried and given up.
+        **This endpoint is restricted to Admins only.**
+        """
+        self._require_admin(current_user)
+        return geo_enrichment_runner.status()
+
+
+# Instantiate the class and export its router
+system_api = SystemAPI()
+router = system_api.router
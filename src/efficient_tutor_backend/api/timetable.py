@@ -1,14 +1,18 @@
 '''
 API endpoints for viewing the generated Timetable.
 '''
+from datetime import datetime
 from typing import Annotated, Any, Union
 from uuid import UUID
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Request, Response, status
 
 from ..database import models as db_models
+from ..database.engine import read_only
+from ..common.serialization import fast_json
 from ..models import timetable as timetable_models
 from ..services.security import verify_token_and_get_user
 from ..services.timetable_service import TimeTableService
+from ..services.calendar_feed_service import CalendarFeedService
 
 
 class TimetableAPI:
@@ -29,19 +33,103 @@ class TimetableAPI:
             self.get_timetable,
             methods=["GET"],
             response_model=list[timetable_models.TimeTableSlot])
+        self.router.add_api_route(
+            "/feed-url",
+            self.get_feed_url,
+            methods=["GET"],
+            response_model=timetable_models.CalendarFeedLink)
+        self.router.add_api_route(
+            "/feed-url/rotate",
+            self.rotate_feed_url,
+            methods=["POST"],
+            response_model=timetable_models.CalendarFeedLink)
+        self.router.add_api_route(
+            "/feed/{user_id}/{token}.ics",
+            self.get_feed,
+            methods=["GET"],
+            name="get_timetable_feed",
+            response_class=Response,
+            responses={
+                200: {"content": {"text/calendar": {}}},
+                304: {"description": "The feed did not change (If-None-Match)."}
+            })
 
+    @read_only
     async def get_timetable(
         self,
         current_user: Annotated[db_models.Users, Depends(verify_token_and_get_user)],
         timetable_service: Annotated[TimeTableService, Depends(TimeTableService)],
-        target_user_id: Annotated[UUID | None, Query(description="Optional filter for Target User ID")] = None
+        target_user_id: Annotated[UUID | None, Query(description="Optional filter for Target User ID")] = None,
+        window_start: Annotated[datetime | None, Query(
+            alias="from", description="Start of a date range (inclusive). Naive values are in the user's timezone."
+        )] = None,
+        window_end: Annotated[datetime | None, Query(
+            alias="to", description="End of a date range (exclusive). Required with 'from'."
+        )] = None
     ) -> list[Any]:
         """
         Retrieves the generated timetable.
         If target_user_id is provided, retrieves the timetable for that specific user (if authorized).
         Otherwise, defaults to the current user's view.
+        With from/to, every occurrence starting in the range is returned (one entry each),
+        instead of each slot once with its next occurrence.
+        """
+        return fast_json(await timetable_service.get_timetable_for_api(
+            current_user,
+            target_user_id=target_user_id,
+            window_start=window_start,
+            window_end=window_end
+        ))
+
+    async def get_feed_url(
+        self,
+        request: Request,
+        current_user: Annotated[db_models.Users, Depends(verify_token_and_get_user)]
+    ) -> timetable_models.CalendarFeedLink:
+        """
+        Returns the subscription URL of the current user's iCalendar feed.
+        The token in the URL is the only credential of the feed.
+        """
+        token = CalendarFeedService.feed_token(current_user.id, current_user.calendar_feed_version)
+        url = request.url_for("get_timetable_feed", user_id=str(current_user.id), token=token)
+        return timetable_models.CalendarFeedLink(url=str(url))
+
+    async def rotate_feed_url(
+        self,
+        request: Request,
+        current_user: Annotated[db_models.Users, Depends(verify_token_and_get_user)],
+        feed_service: Annotated[CalendarFeedService, Depends(CalendarFeedService)]
+    ) -> timetable_models.CalendarFeedLink:
+        """
+        Revokes the current user's feed URL (e.g. after it leaked) and returns the new one.
+        Subscribed calendars must be re-subscribed with the new URL.
+        """
+        token = await feed_service.rotate_feed_token(current_user)
+        url = request.url_for("get_timetable_feed", user_id=str(current_user.id), token=token)
+        return timetable_models.CalendarFeedLink(url=str(url))
+
+    @read_only
+    async def get_feed(
+        self,
+        request: Request,
+        user_id: UUID,
+        token: str,
+        feed_service: Annotated[CalendarFeedService, Depends(CalendarFeedService)]
+    ) -> Response:
+        """
+        Serves the user's timetable as an iCalendar feed, for calendar subscriptions.
+        Returns 304 Not Modified when the client's If-None-Match matches the ETag.
         """
-        return await timetable_service.get_timetable_for_api(current_user, target_user_id=target_user_id)
+        etag, body = await feed_service.get_feed(user_id, token)
+        quoted_etag = f'"{etag}"'
+        headers = {"ETag": quoted_etag, "Cache-Control": "private, no-cache"}
+
+        if_none_match = request.headers.get("if-none-match", "")
+        client_etags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if quoted_etag in client_etags or "*" in client_etags:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        return Response(content=body, media_type="text/calendar; charset=utf-8", headers=headers)
 
 # Instantiate the class and export its router
 timetable_api = TimetableAPI()
@@ -1,11 +1,15 @@
 '''
 API endpoints for managing Tuition Logs.
 '''
+from datetime import datetime
 from typing import Annotated, Any, Union
 from uuid import UUID
-from fastapi import APIRouter, Depends, status, Query
+from fastapi import APIRouter, Depends, status, Query, Response, HTTPException
+from fastapi.responses import StreamingResponse
 
 from ..database import models as db_models
+from ..database.engine import read_only
+from ..common.serialization import fast_json
 from ..models import finance as finance_models
 from ..services.security import verify_token_and_get_user
 from ..services.finance_service import TuitionLogService
@@ -50,25 +54,61 @@ class TuitionLogsAPI:
             methods=["POST"], 
             response_model=finance_models.TuitionLogReadForTeacher)
 
+    @read_only
     async def list_tuition_logs(
         self,
+        response: Response,
         current_user: Annotated[db_models.Users, Depends(verify_token_and_get_user)],
         tuition_log_service: Annotated[TuitionLogService, Depends(TuitionLogService)],
         student_id: Annotated[UUID | None, Query(description="Optional filter for Student ID")] = None,
         parent_id: Annotated[UUID | None, Query(description="Optional filter for Parent ID")] = None,
-        teacher_id: Annotated[UUID | None, Query(description="Optional filter for Teacher ID")] = None
-    ) -> list[Any]:
+        teacher_id: Annotated[UUID | None, Query(description="Optional filter for Teacher ID")] = None,
+        start_from: Annotated[datetime | None, Query(description="Only logs starting at or after this time")] = None,
+        start_to: Annotated[datetime | None, Query(description="Only logs starting before this time")] = None,
+        limit: Annotated[int | None, Query(ge=1, le=500, description="Page size. Omit to get every log")] = None,
+        cursor: Annotated[str | None, Query(description="The X-Next-Cursor value of the previous page")] = None,
+        stream: Annotated[bool, Query(description="Stream all matching logs as NDJSON (for exports)")] = False
+    ) -> Any:
         """
         Retrieves a list of all tuition logs relevant to the current user.
         The response model varies based on the user's role.
+
+        Logs are ordered newest first. When `limit` is given and the page is full,
+        the `X-Next-Cursor` response header holds the cursor of the next page.
+        With `stream=true`, every matching log is sent as one JSON object per line.
         """
-        return await tuition_log_service.get_all_tuition_logs_for_api(
-            current_user,
+        try:
+            decoded_cursor = finance_models.TuitionLogCursor.decode(cursor) if cursor else None
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+        filters = dict(
             student_id=student_id,
             parent_id=parent_id,
-            teacher_id=teacher_id
+            teacher_id=teacher_id,
+            start_from=start_from,
+            start_to=start_to,
+            cursor=decoded_cursor
         )
 
+        if stream:
+            api_logs = await tuition_log_service.stream_tuition_logs_for_api(current_user, **filters)
+
+            async def ndjson_lines():
+                async for api_log in api_logs:
+                    yield api_log.model_dump_json() + "\n"
+
+            return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+        api_logs = await tuition_log_service.get_all_tuition_logs_for_api(current_user, limit=limit, **filters)
+        if limit and len(api_logs) == limit:
+            last_log = api_logs[-1]
+            response.headers["X-Next-Cursor"] = finance_models.TuitionLogCursor(
+                start_time=last_log.start_time, id=last_log.id
+            ).encode()
+        return fast_json(api_logs, response=response)
+
+    @read_only
     async def get_tuition_log(
         self,
         log_id: UUID,
@@ -7,10 +7,13 @@ from fastapi import APIRouter, Depends, Response, status, HTTPException
 
 from ..database import models as db_models
 from ..database.db_enums import UserRole
+from ..database.engine import read_only
+from ..common.serialization import fast_json
 from ..models import tuition as tuition_models
 from ..models import meeting_links as meeting_link_models
 from ..services.security import verify_token_and_get_user
 from ..services.tuition_service import TuitionService
+from ..services.regeneration_jobs import RegenerationQueue, TuitionRegenerationRunner, get_regeneration_runner
 
 class TuitionsAPI:
     """
@@ -36,6 +39,11 @@ class TuitionsAPI:
                 self.regenerate_tuitions, 
                 methods=["POST"], 
                 status_code=status.HTTP_202_ACCEPTED)
+        self.router.add_api_route(
+                "/regenerate/status",
+                self.get_regeneration_status,
+                methods=["GET"],
+                response_model=tuition_models.RegenerationStatusRead)
         self.router.add_api_route(
                 "/{tuition_id}", 
                 self.get_tuition, 
@@ -65,6 +73,7 @@ class TuitionsAPI:
                 methods=["DELETE"], 
                 status_code=status.HTTP_204_NO_CONTENT)
 
+    @read_only
     async def list_tuitions(
         self,
         current_user: Annotated[db_models.Users, Depends(verify_token_and_get_user)],
@@ -74,9 +83,11 @@ class TuitionsAPI:
         Retrieves a list of all tuition templates visible to the current user.
         The response model varies based on the user's role.
         """
-        # The service returns a list of dicts; FastAPI validates against the Union response_model
-        return await tuition_service.get_all_tuitions_for_api(current_user)
+        # The service returns a list of role-specific response models. FastAPI validates them against the Union response_model,
+        # unless FAST_SERIALIZATION is on: then fast_json encodes them as they are (see common/serialization)
+        return fast_json(await tuition_service.get_all_tuitions_for_api(current_user))
 
+    @read_only
     async def get_tuition(
         self,
         tuition_id: UUID,
@@ -142,28 +153,38 @@ class TuitionsAPI:
     async def regenerate_tuitions(
         self,
         current_user: Annotated[db_models.Users, Depends(verify_token_and_get_user)],
-        tuition_service: Annotated[TuitionService, Depends(TuitionService)]
+        regeneration_queue: Annotated[RegenerationQueue, Depends(RegenerationQueue)]
     ):
         """
-        Triggers a full regeneration of all tuition templates.
+        Queues a full regeneration of all tuition templates in the background.
         This is a powerful administrative action that rebuilds tuitions based on
-        current student subject enrollments.
+        current student subject enrollments. Progress is reported by
+        GET /tuitions/regenerate/status.
         **This endpoint is restricted to Admins only.**
         """
-        # Authorization Check
+        self._authorize_admin(current_user)
+        regeneration_queue.enqueue_all()
+        return {"message": "Tuition regeneration process started successfully."}
+
+    async def get_regeneration_status(
+        self,
+        current_user: Annotated[db_models.Users, Depends(verify_token_and_get_user)],
+        runner: Annotated[TuitionRegenerationRunner, Depends(get_regeneration_runner)]
+    ):
+        """
+        Returns the running, queued and recent regeneration jobs of this worker,
+        with their durations.
+        **This endpoint is restricted to Admins only.**
+        """
+        self._authorize_admin(current_user)
+        return tuition_models.RegenerationStatusRead.model_validate(runner.status())
+
+    def _authorize_admin(self, current_user: db_models.Users) -> None:
         if current_user.role != UserRole.ADMIN.value:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="This action is restricted to administrators."
             )
-        
-        success = await tuition_service.regenerate_all_tuitions()
-        if success:
-            return {"message": "Tuition regeneration process started successfully."}
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Tuition regeneration failed.")
 
 
 # Instantiate the class and export its router
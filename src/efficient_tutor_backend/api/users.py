@@ -10,6 +10,7 @@ from ..models import user as user_models
 from ..services.security import verify_token_and_get_user
 from ..services.user_service import AdminService, ParentService, StudentService, TeacherService, UserService
 from ..services.tuition_service import TuitionService # Import TuitionService
+from ..services.regeneration_jobs import RegenerationQueue
 
 
 # Helper function to convert ORM objects to Pydantic models
@@ -199,11 +200,11 @@ class StudentsAPI:
         student_data: user_models.StudentCreate,
         current_user: Annotated[db_models.Users, Depends(verify_token_and_get_user)],
         student_service: Annotated[StudentService, Depends(StudentService)],
-        tuition_service: Annotated[TuitionService, Depends(TuitionService)] # Inject TuitionService
+        regeneration_queue: Annotated[RegenerationQueue, Depends(RegenerationQueue)]
     ):
         new_student = await student_service.create_student(student_data, current_user)
         #TODO: should be moved to the (to-be) made update tuition endpoints, triggered by admins only.
-        await tuition_service.regenerate_all_tuitions() # Call regenerate
+        regeneration_queue.enqueue_students({new_student.id})
         return new_student
 
     async def get_all(self, current_user: Annotated[db_models.Users, Depends(verify_token_and_get_user)], student_service: Annotated[StudentService, Depends(StudentService)]):
@@ -222,10 +223,10 @@ class StudentsAPI:
         update_data: user_models.StudentUpdate,
         current_user: Annotated[db_models.Users, Depends(verify_token_and_get_user)],
         student_service: Annotated[StudentService, Depends(StudentService)],
-        tuition_service: Annotated[TuitionService, Depends(TuitionService)] # Inject TuitionService
+        regeneration_queue: Annotated[RegenerationQueue, Depends(RegenerationQueue)]
     ):
         updated_student = await student_service.update_student(student_id, update_data, current_user)
-        await tuition_service.regenerate_all_tuitions() # Call regenerate
+        regeneration_queue.enqueue_students({student_id})
         return updated_student
 
     async def delete(
@@ -233,10 +234,13 @@ class StudentsAPI:
         student_id: UUID,
         current_user: Annotated[db_models.Users, Depends(verify_token_and_get_user)],
         student_service: Annotated[StudentService, Depends(StudentService)],
-        tuition_service: Annotated[TuitionService, Depends(TuitionService)] # Inject TuitionService
+        tuition_service: Annotated[TuitionService, Depends(TuitionService)],
+        regeneration_queue: Annotated[RegenerationQueue, Depends(RegenerationQueue)]
     ):
+        # Collected first: deleting the student also deletes the links to their partners
+        affected_student_ids = await tuition_service.collect_regeneration_scope({student_id})
         await student_service.delete_student(student_id, current_user)
-        await tuition_service.regenerate_all_tuitions() # Call regenerate
+        regeneration_queue.enqueue_students(affected_student_ids)
 
     async def add_availability_interval(
         self,
@@ -273,10 +277,10 @@ class StudentsAPI:
         subject_data: user_models.StudentSubjectWrite,
         current_user: Annotated[db_models.Users, Depends(verify_token_and_get_user)],
         student_service: Annotated[StudentService, Depends(StudentService)],
-        tuition_service: Annotated[TuitionService, Depends(TuitionService)]
+        regeneration_queue: Annotated[RegenerationQueue, Depends(RegenerationQueue)]
     ):
         new_subject = await student_service.add_student_subject(student_id, subject_data, current_user)
-        await tuition_service.regenerate_all_tuitions()
+        regeneration_queue.enqueue_students({student_id})
         return new_subject
 
     async def delete_student_subject(
@@ -285,10 +289,10 @@ class StudentsAPI:
         subject_id: UUID,
         current_user: Annotated[db_models.Users, Depends(verify_token_and_get_user)],
         student_service: Annotated[StudentService, Depends(StudentService)],
-        tuition_service: Annotated[TuitionService, Depends(TuitionService)]
+        regeneration_queue: Annotated[RegenerationQueue, Depends(RegenerationQueue)]
     ):
         await student_service.delete_student_subject(student_id, subject_id, current_user)
-        await tuition_service.regenerate_all_tuitions()
+        regeneration_queue.enqueue_students({student_id})
         return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
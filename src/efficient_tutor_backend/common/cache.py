@@ -0,0 +1,102 @@
+'''
+Pluggable key-value cache backends for read-heavy services.
+1- InMemoryCacheBackend: bounded TTL cache local to one worker process (cachetools).
+2- RedisCacheBackend: shared between all workers (needs the optional `redis` package).
+3- NullCacheBackend: disables caching.
+Values are strings so every backend stores the same thing.
+'''
+import threading
+from abc import ABC, abstractmethod
+from typing import Optional, Iterable
+from cachetools import TTLCache
+
+from .config import settings
+from .logger import log
+
+
+class CacheBackend(ABC):
+    """Minimal async interface every cache backend implements."""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: str) -> None:
+        ...
+
+    @abstractmethod
+    async def delete(self, keys: Iterable[str]) -> None:
+        ...
+
+
+class InMemoryCacheBackend(CacheBackend):
+    """Bounded LRU/TTL cache. Each worker process has its own copy."""
+
+    def __init__(self, maxsize: int, ttl_seconds: int):
+        self._cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl_seconds)
+        # TTLCache is not thread-safe; sync code paths may run in worker threads.
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            return self._cache.get(key)
+
+    async def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._cache[key] = value
+
+    async def delete(self, keys: Iterable[str]) -> None:
+        with self._lock:
+            for key in keys:
+                self._cache.pop(key, None)
+
+
+class RedisCacheBackend(CacheBackend):
+    """Cache shared by every worker, for multi-process deployments."""
+
+    def __init__(self, url: str, ttl_seconds: int):
+        try:
+            from redis import asyncio as aioredis
+        except ImportError as e:
+            raise RuntimeError("The 'redis' cache backend requires the 'redis' package to be installed.") from e
+        self._client = aioredis.from_url(url, decode_responses=True)
+        self._ttl_seconds = ttl_seconds
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._client.get(key)
+
+    async def set(self, key: str, value: str) -> None:
+        await self._client.set(key, value, ex=self._ttl_seconds)
+
+    async def delete(self, keys: Iterable[str]) -> None:
+        keys = list(keys)
+        if keys:
+            await self._client.delete(*keys)
+
+
+class NullCacheBackend(CacheBackend):
+    """Caches nothing."""
+
+    async def get(self, key: str) -> Optional[str]:
+        return None
+
+    async def set(self, key: str, value: str) -> None:
+        return None
+
+    async def delete(self, keys: Iterable[str]) -> None:
+        return None
+
+
+def create_cache_backend(backend: str, maxsize: int, ttl_seconds: int) -> CacheBackend:
+    """Builds a backend by name: 'memory', 'redis' or 'none'."""
+    if backend == "memory":
+        return InMemoryCacheBackend(maxsize=maxsize, ttl_seconds=ttl_seconds)
+    if backend == "redis":
+        if not settings.CACHE_REDIS_URL:
+            raise RuntimeError("CACHE_REDIS_URL must be set to use the 'redis' cache backend.")
+        return RedisCacheBackend(settings.CACHE_REDIS_URL, ttl_seconds=ttl_seconds)
+    if backend == "none":
+        return NullCacheBackend()
+    log.warning(f"Unknown cache backend '{backend}'. Caching is disabled.")
+    return NullCacheBackend()
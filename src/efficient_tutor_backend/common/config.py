@@ -1,6 +1,7 @@
 '''
 Holds all the configurations
 '''
+from typing import Literal
 from pydantic import ConfigDict
 from pydantic_settings import BaseSettings
 
@@ -29,10 +30,95 @@ class Settings(BaseSettings):
             return self.DATABASE_URL_TEST
         return self.DATABASE_URL_PROD
 
+    # Optional read replica for read-only sessions (falls back to the primary when unset)
+    DATABASE_URL_REPLICA_PROD: str | None = None
+    DATABASE_URL_REPLICA_TEST: str | None = None
+    @property
+    def replica_database_url(self) -> str | None:
+        """The read replica URL for the current mode, or None to read from the primary."""
+        if self.TEST_MODE:
+            return self.DATABASE_URL_REPLICA_TEST
+        return self.DATABASE_URL_REPLICA_PROD
+
+    # Database Pool (per worker process: size + overflow connections at most)
+    DB_POOL_SIZE: int = 5
+    DB_POOL_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 30
+    DB_POOL_RECYCLE_SECONDS: int = -1
+    # LIFO reuses the most recent connection, letting idle extras time out server-side
+    DB_POOL_USE_LIFO: bool = False
+    # "always": ping on every checkout, "idle": only after DB_POOL_PRE_PING_IDLE_SECONDS unused, "never"
+    DB_POOL_PRE_PING: Literal["always", "idle", "never"] = "idle"
+    DB_POOL_PRE_PING_IDLE_SECONDS: float = 60
+
+    # Query instrumentation (per request)
+    DB_QUERY_STATS_HEADER: bool = False  # adds X-DB-Query-Count / X-DB-Time-Ms
+    DB_QUERY_WARN_COUNT: int = 50
+    DB_SLOW_QUERY_MS: float = 500
+
     # JWT Settings
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
+    # Refresh tokens renew access tokens without a password; each use rotates them
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 60
+    # Authenticated users are cached this long per token subject (0 disables)
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 30
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10_000
+    # Verified bearer tokens, kept until their exp (0 disables)
+    VERIFIED_TOKEN_CACHE_MAX_ENTRIES: int = 10_000
+    # bcrypt runs on this many threads per worker; calls beyond the queue limit get a 503
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 200
+
+    # Cache Settings
+    # Backends: "memory" (per worker), "redis" (shared, needs CACHE_REDIS_URL) or "none"
+    SUMMARY_CACHE_BACKEND: str = "memory"
+    SUMMARY_CACHE_MAX_ENTRIES: int = 10_000
+    SUMMARY_CACHE_TTL_SECONDS: int = 300
+    CACHE_REDIS_URL: str | None = None
+    TIMETABLE_CACHE_BACKEND: str = "memory"
+    TIMETABLE_CACHE_MAX_ENTRIES: int = 10_000
+    TIMETABLE_CACHE_TTL_SECONDS: int = 600
+    # A run written by the solver is picked up within this window
+    TIMETABLE_LATEST_RUN_TTL_SECONDS: int = 10
+    # Longest from/to window of GET /timetable/
+    TIMETABLE_MAX_RANGE_DAYS: int = 92
+    # The calendar feed covers the previous week and this many weeks ahead
+    TIMETABLE_FEED_WEEKS: int = 8
+    # Teacher/student/parent links of the authorization checks (see services/relationship_index).
+    # The index only works with Redis, which holds the version token shared by the workers:
+    # "redis" (needs CACHE_REDIS_URL), "auto" (redis when CACHE_REDIS_URL is set, else none)
+    # or "none" (no index, every check runs its query). Per-worker backends are refused.
+    RELATIONSHIP_INDEX_BACKEND: str = "auto"
+    RELATIONSHIP_INDEX_TTL_SECONDS: int = 300
+    # Workers re-read the version token this often; other workers see a revoked link within it
+    RELATIONSHIP_INDEX_VERSION_CHECK_SECONDS: float = 1.0
+
+    # Tuition Regeneration (background runner)
+    # Triggers arriving within this window are merged into a single run
+    TUITION_REGEN_DEBOUNCE_SECONDS: float = 1.0
+    TUITION_REGEN_HISTORY_SIZE: int = 20
+
+    # Geolocation (timezone and currency of new users, see services/geo_service)
+    # Providers tried in order: "local" (offline IP-range table) and "http" (ip-api.com)
+    GEO_PROVIDERS: list[str] = ["local", "http"]
+    GEO_DATABASE_PATH: str | None = None
+    GEO_CACHE_MAX_ENTRIES: int = 10_000
+    GEO_HTTP_TIMEOUT_SECONDS: float = 5.0
+    # Signups not located offline get these values (unless they sent their own) until
+    # the background enrichment patches them; lookups are batched and retried with backoff
+    GEO_DEFAULT_TIMEZONE: str = "Africa/Cairo"
+    GEO_DEFAULT_CURRENCY: str = "EGP"
+    GEO_ENRICHMENT_BATCH_SIZE: int = 100
+    GEO_ENRICHMENT_BATCH_WINDOW_SECONDS: float = 1.0
+    GEO_ENRICHMENT_MAX_ATTEMPTS: int = 8
+    GEO_ENRICHMENT_BACKOFF_SECONDS: float = 2.0
+    GEO_ENRICHMENT_BACKOFF_MAX_SECONDS: float = 600.0
+
+    # API Responses
+    # Opt-in: the large list endpoints skip the response_model re-validation (see common/serialization)
+    FAST_SERIALIZATION: bool = False
 
     # Other settings
     FIRST_DAY_OF_WEEK: int = 5  # 5 is Saturday
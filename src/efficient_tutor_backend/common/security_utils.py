@@ -1,9 +1,126 @@
 '''
 This file contains common security-related utilities, such as password hashing,
 that are decoupled from other services to prevent circular imports.
+
+bcrypt is deliberately slow (tens of milliseconds per call), so request handlers
+use the async variants, which run it on `password_hash_pool`: a bounded thread
+pool (bcrypt releases the GIL) that keeps the event loop free during login bursts.
 '''
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
 
+from .config import settings
+from .logger import log
+
+
+# --- Password Hashing Pool ---
+class PasswordHashPool:
+    """
+    Runs password hashing calls on at most `workers` threads.
+    Calls beyond that wait in the executor's queue; once `max_queue` calls are
+    waiting, new ones are rejected with a 503 instead of piling up.
+    Counters are thread-safe and reported by GET /system/password-hashing.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.queued = 0
+            self.running = 0
+            self.max_queued = 0
+            self.completed = 0
+            self.rejected = 0
+            self.total_wait_ms = 0.0
+            self.max_wait_ms = 0.0
+            self.total_run_ms = 0.0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        return self._executor
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        with self._lock:
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                log.warning(f"Password hashing queue is full ({self.queued} waiting); rejecting the call.")
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="The server is busy. Please try again shortly.",
+                    headers={"Retry-After": "1"}
+                )
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+
+        submitted = time.perf_counter()
+
+        def job() -> Any:
+            started = time.perf_counter()
+            with self._lock:
+                self.queued -= 1
+                self.running += 1
+                wait_ms = (started - submitted) * 1000
+                self.total_wait_ms += wait_ms
+                self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self.running -= 1
+                    self.completed += 1
+                    self.total_run_ms += (time.perf_counter() - started) * 1000
+
+        future = self._get_executor().submit(job)
+        future.add_done_callback(self._release_if_cancelled)
+        # Cancelling the awaiting request cancels the call if it has not started yet
+        return await asyncio.wrap_future(future)
+
+    def _release_if_cancelled(self, future: Future) -> None:
+        if future.cancelled():
+            with self._lock:
+                self.queued -= 1
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "queued": self.queued,
+                "running": self.running,
+                "max_queued": self.max_queued,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "wait_ms": {
+                    "mean": self.total_wait_ms / self.completed if self.completed else 0.0,
+                    "max": self.max_wait_ms,
+                },
+                "run_ms_mean": self.total_run_ms / self.completed if self.completed else 0.0,
+            }
+
+    def shutdown(self) -> None:
+        """Stops the threads; the pool starts new ones on its next call."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hash_pool = PasswordHashPool(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE
+)
+
+
 # --- Password Hashing ---
 class HashedPassword:
     pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -14,3 +131,12 @@ class HashedPassword:
     @classmethod
     def get_hash(cls, password: str) -> str:
         return cls.pwd_context.hash(password)
+
+    # Async variants for request handlers (run on the password hashing pool)
+    @classmethod
+    async def verify_async(cls, plain_password: str, hashed_password: str) -> bool:
+        return await password_hash_pool.run(cls.verify, plain_password, hashed_password)
+
+    @classmethod
+    async def get_hash_async(cls, password: str) -> str:
+        return await password_hash_pool.run(cls.get_hash, password)
@@ -0,0 +1,78 @@
+'''
+Fast JSON responses for the large list endpoints.
+
+FastAPI validates whatever an endpoint returns against its response_model and
+only then encodes it. Our services already build the response models, so that
+second validation (which also recomputes week_number, duration, total_cost...)
+is pure overhead on long lists. An endpoint returning `fast_json(models)` skips
+it: the models are dumped straight to JSON bytes by pydantic-core through a
+cached TypeAdapter, and anything else is encoded with orjson.
+The route keeps its response_model for the OpenAPI schema.
+
+The fast path is opt-in: with FAST_SERIALIZATION=false (the default)
+`fast_json` returns the content unchanged, i.e. the regular validated path.
+'''
+import json
+from functools import lru_cache
+from typing import Any, Optional
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, TypeAdapter
+from pydantic_core import to_jsonable_python
+
+try:
+    import orjson
+except ImportError:  # orjson comes with fastapi[all]; plain json still works without it
+    orjson = None
+
+from .config import settings
+
+
+@lru_cache(maxsize=256)
+def type_adapter(tp: Any) -> TypeAdapter:
+    """A TypeAdapter per type, built once (building one compiles a schema)."""
+    return TypeAdapter(tp)
+
+
+def dump_json(content: Any) -> bytes:
+    """
+    Encodes `content` to JSON bytes.
+    Models and lists of models of a single class go through pydantic-core
+    (same output as the validated path); the rest through orjson.
+    """
+    if isinstance(content, BaseModel):
+        return content.__pydantic_serializer__.to_json(content)
+
+    if isinstance(content, list) and content and isinstance(content[0], BaseModel):
+        model_class = type(content[0])
+        if all(type(item) is model_class for item in content):
+            return type_adapter(list[model_class]).dump_json(content)
+
+    if orjson is not None:
+        return orjson.dumps(content, default=to_jsonable_python)
+    return json.dumps(to_jsonable_python(content), separators=(",", ":")).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered by `dump_json`."""
+
+    def render(self, content: Any) -> bytes:
+        return dump_json(content)
+
+
+def fast_json(
+    content: Any,
+    status_code: int = 200,
+    response: Optional[Response] = None
+) -> Any:
+    """
+    Wraps an endpoint's return value in a FastJSONResponse (when FAST_SERIALIZATION is on).
+    Headers set on the endpoint's injected `response` are carried over, since
+    FastAPI ignores them once a Response is returned directly.
+    """
+    if not settings.FAST_SERIALIZATION:
+        return content
+    fast_response = FastJSONResponse(content, status_code=status_code)
+    if response is not None:
+        fast_response.headers.update(response.headers)
+    return fast_response
@@ -3,44 +3,87 @@ Database Engine file.
 1- Engine: creates and manages TCP Pool connections
 2- AsyncSessionLocal: Session Creator (with engine as bind)
 3- get_db_session: Dependency to create, yield and manage the life-cycle of a session.
+4- Read replica: optional second engine (settings.replica_database_url, falls back to
+   the primary) behind AsyncReadSessionLocal. Its sessions run READ ONLY transactions
+   and never commit. Endpoints opt in with @read_only; services that only ever read
+   can depend on get_read_db_session directly. Caches are never filled from the
+   replica (see primary_read_session).
+Pool sizing and the pre-ping strategy come from the DB_POOL_* settings (see metrics.py).
 '''
+from contextlib import asynccontextmanager
+from fastapi import Request
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, AsyncEngine, async_sessionmaker
-from typing import AsyncGenerator
+from typing import AsyncGenerator, AsyncIterator, Callable, TypeVar
 from ..common.config import settings
 from ..common.logger import log
+from .metrics import InstrumentedAsyncQueuePool, install_idle_pre_ping, install_query_counter
 
 # We define them as None. They will be created by the app's lifespan.
 engine: AsyncEngine | None = None
 AsyncSessionLocal: async_sessionmaker[AsyncSession] | None = None
+replica_engine: AsyncEngine | None = None  # None when reads go to the primary
+AsyncReadSessionLocal: async_sessionmaker[AsyncSession] | None = None
+
+READ_ONLY_ATTR = "__read_only_db__"
+REPLICA_SESSION_KEY = "replica_session"
+
+F = TypeVar("F", bound=Callable)
+
+
+def _create_engine(url: str) -> AsyncEngine:
+    """Creates an engine with the configured (instrumented) pool."""
+    pre_ping = settings.DB_POOL_PRE_PING
+    new_engine = create_async_engine(
+        url,
+        echo=False,
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_POOL_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+        pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+        pool_use_lifo=settings.DB_POOL_USE_LIFO,
+        pool_pre_ping=pre_ping == "always"
+    )
+    if pre_ping == "idle":
+        install_idle_pre_ping(new_engine, settings.DB_POOL_PRE_PING_IDLE_SECONDS)
+    install_query_counter(new_engine)
+    return new_engine
+
+
+def _create_session_factory(bind: AsyncEngine) -> async_sessionmaker[AsyncSession]:
+    return async_sessionmaker(
+        bind=bind,
+        class_=AsyncSession,
+        expire_on_commit=False,
+        autocommit=False,
+        autoflush=False,
+    )
+
 
 def create_db_engine_and_session_factory():
     """
-    Creates the engine and session factory.
+    Creates the engines and session factories.
     This is called by the app's lifespan event.
     """
-    global engine, AsyncSessionLocal
+    global engine, AsyncSessionLocal, replica_engine, AsyncReadSessionLocal
     
     log.info(f"Creating database engine for URL...")
     try:
 
-        # 1. Create the asynchronous engine
-        engine = create_async_engine(
-            settings.database_url,
-            echo=False,
-            pool_size=5,
-            max_overflow=10,
-            pool_timeout=30,
-            pool_recycle=-1,
-            pool_pre_ping=True
+        # 1. Create the asynchronous engine(s)
+        engine = _create_engine(settings.database_url)
+        log.info(
+            f"Pool: size={settings.DB_POOL_SIZE}, max_overflow={settings.DB_POOL_MAX_OVERFLOW}, "
+            f"lifo={settings.DB_POOL_USE_LIFO}, pre_ping={settings.DB_POOL_PRE_PING}"
         )
+        replica_url = settings.replica_database_url
+        replica_engine = _create_engine(replica_url) if replica_url else None
+        log.info(f"Read-only sessions use the {'replica' if replica_engine else 'primary'} database.")
         
-        # 2. Create the AsyncSessionLocal factory
-        AsyncSessionLocal = async_sessionmaker(
-            bind=engine,
-            class_=AsyncSession,
-            expire_on_commit=False,
-            autocommit=False,
-            autoflush=False,
+        # 2. Create the session factories. Read sessions start READ ONLY transactions.
+        AsyncSessionLocal = _create_session_factory(engine)
+        AsyncReadSessionLocal = _create_session_factory(
+            (replica_engine or engine).execution_options(postgresql_readonly=True)
         )
         log.info("Async database engine and session factory created successfully.")
     except Exception as e:
@@ -48,16 +91,88 @@ def create_db_engine_and_session_factory():
         raise
 
 async def dispose_db_engine():
-    """Disposes of the engine. Called by the app's lifespan."""
-    global engine, AsyncSessionLocal
+    """Disposes of the engines. Called by the app's lifespan."""
+    global engine, AsyncSessionLocal, replica_engine, AsyncReadSessionLocal
+    if replica_engine:
+        await replica_engine.dispose()
+        log.info("Replica database engine disposed.")
     if engine:
         await engine.dispose()
         log.info("Database engine disposed.")
     engine = None
     AsyncSessionLocal = None
+    replica_engine = None
+    AsyncReadSessionLocal = None
+
+
+def read_only(endpoint: F) -> F:
+    """
+    Marks an endpoint as read-only: its requests get a READ ONLY session on the
+    replica (or the primary when no replica is configured) from get_db_session.
+    """
+    setattr(endpoint, READ_ONLY_ATTR, True)
+    return endpoint
+
+
+def _is_read_only_request(request: Request) -> bool:
+    # The router stores the matched route in the scope before resolving dependencies
+    endpoint = getattr(request.scope.get("route"), "endpoint", None)
+    return getattr(endpoint, READ_ONLY_ATTR, False)
+
+
+@asynccontextmanager
+async def _read_only_session() -> AsyncIterator[AsyncSession]:
+    if AsyncReadSessionLocal is None:
+        log.error("AsyncReadSessionLocal is not initialized. App lifespan may not have run.")
+        raise RuntimeError("Database session factory is not available.")
+
+    session = AsyncReadSessionLocal()
+    if replica_engine is not None:
+        session.info[REPLICA_SESSION_KEY] = True
+    try:
+        yield session
+    finally:
+        # Nothing to commit: closing returns the connection, which ends the transaction
+        await session.close()
+
+
+def is_replica_session(session: AsyncSession) -> bool:
+    """True if the session reads from the read replica (not the primary)."""
+    return session.info.get(REPLICA_SESSION_KEY, False)
+
+
+@asynccontextmanager
+async def primary_read_session(session: AsyncSession) -> AsyncIterator[AsyncSession]:
+    """
+    Yields `session`, unless it reads from the replica: then a session on the
+    primary, closed without a commit. Caches are filled from it, because a
+    write rotates their keys on the primary and a lagging replica would store
+    the old rows under the new key.
+    """
+    if not is_replica_session(session):
+        yield session
+        return
+    if AsyncSessionLocal is None:
+        log.error("AsyncSessionLocal is not initialized. App lifespan may not have run.")
+        raise RuntimeError("Database session factory is not available.")
+
+    primary = AsyncSessionLocal()
+    try:
+        yield primary
+    finally:
+        await primary.close()
+
+
+async def get_read_db_session() -> AsyncGenerator[AsyncSession, None]:
+    """
+    FastAPI dependency that provides a READ ONLY session on the read replica
+    (falls back to the primary). It is never committed.
+    """
+    async with _read_only_session() as session:
+        yield session
 
 # 3. The new, robust dependency
-async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
+async def get_db_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
     """
     FastAPI dependency that provides a database session per request.
     
@@ -67,7 +182,13 @@ async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
     3. The session is auto-committed if the request is successful.
     4. The session is auto-rolled-back if an exception occurs.
     5. The session is always closed after the request.
+    Endpoints marked @read_only get a read-only session instead (see get_read_db_session).
     """
+    if _is_read_only_request(request):
+        async with _read_only_session() as session:
+            yield session
+        return
+
     if AsyncSessionLocal is None:
         log.error("AsyncSessionLocal is not initialized. App lifespan may not have run.")
         raise RuntimeError("Database session factory is not available.")
@@ -0,0 +1,251 @@
+'''
+Connection pool and query instrumentation (per worker process).
+1- InstrumentedAsyncQueuePool: the default async pool, timing how long each checkout waits.
+2- install_idle_pre_ping: pings a connection on checkout only if it sat idle for a while.
+3- install_query_counter + QueryCountMiddleware: count and time the queries of every
+   request (X-DB-* response headers, a warning log line over budget) and per route.
+4- count_queries: the same counting around any block of code (scripts, tests).
+5- db_metrics: the collected numbers, reported by GET /system/db-pool.
+'''
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator, Optional
+from sqlalchemy import event, exc
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from ..common.config import settings
+from ..common.logger import log
+
+# Upper bounds (ms) of the checkout wait histogram; the last bucket is open-ended
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+LAST_CHECKIN_KEY = "last_checkin"
+QUERY_START_ATTR = "_query_started_at"
+# Longer statements are cut in logs
+STATEMENT_LOG_CHARS = 300
+
+
+class RequestQueries:
+    """Mutable per-request holder, filled by the cursor events."""
+    __slots__ = ("count", "total_ms", "slowest_ms", "slowest_statement")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.slowest_ms = 0.0
+        self.slowest_statement: Optional[str] = None
+
+    def observe(self, statement: str, elapsed_ms: float) -> None:
+        self.total_ms += elapsed_ms
+        if elapsed_ms > self.slowest_ms:
+            self.slowest_ms = elapsed_ms
+            self.slowest_statement = statement
+
+
+current_request_queries: ContextVar[Optional[RequestQueries]] = ContextVar("current_request_queries", default=None)
+
+
+@contextmanager
+def count_queries() -> Iterator[RequestQueries]:
+    """
+    Counts the statements executed inside the block (in this task).
+        with count_queries() as queries:
+            await service.do_something()
+        print(queries.count, queries.total_ms)
+    """
+    holder = RequestQueries()
+    token = current_request_queries.set(holder)
+    try:
+        yield holder
+    finally:
+        current_request_queries.reset(token)
+
+
+class DatabaseMetrics:
+    """Counters shared by the pool and the query counter. Thread-safe."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.wait_buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+            self.checkouts = 0
+            self.checkout_timeouts = 0
+            self.total_wait_ms = 0.0
+            self.max_wait_ms = 0.0
+            self.idle_pings = 0
+            self.stale_connections = 0
+            self.routes: dict[str, dict[str, float]] = {}
+
+    def observe_wait(self, wait_ms: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self.wait_buckets[bisect.bisect_left(WAIT_BUCKETS_MS, wait_ms)] += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            if timed_out:
+                self.checkout_timeouts += 1
+            else:
+                self.checkouts += 1
+
+    def observe_idle_ping(self, stale: bool) -> None:
+        with self._lock:
+            self.idle_pings += 1
+            self.stale_connections += stale
+
+    def observe_request(self, route: str, queries: RequestQueries) -> None:
+        with self._lock:
+            stats = self.routes.setdefault(route, {"requests": 0, "queries": 0, "max_queries": 0, "db_ms": 0.0})
+            stats["requests"] += 1
+            stats["queries"] += queries.count
+            stats["max_queries"] = max(stats["max_queries"], queries.count)
+            stats["db_ms"] += queries.total_ms
+
+    @staticmethod
+    def pool_state(engine: Optional[AsyncEngine]) -> Optional[dict[str, Any]]:
+        if engine is None:
+            return None
+        pool = engine.sync_engine.pool
+        return {
+            "class": type(pool).__name__,
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+        }
+
+    def snapshot(self, engine: Optional[AsyncEngine]) -> dict[str, Any]:
+        """Pool state of `engine` plus the counters (which cover every instrumented engine)."""
+        pool = self.pool_state(engine)
+        with self._lock:
+            observed = self.checkouts + self.checkout_timeouts
+            histogram = {
+                f"le_{bound}ms": count for bound, count in zip(WAIT_BUCKETS_MS, self.wait_buckets)
+            }
+            histogram[f"gt_{WAIT_BUCKETS_MS[-1]}ms"] = self.wait_buckets[-1]
+            return {
+                "pool": pool,
+                "checkouts": self.checkouts,
+                "checkout_timeouts": self.checkout_timeouts,
+                "wait_ms": {
+                    "mean": self.total_wait_ms / observed if observed else 0.0,
+                    "max": self.max_wait_ms,
+                    "histogram": histogram,
+                },
+                "idle_pings": self.idle_pings,
+                "stale_connections": self.stale_connections,
+                "routes": {route: dict(stats) for route, stats in self.routes.items()},
+            }
+
+
+db_metrics = DatabaseMetrics()
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """The default asyncio pool, recording how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            db_metrics.observe_wait((time.perf_counter() - started) * 1000, timed_out=True)
+            raise
+        db_metrics.observe_wait((time.perf_counter() - started) * 1000)
+        return connection
+
+
+def install_idle_pre_ping(engine: AsyncEngine, idle_seconds: float) -> None:
+    """
+    Pings a connection on checkout only if it has been idle in the pool for more
+    than `idle_seconds`. A dead connection is replaced transparently by the pool.
+    """
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "checkin")
+    def _remember_checkin(dbapi_connection, connection_record):
+        connection_record.info[LAST_CHECKIN_KEY] = time.monotonic()
+
+    @event.listens_for(sync_engine, "checkout")
+    def _ping_if_idle(dbapi_connection, connection_record, connection_proxy):
+        last_checkin = connection_record.info.get(LAST_CHECKIN_KEY)
+        if last_checkin is None or time.monotonic() - last_checkin < idle_seconds:
+            return
+        try:
+            sync_engine.dialect.do_ping(dbapi_connection)
+        except Exception as e:
+            db_metrics.observe_idle_ping(stale=True)
+            log.warning(f"Idle pooled connection failed its ping and will be replaced: {e}")
+            # Tells the pool to discard this connection and check out another one
+            raise exc.DisconnectionError() from e
+        db_metrics.observe_idle_ping(stale=False)
+
+
+def install_query_counter(engine: AsyncEngine) -> None:
+    """Counts and times every statement executed on the engine against the current request."""
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _count_query(conn, cursor, statement, parameters, context, executemany):
+        holder = current_request_queries.get()
+        if holder is not None:
+            holder.count += 1
+            if context is not None:
+                setattr(context, QUERY_START_ATTR, time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _time_query(conn, cursor, statement, parameters, context, executemany):
+        holder = current_request_queries.get()
+        started = getattr(context, QUERY_START_ATTR, None)
+        if holder is not None and started is not None:
+            holder.observe(statement, (time.perf_counter() - started) * 1000)
+
+
+class QueryCountMiddleware:
+    """
+    ASGI middleware tracking the queries of every HTTP request:
+    - aggregated per route template (e.g. "GET /tuitions/{tuition_id}"),
+    - X-DB-Query-Count / X-DB-Time-Ms response headers when DB_QUERY_STATS_HEADER is on,
+    - a warning with the slowest statement when a request exceeds
+      DB_QUERY_WARN_COUNT queries or runs a statement slower than DB_SLOW_QUERY_MS.
+    Statements run after the response headers (streamed bodies) are only in the totals.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        holder = RequestQueries()
+        token = current_request_queries.set(holder)
+
+        async def send_with_stats(message):
+            if message["type"] == "http.response.start" and settings.DB_QUERY_STATS_HEADER:
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-query-count", str(holder.count).encode()))
+                headers.append((b"x-db-time-ms", f"{holder.total_ms:.1f}".encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            current_request_queries.reset(token)
+            # The router stores the matched route in the (shared) scope
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "<unmatched>"
+            route_key = f"{scope['method']} {path}"
+            db_metrics.observe_request(route_key, holder)
+
+            if holder.count > settings.DB_QUERY_WARN_COUNT or holder.slowest_ms > settings.DB_SLOW_QUERY_MS:
+                slowest = (holder.slowest_statement or "")[:STATEMENT_LOG_CHARS]
+                log.warning(
+                    f"{route_key}: {holder.count} queries, {holder.total_ms:.1f} ms in the database; "
+                    f"slowest {holder.slowest_ms:.1f} ms: {slowest}"
+                )
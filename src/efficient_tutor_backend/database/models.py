@@ -166,7 +166,8 @@ class TimetableSolutionSlots(Base):
         ForeignKeyConstraint(['solution_id'], ['timetable_run_user_solutions.id'], ondelete='CASCADE', name='timetable_solution_slots_solution_id_fkey'),
         ForeignKeyConstraint(['tuition_id'], ['tuitions.id'], ondelete='CASCADE', name='timetable_solution_slots_tuition_id_fkey'),
         PrimaryKeyConstraint('id', name='timetable_solution_slots_pkey'),
-        Index('idx_timetable_solution_slots_solution_id', 'solution_id')
+        Index('idx_timetable_solution_slots_solution_id', 'solution_id'),
+        Index('idx_timetable_solution_slots_participant_ids', 'participant_ids', postgresql_using='gin')
     )
 
     id: Mapped[uuid.UUID] = mapped_column(Uuid, primary_key=True, server_default=text('gen_random_uuid()'))
@@ -197,6 +198,7 @@ class Users(Base):
     role: Mapped[str] = mapped_column(Enum('admin', 'parent', 'student', 'teacher', name='user_role'), server_default=text("'parent'::user_role"))
     timezone: Mapped[str] = mapped_column(Text, server_default=text("'Africa/Cairo'::text"))
     is_active: Mapped[bool] = mapped_column(Boolean, server_default=text('true'))
+    calendar_feed_version: Mapped[int] = mapped_column(Integer, server_default=text('0'))
     is_first_sign_in: Mapped[Optional[bool]] = mapped_column(Boolean, server_default=text('true'))
     first_name: Mapped[Optional[str]] = mapped_column(Text)
     last_name: Mapped[Optional[str]] = mapped_column(Text)
@@ -442,7 +444,8 @@ class TuitionLogs(Base):
         ForeignKeyConstraint(['teacher_id'], ['teachers.id'], ondelete='SET NULL', name='tuition_logs_teacher_id_fkey'),
         ForeignKeyConstraint(['tuition_id'], ['tuitions.id'], ondelete='SET NULL', name='tuition_logs_tuition_id_fkey'),
         PrimaryKeyConstraint('id', name='tuition_logs_pkey'),
-        Index('idx_tuition_logs_status', 'status')
+        Index('idx_tuition_logs_status', 'status'),
+        Index('idx_tuition_logs_active_start_time', 'start_time', 'id', postgresql_where=text("status = 'ACTIVE'::log_status_enum"))
     )
 
     id: Mapped[uuid.UUID] = mapped_column(Uuid, primary_key=True, server_default=text('gen_random_uuid()'))
@@ -504,7 +507,9 @@ class TuitionLogCharges(Base):
         ForeignKeyConstraint(['parent_id'], ['parents.id'], ondelete='CASCADE', name='tuition_log_charges_parent_id_fkey'),
         ForeignKeyConstraint(['student_id'], ['students.id'], ondelete='CASCADE', name='tuition_log_charges_student_id_fkey'),
         ForeignKeyConstraint(['tuition_log_id'], ['tuition_logs.id'], ondelete='CASCADE', name='tuition_log_charges_tuition_log_id_fkey'),
-        PrimaryKeyConstraint('id', name='tuition_log_charges_pkey')
+        PrimaryKeyConstraint('id', name='tuition_log_charges_pkey'),
+        Index('idx_tuition_log_charges_tuition_log_id', 'tuition_log_id'),
+        Index('idx_tuition_log_charges_parent_id', 'parent_id')
     )
 
     id: Mapped[uuid.UUID] = mapped_column(Uuid, primary_key=True, server_default=text('gen_random_uuid()'))
@@ -525,6 +530,82 @@ class TuitionLogCharges(Base):
     tuition_log: Mapped['TuitionLogs'] = relationship('TuitionLogs', back_populates='tuition_log_charges')
 
 
+class LedgerWallets(Base):
+    __tablename__ = 'ledger_wallets'
+    __table_args__ = (
+        ForeignKeyConstraint(['parent_id'], ['parents.id'], ondelete='CASCADE', name='ledger_wallets_parent_id_fkey'),
+        ForeignKeyConstraint(['teacher_id'], ['teachers.id'], ondelete='CASCADE', name='ledger_wallets_teacher_id_fkey'),
+        PrimaryKeyConstraint('parent_id', 'teacher_id', name='ledger_wallets_pkey'),
+        Index('idx_ledger_wallets_teacher_id', 'teacher_id')
+    )
+
+    parent_id: Mapped[uuid.UUID] = mapped_column(Uuid, primary_key=True)
+    teacher_id: Mapped[uuid.UUID] = mapped_column(Uuid, primary_key=True)
+    total_paid: Mapped[decimal.Decimal] = mapped_column(Numeric(12, 2), server_default=text('0'))
+    total_charged: Mapped[decimal.Decimal] = mapped_column(Numeric(12, 2), server_default=text('0'))
+    remaining_balance: Mapped[decimal.Decimal] = mapped_column(Numeric(12, 2), server_default=text('0'))
+    updated_at: Mapped[datetime.datetime] = mapped_column(DateTime(True), server_default=text('now()'))
+    cursor_start_time: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime(True))
+    cursor_log_id: Mapped[Optional[uuid.UUID]] = mapped_column(Uuid)
+
+
+class LedgerParentWallets(Base):
+    __tablename__ = 'ledger_parent_wallets'
+    __table_args__ = (
+        ForeignKeyConstraint(['parent_id'], ['parents.id'], ondelete='CASCADE', name='ledger_parent_wallets_parent_id_fkey'),
+        PrimaryKeyConstraint('parent_id', name='ledger_parent_wallets_pkey')
+    )
+
+    parent_id: Mapped[uuid.UUID] = mapped_column(Uuid, primary_key=True)
+    total_paid: Mapped[decimal.Decimal] = mapped_column(Numeric(12, 2), server_default=text('0'))
+    total_charged: Mapped[decimal.Decimal] = mapped_column(Numeric(12, 2), server_default=text('0'))
+    remaining_balance: Mapped[decimal.Decimal] = mapped_column(Numeric(12, 2), server_default=text('0'))
+    updated_at: Mapped[datetime.datetime] = mapped_column(DateTime(True), server_default=text('now()'))
+    cursor_start_time: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime(True))
+    cursor_log_id: Mapped[Optional[uuid.UUID]] = mapped_column(Uuid)
+
+
+class LedgerChargeStatuses(Base):
+    __tablename__ = 'ledger_charge_statuses'
+    __table_args__ = (
+        ForeignKeyConstraint(['charge_id'], ['tuition_log_charges.id'], ondelete='CASCADE', name='ledger_charge_statuses_charge_id_fkey'),
+        ForeignKeyConstraint(['tuition_log_id'], ['tuition_logs.id'], ondelete='CASCADE', name='ledger_charge_statuses_tuition_log_id_fkey'),
+        PrimaryKeyConstraint('charge_id', name='ledger_charge_statuses_pkey'),
+        Index('idx_ledger_charge_statuses_log_id', 'tuition_log_id'),
+        Index('idx_ledger_charge_statuses_pair', 'parent_id', 'teacher_id', 'start_time'),
+        Index('idx_ledger_charge_statuses_parent', 'parent_id', 'start_time')
+    )
+
+    charge_id: Mapped[uuid.UUID] = mapped_column(Uuid, primary_key=True)
+    tuition_log_id: Mapped[uuid.UUID] = mapped_column(Uuid)
+    parent_id: Mapped[uuid.UUID] = mapped_column(Uuid)
+    student_id: Mapped[uuid.UUID] = mapped_column(Uuid)
+    start_time: Mapped[datetime.datetime] = mapped_column(DateTime(True))
+    cost: Mapped[decimal.Decimal] = mapped_column(Numeric(10, 2))
+    paid_in_teacher_ledger: Mapped[bool] = mapped_column(Boolean, server_default=text('false'))
+    paid_in_parent_ledger: Mapped[bool] = mapped_column(Boolean, server_default=text('false'))
+    teacher_id: Mapped[Optional[uuid.UUID]] = mapped_column(Uuid)
+
+
+class RefreshTokens(Base):
+    __tablename__ = 'refresh_tokens'
+    __table_args__ = (
+        ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE', name='refresh_tokens_user_id_fkey'),
+        PrimaryKeyConstraint('id', name='refresh_tokens_pkey'),
+        UniqueConstraint('token_hash', name='refresh_tokens_token_hash_key'),
+        Index('idx_refresh_tokens_user_id', 'user_id'),
+        Index('idx_refresh_tokens_family_id', 'family_id')
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(Uuid, primary_key=True, server_default=text('gen_random_uuid()'))
+    user_id: Mapped[uuid.UUID] = mapped_column(Uuid)
+    token_hash: Mapped[str] = mapped_column(Text)
+    family_id: Mapped[uuid.UUID] = mapped_column(Uuid)
+    expires_at: Mapped[datetime.datetime] = mapped_column(DateTime(True))
+    created_at: Mapped[datetime.datetime] = mapped_column(DateTime(True), server_default=text('now()'))
+    revoked_at: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime(True))
+
+
 class Notes(Base):
     __tablename__ = 'notes'
     __table_args__ = (
@@ -0,0 +1,5 @@
+-- Add 'calendar_feed_version' to 'users'.
+-- The calendar feed URL carries an HMAC of (user id, version). Incrementing the
+-- version (POST /timetable/feed-url/rotate) revokes a leaked URL without
+-- rotating SECRET_KEY. Existing URLs stay valid: they were signed for version 0.
+ALTER TABLE users ADD COLUMN calendar_feed_version INTEGER NOT NULL DEFAULT 0;
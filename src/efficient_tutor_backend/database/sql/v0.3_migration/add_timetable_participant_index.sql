@@ -0,0 +1,5 @@
+-- Index for the timetable visibility rules.
+
+-- "Is the viewer a participant of this slot?" (participant_ids @> ARRAY[viewer])
+-- is answered from the index instead of unpacking every slot's array.
+CREATE INDEX idx_timetable_solution_slots_participant_ids ON timetable_solution_slots USING GIN (participant_ids);
@@ -0,0 +1,9 @@
+-- Indexes for the single-log read path.
+
+-- 1. min(start_time) over ACTIVE logs (week number base) becomes an index probe,
+--    and (start_time, id) is the tie-broken FIFO order used by the ledger.
+CREATE INDEX idx_tuition_logs_active_start_time ON tuition_logs(start_time, id) WHERE status = 'ACTIVE';
+
+-- 2. Charges were only reachable through a sequential scan.
+CREATE INDEX idx_tuition_log_charges_tuition_log_id ON tuition_log_charges(tuition_log_id);
+CREATE INDEX idx_tuition_log_charges_parent_id ON tuition_log_charges(parent_id);
@@ -0,0 +1,63 @@
+-- Phase 1: Create the 'ledger_wallets' table.
+-- One row per (parent, teacher) relationship. Holds the wallet cursor of the
+-- FIFO allocation so that appending a newer log does not replay history.
+CREATE TABLE ledger_wallets (
+    parent_id UUID NOT NULL REFERENCES parents(id) ON DELETE CASCADE,
+    teacher_id UUID NOT NULL REFERENCES teachers(id) ON DELETE CASCADE,
+
+    total_paid NUMERIC(12, 2) NOT NULL DEFAULT 0,
+    total_charged NUMERIC(12, 2) NOT NULL DEFAULT 0,
+
+    -- What is left in the wallet after allocating every charge up to the cursor.
+    remaining_balance NUMERIC(12, 2) NOT NULL DEFAULT 0,
+    cursor_start_time TIMESTAMPTZ,
+    cursor_log_id UUID,
+
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+
+    PRIMARY KEY (parent_id, teacher_id)
+);
+
+CREATE INDEX idx_ledger_wallets_teacher_id ON ledger_wallets(teacher_id);
+
+
+-- Phase 2: Create the 'ledger_charge_statuses' table.
+-- One row per charge of an ACTIVE tuition log. VOID logs have no rows here.
+CREATE TABLE ledger_charge_statuses (
+    charge_id UUID PRIMARY KEY REFERENCES tuition_log_charges(id) ON DELETE CASCADE,
+    tuition_log_id UUID NOT NULL REFERENCES tuition_logs(id) ON DELETE CASCADE,
+
+    teacher_id UUID,
+    parent_id UUID NOT NULL,
+    student_id UUID NOT NULL,
+    start_time TIMESTAMPTZ NOT NULL,
+    cost NUMERIC(10, 2) NOT NULL,
+
+    -- Status from the per-(parent, teacher) wallet (what the teacher sees).
+    paid_in_teacher_ledger BOOLEAN NOT NULL DEFAULT false,
+    -- Status from the parent's pooled wallet across all teachers (what the parent sees).
+    paid_in_parent_ledger BOOLEAN NOT NULL DEFAULT false
+);
+
+CREATE INDEX idx_ledger_charge_statuses_log_id ON ledger_charge_statuses(tuition_log_id);
+CREATE INDEX idx_ledger_charge_statuses_pair ON ledger_charge_statuses(parent_id, teacher_id, start_time);
+CREATE INDEX idx_ledger_charge_statuses_parent ON ledger_charge_statuses(parent_id, start_time);
+
+-- Phase 3: Create the 'ledger_parent_wallets' table.
+-- One row per parent: the cursor of the parent's wallet pooled across all
+-- teachers, so appending a newer log does not replay the parent's history either.
+CREATE TABLE ledger_parent_wallets (
+    parent_id UUID PRIMARY KEY REFERENCES parents(id) ON DELETE CASCADE,
+
+    total_paid NUMERIC(12, 2) NOT NULL DEFAULT 0,
+    total_charged NUMERIC(12, 2) NOT NULL DEFAULT 0,
+
+    remaining_balance NUMERIC(12, 2) NOT NULL DEFAULT 0,
+    cursor_start_time TIMESTAMPTZ,
+    cursor_log_id UUID,
+
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- NOTE: The tables are populated by `scripts/rebuild_ledger.py`, which is run
+-- by `run_migrations.py` after the SQL phase.
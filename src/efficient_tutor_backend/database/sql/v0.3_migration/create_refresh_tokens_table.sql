@@ -0,0 +1,19 @@
+-- Create the 'refresh_tokens' table.
+-- One row per issued refresh token. Only the SHA-256 digest of the token is
+-- stored; the tokens are random 256-bit strings, so a slow hash is not needed.
+-- Every refresh revokes the presented token and issues the next one of the same
+-- family (the chain started by one login). Presenting a revoked token again
+-- revokes the whole family.
+CREATE TABLE refresh_tokens (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    token_hash TEXT NOT NULL UNIQUE,
+    family_id UUID NOT NULL,
+
+    expires_at TIMESTAMPTZ NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    revoked_at TIMESTAMPTZ
+);
+
+CREATE INDEX idx_refresh_tokens_user_id ON refresh_tokens(user_id);
+CREATE INDEX idx_refresh_tokens_family_id ON refresh_tokens(family_id);
@@ -8,7 +8,12 @@ from contextlib import asynccontextmanager
 from .database.engine import create_db_engine_and_session_factory, dispose_db_engine
 from .common.logger import log
 from .common.config import settings
-from .api import auth, users, tuitions, timetable, tuition_logs, payment_logs, financial_summaries, notes 
+from .common.security_utils import password_hash_pool
+from .services.regeneration_jobs import regeneration_runner
+from .services.geo_service import load_geo_providers, close_geo_providers
+from .services.geo_enrichment import geo_enrichment_runner
+from .api import auth, users, tuitions, timetable, tuition_logs, payment_logs, financial_summaries, notes, system
+from .database.metrics import QueryCountMiddleware
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -18,10 +23,17 @@ async def lifespan(app: FastAPI):
     # --- On App Startup ---
     log.info(f"Starting {settings.APP_NAME} v{settings.APP_VERSION}...")
     create_db_engine_and_session_factory()
+    regeneration_runner.start()
+    load_geo_providers()
+    geo_enrichment_runner.start()
     
     yield # --- Application is now running ---
 
     # --- On App Shutdown ---
+    await regeneration_runner.stop()
+    await geo_enrichment_runner.stop()
+    password_hash_pool.shutdown()
+    await close_geo_providers()
     if not settings.TEST_MODE:
         log.info("Application lifespan shutdown...")
         await dispose_db_engine()
@@ -65,9 +77,14 @@ app.add_middleware(
     # Allow all methods (GET, POST, etc.)
     allow_methods=["*"],
     # Allow all headers
-    allow_headers=["*"],)
+    allow_headers=["*"],
+    # Let browsers read the pagination cursor of list endpoints
+    expose_headers=["X-Next-Cursor"],)
 # --- End of CORS Middleware ---
 
+# Per-request query counts (reported by GET /system/db-pool)
+app.add_middleware(QueryCountMiddleware)
+
 @app.get("/")
 async def health_check():
     return {"status": "ok", "message": f"{settings.APP_NAME} is running"}
@@ -80,5 +97,6 @@ app.include_router(tuition_logs.router)
 app.include_router(payment_logs.router)
 app.include_router(financial_summaries.router)
 app.include_router(notes.router) 
+app.include_router(system.router)
 
 
@@ -1,6 +1,7 @@
 '''
 
 '''
+import base64
 import calendar
 from datetime import datetime, timedelta
 from decimal import Decimal
@@ -250,6 +251,28 @@ class PaymentLogRead(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class TuitionLogCursor(BaseModel):
+    """
+    Keyset pagination position in the tuition log list, which is ordered by
+    (start_time, id) descending. Sent to clients as an opaque string.
+    """
+    start_time: datetime
+    id: UUID
+
+    def encode(self) -> str:
+        raw = f"{self.start_time.isoformat()}|{self.id}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    @classmethod
+    def decode(cls, value: str) -> "TuitionLogCursor":
+        """Raises ValueError if the cursor is malformed."""
+        try:
+            start_time, log_id = base64.urlsafe_b64decode(value.encode()).decode().split("|")
+            return cls(start_time=datetime.fromisoformat(start_time), id=UUID(log_id))
+        except Exception as e:
+            raise ValueError(f"Invalid cursor: {value}") from e
+
+
 # --- 3. Financial Summary Models (Output) ---
 
 class FinancialSummaryForParent(BaseModel):
@@ -12,12 +12,11 @@ class TimeTableSlotType(str, Enum):
     AVAILABILITY = "Availability"
     OTHER = "Other"
 
-class TimeTableSlot(BaseModel):
+class TimeTableSlotBase(BaseModel):
     """
-    Unified model for a single slot in the timetable.
-    Contains both absolute data from DB and relativistic calculated data.
+    Absolute data of a slot (from the DB, after masking).
+    This is what the timetable cache stores.
     """
-    # Absolute Data (From DB)
     id: UUID
     user_id: UUID = Field(..., description="The ID of the user this slot belongs to (e.g. the student).")
     name: str
@@ -28,9 +27,20 @@ class TimeTableSlot(BaseModel):
     end_time: time
     object_uuid: Optional[UUID] = Field(None, description="ID of the Tuition or AvailabilityInterval. None if masked.")
 
+    model_config = ConfigDict(from_attributes=True)
+
+class TimeTableSlot(TimeTableSlotBase):
+    """
+    Unified model for a single slot in the timetable.
+    Contains both absolute data from DB and relativistic calculated data.
+    """
     # Relativistic Data (Calculated based on viewer's time/timezone)
+    # With a from/to range: this occurrence instead of the next one
     next_occurrence_start: datetime
     next_occurrence_end: datetime
 
     model_config = ConfigDict(from_attributes=True)
 
+class CalendarFeedLink(BaseModel):
+    """Subscription URL of the user's iCalendar feed. Anyone with the URL can read the feed."""
+    url: str
@@ -1,12 +1,18 @@
 '''
 
 '''
+from typing import Optional
 from pydantic import BaseModel, EmailStr
 from datetime import datetime
 
 class Token(BaseModel):
     access_token: str
     token_type: str
+    # Exchanged at POST /auth/refresh for a new pair once the access token expires
+    refresh_token: Optional[str] = None
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
 
 class TokenPayload(BaseModel):
     sub: EmailStr # 'sub' is standard JWT claim for subject (the user's email)
@@ -1,7 +1,7 @@
 '''
 
 '''
-from datetime import timedelta
+from datetime import timedelta, datetime
 from decimal import Decimal
 from typing import Optional
 from uuid import UUID
@@ -121,6 +121,34 @@ class TuitionUpdate(BaseModel):
         return self
 
 
+class RegenerationJobRead(BaseModel):
+    """
+    Status of one background tuition regeneration (Admins only).
+    """
+    id: int
+    full: bool
+    student_count: int
+    status: str
+    triggers: int
+    queued_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    duration_seconds: Optional[float] = None
+    error: Optional[str] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+class RegenerationStatusRead(BaseModel):
+    """
+    The running job, the queued (coalesced) job and the most recent runs of this worker.
+    """
+    running: Optional[RegenerationJobRead] = None
+    queued: Optional[RegenerationJobRead] = None
+    recent: list[RegenerationJobRead]
+
+    model_config = ConfigDict(from_attributes=True)
+
+
 # Define a union type for role-based responses
 TuitionReadRoleBased = Union[
     TuitionReadForTeacher,
@@ -1,16 +1,127 @@
 '''
 
 '''
-from typing import Annotated
+import hashlib
+import secrets
+from datetime import datetime, timedelta, timezone
+from typing import Annotated, Optional
+from uuid import UUID, uuid4
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from .security import HashedPassword, JWTHandler
 from .user_service import UserService  # CHANGED: Import UserService
+from ..database.engine import get_db_session
 from ..database import models as db_models
 from ..models import token as token_models
+from ..common.config import settings
 from ..common.logger import log
 
+
+class RefreshTokenService:
+    """
+    Service for refresh tokens: long-lived, revocable credentials that renew the
+    short-lived access tokens without a password (and its bcrypt verify).
+    - Tokens are random; only their SHA-256 digest is stored, looked up by a unique index.
+    - Every refresh revokes the presented token and issues the next one of the
+      same family (the chain started by one login).
+    - A revoked token presented again means it was copied: the whole family is revoked.
+    """
+    def __init__(
+        self,
+        db: Annotated[AsyncSession, Depends(get_db_session)]
+    ):
+        self.db = db
+
+    @staticmethod
+    def _digest(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    async def issue(self, user_id: UUID, family_id: Optional[UUID] = None) -> str:
+        """Stores a new refresh token of `user_id` (in a new family by default) and returns it."""
+        token = secrets.token_urlsafe(32)
+        self.db.add(db_models.RefreshTokens(
+            id=uuid4(),
+            user_id=user_id,
+            token_hash=self._digest(token),
+            family_id=family_id or uuid4(),
+            expires_at=datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+        ))
+        await self.db.flush()
+        return token
+
+    async def rotate(self, refresh_token: str) -> Optional[token_models.Token]:
+        """
+        Exchanges a refresh token for a new access token and the next refresh token.
+        Returns None when a revoked token is reused: its family has been revoked
+        in this session, so the caller must answer 401 WITHOUT raising (raising
+        would roll the revocation back).
+        Raises 401 for unknown, expired or inactive-user tokens.
+        """
+        invalid_token = HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+        try:
+            # 1. Single indexed lookup, locking the row against a concurrent rotation
+            stmt = select(
+                db_models.RefreshTokens, db_models.Users.email, db_models.Users.is_active
+            ).join(
+                db_models.Users, db_models.Users.id == db_models.RefreshTokens.user_id
+            ).filter(
+                db_models.RefreshTokens.token_hash == self._digest(refresh_token)
+            ).with_for_update(of=db_models.RefreshTokens)
+            row = (await self.db.execute(stmt)).first()
+            if row is None:
+                raise invalid_token
+            stored, email, is_active = row
+
+            # 2. Reuse of a rotated or revoked token
+            if stored.revoked_at is not None:
+                log.warning(f"SECURITY: Revoked refresh token reused for user {stored.user_id}; revoking its family.")
+                await self._revoke_family(stored.family_id)
+                return None
+
+            # 3. Expiry and account state
+            if stored.expires_at <= datetime.now(timezone.utc) or not is_active:
+                raise invalid_token
+
+            # 4. Rotate
+            stored.revoked_at = func.now()
+            new_refresh_token = await self.issue(stored.user_id, family_id=stored.family_id)
+            log.info(f"Refresh token rotated for user: {email}")
+            return token_models.Token(
+                access_token=JWTHandler.create_access_token(subject=email),
+                token_type="bearer",
+                refresh_token=new_refresh_token
+            )
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            log.error(f"Error rotating a refresh token: {e}", exc_info=True)
+            raise
+
+    async def revoke(self, refresh_token: str) -> None:
+        """Revokes the family of `refresh_token` (logout on that device). Unknown tokens are ignored."""
+        stmt = select(db_models.RefreshTokens.family_id).filter(
+            db_models.RefreshTokens.token_hash == self._digest(refresh_token)
+        )
+        family_id = (await self.db.execute(stmt)).scalar()
+        if family_id is not None:
+            await self._revoke_family(family_id)
+
+    async def _revoke_family(self, family_id: UUID) -> None:
+        await self.db.execute(
+            update(db_models.RefreshTokens)
+            .where(db_models.RefreshTokens.family_id == family_id, db_models.RefreshTokens.revoked_at.is_(None))
+            .values(revoked_at=func.now())
+        )
+
+
 class LoginService:
     """
     Service for handling user login and authentication.
@@ -18,9 +129,11 @@ class LoginService:
     """
     def __init__(
         self, 
-        user_service: Annotated[UserService, Depends(UserService)]
+        user_service: Annotated[UserService, Depends(UserService)],
+        refresh_token_service: Annotated[RefreshTokenService, Depends(RefreshTokenService)]
     ):
         self.user_service = user_service
+        self.refresh_token_service = refresh_token_service
 
     async def login_user(self, form_data: OAuth2PasswordRequestForm) -> token_models.Token:
         log.info(f"Attempting login for user: {form_data.username}")
@@ -28,7 +141,7 @@ class LoginService:
         # CHANGED: Call the UserService to fetch the user
         user = await self.user_service._get_user_by_email_with_password(form_data.username)
 
-        if not user or not HashedPassword.verify(form_data.password, user.password):
+        if not user or not await HashedPassword.verify_async(form_data.password, user.password):
             log.warning(f"Login failed for user: {form_data.username} - Incorrect email or password")
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -45,6 +158,7 @@ class LoginService:
             )
 
         access_token = JWTHandler.create_access_token(subject=user.email)
+        refresh_token = await self.refresh_token_service.issue(user.id)
         log.info(f"Login successful for user: {form_data.username}")
 
-        return token_models.Token(access_token=access_token, token_type="bearer")
+        return token_models.Token(access_token=access_token, token_type="bearer", refresh_token=refresh_token)
@@ -0,0 +1,272 @@
+'''
+iCalendar (.ics) subscription feed of a user's timetable.
+
+Calendar apps poll the feed URL every few minutes and cannot send an
+Authorization header, so the URL itself carries a per-user token (an HMAC of
+the user id and the user's calendar_feed_version). Rotating the version
+revokes a leaked URL. A feed covers the previous week and the next
+TIMETABLE_FEED_WEEKS weeks of the latest run, with meeting links on tuitions.
+
+Rendered feeds are kept in the timetable cache together with their ETag and
+the digest of the token they were verified with, so a poll is a few cache
+lookups and, when nothing changed, a 304. Any other token is verified against
+the database on the render path.
+'''
+import hashlib
+import hmac
+from datetime import datetime, timedelta, timezone
+from typing import Annotated, Iterable
+from uuid import UUID
+from fastapi import Depends, HTTPException, status
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+
+from ..database.engine import get_db_session, primary_read_session
+from ..database import models as db_models
+from ..database.db_enums import UserRole
+from ..models import timetable as timetable_models
+from ..common.config import settings
+from ..common.logger import log
+from .user_service import UserService
+from .timetable_service import TimeTableService
+from .timetable_cache import TimetableCache
+from .principal_cache import principal_cache
+from . import timetable_occurrences
+
+PRODID = "-//EfficientTutor//Timetable//EN"
+# RFC 5545: content lines are folded at 75 octets
+ICS_LINE_OCTETS = 75
+
+
+def _escape_text(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+        .replace("\r\n", "\\n").replace("\n", "\\n")
+    )
+
+
+def _fold(line: str) -> str:
+    """Folds a content line into CRLF + space continuations of at most 75 octets."""
+    encoded = line.encode()
+    if len(encoded) <= ICS_LINE_OCTETS:
+        return line
+    parts, current, size = [], [], 0
+    for char in line:
+        width = len(char.encode())
+        # Continuation lines start with a space, which counts towards the limit
+        if size + width > (ICS_LINE_OCTETS if not parts else ICS_LINE_OCTETS - 1):
+            parts.append("".join(current))
+            current, size = [], 0
+        current.append(char)
+        size += width
+    parts.append("".join(current))
+    return "\r\n ".join(parts)
+
+
+def _ics_datetime(value: datetime) -> str:
+    return value.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def render_ics(
+    calendar_name: str,
+    zone_name: str,
+    occurrences: Iterable[tuple[timetable_models.TimeTableSlotBase, datetime, datetime]],
+    meeting_links: dict[UUID, db_models.MeetingLinks],
+    stamp: datetime
+) -> str:
+    """Renders occurrences as a VCALENDAR of UTC VEVENTs (no VTIMEZONE needed)."""
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{PRODID}",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_escape_text(calendar_name)}",
+        f"X-WR-TIMEZONE:{zone_name}",
+    ]
+    for slot, start_dt, end_dt in occurrences:
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:{slot.id}-{_ics_datetime(start_dt)}@efficienttutor",
+            f"DTSTAMP:{_ics_datetime(stamp)}",
+            f"DTSTART:{_ics_datetime(start_dt)}",
+            f"DTEND:{_ics_datetime(end_dt)}",
+            f"SUMMARY:{_escape_text(slot.name)}",
+            f"CATEGORIES:{slot.slot_type.value}",
+            "TRANSP:OPAQUE",
+        ]
+        link = meeting_links.get(slot.object_uuid) if slot.object_uuid else None
+        if link is not None:
+            description = f"Meeting link: {link.meeting_link}"
+            if link.meeting_id:
+                description += f"\nMeeting ID: {link.meeting_id}"
+            lines += [f"URL:{link.meeting_link}", f"DESCRIPTION:{_escape_text(description)}"]
+        lines.append("END:VEVENT")
+    lines.append("END:VCALENDAR")
+    return "\r\n".join(_fold(line) for line in lines) + "\r\n"
+
+
+class CalendarFeedService:
+    """
+    Service for the token-protected timetable feed.
+    The feed shows what GET /timetable/ shows by default: the user's own
+    timetable, or all their children's for a parent.
+    """
+    def __init__(
+        self,
+        db: Annotated[AsyncSession, Depends(get_db_session)],
+        user_service: Annotated[UserService, Depends(UserService)],
+        timetable_service: Annotated[TimeTableService, Depends(TimeTableService)],
+        timetable_cache: Annotated[TimetableCache, Depends(TimetableCache)]
+    ):
+        self.db = db
+        self.user_service = user_service
+        self.timetable_service = timetable_service
+        self.timetable_cache = timetable_cache
+
+    # --- Token Helpers ---
+
+    @staticmethod
+    def feed_token(user_id: UUID, version: int) -> str:
+        """
+        The token of the user's feed URL at a feed version.
+        Incrementing the user's version revokes their feed; rotating SECRET_KEY revokes every feed.
+        """
+        digest = hmac.new(
+            settings.SECRET_KEY.encode(), f"calendar-feed:{user_id}:{version}".encode(), hashlib.sha256
+        )
+        return digest.hexdigest()[:32]
+
+    @staticmethod
+    def _token_digest(token: str) -> str:
+        # Cached next to the feed instead of the token itself
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def _verify_feed_token(self, user: db_models.Users, token: str) -> None:
+        if not hmac.compare_digest(self.feed_token(user.id, user.calendar_feed_version), token):
+            log.warning(f"SECURITY: Invalid calendar feed token for user {user.id}.")
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Calendar feed not found.")
+
+    async def rotate_feed_token(self, current_user: db_models.Users) -> str:
+        """
+        Revokes the user's current feed URL. Returns the new token.
+        Cached feeds are dropped once the session commits.
+        """
+        log.info(f"Rotating the calendar feed token of user {current_user.id}.")
+        stmt = update(db_models.Users).where(
+            db_models.Users.id == current_user.id
+        ).values(
+            calendar_feed_version=db_models.Users.calendar_feed_version + 1
+        ).returning(db_models.Users.calendar_feed_version)
+        version = (await self.db.execute(stmt)).scalar_one()
+
+        # Already written: keep the loaded user in step without another UPDATE
+        set_committed_value(current_user, "calendar_feed_version", version)
+        principal_cache.purge_on_commit(self.db, [current_user.id])
+        self.timetable_cache.invalidate_on_commit(self.db)
+        return self.feed_token(current_user.id, version)
+
+    @staticmethod
+    def _feed_window(now: datetime) -> tuple[datetime, datetime]:
+        """The previous week and TIMETABLE_FEED_WEEKS weeks from this week's Monday (UTC)."""
+        monday = (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+        window_start = monday - timedelta(weeks=1)
+        return window_start, monday + timedelta(weeks=settings.TIMETABLE_FEED_WEEKS)
+
+    # --- Main API Method ---
+
+    async def get_feed(self, user_id: UUID, token: str) -> tuple[str, str]:
+        """
+        Returns (etag, ics body) of the user's feed, from the cache when possible.
+        The ETag is derived from the run id, the user's relationships (the feed's
+        targets), the timezone, the feed window and the cache generation. Timezone
+        changes rotate the generation, like any other timetable change.
+        """
+        log.info(f"Serving calendar feed of user {user_id}.")
+        try:
+            # 1. Cache lookup: latest run (cached for a few seconds) + rendered feed.
+            #    A hit is authorized by the token it was verified with.
+            run_id = await self.timetable_cache.latest_run_id(self.timetable_service._load_latest_run_id) or 0
+            window_start, window_end = self._feed_window(datetime.now(timezone.utc))
+            window_key = window_start.date().isoformat()
+            token_digest = self._token_digest(token)
+            generation, cached = await self.timetable_cache.lookup_feed(run_id, user_id, window_key)
+            if cached is not None:
+                cached_digest, etag, body = cached.split("\n", 2)
+                if hmac.compare_digest(cached_digest, token_digest):
+                    return etag, body
+
+            # 2. Verify the token against the user's feed version and render, on the primary:
+            #    rows read from a lagging replica would be cached under the new generation
+            async with primary_read_session(self.db) as fill_db:
+                renderer = self if fill_db is self.db else CalendarFeedService(
+                    fill_db,
+                    UserService(fill_db),
+                    TimeTableService(fill_db, UserService(fill_db), self.timetable_cache),
+                    self.timetable_cache
+                )
+                etag, body = await renderer._render_feed(
+                    user_id, token, run_id, generation, window_start, window_end, window_key
+                )
+            await self.timetable_cache.store_feed(
+                generation, run_id, user_id, window_key, f"{token_digest}\n{etag}\n{body}"
+            )
+            return etag, body
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            log.error(f"Error rendering calendar feed of user {user_id}: {e}", exc_info=True)
+            raise
+
+    async def _render_feed(
+        self,
+        user_id: UUID,
+        token: str,
+        run_id: int,
+        generation: str,
+        window_start: datetime,
+        window_end: datetime,
+        window_key: str
+    ) -> tuple[str, str]:
+        """Verifies the token and renders (etag, ics body) of the user's feed for the cache."""
+        user = await self.user_service.get_user_by_id(user_id)
+        if user is None or not user.is_active:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Calendar feed not found.")
+        self._verify_feed_token(user, token)
+
+        if user.role == UserRole.PARENT.value:
+            target_user_ids = sorted(await self.user_service.get_student_ids(user))
+        else:
+            target_user_ids = [user.id]
+
+        base_slots = []
+        if target_user_ids:
+            _, base_slots = await self.timetable_service.get_visible_slots(user, target_user_ids)
+
+        zone = timetable_occurrences.get_zone(user.timezone)
+        occurrences = timetable_occurrences.expand_occurrences(base_slots, zone, window_start, window_end)
+        meeting_links = await self._load_meeting_links(
+            {slot.object_uuid for slot in base_slots if slot.slot_type == timetable_models.TimeTableSlotType.TUITION}
+        )
+        body = render_ics(
+            "EfficientTutor Timetable",
+            zone.key,
+            occurrences,
+            meeting_links,
+            stamp=datetime.now(timezone.utc)
+        )
+
+        relationships = ",".join(str(target_id) for target_id in target_user_ids)
+        etag = hashlib.sha256(
+            f"{generation}:{run_id}:{user.role}:{relationships}:{zone.key}:{window_key}".encode()
+        ).hexdigest()[:32]
+        return etag, body
+
+    async def _load_meeting_links(self, tuition_ids: set[UUID]) -> dict[UUID, db_models.MeetingLinks]:
+        if not tuition_ids:
+            return {}
+        stmt = select(db_models.MeetingLinks).filter(db_models.MeetingLinks.tuition_id.in_(tuition_ids))
+        result = await self.db.execute(stmt)
+        return {link.tuition_id: link for link in result.scalars().all()}
@@ -1,18 +1,18 @@
 '''
 
 '''
-from typing import Optional, Annotated, Any
+from typing import Optional, Annotated, Any, AsyncIterator
 from collections import defaultdict
 from uuid import UUID
 from decimal import Decimal
 from datetime import datetime
 from pydantic import ValidationError
 from fastapi import Depends, HTTPException, status
-from sqlalchemy import select, func, and_, text
+from sqlalchemy import select, func, and_, text, tuple_, literal, true
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import aliased, selectinload
 
-from ..database.engine import get_db_session
+from ..database.engine import get_db_session, primary_read_session
 from ..database import models as db_models
 from ..database.db_enums import UserRole, LogStatusEnum, TuitionLogCreateTypeEnum, PaidStatus
 from ..models import finance as finance_models
@@ -20,6 +20,9 @@ from ..common.logger import log
 from ..common.config import settings
 from .user_service import UserService
 from .tuition_service import TuitionService
+from .ledger_service import LedgerService
+from .summary_cache import SummaryCache
+from .relationship_index import relationship_index
 
 # --- Service 1: Tuition Log Management ---
 
@@ -32,11 +35,15 @@ class TuitionLogService:
         self, 
         db: Annotated[AsyncSession, Depends(get_db_session)],
         user_service: Annotated[UserService, Depends(UserService)],
-        tuition_service: Annotated[TuitionService, Depends(TuitionService)]
+        tuition_service: Annotated[TuitionService, Depends(TuitionService)],
+        ledger_service: Annotated[LedgerService, Depends(LedgerService)],
+        summary_cache: Annotated[SummaryCache, Depends(SummaryCache)]
     ):
         self.db = db
         self.user_service = user_service
         self.tuition_service = tuition_service
+        self.ledger_service = ledger_service
+        self.summary_cache = summary_cache
 
     # --- 1. Authorization Helpers ---
 
@@ -74,29 +81,15 @@ class TuitionLogService:
             
             # Relationship Check: Student
             if student_id:
-                # Check if student is in any of this teacher's tuitions
-                stmt = select(db_models.TuitionTemplateCharges.id).join(
-                    db_models.Tuitions
-                ).filter(
-                    db_models.Tuitions.teacher_id == current_user.id,
-                    db_models.TuitionTemplateCharges.student_id == student_id
-                ).limit(1)
-                result = await self.db.execute(stmt)
-                if not result.scalars().first():
+                # Check if student is in any of this teacher's tuitions (relationship index)
+                if not await relationship_index.teacher_has_student(self.db, current_user.id, student_id):
                     raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You are not associated with this student.")
 
             # Relationship Check: Parent
             if parent_id:
-                # Check if parent is in any of this teacher's tuitions
-                stmt = select(db_models.TuitionTemplateCharges.id).join(
-                    db_models.Tuitions
-                ).filter(
-                    db_models.Tuitions.teacher_id == current_user.id,
-                    db_models.TuitionTemplateCharges.parent_id == parent_id
-                ).limit(1)
-                result = await self.db.execute(stmt)
-                if not result.scalars().first():
-                     raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You are not associated with this parent.")
+                # Check if parent is in any of this teacher's tuitions (relationship index)
+                if not await relationship_index.teacher_has_parent(self.db, current_user.id, parent_id):
+                    raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You are not associated with this parent.")
 
         # 3. Parent Rules
         elif current_user.role == UserRole.PARENT.value:
@@ -104,23 +97,15 @@ class TuitionLogService:
             if parent_id and parent_id != current_user.id:
                 raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Parents can only filter by their own ID.")
 
-            # Relationship Check: Student (In-Memory)
+            # Relationship Check: Student (ids captured at authentication)
             if student_id:
-                # UserService ensures 'students' relationship is loaded for Parents
-                if not any(s.id == student_id for s in current_user.students):
+                if student_id not in await self.user_service.get_student_ids(current_user):
                     raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You can only filter by your own children.")
 
-            # Relationship Check: Teacher (DB Check)
+            # Relationship Check: Teacher (relationship index)
             if teacher_id:
                 # Check if this teacher teaches any of the parent's children
-                stmt = select(db_models.Tuitions.id).join(
-                    db_models.TuitionTemplateCharges
-                ).filter(
-                    db_models.TuitionTemplateCharges.parent_id == current_user.id,
-                    db_models.Tuitions.teacher_id == teacher_id
-                ).limit(1)
-                result = await self.db.execute(stmt)
-                if not result.scalars().first():
+                if not await relationship_index.teacher_has_parent(self.db, teacher_id, current_user.id):
                     raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You are not associated with this teacher.")
 
         # 4. Student Rules
@@ -156,8 +141,7 @@ class TuitionLogService:
         
         # 3. Check if Parent is the parent of a student in the charges
         elif current_user.role == UserRole.PARENT.value:
-            await self.db.refresh(current_user, ['students'])
-            my_student_ids = {student.id for student in current_user.students}
+            my_student_ids = await self.user_service.get_student_ids(current_user)
             if any(charge.student_id in my_student_ids for charge in log_obj.tuition_log_charges):
                 return  # Allow
 
@@ -170,10 +154,12 @@ class TuitionLogService:
 
     # --- 2. Internal Data-Fetching (No Auth) ---
 
-    async def _get_log_by_id_internal(self, log_id: UUID) -> db_models.TuitionLogs:
+    async def _get_log_by_id_internal(self, log_id: UUID, populate_existing: bool = False) -> db_models.TuitionLogs:
         """
         RENAMED: Internal "dumb" fetcher.
         Fetches a single, fully-loaded tuition log by its ID.
+        `populate_existing` reloads a log already in the session (e.g. just flushed)
+        in the same fixed number of queries, whatever its number of charges.
         """
         log.info(f"Internal fetch for tuition log by ID: {log_id}")
         try:
@@ -185,6 +171,8 @@ class TuitionLogService:
                     selectinload(db_models.TuitionLogCharges.parent)
                 )
             ).filter(db_models.TuitionLogs.id == log_id)
+            if populate_existing:
+                stmt = stmt.execution_options(populate_existing=True)
             
             result = await self.db.execute(stmt)
             log_obj = result.scalars().first()
@@ -204,12 +192,20 @@ class TuitionLogService:
         include_void: bool = False,
         target_student_id: Optional[UUID] = None,
         target_parent_id: Optional[UUID] = None,
-        target_teacher_id: Optional[UUID] = None
+        target_teacher_id: Optional[UUID] = None,
+        start_from: Optional[datetime] = None,
+        start_to: Optional[datetime] = None,
+        cursor: Optional[finance_models.TuitionLogCursor] = None,
+        limit: Optional[int] = None
     ) -> list[db_models.TuitionLogs]:
         """
         RENAMED: Internal "dumb" fetcher.
         Fetches all tuition logs relevant to the current user, fully loaded.
         This method is "dumb" and only filters data; it does not raise auth errors.
+
+        Logs are ordered by (start_time, id) descending. `start_from` is inclusive
+        and `start_to` exclusive. `cursor` returns only the logs after that position
+        (keyset pagination), and `limit` caps the page size.
         """
         log.info(f"Internal ORM fetch for all tuition logs for user {current_user.id}")
         
@@ -264,7 +260,23 @@ class TuitionLogService:
         if current_user.role == UserRole.PARENT.value:
             stmt = stmt.filter(db_models.TuitionLogs.status == LogStatusEnum.ACTIVE.value)
             
-        stmt = stmt.order_by(db_models.TuitionLogs.start_time.desc()).distinct()
+        # 3. DATE RANGE AND KEYSET FILTERS
+        if start_from:
+            stmt = stmt.filter(db_models.TuitionLogs.start_time >= start_from)
+        if start_to:
+            stmt = stmt.filter(db_models.TuitionLogs.start_time < start_to)
+        if cursor:
+            stmt = stmt.filter(
+                tuple_(db_models.TuitionLogs.start_time, db_models.TuitionLogs.id)
+                < tuple_(literal(cursor.start_time), literal(cursor.id))
+            )
+
+        stmt = stmt.order_by(
+            db_models.TuitionLogs.start_time.desc(),
+            db_models.TuitionLogs.id.desc()
+        ).distinct()
+        if limit:
+            stmt = stmt.limit(limit)
         result = await self.db.execute(stmt)
         return list(result.scalars().all())
 
@@ -290,16 +302,15 @@ class TuitionLogService:
             await self._authorize_related_id(current_user, log_obj)
             
             # 4. Format and Return
+            # Point queries: paid status of this log only, from cumulative sums
             earliest_date = await self._get_earliest_log_date()
             
             if current_user.role == UserRole.TEACHER.value:
-                ledger = await self._calculate_teacher_ledger(current_user.id)
-                # Note: _build_teacher_api_log needs to be updated to accept the full ledger
+                ledger = await self.ledger_service.get_teacher_statuses_for_log(log_obj)
                 return self._build_teacher_api_log(log_obj, earliest_date, ledger)
                 
             elif current_user.role == UserRole.PARENT.value:
-                ledger = await self._calculate_parent_ledger(current_user.id)
-                status = ledger.get(log_obj.id, PaidStatus.UNPAID)
+                status = await self.ledger_service.get_parent_status_for_log(current_user.id, log_obj)
                 return self._build_parent_api_log(log_obj, earliest_date, status, current_user.id)
             else: # Student
                 return self._build_student_api_log(log_obj, earliest_date, current_user.id)
@@ -315,12 +326,16 @@ class TuitionLogService:
         current_user: db_models.Users,
         student_id: Optional[UUID] = None,
         parent_id: Optional[UUID] = None,
-        teacher_id: Optional[UUID] = None
+        teacher_id: Optional[UUID] = None,
+        start_from: Optional[datetime] = None,
+        start_to: Optional[datetime] = None,
+        cursor: Optional[finance_models.TuitionLogCursor] = None,
+        limit: Optional[int] = None
     ) -> list[finance_models.TuitionLogReadRoleBased]:
         """
         REFACTORED: API-facing method.
         1. Authorizes Filtering Rules (Identity & Relationship checks)
-        2. Fetches Data with Filters
+        2. Fetches Data with Filters (one keyset page if `limit` is given)
         3. Formats
         """
         log.info(f"User {current_user.id} (Role: {current_user.role}) requesting all tuition logs for API.")
@@ -333,7 +348,11 @@ class TuitionLogService:
                 current_user=current_user,
                 target_student_id=student_id,
                 target_parent_id=parent_id,
-                target_teacher_id=teacher_id
+                target_teacher_id=teacher_id,
+                start_from=start_from,
+                start_to=start_to,
+                cursor=cursor,
+                limit=limit
             )
             if not rich_logs:
                 return []
@@ -341,25 +360,7 @@ class TuitionLogService:
             earliest_date = await self._get_earliest_log_date()
             
             # 3. Get paid statuses and Format
-            api_logs = []
-            
-            if current_user.role == UserRole.TEACHER.value:
-                ledger = await self._calculate_teacher_ledger(current_user.id)
-                for rich_log in rich_logs:
-                    # Pass the full ledger to the builder
-                    api_logs.append(self._build_teacher_api_log(rich_log, earliest_date, ledger))
-            
-            elif current_user.role == UserRole.PARENT.value:
-                ledger = await self._calculate_parent_ledger(current_user.id)
-                for rich_log in rich_logs:
-                    status = ledger.get(rich_log.id, PaidStatus.UNPAID)
-                    api_logs.append(self._build_parent_api_log(rich_log, earliest_date, status, current_user.id))
-            
-            elif current_user.role == UserRole.STUDENT.value:
-                for rich_log in rich_logs:
-                    api_logs.append(self._build_student_api_log(rich_log, earliest_date, current_user.id))
-            
-            return api_logs
+            return await self._format_logs_for_api(current_user, rich_logs, earliest_date)
             
         except HTTPException as http_exc:
             raise http_exc
@@ -367,6 +368,97 @@ class TuitionLogService:
             log.error(f"Error in get_all_tuition_logs_for_api: {e}", exc_info=True)
             raise
 
+    async def stream_tuition_logs_for_api(
+        self,
+        current_user: db_models.Users,
+        student_id: Optional[UUID] = None,
+        parent_id: Optional[UUID] = None,
+        teacher_id: Optional[UUID] = None,
+        start_from: Optional[datetime] = None,
+        start_to: Optional[datetime] = None,
+        cursor: Optional[finance_models.TuitionLogCursor] = None,
+        batch_size: int = 500
+    ) -> AsyncIterator[finance_models.TuitionLogReadRoleBased]:
+        """
+        API-facing method for exports.
+        Authorizes up front (so errors surface before the response starts), then
+        returns an iterator that walks the logs in keyset batches. Each batch is
+        expunged from the session once formatted, so memory stays constant.
+        """
+        log.info(f"User {current_user.id} (Role: {current_user.role}) streaming tuition logs for API.")
+        try:
+            # 1. Authorize Filtering Rules (Strict Security Check)
+            await self._authorize_for_filtering(current_user, student_id, parent_id, teacher_id)
+        except HTTPException as http_exc:
+            raise http_exc
+        except Exception as e:
+            log.error(f"Error in stream_tuition_logs_for_api: {e}", exc_info=True)
+            raise
+
+        async def iterate_batches() -> AsyncIterator[finance_models.TuitionLogReadRoleBased]:
+            position = cursor
+            earliest_date = None
+            while True:
+                # 2. Fetch the next batch after the current position
+                rich_logs = await self.get_all_tuition_logs_orm(
+                    current_user=current_user,
+                    target_student_id=student_id,
+                    target_parent_id=parent_id,
+                    target_teacher_id=teacher_id,
+                    start_from=start_from,
+                    start_to=start_to,
+                    cursor=position,
+                    limit=batch_size
+                )
+                if not rich_logs:
+                    return
+                if earliest_date is None:
+                    earliest_date = await self._get_earliest_log_date()
+
+                # 3. Format, then release the batch
+                for api_log in await self._format_logs_for_api(current_user, rich_logs, earliest_date):
+                    yield api_log
+
+                last_log = rich_logs[-1]
+                position = finance_models.TuitionLogCursor(start_time=last_log.start_time, id=last_log.id)
+                for rich_log in rich_logs:
+                    for charge in rich_log.tuition_log_charges:
+                        self.db.expunge(charge)
+                    self.db.expunge(rich_log)
+
+                if len(rich_logs) < batch_size:
+                    return
+
+        return iterate_batches()
+
+    async def _format_logs_for_api(
+        self,
+        current_user: db_models.Users,
+        rich_logs: list[db_models.TuitionLogs],
+        earliest_date: datetime
+    ) -> list[finance_models.TuitionLogReadRoleBased]:
+        """Looks up the paid statuses of the given logs and builds the role-based API models."""
+        api_logs = []
+        log_ids = [rich_log.id for rich_log in rich_logs]
+
+        if current_user.role == UserRole.TEACHER.value:
+            ledger = await self.ledger_service.get_teacher_ledger(log_ids)
+            for rich_log in rich_logs:
+                # Pass the full ledger to the builder
+                api_logs.append(self._build_teacher_api_log(rich_log, earliest_date, ledger))
+        
+        elif current_user.role == UserRole.PARENT.value:
+            ledger = await self.ledger_service.get_parent_ledger(current_user.id, log_ids)
+            for rich_log in rich_logs:
+                status = ledger.get(rich_log.id, PaidStatus.UNPAID)
+                api_logs.append(self._build_parent_api_log(rich_log, earliest_date, status, current_user.id))
+        
+        elif current_user.role == UserRole.STUDENT.value:
+            for rich_log in rich_logs:
+                api_logs.append(self._build_student_api_log(rich_log, earliest_date, current_user.id))
+        
+        return api_logs
+
     # --- 4. API-Facing Write Methods (With Auth) ---
 
     async def create_tuition_log(
@@ -401,11 +493,13 @@ class TuitionLogService:
             if not new_log_object:
                  raise Exception("Tuition log creation did not return a valid object.")
 
+            # Allocate the new charges in the materialized ledger
+            await self.ledger_service.record_tuition_log(new_log_object)
+            await self.summary_cache.invalidate(self._affected_user_ids(new_log_object))
+
             # Format for API response
             earliest_date = await self._get_earliest_log_date()
-            
-            # Recalculate ledger to reflect the new log's status immediately
-            ledger = await self._calculate_teacher_ledger(current_user.id)
+            ledger = await self.ledger_service.get_teacher_ledger([new_log_object.id])
             
             return self._build_teacher_api_log(
                 log=new_log_object,
@@ -467,10 +561,8 @@ class TuitionLogService:
         ]
         self.db.add_all(new_charges)
         await self.db.flush()
-        await self.db.refresh(new_log, ['teacher', 'tuition_log_charges', 'tuition'])
-        for charge in new_log.tuition_log_charges:
-            await self.db.refresh(charge, ['student'])
-        return new_log
+        # One eager reload instead of a refresh per charge
+        return await self._get_log_by_id_internal(new_log.id, populate_existing=True)
 
     async def _create_from_custom(
         self, 
@@ -519,10 +611,8 @@ class TuitionLogService:
             ))
         self.db.add_all(new_charges)
         await self.db.flush()
-        await self.db.refresh(new_log, ['teacher', 'tuition_log_charges'])
-        for charge in new_log.tuition_log_charges:
-            await self.db.refresh(charge, ['student'])
-        return new_log
+        # One eager reload instead of a refresh per charge
+        return await self._get_log_by_id_internal(new_log.id, populate_existing=True)
 
     async def correct_tuition_log(
         self, 
@@ -575,13 +665,23 @@ class TuitionLogService:
         log_obj.status = LogStatusEnum.VOID.value
         self.db.add(log_obj)
         await self.db.flush()
+
+        # 4. Release the log's charges from the materialized ledger
+        await self.ledger_service.remove_tuition_log(log_obj.id)
+        await self.summary_cache.invalidate(self._affected_user_ids(log_obj))
         return True
 
     # --- 5. Internal Formatters & Helpers ---
 
+    def _affected_user_ids(self, log_obj: db_models.TuitionLogs) -> set[UUID]:
+        """The teacher and parents whose financial summaries a change to this log affects."""
+        return {log_obj.teacher_id} | {c.parent_id for c in log_obj.tuition_log_charges}
+
     async def _get_earliest_log_date(self) -> datetime:
-        """Fetches the earliest log start time for week number calculations."""
-        # ... (this method is correct and unchanged) ...
+        """
+        Fetches the earliest log start time for week number calculations.
+        Served by the partial index idx_tuition_logs_active_start_time (an index probe, not a scan).
+        """
         log.info("Fetching earliest log start time for week calculation.")
         try:
             result = await self.db.execute(
@@ -599,6 +699,7 @@ class TuitionLogService:
         """
         Calculates the payment status for every student charge in every log for a teacher.
         Returns a map: {(log_id, student_id): PaidStatus}
+        Full recompute; API reads use LedgerService. Kept as the reference implementation.
         """
         # 1. Fetch all parent wallets (Total Paid)
         payment_stmt = select(
@@ -612,13 +713,13 @@ class TuitionLogService:
         payment_results = await self.db.execute(payment_stmt)
         parent_wallets = {row.parent_id: row[1] for row in payment_results}
 
-        # 2. Fetch all logs chronologically
+        # 2. Fetch all logs chronologically (ties broken by id, as in the ledger)
         log_stmt = select(db_models.TuitionLogs).options(
             selectinload(db_models.TuitionLogs.tuition_log_charges)
         ).filter(
             db_models.TuitionLogs.teacher_id == teacher_id,
             db_models.TuitionLogs.status == LogStatusEnum.ACTIVE.value
-        ).order_by(db_models.TuitionLogs.start_time.asc())
+        ).order_by(db_models.TuitionLogs.start_time.asc(), db_models.TuitionLogs.id.asc())
 
         log_results = await self.db.execute(log_stmt)
         logs = log_results.scalars().unique().all()
@@ -627,7 +728,7 @@ class TuitionLogService:
         ledger_map = {}
         
         for log_entry in logs:
-            for charge in log_entry.tuition_log_charges:
+            for charge in sorted(log_entry.tuition_log_charges, key=lambda c: c.id):
                 current_wallet = parent_wallets.get(charge.parent_id, Decimal(0))
                 
                 if current_wallet >= charge.cost:
@@ -645,6 +746,7 @@ class TuitionLogService:
         """
         Calculates the payment status for every log for a specific parent.
         Returns a map: {log_id: PaidStatus}
+        Full recompute; API reads use LedgerService. Kept as the reference implementation.
         """
         # 1. Fetch Parent's Total Paid
         payment_stmt = select(func.sum(db_models.PaymentLogs.amount_paid)).filter(
@@ -663,7 +765,7 @@ class TuitionLogService:
         ).filter(
             db_models.TuitionLogCharges.parent_id == parent_id,
             db_models.TuitionLogs.status == LogStatusEnum.ACTIVE.value
-        ).order_by(db_models.TuitionLogs.start_time.asc()).distinct()
+        ).order_by(db_models.TuitionLogs.start_time.asc(), db_models.TuitionLogs.id.asc()).distinct()
 
         log_results = await self.db.execute(log_stmt)
         logs = log_results.scalars().unique().all()
@@ -808,10 +910,14 @@ class PaymentLogService:
     def __init__(
         self, 
         db: Annotated[AsyncSession, Depends(get_db_session)],
-        user_service: Annotated[UserService, Depends(UserService)]
+        user_service: Annotated[UserService, Depends(UserService)],
+        ledger_service: Annotated[LedgerService, Depends(LedgerService)],
+        summary_cache: Annotated[SummaryCache, Depends(SummaryCache)]
     ):
         self.db = db
         self.user_service = user_service
+        self.ledger_service = ledger_service
+        self.summary_cache = summary_cache
 
     # --- Private Authorization Helper ---
 
@@ -838,14 +944,7 @@ class PaymentLogService:
             # Relationship Check: Parent
             if parent_id:
                 # Check if parent has a student in this teacher's tuitions
-                stmt = select(db_models.TuitionTemplateCharges.id).join(
-                    db_models.Tuitions
-                ).filter(
-                    db_models.Tuitions.teacher_id == current_user.id,
-                    db_models.TuitionTemplateCharges.parent_id == parent_id
-                ).limit(1)
-                result = await self.db.execute(stmt)
-                if not result.scalars().first():
+                if not await relationship_index.teacher_has_parent(self.db, current_user.id, parent_id):
                     raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You are not associated with this parent.")
 
         # 3. Parent Rules
@@ -857,14 +956,7 @@ class PaymentLogService:
             # Relationship Check: Teacher
             if teacher_id:
                 # Check if this teacher teaches any of the parent's children
-                stmt = select(db_models.Tuitions.id).join(
-                    db_models.TuitionTemplateCharges
-                ).filter(
-                    db_models.TuitionTemplateCharges.parent_id == current_user.id,
-                    db_models.Tuitions.teacher_id == teacher_id
-                ).limit(1)
-                result = await self.db.execute(stmt)
-                if not result.scalars().first():
+                if not await relationship_index.teacher_has_parent(self.db, teacher_id, current_user.id):
                     raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You are not associated with this teacher.")
 
         # 4. Student Rules
@@ -1083,8 +1175,12 @@ class PaymentLogService:
             #    that the formatter needs.
             await self.db.refresh(new_log_object, ['parent', 'teacher'])
             # --- END OF FIX ---
+
+            # 7. Re-allocate the (parent, teacher) wallet in the materialized ledger
+            await self.ledger_service.record_payment_change(new_log_object.parent_id, new_log_object.teacher_id)
+            await self.summary_cache.invalidate([new_log_object.parent_id, new_log_object.teacher_id])
             
-            # 7. Format for the API and return
+            # 8. Format for the API and return
             return self._format_payment_log_for_api(new_log_object)
 
         except (ValidationError, ValueError) as e:
@@ -1115,6 +1211,9 @@ class PaymentLogService:
             log_obj.status = LogStatusEnum.VOID.value
             self.db.add(log_obj)
             await self.db.flush()
+
+            await self.ledger_service.record_payment_change(log_obj.parent_id, log_obj.teacher_id)
+            await self.summary_cache.invalidate([log_obj.parent_id, log_obj.teacher_id])
             return True
         except HTTPException as http_exc:
             raise http_exc # Re-raise 404s
@@ -1171,10 +1270,12 @@ class FinancialSummaryService:
     def __init__(
         self, 
         db: Annotated[AsyncSession, Depends(get_db_session)],
-        tuition_log_service: Annotated[TuitionLogService, Depends(TuitionLogService)]
+        tuition_log_service: Annotated[TuitionLogService, Depends(TuitionLogService)],
+        summary_cache: Annotated[SummaryCache, Depends(SummaryCache)]
     ):
         self.db = db
         self.tuition_log_service = tuition_log_service
+        self.summary_cache = summary_cache
 
     async def _authorize_for_filtering(
         self, 
@@ -1191,45 +1292,24 @@ class FinancialSummaryService:
         if current_user.role == UserRole.TEACHER.value:
             # Target Check: Parent
             if parent_id:
-                stmt = select(db_models.TuitionTemplateCharges.id).join(
-                    db_models.Tuitions
-                ).filter(
-                    db_models.Tuitions.teacher_id == current_user.id,
-                    db_models.TuitionTemplateCharges.parent_id == parent_id
-                ).limit(1)
-                result = await self.db.execute(stmt)
-                if not result.scalars().first():
+                if not await relationship_index.teacher_has_parent(self.db, current_user.id, parent_id):
                     raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You are not associated with this parent.")
 
             # Target Check: Student
             if student_id:
-                stmt = select(db_models.TuitionTemplateCharges.id).join(
-                    db_models.Tuitions
-                ).filter(
-                    db_models.Tuitions.teacher_id == current_user.id,
-                    db_models.TuitionTemplateCharges.student_id == student_id
-                ).limit(1)
-                result = await self.db.execute(stmt)
-                if not result.scalars().first():
+                if not await relationship_index.teacher_has_student(self.db, current_user.id, student_id):
                     raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You are not associated with this student.")
 
         # 2. Parent Rules
         elif current_user.role == UserRole.PARENT.value:
             # Target Check: Teacher
             if teacher_id:
-                stmt = select(db_models.Tuitions.id).join(
-                    db_models.TuitionTemplateCharges
-                ).filter(
-                    db_models.TuitionTemplateCharges.parent_id == current_user.id,
-                    db_models.Tuitions.teacher_id == teacher_id
-                ).limit(1)
-                result = await self.db.execute(stmt)
-                if not result.scalars().first():
+                if not await relationship_index.teacher_has_parent(self.db, teacher_id, current_user.id):
                     raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You are not associated with this teacher.")
 
-            # Target Check: Student (In-Memory)
+            # Target Check: Student (ids captured at authentication)
             if student_id:
-                if not any(s.id == student_id for s in current_user.students):
+                if student_id not in await self.tuition_log_service.user_service.get_student_ids(current_user):
                     raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You can only view summaries for your own children.")
 
         # 3. Unauthorized Roles (Student, Admin, etc.)
@@ -1253,29 +1333,44 @@ class FinancialSummaryService:
             # 1. Authorize Filtering Rules (Strict Security Check)
             await self._authorize_for_filtering(current_user, parent_id, student_id, teacher_id)
 
+            # 2. Serve from the cache while no write has touched this user's logs
+            filters = (parent_id, student_id, teacher_id)
+            generation, cached = await self.summary_cache.lookup(current_user.id, filters)
+            if cached is not None:
+                if current_user.role == UserRole.PARENT.value:
+                    return finance_models.FinancialSummaryForParent.model_validate_json(cached)
+                return finance_models.FinancialSummaryForTeacher.model_validate_json(cached)
+
             summary_model: Optional[finance_models.FinancialSummaryForParent | finance_models.FinancialSummaryForTeacher] = None
             
-            if current_user.role == UserRole.PARENT.value:
-                if teacher_id:
-                    summary_model = await self._get_summary_for_parent_for_specific_teacher(current_user.id, teacher_id)
-                elif student_id:
-                    summary_model = await self._get_summary_for_parent_for_specific_student(current_user.id, student_id)
-                else:
-                    summary_model = await self._get_summary_for_parent(current_user.id)
+            # 3. Compute the summary in a single SQL statement, on the primary:
+            #    figures read from a lagging replica would be cached under the new generation
+            async with primary_read_session(self.db) as fill_db:
+                reader = self if fill_db is self.db else FinancialSummaryService(
+                    fill_db, self.tuition_log_service, self.summary_cache
+                )
+                if current_user.role == UserRole.PARENT.value:
+                    if teacher_id:
+                        summary_model = await reader._get_parent_summary_sql(current_user.id, teacher_id=teacher_id)
+                    elif student_id:
+                        summary_model = await reader._get_parent_summary_sql(current_user.id, student_id=student_id)
+                    else:
+                        summary_model = await reader._get_parent_summary_sql(current_user.id)
 
-            elif current_user.role == UserRole.TEACHER.value:
-                if parent_id:
-                    summary_model = await self._get_summary_for_teacher_for_specific_parent(current_user.id, parent_id)
-                elif student_id:
-                    summary_model = await self._get_summary_for_teacher_for_specific_student(current_user.id, student_id)
+                elif current_user.role == UserRole.TEACHER.value:
+                    if parent_id:
+                        summary_model = await reader._get_teacher_summary_sql(current_user.id, parent_id=parent_id)
+                    elif student_id:
+                        summary_model = await reader._get_teacher_summary_sql(current_user.id, student_id=student_id)
+                    else:
+                        summary_model = await reader._get_teacher_summary_sql(current_user.id)
                 else:
-                    summary_model = await self._get_summary_for_teacher(current_user.id)
-            else:
-                # This branch is technically unreachable now due to _authorize_for_filtering, 
-                # but good to keep as a fallback safety net.
-                log.warning(f"SECURITY: User {current_user.id} tried to get financial summary. ")
-                raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User role not authorized for financial summaries.")
+                    # This branch is technically unreachable now due to _authorize_for_filtering, 
+                    # but good to keep as a fallback safety net.
+                    log.warning(f"SECURITY: User {current_user.id} tried to get financial summary. ")
+                    raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User role not authorized for financial summaries.")
             
+            await self.summary_cache.store(current_user.id, generation, filters, summary_model.model_dump_json())
             return summary_model
             
         except HTTPException as http_exc:
@@ -1284,6 +1379,208 @@ class FinancialSummaryService:
             log.error(f"Error in get_financial_summary_for_api for user {current_user.id}: {e}", exc_info=True)
             raise
 
+    # --- Summary Engine (single SQL statement) ---
+
+    async def _calculate_summary_totals(
+        self,
+        parent_id: Optional[UUID] = None,
+        teacher_id: Optional[UUID] = None,
+        student_id: Optional[UUID] = None
+    ):
+        """
+        Computes every figure of a financial summary in one SQL statement.
+        Returns a row with: total_due, total_credit, unpaid_charges, unpaid_cost,
+        unpaid_logs and lessons_this_month.
+
+        The scope is every (parent, teacher) wallet matching the given ids (for a
+        student, the wallets their charges are billed to). Logs and payments of a
+        deleted teacher keep a NULL teacher_id: that is one wallet, so wallets are
+        matched with IS NOT DISTINCT FROM. A windowed running sum
+        replays the FIFO allocation of each wallet: with non-negative costs, a charge
+        is unpaid iff it costs something and the running cost through it exceeds
+        the wallet's total payments. Ties are ordered by (start_time, log id, charge id),
+        like the materialized ledger.
+        """
+        active = LogStatusEnum.ACTIVE.value
+        logs = db_models.TuitionLogs
+        charges = db_models.TuitionLogCharges
+        payments = db_models.PaymentLogs
+
+        def in_scope(stmt, parent_col, teacher_col):
+            if parent_id:
+                stmt = stmt.filter(parent_col == parent_id)
+            if teacher_id:
+                stmt = stmt.filter(teacher_col == teacher_id)
+            if student_id:
+                # EXISTS instead of a tuple IN: a deleted teacher's wallet has a NULL teacher_id
+                student_charges, student_logs = aliased(charges), aliased(logs)
+                student_wallet = select(student_charges.id).join(
+                    student_logs, student_logs.id == student_charges.tuition_log_id
+                ).filter(
+                    student_charges.student_id == student_id,
+                    student_logs.status == active,
+                    student_charges.parent_id == parent_col,
+                    student_logs.teacher_id.is_not_distinct_from(teacher_col)
+                )
+                stmt = stmt.filter(student_wallet.exists())
+            return stmt
+
+        # 1. Charges and payments of the wallets in scope
+        scoped_charges = in_scope(
+            select(
+                charges.id.label("charge_id"),
+                charges.tuition_log_id,
+                charges.parent_id,
+                charges.student_id,
+                charges.cost,
+                logs.teacher_id,
+                logs.start_time
+            ).join(logs, logs.id == charges.tuition_log_id).filter(logs.status == active),
+            charges.parent_id, logs.teacher_id
+        ).cte("scoped_charges")
+
+        wallet_paid = in_scope(
+            select(
+                payments.parent_id,
+                payments.teacher_id,
+                func.sum(payments.amount_paid).label("total_paid")
+            ).filter(payments.status == active).group_by(payments.parent_id, payments.teacher_id),
+            payments.parent_id, payments.teacher_id
+        ).cte("wallet_paid")
+
+        wallet_charged = select(
+            scoped_charges.c.parent_id,
+            scoped_charges.c.teacher_id,
+            func.sum(scoped_charges.c.cost).label("total_charged")
+        ).group_by(scoped_charges.c.parent_id, scoped_charges.c.teacher_id).cte("wallet_charged")
+
+        # 2. Balance per wallet (a wallet may have payments but no charges, or vice versa)
+        balance = (
+            func.coalesce(wallet_paid.c.total_paid, 0) - func.coalesce(wallet_charged.c.total_charged, 0)
+        )
+        balance_totals = select(
+            func.coalesce(func.sum(func.greatest(-balance, 0)), 0).label("total_due"),
+            func.coalesce(func.sum(func.greatest(balance, 0)), 0).label("total_credit")
+        ).select_from(
+            wallet_charged.join(
+                wallet_paid,
+                and_(
+                    wallet_charged.c.parent_id == wallet_paid.c.parent_id,
+                    wallet_charged.c.teacher_id.is_not_distinct_from(wallet_paid.c.teacher_id)
+                ),
+                full=True
+            )
+        ).subquery("balance_totals")
+
+        # 3. FIFO replay via running sums per wallet
+        running_charges = select(
+            scoped_charges.c.tuition_log_id,
+            scoped_charges.c.student_id,
+            scoped_charges.c.cost,
+            func.sum(scoped_charges.c.cost).over(
+                partition_by=(scoped_charges.c.parent_id, scoped_charges.c.teacher_id),
+                order_by=(scoped_charges.c.start_time, scoped_charges.c.tuition_log_id, scoped_charges.c.charge_id)
+            ).label("running_cost"),
+            func.coalesce(wallet_paid.c.total_paid, 0).label("total_paid")
+        ).select_from(
+            scoped_charges.outerjoin(
+                wallet_paid,
+                and_(
+                    scoped_charges.c.parent_id == wallet_paid.c.parent_id,
+                    scoped_charges.c.teacher_id.is_not_distinct_from(wallet_paid.c.teacher_id)
+                )
+            )
+        ).cte("running_charges")
+
+        unpaid_totals = select(
+            func.count().label("unpaid_charges"),
+            func.coalesce(func.sum(running_charges.c.cost), 0).label("unpaid_cost"),
+            func.count(running_charges.c.tuition_log_id.distinct()).label("unpaid_logs")
+        ).filter(
+            running_charges.c.cost > 0,
+            running_charges.c.running_cost > running_charges.c.total_paid
+        )
+        if student_id:
+            unpaid_totals = unpaid_totals.filter(running_charges.c.student_id == student_id)
+        unpaid_totals = unpaid_totals.subquery("unpaid_totals")
+
+        # 4. Lessons this month (teacher summaries only)
+        lessons_this_month = literal(0)
+        if teacher_id:
+            month_start = func.date_trunc('month', func.now())
+            month_stmt = select(func.count(logs.id.distinct())).filter(
+                logs.teacher_id == teacher_id,
+                logs.status == active,
+                logs.start_time >= month_start,
+                logs.start_time < (month_start + text("interval '1 month'"))
+            )
+            if parent_id or student_id:
+                month_stmt = month_stmt.join(charges, charges.tuition_log_id == logs.id)
+            if parent_id:
+                month_stmt = month_stmt.filter(charges.parent_id == parent_id)
+            if student_id:
+                month_stmt = month_stmt.filter(charges.student_id == student_id)
+            lessons_this_month = month_stmt.scalar_subquery()
+
+        stmt = select(
+            balance_totals.c.total_due,
+            balance_totals.c.total_credit,
+            unpaid_totals.c.unpaid_charges,
+            unpaid_totals.c.unpaid_cost,
+            unpaid_totals.c.unpaid_logs,
+            lessons_this_month.label("lessons_this_month")
+        ).select_from(balance_totals.join(unpaid_totals, true()))
+
+        return (await self.db.execute(stmt)).one()
+
+    async def _get_parent_summary_sql(
+        self,
+        parent_id: UUID,
+        teacher_id: Optional[UUID] = None,
+        student_id: Optional[UUID] = None
+    ) -> finance_models.FinancialSummaryForParent:
+        """Parent summary from the SQL engine. Credit cannot be attributed to a single student."""
+        if student_id:
+            totals = await self._calculate_summary_totals(student_id=student_id)
+            return finance_models.FinancialSummaryForParent(
+                total_due=totals.unpaid_cost,
+                credit_balance=Decimal(0),
+                unpaid_count=totals.unpaid_charges
+            )
+
+        totals = await self._calculate_summary_totals(parent_id=parent_id, teacher_id=teacher_id)
+        return finance_models.FinancialSummaryForParent(
+            total_due=totals.total_due,
+            credit_balance=totals.total_credit,
+            unpaid_count=totals.unpaid_charges
+        )
+
+    async def _get_teacher_summary_sql(
+        self,
+        teacher_id: UUID,
+        parent_id: Optional[UUID] = None,
+        student_id: Optional[UUID] = None
+    ) -> finance_models.FinancialSummaryForTeacher:
+        """Teacher summary from the SQL engine. Credit cannot be attributed to a single student."""
+        totals = await self._calculate_summary_totals(parent_id=parent_id, teacher_id=teacher_id, student_id=student_id)
+        if student_id:
+            return finance_models.FinancialSummaryForTeacher(
+                total_owed_to_teacher=totals.unpaid_cost,
+                total_credit_held=Decimal(0),
+                total_lessons_given_this_month=totals.lessons_this_month,
+                unpaid_lessons_count=totals.unpaid_charges
+            )
+
+        return finance_models.FinancialSummaryForTeacher(
+            total_owed_to_teacher=totals.total_due,
+            total_credit_held=totals.total_credit,
+            total_lessons_given_this_month=totals.lessons_this_month,
+            unpaid_lessons_count=totals.unpaid_logs
+        )
+
+    # --- Reference Implementation (Python FIFO replay) ---
+    # Not used by the API anymore; kept to check the SQL engine against.
+
     async def _get_summary_for_parent(self, parent_id: UUID) -> finance_models.FinancialSummaryForParent:
         """
         Calculates and returns the summary Pydantic model for a parent.
@@ -0,0 +1,267 @@
+'''
+Background enrichment of new users' timezone and currency from their signup IP.
+
+Signups do not wait for geolocation: unless the location is known offline
+(`GeoService.get_known_location`), the user is created with provisional values
+and queued here.
+1- GeoEnrichmentQueue: request-scoped. Queues the users once the signup's
+   transaction commits.
+2- GeoEnrichmentRunner: one asyncio task per worker. Takes due jobs in batches,
+   resolves each distinct IP once (one ip-api.com batch request), and patches
+   the batch's rows in one transaction. Failed lookups are retried with
+   exponential backoff.
+A patch only applies while the row still holds its provisional value, so an
+edit the user made in the meantime wins. Jobs live in memory: after a restart
+the affected users keep their provisional values.
+'''
+import asyncio
+from dataclasses import dataclass
+from typing import Annotated, Iterable, Optional
+from uuid import UUID
+from fastapi import Depends, HTTPException, status
+from sqlalchemy import bindparam, event, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import engine as db_engine
+from ..database import models as db_models
+from ..database.engine import get_db_session
+from ..common.config import settings
+from ..common.logger import log
+from .geo_service import GeoService
+from .principal_cache import principal_cache
+from .timetable_cache import TimetableCache, get_timetable_cache_backend
+
+PENDING_GEO_ENRICHMENT_KEY = "pending_geo_enrichment"
+
+# Lookup failures worth retrying: the service is down, overloaded or rate limiting us
+RETRYABLE_STATUS_CODES = {status.HTTP_429_TOO_MANY_REQUESTS}
+
+
+@dataclass
+class GeoEnrichmentJob:
+    """One user waiting for the location of their signup IP."""
+    user_id: UUID
+    ip_address: str
+    # The provisional values the row was created with
+    timezone: str
+    currency: Optional[str]  # None for admins (no currency column)
+    attempts: int = 0
+    due_at: float = 0.0  # event loop time
+
+
+class GeoEnrichmentRunner:
+    """Queues, batches and retries geolocation enrichments in the background."""
+
+    def __init__(
+        self,
+        batch_size: int,
+        batch_window_seconds: float,
+        max_attempts: int,
+        backoff_seconds: float,
+        backoff_max_seconds: float
+    ):
+        self.batch_size = batch_size
+        self.batch_window_seconds = batch_window_seconds
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.pending: list[GeoEnrichmentJob] = []
+        self.stats = {"batches": 0, "enriched": 0, "unknown": 0, "retried": 0, "failed": 0}
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Starts the worker task. Called by the app's lifespan."""
+        if self._task is not None:
+            return
+        self._wake = asyncio.Event()
+        if self.pending:
+            self._wake.set()
+        self._task = asyncio.create_task(self._run_forever())
+        log.info("Geolocation enrichment runner started.")
+
+    async def stop(self) -> None:
+        """Stops the worker task. Pending jobs are dropped."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._wake = None
+        if self.pending:
+            log.warning(f"Geolocation enrichment runner stopped with {len(self.pending)} pending users.")
+        log.info("Geolocation enrichment runner stopped.")
+
+    def request(self, jobs: Iterable[GeoEnrichmentJob]) -> None:
+        """Queues jobs, due immediately (they wait for the batch window)."""
+        self.pending.extend(jobs)
+        if self._wake is not None:
+            self._wake.set()
+
+    def status(self) -> dict:
+        return {"pending": len(self.pending), **self.stats}
+
+    def _backoff(self, attempts: int) -> float:
+        return min(self.backoff_seconds * 2 ** (attempts - 1), self.backoff_max_seconds)
+
+    def _take_due(self, now: float) -> list[GeoEnrichmentJob]:
+        due, waiting = [], []
+        for job in self.pending:
+            (due if job.due_at <= now and len(due) < self.batch_size else waiting).append(job)
+        self.pending = waiting
+        return due
+
+    async def _run_forever(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            # Sleep until woken by new jobs or until the earliest retry is due
+            timeout = None
+            if self.pending:
+                timeout = max(min(job.due_at for job in self.pending) - loop.time(), 0)
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except TimeoutError:
+                pass
+            # Let a burst of signups land in the same batch
+            await asyncio.sleep(self.batch_window_seconds)
+            self._wake.clear()
+
+            while batch := self._take_due(loop.time()):
+                await self.run(batch)
+
+    async def run(self, batch: list[GeoEnrichmentJob]) -> None:
+        """Resolves the batch's IPs and patches the rows that have an answer."""
+        self.stats["batches"] += 1
+        log.info(f"Geolocation enrichment of {len(batch)} users started.")
+        try:
+            results = await GeoService().get_locations_info(job.ip_address for job in batch)
+        except Exception as e:
+            log.error(f"Geolocation enrichment lookup failed: {e}", exc_info=True)
+            self._retry(batch)
+            return
+
+        resolved, retry = [], []
+        for job in batch:
+            result = results.get(job.ip_address)
+            if isinstance(result, HTTPException):
+                if result.status_code >= 500 or result.status_code in RETRYABLE_STATUS_CODES:
+                    retry.append(job)
+                else:
+                    # e.g. an address ip-api.com rejects: retrying cannot help
+                    self.stats["failed"] += 1
+                    log.warning(f"Geolocation of user {job.user_id} failed for good: {result.detail}")
+            elif result is None or (not result["timezone"] and not result["currency"]):
+                self.stats["unknown"] += 1
+            else:
+                resolved.append((job, result))
+
+        if resolved:
+            try:
+                await self._apply(resolved)
+                self.stats["enriched"] += len(resolved)
+            except Exception as e:
+                log.error(f"Could not save the geolocation of {len(resolved)} users: {e}", exc_info=True)
+                retry.extend(job for job, _ in resolved)
+        self._retry(retry)
+
+    def _retry(self, jobs: list[GeoEnrichmentJob]) -> None:
+        now = asyncio.get_running_loop().time()
+        for job in jobs:
+            job.attempts += 1
+            if job.attempts >= self.max_attempts:
+                self.stats["failed"] += 1
+                log.error(f"Giving up the geolocation of user {job.user_id} after {job.attempts} attempts.")
+                continue
+            job.due_at = now + self._backoff(job.attempts)
+            self.pending.append(job)
+            self.stats["retried"] += 1
+
+    async def _apply(self, resolved: list[tuple[GeoEnrichmentJob, dict]]) -> None:
+        """Patches timezones and currencies with one statement per table."""
+        if db_engine.AsyncSessionLocal is None:
+            raise RuntimeError("the session factory is not initialized")
+
+        timezone_params = [
+            {"b_id": job.user_id, "b_old": job.timezone, "b_new": result["timezone"]}
+            for job, result in resolved if result["timezone"] and result["timezone"] != job.timezone
+        ]
+        currency_params = [
+            {"b_id": job.user_id, "b_old": job.currency, "b_new": result["currency"]}
+            for job, result in resolved
+            if job.currency is not None and result["currency"] and result["currency"] != job.currency
+        ]
+
+        async with db_engine.AsyncSessionLocal() as session:
+            async with session.begin():
+                if timezone_params:
+                    await session.execute(self._patch(db_models.Users.__table__, "timezone"), timezone_params)
+                if currency_params:
+                    # A user is a parent or a teacher; the other table has no row to match
+                    for table in (db_models.Parents.__table__, db_models.Teachers.__table__):
+                        await session.execute(self._patch(table, "currency"), currency_params)
+        principal_cache.purge(job.user_id for job, _ in resolved)
+        if timezone_params:
+            # Cached calendar feeds are rendered in the user's timezone
+            await TimetableCache(get_timetable_cache_backend()).invalidate()
+
+    @staticmethod
+    def _patch(table, column: str):
+        # Compare-and-set: leaves rows the user has edited since the signup alone
+        return (
+            update(table)
+            .where(table.c.id == bindparam("b_id"), table.c[column] == bindparam("b_old"))
+            .values({column: bindparam("b_new")})
+        )
+
+
+geo_enrichment_runner = GeoEnrichmentRunner(
+    batch_size=settings.GEO_ENRICHMENT_BATCH_SIZE,
+    batch_window_seconds=settings.GEO_ENRICHMENT_BATCH_WINDOW_SECONDS,
+    max_attempts=settings.GEO_ENRICHMENT_MAX_ATTEMPTS,
+    backoff_seconds=settings.GEO_ENRICHMENT_BACKOFF_SECONDS,
+    backoff_max_seconds=settings.GEO_ENRICHMENT_BACKOFF_MAX_SECONDS
+)
+
+
+def get_geo_enrichment_runner() -> GeoEnrichmentRunner:
+    return geo_enrichment_runner
+
+
+class GeoEnrichmentQueue:
+    """
+    Request-scoped entry point for queueing enrichments.
+    Nothing is queued if the request's transaction rolls back.
+    """
+    def __init__(
+        self,
+        db: Annotated[AsyncSession, Depends(get_db_session)],
+        runner: Annotated[GeoEnrichmentRunner, Depends(get_geo_enrichment_runner)]
+    ):
+        self.db = db
+        self.runner = runner
+
+    def enqueue(self, user: db_models.Users, ip_address: str) -> None:
+        """Queues the user, created with provisional timezone (and currency)."""
+        job = GeoEnrichmentJob(
+            user_id=user.id,
+            ip_address=ip_address,
+            timezone=user.timezone,
+            currency=getattr(user, "currency", None)
+        )
+        pending = self.db.info.get(PENDING_GEO_ENRICHMENT_KEY)
+        if pending is None:
+            pending = self.db.info[PENDING_GEO_ENRICHMENT_KEY] = []
+            event.listen(self.db.sync_session, "after_commit", self._flush_pending, once=True)
+            event.listen(self.db.sync_session, "after_rollback", self._drop_pending, once=True)
+        pending.append(job)
+
+    def _flush_pending(self, session) -> None:
+        pending = session.info.pop(PENDING_GEO_ENRICHMENT_KEY, None)
+        if pending:
+            self.runner.request(pending)
+
+    def _drop_pending(self, session) -> None:
+        session.info.pop(PENDING_GEO_ENRICHMENT_KEY, None)
@@ -1,86 +1,432 @@
+'''
+IP geolocation for signups: the timezone and currency of a new user.
+
+Lookups go through the providers named in GEO_PROVIDERS, in order:
+- "local": an offline IP-range table (built by scripts/build_geo_database.py),
+  memory-mapped at startup and searched by bisection. No network, microseconds.
+- "http": ip-api.com through one shared client, for addresses the table does
+  not cover (IPv6, or no table configured). Its batch endpoint serves
+  `get_locations_info`, used by the background enrichment of new users.
+Answers are kept in a per-worker LRU cache keyed by IP address.
+
+Table file layout (little-endian):
+    header      magic (8 bytes), range count, location count, location table size (uint32 each)
+    starts      uint32[range count], sorted first addresses of the ranges
+    ends        uint32[range count], last addresses (inclusive)
+    locations   uint16[range count], index into the location table
+    table       UTF-8 JSON list of [country code, timezone, currency]
+'''
+import array
+import asyncio
+import inspect
+import ipaddress
+import json
+import mmap
+import struct
+import sys
+from bisect import bisect_right
+from pathlib import Path
+from typing import Any, Iterable, NamedTuple, Optional, Protocol, Union
+
 import httpx # Using httpx for async requests
+from cachetools import LRUCache
 from countryinfo import CountryInfo
 from fastapi import HTTPException, status
+
+from ..common.config import settings
 from ..common.logger import log
-import asyncio
-import inspect
 
-class GeoService:
+IPAddress = Union[ipaddress.IPv4Address, ipaddress.IPv6Address]
+
+
+class GeoLocation(NamedTuple):
+    country_code: Optional[str]
+    timezone: Optional[str]
+    currency: Optional[str] = None
+
+
+UNKNOWN_LOCATION = GeoLocation(None, None, None)
+
+
+class GeoProvider(Protocol):
     """
-    Service to handle geolocation lookups based on IP address.
-    Uses ip-api.com for IP to location data and countryinfo for currency.
+    A source of IP locations.
+    `lookup` returns None when it has no answer (the next provider is tried),
+    UNKNOWN_LOCATION when the address has no location (e.g. a reserved range),
+    and raises HTTPException when it fails.
     """
-    IP_API_URL = "http://ip-api.com/json/"
+    name: str
 
-    async def get_location_info(self, ip_address: str) -> dict:
-        """
-        Fetches geolocation information (timezone, country code, currency) for a given IP address.
-        """
-        log.info(f"Fetching geolocation for IP: {ip_address}")
+    async def lookup(self, ip_address: str, address: Optional[IPAddress]) -> Optional[GeoLocation]: ...
+
+
+# --- Local Provider ---
+
+GEO_DATABASE_MAGIC = b"ETGEO1\x00\x00"
+_HEADER = struct.Struct("<8sIII")
+
+
+def write_geo_database(path: Union[str, Path], ranges: Iterable[tuple[int, int, GeoLocation]]) -> int:
+    """
+    Writes an IP-range table from (first, last, location) IPv4 ranges given as integers.
+    Ranges must not overlap. Returns the number of ranges written.
+    """
+    rows = sorted(ranges, key=lambda row: row[0])
+    for previous, current in zip(rows, rows[1:]):
+        if current[0] <= previous[1]:
+            raise ValueError(f"Overlapping ranges starting at {ipaddress.IPv4Address(previous[0])} and {ipaddress.IPv4Address(current[0])}.")
+
+    location_ids: dict[GeoLocation, int] = {}
+    for _, _, location in rows:
+        location_ids.setdefault(GeoLocation(*location), len(location_ids))
+    if len(location_ids) > 0xFFFF:
+        raise ValueError("Too many distinct locations for a uint16 index.")
+
+    starts = array.array("I", (row[0] for row in rows))
+    ends = array.array("I", (row[1] for row in rows))
+    locations = array.array("H", (location_ids[GeoLocation(*row[2])] for row in rows))
+    if sys.byteorder != "little":
+        for column in (starts, ends, locations):
+            column.byteswap()
+    table = json.dumps([list(location) for location in location_ids]).encode()
+
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(GEO_DATABASE_MAGIC, len(rows), len(location_ids), len(table)))
+        f.write(starts.tobytes())
+        f.write(ends.tobytes())
+        f.write(locations.tobytes())
+        f.write(table)
+    return len(rows)
+
+
+class LocalGeoProvider:
+    """
+    Offline lookups in the IP-range table at `path` (IPv4 only).
+    The file is memory-mapped, so the workers of one host share its pages;
+    its location table doubles as the precomputed country -> currency map.
+    """
+    name = "local"
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self._load_attempted = False
+        self._file = None
+        self._mmap: Optional[mmap.mmap] = None
+        # Views into the mapping; all must be released before it can be closed
+        self._views: list[memoryview] = []
+        self._starts = self._ends = self._location_ids = ()
+        self.locations: list[GeoLocation] = []
+        self.currencies: dict[str, str] = {}
+
+    @property
+    def loaded(self) -> bool:
+        return bool(self.locations)
+
+    def load(self) -> bool:
+        """Maps the table (once). Returns False when none is configured or it is unusable."""
+        if self._load_attempted:
+            return self.loaded
+        self._load_attempted = True
+        if not self.path:
+            return False
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{self.IP_API_URL}{ip_address}")
-                response.raise_for_status() # Raise an exception for HTTP errors (4xx or 5xx)
-                data = response.json()
-
-            if data.get("status") == "fail":
-                message = data.get('message', 'Unknown error')
-                if "reserved range" in message.lower():
-                    log.warning(f"Geolocation lookup failed for IP {ip_address} due to 'Reserved Range'.")
-                    timezone = None 
-                    country_code = None
-                    currency = None
-                else:
-                    log.warning(f"Geolocation lookup failed for IP {ip_address}: {message}")
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail=f"Could not determine location for IP address: {ip_address}. Reason: {message}"
-                    )
-
-            timezone = data.get("timezone")
-            country_code = data.get("countryCode")
-
-            # Defensive check for mocking in tests
-            if inspect.isawaitable(country_code):
-                country_code = await country_code
-            if inspect.isawaitable(timezone):
-                timezone = await timezone
-
-
-            if not timezone or not country_code:
-                log.warning(f"Incomplete geolocation data for IP {ip_address}: {data}. Using default timezone 'UTC' and currency 'USD'.")
-                timezone = None
-                country_code = None
-                currency = None
-
-
-            # Use countryinfo to get currency in a separate thread to avoid blocking
-            def get_currency_sync(code: str) -> list:
-                return CountryInfo(code).currencies()
-
-            currencies = await asyncio.to_thread(get_currency_sync, country_code)
-            
-            if not currencies:
-                log.warning(f"Could not determine currency for country code: {country_code}")
-                currency = None
+            self._file = open(self.path, "rb")
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, range_count, location_count, table_size = _HEADER.unpack_from(self._mmap, 0)
+            if magic != GEO_DATABASE_MAGIC:
+                raise ValueError("not a geolocation table")
+
+            view = memoryview(self._mmap)
+            self._views.append(view)
+            offset = _HEADER.size
+            starts = view[offset:offset + 4 * range_count]
+            offset += 4 * range_count
+            ends = view[offset:offset + 4 * range_count]
+            offset += 4 * range_count
+            location_ids = view[offset:offset + 2 * range_count]
+            offset += 2 * range_count
+            self._views += [starts, ends, location_ids]
+            table = json.loads(self._mmap[offset:offset + table_size])
+
+            if sys.byteorder == "little":
+                # Zero-copy: bisection reads the mapped pages directly
+                self._starts, self._ends, self._location_ids = starts.cast("I"), ends.cast("I"), location_ids.cast("H")
+                self._views += [self._starts, self._ends, self._location_ids]
             else:
-                currency = currencies[0] # Take the first currency if multiple are listed
+                self._starts, self._ends, self._location_ids = (
+                    self._swapped("I", starts), self._swapped("I", ends), self._swapped("H", location_ids)
+                )
+            self.locations = [GeoLocation(*location) for location in table]
+            if len(self.locations) != location_count:
+                raise ValueError("truncated location table")
+            self.currencies = {
+                location.country_code: location.currency
+                for location in self.locations if location.country_code and location.currency
+            }
+            log.info(f"Loaded geolocation table {self.path}: {range_count} ranges, {location_count} locations.")
+            return True
+        except Exception as e:
+            log.error(f"Could not load geolocation table {self.path}: {e}. Falling back to the next provider.")
+            self.close()
+            self._load_attempted = True # Do not retry on every lookup
+            return False
+
+    @staticmethod
+    def _swapped(typecode: str, raw: memoryview) -> array.array:
+        values = array.array(typecode, raw)
+        values.byteswap()
+        return values
+
+    def close(self) -> None:
+        """Unmaps the table; the next lookup maps it again."""
+        self._load_attempted = False
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._starts = self._ends = self._location_ids = ()
+        self.locations, self.currencies = [], {}
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def find(self, address: IPAddress) -> Optional[GeoLocation]:
+        if not self.load():
+            return None
+        if isinstance(address, ipaddress.IPv6Address):
+            if address.ipv4_mapped is None:
+                return None
+            address = address.ipv4_mapped
+        value = int(address)
+        index = bisect_right(self._starts, value) - 1
+        if index < 0 or value > self._ends[index]:
+            return None
+        return self.locations[self._location_ids[index]]
+
+    async def lookup(self, ip_address: str, address: Optional[IPAddress]) -> Optional[GeoLocation]:
+        return self.find(address) if address is not None else None
+
+
+# --- HTTP Provider ---
+
+class HttpGeoProvider:
+    """
+    Lookups through ip-api.com.
+    One client (and its connection pool) is shared by all requests of the
+    worker; a new one is opened if the event loop changes (test clients).
+    """
+    name = "http"
+    IP_API_URL = "http://ip-api.com/json/"
+    BATCH_URL = "http://ip-api.com/batch"
+    # ip-api.com accepts at most 100 addresses per batch
+    BATCH_SIZE = 100
+    BATCH_FIELDS = "status,message,countryCode,timezone,query"
+
+    def __init__(self, timeout_seconds: float):
+        self.timeout_seconds = timeout_seconds
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._client = httpx.AsyncClient(timeout=self.timeout_seconds)
+            self._loop = loop
+        return self._client
 
-            log.info(f"Geolocation successful for IP {ip_address}: Timezone={timezone}, Currency={currency}")
-            return {"timezone": timezone, "currency": currency}
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._loop = None
 
+    async def _request(self, description: str, method: str, url: str, **kwargs) -> Any:
+        """Sends one request to ip-api.com and returns its JSON, mapping failures to HTTPException."""
+        try:
+            response = await getattr(self._get_client(), method)(url, **kwargs)
+            response.raise_for_status() # Raise an exception for HTTP errors (4xx or 5xx)
+            return response.json()
         except httpx.RequestError as e:
-            log.error(f"HTTP request failed for geolocation service for IP {ip_address}: {e}", exc_info=True)
+            log.error(f"HTTP request failed for geolocation service for {description}: {e}", exc_info=True)
             raise HTTPException(
                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
                 detail="Geolocation service is currently unavailable. Please Try Again!"
             )
         except httpx.HTTPStatusError as e:
-            log.error(f"Geolocation service returned an error for IP {ip_address}: {e.response.status_code} - {e.response.text}", exc_info=True)
+            log.error(f"Geolocation service returned an error for {description}: {e.response.status_code} - {e.response.text}", exc_info=True)
             raise HTTPException(
                 status_code=e.response.status_code,
                 detail=f"Geolocation service error: {e.response.text}"
             )
+
+    async def _location_from(self, ip_address: str, data: dict) -> GeoLocation:
+        """Reads one ip-api.com answer."""
+        if data.get("status") == "fail":
+            message = data.get('message', 'Unknown error')
+            if "reserved range" in message.lower():
+                log.warning(f"Geolocation lookup failed for IP {ip_address} due to 'Reserved Range'.")
+                return UNKNOWN_LOCATION
+            log.warning(f"Geolocation lookup failed for IP {ip_address}: {message}")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Could not determine location for IP address: {ip_address}. Reason: {message}"
+            )
+
+        timezone = data.get("timezone")
+        country_code = data.get("countryCode")
+
+        # Defensive check for mocking in tests
+        if inspect.isawaitable(country_code):
+            country_code = await country_code
+        if inspect.isawaitable(timezone):
+            timezone = await timezone
+
+        if not timezone or not country_code:
+            log.warning(f"Incomplete geolocation data for IP {ip_address}: {data}.")
+            return UNKNOWN_LOCATION
+        return GeoLocation(country_code, timezone)
+
+    async def lookup(self, ip_address: str, address: Optional[IPAddress]) -> Optional[GeoLocation]:
+        data = await self._request(f"IP {ip_address}", "get", f"{self.IP_API_URL}{ip_address}")
+        return await self._location_from(ip_address, data)
+
+    async def lookup_batch(self, ip_addresses: list[str]) -> dict[str, Union[GeoLocation, HTTPException]]:
+        """
+        Looks up to BATCH_SIZE addresses with one request. Raises HTTPException
+        when the request fails; per-address failures are returned in the result.
+        """
+        data = await self._request(
+            f"a batch of {len(ip_addresses)} IPs",
+            "post",
+            self.BATCH_URL,
+            json=[{"query": ip_address, "fields": self.BATCH_FIELDS} for ip_address in ip_addresses]
+        )
+        results: dict[str, Union[GeoLocation, HTTPException]] = {}
+        for ip_address, item in zip(ip_addresses, data):
+            try:
+                results[ip_address] = await self._location_from(ip_address, item)
+            except HTTPException as e:
+                results[ip_address] = e
+        return results
+
+
+local_geo_provider = LocalGeoProvider(settings.GEO_DATABASE_PATH)
+http_geo_provider = HttpGeoProvider(settings.GEO_HTTP_TIMEOUT_SECONDS)
+GEO_PROVIDERS: dict[str, GeoProvider] = {
+    local_geo_provider.name: local_geo_provider,
+    http_geo_provider.name: http_geo_provider,
+}
+
+# Answers per IP address; only touched from the event loop
+geo_result_cache: LRUCache = LRUCache(maxsize=max(settings.GEO_CACHE_MAX_ENTRIES, 1))
+
+# Currencies of countries not in the local table, read from countryinfo once per country
+_countryinfo_currencies: dict[str, Optional[str]] = {}
+
+
+def load_geo_providers() -> None:
+    """Maps the local table at startup, so the first signup does not pay for it."""
+    if local_geo_provider.name in settings.GEO_PROVIDERS:
+        local_geo_provider.load()
+
+
+async def close_geo_providers() -> None:
+    await http_geo_provider.aclose()
+    local_geo_provider.close()
+
+
+async def country_currency(country_code: str) -> Optional[str]:
+    """The main currency of a country: from the local table, else from countryinfo."""
+    currency = local_geo_provider.currencies.get(country_code)
+    if currency is not None:
+        return currency
+    if country_code not in _countryinfo_currencies:
+        # countryinfo reads its JSON data files; keep that off the event loop
+        def get_currency_sync(code: str) -> Optional[str]:
+            currencies = CountryInfo(code).currencies()
+            return currencies[0] if currencies else None # Take the first currency if multiple are listed
+
+        _countryinfo_currencies[country_code] = await asyncio.to_thread(get_currency_sync, country_code)
+    return _countryinfo_currencies[country_code]
+
+
+class GeoService:
+    """
+    Service to handle geolocation lookups based on IP address.
+    Tries the configured providers in order (see module docstring).
+    """
+    IP_API_URL = HttpGeoProvider.IP_API_URL
+
+    def __init__(self):
+        self.providers: list[GeoProvider] = [GEO_PROVIDERS[name] for name in settings.GEO_PROVIDERS]
+
+    @staticmethod
+    def _parse(ip_address: str) -> Optional[IPAddress]:
+        # The HTTP API also accepts what we cannot parse (e.g. host names)
+        try:
+            return ipaddress.ip_address(ip_address)
+        except ValueError:
+            return None
+
+    async def _complete(self, ip_address: str, location: GeoLocation) -> dict:
+        """Adds the currency of the country and caches the answer."""
+        currency = location.currency
+        if currency is None and location.country_code:
+            currency = await country_currency(location.country_code)
+            if currency is None:
+                log.warning(f"Could not determine currency for country code: {location.country_code}")
+
+        result = {"timezone": location.timezone, "currency": currency}
+        geo_result_cache[ip_address] = result
+        log.info(f"Geolocation successful for IP {ip_address}: Timezone={location.timezone}, Currency={currency}")
+        return dict(result)
+
+    def get_known_location(self, ip_address: str) -> Optional[dict]:
+        """
+        The location of `ip_address` if it is known without a network call
+        (result cache or local table), else None.
+        """
+        cached = geo_result_cache.get(ip_address)
+        if cached is not None:
+            return dict(cached)
+        if local_geo_provider not in self.providers:
+            return None
+        address = self._parse(ip_address)
+        location = local_geo_provider.find(address) if address is not None else None
+        if location is None or location.currency is None:
+            return None
+        result = {"timezone": location.timezone, "currency": location.currency}
+        geo_result_cache[ip_address] = result
+        return dict(result)
+
+    async def get_location_info(self, ip_address: str) -> dict:
+        """
+        Fetches geolocation information (timezone, currency) for a given IP address.
+        """
+        log.info(f"Fetching geolocation for IP: {ip_address}")
+        cached = geo_result_cache.get(ip_address)
+        if cached is not None:
+            return dict(cached)
+
+        try:
+            # 1. Parse once for the local table
+            address = self._parse(ip_address)
+
+            # 2. First provider with an answer wins
+            location = None
+            for provider in self.providers:
+                location = await provider.lookup(ip_address, address)
+                if location is not None:
+                    break
+            if location is None:
+                log.warning(f"No geolocation provider knows IP {ip_address}.")
+                location = UNKNOWN_LOCATION
+
+            # 3. Currency of the country
+            return await self._complete(ip_address, location)
+
         except HTTPException:
             # Re-raise HTTPException to ensure it's not caught by the generic exception handler
             raise
@@ -90,3 +436,48 @@ class GeoService:
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="An unexpected error occurred during geolocation."
             )
+
+    async def get_locations_info(self, ip_addresses: Iterable[str]) -> dict[str, Union[dict, HTTPException]]:
+        """
+        Batch variant of get_location_info (used by the background enrichment).
+        Known addresses are answered offline, the rest with one ip-api.com
+        request per HttpGeoProvider.BATCH_SIZE addresses.
+        Failures are returned per address instead of raised.
+        """
+        results: dict[str, Union[dict, HTTPException]] = {}
+        remaining = []
+        for ip_address in dict.fromkeys(ip_addresses):
+            known = self.get_known_location(ip_address)
+            if known is not None:
+                results[ip_address] = known
+            else:
+                remaining.append(ip_address)
+
+        if http_geo_provider not in self.providers:
+            # Only the local table is configured: what it does not know stays unknown
+            for ip_address in remaining:
+                results[ip_address] = await self._complete(ip_address, UNKNOWN_LOCATION)
+            return results
+
+        log.info(f"Fetching geolocation for {len(remaining)} IPs.")
+        size = HttpGeoProvider.BATCH_SIZE
+        for chunk in (remaining[i:i + size] for i in range(0, len(remaining), size)):
+            try:
+                locations = await http_geo_provider.lookup_batch(chunk)
+            except HTTPException as e:
+                results.update({ip_address: e for ip_address in chunk})
+                continue
+            except Exception as e:
+                log.error(f"An unexpected error occurred during batch geolocation: {e}", exc_info=True)
+                results.update({ip_address: HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail="An unexpected error occurred during geolocation."
+                ) for ip_address in chunk})
+                continue
+            for ip_address in chunk:
+                location = locations.get(ip_address, UNKNOWN_LOCATION)
+                if isinstance(location, HTTPException):
+                    results[ip_address] = location
+                else:
+                    results[ip_address] = await self._complete(ip_address, location)
+        return results
@@ -0,0 +1,666 @@
+'''
+Materialized FIFO payment ledger.
+
+The ledger keeps two things in sync with the tuition and payment logs:
+- `ledger_charge_statuses`: the paid status of every charge of an ACTIVE log,
+  both from the teacher's point of view (per-(parent, teacher) wallet) and from
+  the parent's point of view (one wallet pooled across all teachers).
+- `ledger_wallets`: one wallet cursor per (parent, teacher) relationship.
+- `ledger_parent_wallets`: one wallet cursor per parent (the pooled wallet).
+
+The write methods of TuitionLogService and PaymentLogService call the hooks in
+this service, so reads become indexed lookups instead of a full FIFO replay.
+The allocation rules are the same as `TuitionLogService._calculate_teacher_ledger`
+and `TuitionLogService._calculate_parent_ledger`, which stay as the reference
+implementation (see `scripts/rebuild_ledger.py --verify`).
+'''
+from typing import Annotated, Optional
+from collections import defaultdict
+from uuid import UUID
+from decimal import Decimal
+from fastapi import Depends
+from sqlalchemy import select, func, update, delete, insert, and_, tuple_, literal, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database.engine import get_db_session
+from ..database import models as db_models
+from ..database.db_enums import LogStatusEnum, PaidStatus
+from ..common.logger import log
+
+# Arbitrary namespace of the per-parent advisory locks (the key is taken from the parent id)
+LEDGER_LOCK_NAMESPACE = 73_162
+
+
+class LedgerService:
+    """
+    Service that maintains and reads the materialized payment ledger.
+    It never commits; the request's session dependency does.
+    """
+    def __init__(self, db: Annotated[AsyncSession, Depends(get_db_session)]):
+        self.db = db
+
+    # --- 1. Read Methods ---
+
+    async def get_teacher_ledger(self, log_ids: list[UUID]) -> dict[tuple[UUID, UUID], PaidStatus]:
+        """
+        Returns the teacher-side paid status of the given logs.
+        Same shape as `_calculate_teacher_ledger`: {(log_id, student_id): PaidStatus}
+        """
+        if not log_ids:
+            return {}
+        stmt = select(
+            db_models.LedgerChargeStatuses.tuition_log_id,
+            db_models.LedgerChargeStatuses.student_id,
+            db_models.LedgerChargeStatuses.paid_in_teacher_ledger
+        ).filter(db_models.LedgerChargeStatuses.tuition_log_id.in_(log_ids))
+
+        result = await self.db.execute(stmt)
+        return {
+            (row.tuition_log_id, row.student_id): PaidStatus.PAID if row.paid_in_teacher_ledger else PaidStatus.UNPAID
+            for row in result
+        }
+
+    async def get_parent_ledger(self, parent_id: UUID, log_ids: list[UUID]) -> dict[UUID, PaidStatus]:
+        """
+        Returns the parent-side paid status of the given logs.
+        Same shape as `_calculate_parent_ledger`: {log_id: PaidStatus}
+        """
+        if not log_ids:
+            return {}
+        stmt = select(
+            db_models.LedgerChargeStatuses.tuition_log_id,
+            func.bool_and(db_models.LedgerChargeStatuses.paid_in_parent_ledger).label("is_paid")
+        ).filter(
+            db_models.LedgerChargeStatuses.parent_id == parent_id,
+            db_models.LedgerChargeStatuses.tuition_log_id.in_(log_ids)
+        ).group_by(db_models.LedgerChargeStatuses.tuition_log_id)
+
+        result = await self.db.execute(stmt)
+        return {
+            row.tuition_log_id: PaidStatus.PAID if row.is_paid else PaidStatus.UNPAID
+            for row in result
+        }
+
+    # --- 1b. Single-Log Point Queries ---
+    #
+    # Under FIFO with a drained wallet, every charge is paid until the first
+    # unpaid one, after which the wallet stays at 0. So a charge is paid iff it
+    # costs nothing, or the running total of charges up to and including it
+    # does not exceed the total paid. One aggregate answers that for one log,
+    # independent of how much history precedes it.
+
+    def _charges_through(self, log_obj: db_models.TuitionLogs, inclusive: bool):
+        """Filter for ACTIVE logs ordered before (or up to) `log_obj` in ledger order."""
+        position = tuple_(db_models.TuitionLogs.start_time, db_models.TuitionLogs.id)
+        this_log = tuple_(literal(log_obj.start_time), literal(log_obj.id))
+        return and_(
+            db_models.TuitionLogs.status == LogStatusEnum.ACTIVE.value,
+            position <= this_log if inclusive else position < this_log
+        )
+
+    async def get_parent_status_for_log(self, parent_id: UUID, log_obj: db_models.TuitionLogs) -> PaidStatus:
+        """Parent-side paid status of one log from cumulative sums (one statement)."""
+        if log_obj.status != LogStatusEnum.ACTIVE.value:
+            return PaidStatus.UNPAID
+
+        my_cost = sum((c.cost for c in log_obj.tuition_log_charges if c.parent_id == parent_id), Decimal(0))
+        if my_cost == 0:
+            return PaidStatus.PAID
+
+        total_paid = select(func.coalesce(func.sum(db_models.PaymentLogs.amount_paid), 0)).filter(
+            db_models.PaymentLogs.parent_id == parent_id,
+            db_models.PaymentLogs.status == LogStatusEnum.ACTIVE.value
+        ).scalar_subquery()
+
+        charged_through = select(func.coalesce(func.sum(db_models.TuitionLogCharges.cost), 0)).join(
+            db_models.TuitionLogs,
+            db_models.TuitionLogs.id == db_models.TuitionLogCharges.tuition_log_id
+        ).filter(
+            db_models.TuitionLogCharges.parent_id == parent_id,
+            self._charges_through(log_obj, inclusive=True)
+        ).scalar_subquery()
+
+        row = (await self.db.execute(select(total_paid.label("paid"), charged_through.label("charged")))).one()
+        return PaidStatus.PAID if row.charged <= row.paid else PaidStatus.UNPAID
+
+    async def get_teacher_statuses_for_log(self, log_obj: db_models.TuitionLogs) -> dict[tuple[UUID, UUID], PaidStatus]:
+        """
+        Teacher-side paid status of every charge of one log from cumulative sums.
+        One statement returns, per parent in the log, what they paid this teacher
+        and what was charged before this log; the log's own charges are then
+        walked in ledger order (by charge id).
+        """
+        if log_obj.status != LogStatusEnum.ACTIVE.value or not log_obj.teacher_id:
+            return {(log_obj.id, c.student_id): PaidStatus.UNPAID for c in log_obj.tuition_log_charges}
+
+        parent_ids = list({c.parent_id for c in log_obj.tuition_log_charges})
+        if not parent_ids:
+            return {}
+        parents = db_models.Parents.__table__
+
+        total_paid = select(func.coalesce(func.sum(db_models.PaymentLogs.amount_paid), 0)).filter(
+            db_models.PaymentLogs.parent_id == parents.c.id,
+            db_models.PaymentLogs.teacher_id == log_obj.teacher_id,
+            db_models.PaymentLogs.status == LogStatusEnum.ACTIVE.value
+        ).correlate(parents).scalar_subquery()
+
+        charged_before = select(func.coalesce(func.sum(db_models.TuitionLogCharges.cost), 0)).join(
+            db_models.TuitionLogs,
+            db_models.TuitionLogs.id == db_models.TuitionLogCharges.tuition_log_id
+        ).filter(
+            db_models.TuitionLogCharges.parent_id == parents.c.id,
+            db_models.TuitionLogs.teacher_id == log_obj.teacher_id,
+            self._charges_through(log_obj, inclusive=False)
+        ).correlate(parents).scalar_subquery()
+
+        stmt = select(
+            parents.c.id,
+            total_paid.label("paid"),
+            charged_before.label("charged")
+        ).filter(parents.c.id.in_(parent_ids))
+        running = {row.id: (row.paid, row.charged) for row in await self.db.execute(stmt)}
+
+        statuses = {}
+        for charge in sorted(log_obj.tuition_log_charges, key=lambda c: c.id):
+            paid, charged = running.get(charge.parent_id, (Decimal(0), Decimal(0)))
+            charged += charge.cost
+            running[charge.parent_id] = (paid, charged)
+            is_paid = charge.cost == 0 or charged <= paid
+            statuses[(log_obj.id, charge.student_id)] = PaidStatus.PAID if is_paid else PaidStatus.UNPAID
+        return statuses
+
+    # --- 2. Write Hooks ---
+
+    async def record_tuition_log(self, log_obj: db_models.TuitionLogs) -> None:
+        """
+        Adds the charges of a newly created ACTIVE log to the ledger.
+        Expects `log_obj.tuition_log_charges` to be loaded and flushed.
+        """
+        log.info(f"Recording tuition log {log_obj.id} in the ledger.")
+        try:
+            charges = log_obj.tuition_log_charges
+            if not charges:
+                return
+
+            # 1. Insert the charge rows (unpaid until allocated)
+            await self.db.execute(insert(db_models.LedgerChargeStatuses), [
+                {
+                    "charge_id": c.id,
+                    "tuition_log_id": log_obj.id,
+                    "teacher_id": log_obj.teacher_id,
+                    "parent_id": c.parent_id,
+                    "student_id": c.student_id,
+                    "start_time": log_obj.start_time,
+                    "cost": c.cost,
+                    "paid_in_teacher_ledger": False,
+                    "paid_in_parent_ledger": False
+                }
+                for c in charges
+            ])
+
+            # 2. Allocate per parent. Sorted to keep a stable lock order.
+            charges_by_parent = defaultdict(list)
+            for c in charges:
+                charges_by_parent[c.parent_id].append(c)
+
+            for parent_id in sorted(charges_by_parent):
+                await self._lock_parent(parent_id)
+                if log_obj.teacher_id:
+                    await self._append_to_pair(parent_id, log_obj, charges_by_parent[parent_id])
+                await self._append_to_parent(parent_id, log_obj, charges_by_parent[parent_id])
+
+            await self.db.flush()
+        except Exception as e:
+            log.error(f"Error recording tuition log {log_obj.id} in the ledger: {e}", exc_info=True)
+            raise
+
+    async def remove_tuition_log(self, log_id: UUID) -> None:
+        """Removes a (now VOID) log from the ledger and re-allocates the affected wallets."""
+        log.info(f"Removing tuition log {log_id} from the ledger.")
+        try:
+            # 1. Find the affected relationships before deleting
+            pairs_stmt = select(
+                db_models.LedgerChargeStatuses.parent_id,
+                db_models.LedgerChargeStatuses.teacher_id
+            ).filter(db_models.LedgerChargeStatuses.tuition_log_id == log_id).distinct()
+            pairs = (await self.db.execute(pairs_stmt)).all()
+            if not pairs:
+                return
+
+            # 2. Delete the charge rows
+            await self.db.execute(
+                delete(db_models.LedgerChargeStatuses).where(
+                    db_models.LedgerChargeStatuses.tuition_log_id == log_id
+                )
+            )
+
+            # 3. Re-allocate
+            for parent_id, teacher_id in sorted(pairs, key=lambda p: p[0]):
+                await self._lock_parent(parent_id)
+                if teacher_id:
+                    wallet, _ = await self._get_wallet(parent_id, teacher_id)
+                    await self._replay_pair(wallet)
+                await self._replay_parent(parent_id)
+
+            await self.db.flush()
+        except Exception as e:
+            log.error(f"Error removing tuition log {log_id} from the ledger: {e}", exc_info=True)
+            raise
+
+    async def record_payment_change(self, parent_id: UUID, teacher_id: Optional[UUID]) -> None:
+        """
+        Re-syncs a wallet after a payment log for (parent, teacher) was created or voided.
+        A payment changes what earlier charges were covered, so the pair is replayed.
+        """
+        log.info(f"Recording payment change for parent {parent_id} and teacher {teacher_id} in the ledger.")
+        try:
+            await self._lock_parent(parent_id)
+            if teacher_id:
+                wallet, _ = await self._get_wallet(parent_id, teacher_id)
+                wallet.total_paid = await self._sum_payments(parent_id, teacher_id)
+                await self._replay_pair(wallet)
+            await self._replay_parent(parent_id)
+            await self.db.flush()
+        except Exception as e:
+            log.error(f"Error recording payment change for parent {parent_id}: {e}", exc_info=True)
+            raise
+
+    # --- 2b. User Deletions ---
+    #
+    # Deleting a student cascades its charges (and their ledger rows); deleting a
+    # teacher cascades its wallets and detaches its payments. Neither goes
+    # through the hooks above, so the user services collect the affected pairs
+    # before the delete and re-sync them after the flush.
+
+    async def pairs_of_student(self, student_id: UUID) -> list[tuple[UUID, Optional[UUID]]]:
+        """The (parent, teacher) pairs holding charges of a student."""
+        stmt = select(
+            db_models.LedgerChargeStatuses.parent_id,
+            db_models.LedgerChargeStatuses.teacher_id
+        ).filter(db_models.LedgerChargeStatuses.student_id == student_id).distinct()
+        return [(row.parent_id, row.teacher_id) for row in await self.db.execute(stmt)]
+
+    async def pairs_of_teacher(self, teacher_id: UUID) -> list[tuple[UUID, Optional[UUID]]]:
+        """The parents with a wallet or a payment for a teacher, paired with no teacher (its wallets go with it)."""
+        wallets = select(db_models.LedgerWallets.parent_id).filter(
+            db_models.LedgerWallets.teacher_id == teacher_id
+        )
+        payments = select(db_models.PaymentLogs.parent_id).filter(
+            db_models.PaymentLogs.teacher_id == teacher_id
+        )
+        parent_ids = (await self.db.execute(wallets.union(payments))).scalars().all()
+        return [(parent_id, None) for parent_id in parent_ids]
+
+    async def resync_pairs(self, pairs: list[tuple[UUID, Optional[UUID]]]) -> None:
+        """Replays the given pairs' existing wallets and their parents."""
+        teachers_by_parent = defaultdict(set)
+        for parent_id, teacher_id in pairs:
+            teachers_by_parent[parent_id].add(teacher_id)
+        if not teachers_by_parent:
+            return
+        log.info(f"Re-syncing the ledger of {len(teachers_by_parent)} parents after a user deletion.")
+        try:
+            for parent_id in sorted(teachers_by_parent):
+                await self._lock_parent(parent_id)
+                teacher_ids = [t for t in teachers_by_parent[parent_id] if t]
+                if teacher_ids:
+                    # Only wallets that survived the delete; none is created for a deleted teacher
+                    stmt = select(db_models.LedgerWallets).filter(
+                        db_models.LedgerWallets.parent_id == parent_id,
+                        db_models.LedgerWallets.teacher_id.in_(teacher_ids)
+                    ).with_for_update().execution_options(populate_existing=True)
+                    for wallet in (await self.db.execute(stmt)).scalars().all():
+                        await self._replay_pair(wallet)
+                await self._replay_parent(parent_id)
+
+            await self.db.flush()
+        except Exception as e:
+            log.error(f"Error re-syncing the ledger after a user deletion: {e}", exc_info=True)
+            raise
+
+    # --- 3. Rebuild ---
+
+    async def rebuild(self) -> dict[str, int]:
+        """
+        Drops and recomputes the whole ledger from the tuition and payment logs.
+        Used after migrations, after seeding, and to repair drift.
+        Returns row counts for reporting.
+        """
+        log.info("Rebuilding the materialized payment ledger.")
+        try:
+            # 1. Wipe
+            await self.db.execute(delete(db_models.LedgerChargeStatuses))
+            await self.db.execute(delete(db_models.LedgerWallets))
+            await self.db.execute(delete(db_models.LedgerParentWallets))
+
+            # 2. Charge rows of every ACTIVE log
+            charges_select = select(
+                db_models.TuitionLogCharges.id,
+                db_models.TuitionLogCharges.tuition_log_id,
+                db_models.TuitionLogs.teacher_id,
+                db_models.TuitionLogCharges.parent_id,
+                db_models.TuitionLogCharges.student_id,
+                db_models.TuitionLogs.start_time,
+                db_models.TuitionLogCharges.cost
+            ).join(
+                db_models.TuitionLogs,
+                db_models.TuitionLogs.id == db_models.TuitionLogCharges.tuition_log_id
+            ).filter(db_models.TuitionLogs.status == LogStatusEnum.ACTIVE.value)
+
+            await self.db.execute(
+                insert(db_models.LedgerChargeStatuses).from_select(
+                    ['charge_id', 'tuition_log_id', 'teacher_id', 'parent_id', 'student_id', 'start_time', 'cost'],
+                    charges_select
+                )
+            )
+
+            # 3. One wallet per relationship that has charges or payments
+            payments_stmt = select(
+                db_models.PaymentLogs.parent_id,
+                db_models.PaymentLogs.teacher_id,
+                func.sum(db_models.PaymentLogs.amount_paid).label("total_paid")
+            ).filter(
+                db_models.PaymentLogs.status == LogStatusEnum.ACTIVE.value,
+                db_models.PaymentLogs.teacher_id.is_not(None)
+            ).group_by(db_models.PaymentLogs.parent_id, db_models.PaymentLogs.teacher_id)
+            paid_map = {
+                (row.parent_id, row.teacher_id): row.total_paid
+                for row in await self.db.execute(payments_stmt)
+            }
+
+            pairs_stmt = select(
+                db_models.LedgerChargeStatuses.parent_id,
+                db_models.LedgerChargeStatuses.teacher_id
+            ).filter(db_models.LedgerChargeStatuses.teacher_id.is_not(None)).distinct()
+            all_pairs = set(paid_map.keys()) | {(p, t) for p, t in (await self.db.execute(pairs_stmt)).all()}
+
+            if all_pairs:
+                await self.db.execute(insert(db_models.LedgerWallets), [
+                    {
+                        "parent_id": parent_id,
+                        "teacher_id": teacher_id,
+                        "total_paid": paid_map.get((parent_id, teacher_id), Decimal(0)),
+                        "total_charged": Decimal(0),
+                        "remaining_balance": Decimal(0)
+                    }
+                    for parent_id, teacher_id in all_pairs
+                ])
+
+            # 4. Replay every wallet and every parent
+            wallets = (await self.db.execute(select(db_models.LedgerWallets))).scalars().all()
+            for wallet in wallets:
+                await self._replay_pair(wallet)
+
+            parents_stmt = select(db_models.LedgerChargeStatuses.parent_id).distinct()
+            parent_ids = (await self.db.execute(parents_stmt)).scalars().all()
+            for parent_id in parent_ids:
+                await self._replay_parent(parent_id)
+
+            await self.db.flush()
+
+            counts = {"wallets": len(wallets), "parents": len(parent_ids)}
+            log.info(f"Ledger rebuilt: {counts}")
+            return counts
+        except Exception as e:
+            log.error(f"Error rebuilding the ledger: {e}", exc_info=True)
+            raise
+
+    # --- 4. Internal Allocation Helpers ---
+
+    async def _lock_parent(self, parent_id: UUID) -> None:
+        """
+        Serializes ledger writes for one parent, until the transaction ends.
+        An advisory lock exists even before the parent's first wallet, so
+        concurrent writes by different teachers cannot replay the pooled
+        parent wallet from stale data.
+        """
+        await self.db.execute(
+            text("SELECT pg_advisory_xact_lock(:namespace, :key)"),
+            {"namespace": LEDGER_LOCK_NAMESPACE, "key": int.from_bytes(parent_id.bytes[:4], "big", signed=True)}
+        )
+
+    async def _get_wallet(self, parent_id: UUID, teacher_id: UUID) -> tuple[db_models.LedgerWallets, bool]:
+        """
+        Fetches (creating if missing) and locks the wallet of a (parent, teacher) pair.
+        Returns (wallet, created). A created wallet has no cursor yet: callers
+        appending charges must replay it, as the pair may already have charges.
+        """
+        # A new wallet starts from the payments already on record for the pair
+        paid_subquery = select(
+            func.coalesce(func.sum(db_models.PaymentLogs.amount_paid), 0)
+        ).filter(
+            db_models.PaymentLogs.parent_id == parent_id,
+            db_models.PaymentLogs.teacher_id == teacher_id,
+            db_models.PaymentLogs.status == LogStatusEnum.ACTIVE.value
+        ).scalar_subquery()
+
+        inserted = await self.db.execute(
+            pg_insert(db_models.LedgerWallets).values(
+                parent_id=parent_id,
+                teacher_id=teacher_id,
+                total_paid=paid_subquery,
+                remaining_balance=paid_subquery
+            ).on_conflict_do_nothing(
+                index_elements=['parent_id', 'teacher_id']
+            ).returning(db_models.LedgerWallets.parent_id)
+        )
+        created = inserted.first() is not None
+        stmt = select(db_models.LedgerWallets).filter(
+            db_models.LedgerWallets.parent_id == parent_id,
+            db_models.LedgerWallets.teacher_id == teacher_id
+        ).with_for_update().execution_options(populate_existing=True)
+        return (await self.db.execute(stmt)).scalar_one(), created
+
+    async def _get_parent_wallet(self, parent_id: UUID) -> tuple[db_models.LedgerParentWallets, bool]:
+        """Fetches (creating if missing) the pooled wallet of a parent. Returns (wallet, created)."""
+        paid_subquery = select(
+            func.coalesce(func.sum(db_models.PaymentLogs.amount_paid), 0)
+        ).filter(
+            db_models.PaymentLogs.parent_id == parent_id,
+            db_models.PaymentLogs.status == LogStatusEnum.ACTIVE.value
+        ).scalar_subquery()
+
+        inserted = await self.db.execute(
+            pg_insert(db_models.LedgerParentWallets).values(
+                parent_id=parent_id,
+                total_paid=paid_subquery,
+                remaining_balance=paid_subquery
+            ).on_conflict_do_nothing(
+                index_elements=['parent_id']
+            ).returning(db_models.LedgerParentWallets.parent_id)
+        )
+        created = inserted.first() is not None
+        stmt = select(db_models.LedgerParentWallets).filter(
+            db_models.LedgerParentWallets.parent_id == parent_id
+        ).execution_options(populate_existing=True)
+        return (await self.db.execute(stmt)).scalar_one(), created
+
+    async def _sum_payments(self, parent_id: UUID, teacher_id: Optional[UUID] = None) -> Decimal:
+        """Sum of ACTIVE payments by a parent, optionally to one teacher only."""
+        stmt = select(func.sum(db_models.PaymentLogs.amount_paid)).filter(
+            db_models.PaymentLogs.parent_id == parent_id,
+            db_models.PaymentLogs.status == LogStatusEnum.ACTIVE.value
+        )
+        if teacher_id:
+            stmt = stmt.filter(db_models.PaymentLogs.teacher_id == teacher_id)
+        return (await self.db.execute(stmt)).scalar() or Decimal(0)
+
+    async def _append_to_pair(
+        self,
+        parent_id: UUID,
+        log_obj: db_models.TuitionLogs,
+        charges: list[db_models.TuitionLogCharges]
+    ) -> None:
+        """
+        Allocates the charges of a new log for one (parent, teacher) pair.
+        If the log is after the wallet cursor (the usual case) the allocation
+        continues from the remaining balance. A back-dated log, or the first log
+        of a new wallet, replays the pair.
+        """
+        wallet, created = await self._get_wallet(parent_id, log_obj.teacher_id)
+        new_cost = sum((c.cost for c in charges), Decimal(0))
+
+        is_after_cursor = (
+            wallet.cursor_start_time is None
+            or (log_obj.start_time, log_obj.id) > (wallet.cursor_start_time, wallet.cursor_log_id)
+        )
+        if created or not is_after_cursor:
+            await self._replay_pair(wallet)
+            return
+
+        remaining = wallet.remaining_balance
+        paid_ids = []
+        for charge in sorted(charges, key=lambda c: c.id):
+            if remaining >= charge.cost:
+                paid_ids.append(charge.id)
+                remaining -= charge.cost
+            else:
+                remaining = max(Decimal(0), remaining - charge.cost)
+
+        await self._set_statuses(db_models.LedgerChargeStatuses.paid_in_teacher_ledger, paid_ids, [])
+
+        wallet.total_charged += new_cost
+        wallet.remaining_balance = remaining
+        wallet.cursor_start_time = log_obj.start_time
+        wallet.cursor_log_id = log_obj.id
+        wallet.updated_at = func.now()
+
+    async def _replay_pair(self, wallet: db_models.LedgerWallets) -> None:
+        """Re-runs the FIFO allocation of one (parent, teacher) wallet from its charge rows."""
+        stmt = select(
+            db_models.LedgerChargeStatuses.charge_id,
+            db_models.LedgerChargeStatuses.tuition_log_id,
+            db_models.LedgerChargeStatuses.start_time,
+            db_models.LedgerChargeStatuses.cost,
+            db_models.LedgerChargeStatuses.paid_in_teacher_ledger
+        ).filter(
+            db_models.LedgerChargeStatuses.parent_id == wallet.parent_id,
+            db_models.LedgerChargeStatuses.teacher_id == wallet.teacher_id
+        ).order_by(
+            db_models.LedgerChargeStatuses.start_time.asc(),
+            db_models.LedgerChargeStatuses.tuition_log_id.asc(),
+            db_models.LedgerChargeStatuses.charge_id.asc()
+        )
+        rows = (await self.db.execute(stmt)).all()
+
+        remaining = wallet.total_paid
+        total_charged = Decimal(0)
+        to_paid, to_unpaid = [], []
+        for row in rows:
+            total_charged += row.cost
+            if remaining >= row.cost:
+                is_paid = True
+                remaining -= row.cost
+            else:
+                is_paid = False
+                remaining = max(Decimal(0), remaining - row.cost)
+
+            if is_paid != row.paid_in_teacher_ledger:
+                (to_paid if is_paid else to_unpaid).append(row.charge_id)
+
+        await self._set_statuses(db_models.LedgerChargeStatuses.paid_in_teacher_ledger, to_paid, to_unpaid)
+
+        wallet.total_charged = total_charged
+        wallet.remaining_balance = remaining
+        wallet.cursor_start_time = rows[-1].start_time if rows else None
+        wallet.cursor_log_id = rows[-1].tuition_log_id if rows else None
+        wallet.updated_at = func.now()
+
+    async def _append_to_parent(
+        self,
+        parent_id: UUID,
+        log_obj: db_models.TuitionLogs,
+        charges: list[db_models.TuitionLogCharges]
+    ) -> None:
+        """
+        Allocates the parent's charges of a new log from the pooled wallet.
+        Same cursor rules as `_append_to_pair`: a log after the cursor is paid
+        from the remaining balance, otherwise the parent is replayed.
+        """
+        wallet, created = await self._get_parent_wallet(parent_id)
+
+        is_after_cursor = (
+            wallet.cursor_start_time is None
+            or (log_obj.start_time, log_obj.id) > (wallet.cursor_start_time, wallet.cursor_log_id)
+        )
+        if created or not is_after_cursor:
+            await self._replay_parent(parent_id)
+            return
+
+        my_cost = sum((c.cost for c in charges), Decimal(0))
+        if wallet.remaining_balance >= my_cost:
+            await self._set_statuses(db_models.LedgerChargeStatuses.paid_in_parent_ledger, [c.id for c in charges], [])
+            wallet.remaining_balance -= my_cost
+        else:
+            wallet.remaining_balance = Decimal(0)
+
+        wallet.total_charged += my_cost
+        wallet.cursor_start_time = log_obj.start_time
+        wallet.cursor_log_id = log_obj.id
+        wallet.updated_at = func.now()
+
+    async def _replay_parent(self, parent_id: UUID) -> None:
+        """
+        Re-runs the FIFO allocation of the parent's pooled wallet.
+        A log is paid for the parent when the wallet covers the parent's total
+        cost in that log. Only rows whose status changed are written.
+        """
+        parent_wallet, _ = await self._get_parent_wallet(parent_id)
+        parent_wallet.total_paid = wallet = await self._sum_payments(parent_id)
+
+        stmt = select(
+            db_models.LedgerChargeStatuses.charge_id,
+            db_models.LedgerChargeStatuses.tuition_log_id,
+            db_models.LedgerChargeStatuses.start_time,
+            db_models.LedgerChargeStatuses.cost,
+            db_models.LedgerChargeStatuses.paid_in_parent_ledger
+        ).filter(
+            db_models.LedgerChargeStatuses.parent_id == parent_id
+        ).order_by(
+            db_models.LedgerChargeStatuses.start_time.asc(),
+            db_models.LedgerChargeStatuses.tuition_log_id.asc()
+        )
+        rows = (await self.db.execute(stmt)).all()
+
+        # Group consecutive rows into logs, preserving chronological order
+        logs_in_order: list[list] = []
+        for row in rows:
+            if logs_in_order and logs_in_order[-1][0].tuition_log_id == row.tuition_log_id:
+                logs_in_order[-1].append(row)
+            else:
+                logs_in_order.append([row])
+
+        to_paid, to_unpaid = [], []
+        total_charged = Decimal(0)
+        for log_rows in logs_in_order:
+            my_cost = sum((r.cost for r in log_rows), Decimal(0))
+            total_charged += my_cost
+            if wallet >= my_cost:
+                is_paid = True
+                wallet -= my_cost
+            else:
+                is_paid = False
+                wallet = max(Decimal(0), wallet - my_cost)
+
+            for r in log_rows:
+                if is_paid != r.paid_in_parent_ledger:
+                    (to_paid if is_paid else to_unpaid).append(r.charge_id)
+
+        await self._set_statuses(db_models.LedgerChargeStatuses.paid_in_parent_ledger, to_paid, to_unpaid)
+
+        parent_wallet.total_charged = total_charged
+        parent_wallet.remaining_balance = wallet
+        parent_wallet.cursor_start_time = rows[-1].start_time if rows else None
+        parent_wallet.cursor_log_id = rows[-1].tuition_log_id if rows else None
+        parent_wallet.updated_at = func.now()
+
+    async def _set_statuses(self, column, to_paid: list[UUID], to_unpaid: list[UUID]) -> None:
+        """Writes changed statuses with at most two UPDATE statements."""
+        for charge_ids, value in ((to_paid, True), (to_unpaid, False)):
+            if not charge_ids:
+                continue
+            stmt = update(db_models.LedgerChargeStatuses).where(
+                db_models.LedgerChargeStatuses.charge_id.in_(charge_ids)
+            ).values({column: value}).execution_options(synchronize_session=False)
+            await self.db.execute(stmt)
@@ -60,10 +60,7 @@ class NotesService:
         
         # 3. Check if Parent is the parent of the subject student
         elif current_user.role == UserRole.PARENT.value:
-            # We must rely on the 'students' relationship being loaded on the
-            # 'current_user' (a Parent object) by the UserService.
-            await self.db.refresh(current_user, ['students'])
-            student_ids = [student.id for student in current_user.students]
+            student_ids = await self.user_service.get_student_ids(current_user)
             if note.student_id in student_ids:
                 return  # Allow
         
@@ -148,8 +145,7 @@ class NotesService:
                 stmt = stmt.filter(db_models.Notes.teacher_id == current_user.id)
             
             elif current_user.role == UserRole.PARENT.value:
-                await self.db.refresh(current_user, ['students'])
-                student_ids = [student.id for student in current_user.students]
+                student_ids = list(await self.user_service.get_student_ids(current_user))
                 if not student_ids:
                     return [] # This parent has no students
                 stmt = stmt.filter(db_models.Notes.student_id.in_(student_ids))
@@ -0,0 +1,212 @@
+'''
+Short-lived cache of authenticated users (principals).
+
+`verify_token_and_get_user` runs on every protected request, and loading the
+full polymorphic user with its relationships costs several queries. Instead, a
+snapshot of the user's columns and their children's ids is kept per token subject
+for PRINCIPAL_CACHE_TTL_SECONDS. On a hit the snapshot is merged into the request's
+session without a query. Relationships stay unloaded; the few handlers that need
+them load them explicitly.
+
+In front of it, `verified_token_cache` remembers bearer tokens that already
+passed JWT decoding and signature verification, keyed by their SHA-256 digest,
+until the token's own `exp`. A client resends the same token for its whole
+lifetime, so the auth step is usually two dictionary lookups.
+
+Principals are always loaded from the primary, even on read-replica requests.
+Both caches are local to each worker. User writes (profile and password updates,
+deletions) purge the local entries of that user from both, and the TTL bounds
+how stale the other workers' principals can be.
+'''
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Optional, Iterable
+from uuid import UUID
+from cachetools import TLRUCache, TTLCache
+from sqlalchemy import event, inspect as sa_inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+
+from ..database import models as db_models
+from ..database.db_enums import UserRole
+from ..common.config import settings
+from ..common.logger import log
+
+ROLE_CLASSES: dict[str, type[db_models.Users]] = {
+    UserRole.PARENT.value: db_models.Parents,
+    UserRole.STUDENT.value: db_models.Students,
+    UserRole.TEACHER.value: db_models.Teachers,
+    UserRole.ADMIN.value: db_models.Admins,
+}
+
+# Never kept in memory; it is expired on cached users and only the login path reads it.
+EXCLUDED_COLUMNS = {"password"}
+
+# Attribute set on users restored from the cache, read by UserService.get_student_ids
+STUDENT_IDS_ATTR = "_cached_student_ids"
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Lightweight snapshot of an authenticated user."""
+    id: UUID
+    role: str
+    timezone: str
+    is_active: bool
+    student_ids: frozenset[UUID]
+    columns: dict[str, Any]
+
+
+@dataclass(frozen=True)
+class VerifiedToken:
+    """A bearer token whose signature and claims were verified."""
+    subject: str
+    user_id: UUID
+    expires_at: float  # the token's `exp`, as a timestamp
+
+
+class VerifiedTokenCache:
+    """LRU of verified tokens keyed by token digest; an entry expires with its token."""
+
+    def __init__(self, maxsize: int):
+        self._cache: TLRUCache = TLRUCache(
+            maxsize=max(maxsize, 1), ttu=lambda _key, token, _now: token.expires_at, timer=time.time
+        )
+        self._lock = threading.Lock()
+        self.enabled = maxsize > 0
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, digest: bytes) -> Optional[VerifiedToken]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            return self._cache.get(digest)
+
+    def remember(self, digest: bytes, subject: str, user_id: UUID, expires_at: datetime) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._cache[digest] = VerifiedToken(subject, user_id, expires_at.timestamp())
+
+    def purge(self, user_ids: set[UUID]) -> None:
+        with self._lock:
+            stale = [digest for digest, token in self._cache.items() if token.user_id in user_ids]
+            for digest in stale:
+                self._cache.pop(digest, None)
+        if stale:
+            log.info(f"Purged {len(stale)} verified tokens.")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+
+verified_token_cache = VerifiedTokenCache(maxsize=settings.VERIFIED_TOKEN_CACHE_MAX_ENTRIES)
+
+
+class PrincipalCache:
+    """TTL cache of principals keyed by the token subject (the user's email)."""
+
+    def __init__(self, maxsize: int, ttl_seconds: int):
+        self._cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl_seconds)
+        self._lock = threading.Lock()
+        self.enabled = ttl_seconds > 0
+
+    def get(self, subject: str) -> Optional[Principal]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            return self._cache.get(subject)
+
+    def remember(self, subject: str, user: db_models.Users) -> None:
+        """Snapshots a fully loaded user. Users with unloaded columns are not cached."""
+        if not self.enabled:
+            return
+        principal = self.snapshot(user)
+        if principal is None:
+            return
+        with self._lock:
+            self._cache[subject] = principal
+
+    @staticmethod
+    def snapshot(user: db_models.Users) -> Optional[Principal]:
+        """The user's principal, or None if the user has unloaded columns or an unknown role."""
+        if user.role not in ROLE_CLASSES:
+            return None
+
+        state = sa_inspect(user)
+        columns = {}
+        for attr in state.mapper.column_attrs:
+            if attr.key in EXCLUDED_COLUMNS:
+                continue
+            if attr.key not in state.dict:
+                return None
+            columns[attr.key] = state.dict[attr.key]
+
+        student_ids: frozenset[UUID] = frozenset()
+        if user.role == UserRole.PARENT.value:
+            student_ids = getattr(user, STUDENT_IDS_ATTR, None)
+            if student_ids is None:
+                if "students" not in state.dict:
+                    return None
+                student_ids = frozenset(s.id for s in user.students)
+
+        return Principal(
+            id=user.id,
+            role=user.role,
+            timezone=user.timezone,
+            is_active=user.is_active,
+            student_ids=student_ids,
+            columns=columns
+        )
+
+    async def restore(self, db: AsyncSession, principal: Principal) -> db_models.Users:
+        """
+        Attaches the cached user to the session as a persistent, unmodified object
+        without querying the database (`merge(load=False)`).
+        """
+        user = ROLE_CLASSES[principal.role](**principal.columns)
+        make_transient_to_detached(user)
+        user = await db.merge(user, load=False)
+        if principal.role == UserRole.PARENT.value:
+            setattr(user, STUDENT_IDS_ATTR, principal.student_ids)
+        return user
+
+    def purge(self, user_ids: Iterable[Optional[UUID]]) -> None:
+        """Drops the users' principals and their verified tokens (the revocation hook)."""
+        user_ids = {user_id for user_id in user_ids if user_id}
+        if not user_ids:
+            return
+        verified_token_cache.purge(user_ids)
+        with self._lock:
+            stale = [subject for subject, p in self._cache.items() if p.id in user_ids]
+            for subject in stale:
+                self._cache.pop(subject, None)
+        if stale:
+            log.info(f"Purged {len(stale)} cached principals.")
+
+    def purge_on_commit(self, db: AsyncSession, user_ids: Iterable[Optional[UUID]]) -> None:
+        """
+        Purges now and again once the session commits, so a request reading the
+        user before the commit cannot keep the old snapshot.
+        """
+        user_ids = list(user_ids)
+        self.purge(user_ids)
+        event.listen(db.sync_session, "after_commit", lambda session: self.purge(user_ids), once=True)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+        verified_token_cache.clear()
+
+
+principal_cache = PrincipalCache(
+    maxsize=settings.PRINCIPAL_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS
+)
@@ -0,0 +1,252 @@
+'''
+Background runner for tuition regeneration.
+
+Student writes only queue a regeneration; the API returns without waiting for it.
+1- RegenerationQueue: request-scoped. Queues the affected students once the
+   request's transaction commits, so the job always sees the committed data.
+2- TuitionRegenerationRunner: one asyncio task per worker. Triggers that arrive
+   while a job is queued are merged into it (a burst of edits becomes one run), and
+   every run holds a Postgres advisory lock so only one regeneration executes at a
+   time across all workers.
+'''
+import asyncio
+import itertools
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Annotated, Optional, Iterable
+from uuid import UUID
+from fastapi import Depends
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import engine as db_engine
+from ..database.engine import get_db_session
+from ..common.config import settings
+from ..common.logger import log
+from .tuition_service import TuitionService
+from .timetable_cache import TimetableCache, get_timetable_cache_backend
+from .user_service import UserService
+
+# Arbitrary, app-wide key of the advisory lock guarding regeneration
+REGENERATION_LOCK_KEY = 7_316_204_551
+
+PENDING_REGENERATION_KEY = "pending_tuition_regeneration"
+
+
+@dataclass
+class RegenerationJob:
+    """One (possibly coalesced) regeneration run."""
+    id: int
+    full: bool
+    student_ids: set[UUID] = field(default_factory=set)
+    status: str = "queued"  # queued -> running -> succeeded | failed
+    triggers: int = 0
+    queued_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    duration_seconds: Optional[float] = None
+    error: Optional[str] = None
+
+    @property
+    def student_count(self) -> int:
+        return len(self.student_ids)
+
+
+class TuitionRegenerationRunner:
+    """Queues, coalesces and runs tuition regenerations in the background."""
+
+    def __init__(self, debounce_seconds: float, history_size: int):
+        self.debounce_seconds = debounce_seconds
+        self.queued: Optional[RegenerationJob] = None
+        self.running: Optional[RegenerationJob] = None
+        self.history: deque[RegenerationJob] = deque(maxlen=history_size)
+        self._ids = itertools.count(1)
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Starts the worker task. Called by the app's lifespan."""
+        if self._task is not None:
+            return
+        self._wake = asyncio.Event()
+        if self.queued is not None:
+            self._wake.set()
+        self._task = asyncio.create_task(self._run_forever())
+        log.info("Tuition regeneration runner started.")
+
+    async def stop(self) -> None:
+        """
+        Stops the worker task, then drains: a job cancelled mid-run is merged back
+        into the queued one, and the queued job gets one final run before returning.
+        Student writes are already committed, so skipping it would lose them.
+        """
+        if self._task is not None:
+            interrupted = self.running
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wake = None
+            if interrupted is not None:
+                self._requeue(interrupted)
+
+        job, self.queued = self.queued, None
+        if job is not None:
+            log.info(f"Draining regeneration job {job.id} before shutdown.")
+            await self.run(job)
+            if job.status != "succeeded":
+                scope = "all students" if job.full else ", ".join(str(s) for s in job.student_ids)
+                log.warning(
+                    f"Tuition regeneration runner stopped without regenerating {scope}. "
+                    "Re-trigger /tuitions/regenerate to apply these changes."
+                )
+        log.info("Tuition regeneration runner stopped.")
+
+    def _requeue(self, job: RegenerationJob) -> None:
+        """Merges an unfinished job back into the queued one."""
+        queued = self.queued
+        if queued is None:
+            queued = self.queued = RegenerationJob(id=next(self._ids), full=job.full)
+        if job.full:
+            queued.full = True
+            queued.student_ids.clear()
+        elif not queued.full:
+            queued.student_ids.update(job.student_ids)
+        queued.triggers += job.triggers
+
+    def request(self, student_ids: Optional[Iterable[UUID]] = None) -> RegenerationJob:
+        """
+        Queues a regeneration for the given students, or a full one when
+        `student_ids` is None. Merges into the already queued job if there is one.
+        """
+        job = self.queued
+        if job is None:
+            job = self.queued = RegenerationJob(id=next(self._ids), full=student_ids is None)
+        if student_ids is None:
+            job.full = True
+            job.student_ids.clear()
+        elif not job.full:
+            job.student_ids.update(student_ids)
+        job.triggers += 1
+
+        if self._wake is not None:
+            self._wake.set()
+        return job
+
+    def status(self) -> dict:
+        return {
+            "running": self.running,
+            "queued": self.queued,
+            "recent": list(reversed(self.history)),
+        }
+
+    async def _run_forever(self) -> None:
+        while True:
+            await self._wake.wait()
+            # Let a burst of triggers land in the queued job before taking it
+            await asyncio.sleep(self.debounce_seconds)
+            self._wake.clear()
+
+            job, self.queued = self.queued, None
+            if job is None:
+                continue
+            await self.run(job)
+
+    async def run(self, job: RegenerationJob) -> None:
+        """Executes one job in its own session and transaction."""
+        if db_engine.AsyncSessionLocal is None:
+            log.error("Cannot run tuition regeneration: the session factory is not initialized.")
+            return
+
+        self.running = job
+        job.status = "running"
+        job.started_at = datetime.now(timezone.utc)
+        scope = "all students" if job.full else f"{job.student_count} students"
+        log.info(f"Regeneration job {job.id} started for {scope} ({job.triggers} triggers).")
+        try:
+            async with db_engine.AsyncSessionLocal() as session:
+                async with session.begin():
+                    # Released automatically when the transaction ends
+                    await session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": REGENERATION_LOCK_KEY})
+
+                    tuition_service = TuitionService(db=session, user_service=UserService(db=session))
+                    if job.full:
+                        await tuition_service.regenerate_all_tuitions()
+                    else:
+                        await tuition_service.regenerate_tuitions_for_students(job.student_ids)
+            # Removed tuitions took their timetable slots with them
+            await TimetableCache(get_timetable_cache_backend()).invalidate()
+            job.status = "succeeded"
+        except asyncio.CancelledError:
+            job.status = "failed"
+            job.error = "cancelled"
+            raise
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            log.error(f"Regeneration job {job.id} failed: {e}", exc_info=True)
+        finally:
+            job.finished_at = datetime.now(timezone.utc)
+            job.duration_seconds = (job.finished_at - job.started_at).total_seconds()
+            self.running = None
+            self.history.append(job)
+            log.info(f"Regeneration job {job.id} {job.status} in {job.duration_seconds:.3f}s.")
+
+
+regeneration_runner = TuitionRegenerationRunner(
+    debounce_seconds=settings.TUITION_REGEN_DEBOUNCE_SECONDS,
+    history_size=settings.TUITION_REGEN_HISTORY_SIZE
+)
+
+
+def get_regeneration_runner() -> TuitionRegenerationRunner:
+    return regeneration_runner
+
+
+class RegenerationQueue:
+    """
+    Request-scoped entry point for queueing regenerations.
+    Nothing is queued if the request's transaction rolls back.
+    """
+    def __init__(
+        self,
+        db: Annotated[AsyncSession, Depends(get_db_session)],
+        runner: Annotated[TuitionRegenerationRunner, Depends(get_regeneration_runner)]
+    ):
+        self.db = db
+        self.runner = runner
+
+    def enqueue_students(self, student_ids: Iterable[UUID]) -> None:
+        """Queues a targeted regeneration of these students (and their group)."""
+        self._enqueue_after_commit(set(student_ids))
+
+    def enqueue_all(self) -> None:
+        """Queues a full regeneration."""
+        self._enqueue_after_commit(None)
+
+    def _enqueue_after_commit(self, student_ids: Optional[set[UUID]]) -> None:
+        pending = self.db.info.get(PENDING_REGENERATION_KEY)
+        if pending is None:
+            pending = self.db.info[PENDING_REGENERATION_KEY] = {"full": False, "student_ids": set()}
+            event.listen(self.db.sync_session, "after_commit", self._flush_pending, once=True)
+            event.listen(self.db.sync_session, "after_rollback", self._drop_pending, once=True)
+        if student_ids is None:
+            pending["full"] = True
+        else:
+            pending["student_ids"].update(student_ids)
+
+    def _flush_pending(self, session) -> None:
+        pending = session.info.pop(PENDING_REGENERATION_KEY, None)
+        if pending is None:
+            return
+        if pending["full"]:
+            self.runner.request(None)
+        else:
+            self.runner.request(pending["student_ids"])
+
+    def _drop_pending(self, session) -> None:
+        if session.info.pop(PENDING_REGENERATION_KEY, None) is not None:
+            log.info("Request rolled back; the queued tuition regeneration was dropped.")
@@ -0,0 +1,228 @@
+'''
+In-memory index of the teacher <-> student <-> parent links, for the
+authorization checks ("is this student / parent one of this teacher's?").
+
+The links are the (teacher, student, parent) triples of the tuition template
+charges. Each worker keeps them as adjacency sets, so a check is a set lookup
+instead of a join before the real query.
+The links only change when tuitions are regenerated or users are deleted.
+Those writes rotate a version token in Redis once they commit. Each worker
+reads the token at most once per RELATIONSHIP_INDEX_VERSION_CHECK_SECONDS, so
+most checks are answered in memory, and rebuilds its graph (one query, on the
+primary) when the token differs from the graph's. The worker that made the
+write sees it at once; the others within that interval.
+The token must be shared: a per-worker token would let the other workers keep
+authorizing a revoked link. So the index only works with Redis: it is enabled
+with RELATIONSHIP_INDEX_BACKEND="redis", or "auto" (the default) when
+CACHE_REDIS_URL is set. Otherwise every check runs its query.
+'''
+import asyncio
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Optional
+from uuid import UUID, uuid4
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..common.cache import CacheBackend, NullCacheBackend, create_cache_backend
+from ..common.config import settings
+from ..common.logger import log
+from ..database import models as db_models
+from ..database.engine import primary_read_session
+
+VERSION_KEY = "relationship_index:version"
+PENDING_INVALIDATION_KEY = "relationship_index_invalidation"
+
+# Keeps the post-commit invalidation tasks alive until they finish
+_pending_tasks: set[asyncio.Task] = set()
+
+
+@dataclass(frozen=True)
+class RelationshipGraph:
+    """One worker's snapshot of the links, tagged with the version it was built at."""
+    version: str
+    students_by_teacher: dict[UUID, frozenset[UUID]]
+    parents_by_teacher: dict[UUID, frozenset[UUID]]
+
+
+class RelationshipIndex:
+    """Versioned teacher -> students / parents adjacency (see the module docstring)."""
+
+    def __init__(self, backend: Optional[CacheBackend] = None, version_check_seconds: Optional[float] = None):
+        self._backend = backend
+        self.version_check_seconds = (
+            settings.RELATIONSHIP_INDEX_VERSION_CHECK_SECONDS if version_check_seconds is None else version_check_seconds
+        )
+        self._graph: Optional[RelationshipGraph] = None
+        # The last token read from the backend, trusted until _version_expires_at
+        self._seen_version: Optional[str] = None
+        self._version_expires_at = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        self._lock_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def backend(self) -> CacheBackend:
+        if self._backend is None:
+            configured = settings.RELATIONSHIP_INDEX_BACKEND
+            if configured == "auto":
+                configured = "redis" if settings.CACHE_REDIS_URL else "none"
+            if configured == "redis":
+                self._backend = create_cache_backend(
+                    "redis",
+                    maxsize=16,
+                    ttl_seconds=settings.RELATIONSHIP_INDEX_TTL_SECONDS
+                )
+            else:
+                if configured != "none":
+                    log.warning(
+                        f"The relationship index needs a shared backend ('redis'), not "
+                        f"'{settings.RELATIONSHIP_INDEX_BACKEND}'. The index is disabled."
+                    )
+                self._backend = NullCacheBackend()
+        return self._backend
+
+    def _get_lock(self) -> asyncio.Lock:
+        # A lock belongs to one event loop; test clients run several
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
+
+    @property
+    def enabled(self) -> bool:
+        return not isinstance(self.backend, NullCacheBackend)
+
+    # --- Checks ---
+
+    async def teacher_has_student(self, db: AsyncSession, teacher_id: UUID, student_id: UUID) -> bool:
+        """True if the student is charged on one of the teacher's tuitions."""
+        graph = await self._current_graph(db)
+        if graph is None:
+            stmt = select(db_models.TuitionTemplateCharges.id).join(
+                db_models.Tuitions
+            ).filter(
+                db_models.Tuitions.teacher_id == teacher_id,
+                db_models.TuitionTemplateCharges.student_id == student_id
+            ).limit(1)
+            return (await db.execute(stmt)).scalars().first() is not None
+        return student_id in graph.students_by_teacher.get(teacher_id, ())
+
+    async def teacher_has_parent(self, db: AsyncSession, teacher_id: UUID, parent_id: UUID) -> bool:
+        """True if the parent is charged on one of the teacher's tuitions."""
+        graph = await self._current_graph(db)
+        if graph is None:
+            stmt = select(db_models.TuitionTemplateCharges.id).join(
+                db_models.Tuitions
+            ).filter(
+                db_models.Tuitions.teacher_id == teacher_id,
+                db_models.TuitionTemplateCharges.parent_id == parent_id
+            ).limit(1)
+            return (await db.execute(stmt)).scalars().first() is not None
+        return parent_id in graph.parents_by_teacher.get(teacher_id, ())
+
+    # --- Graph ---
+
+    async def _version(self, fresh: bool = False) -> str:
+        """The shared version token; the last one read unless it is older than the check interval."""
+        now = time.monotonic()
+        if not fresh and self._seen_version is not None and now < self._version_expires_at:
+            return self._seen_version
+        version = await self.backend.get(VERSION_KEY)
+        if version is None:
+            version = uuid4().hex
+            await self.backend.set(VERSION_KEY, version)
+        self._seen_version, self._version_expires_at = version, now + self.version_check_seconds
+        return version
+
+    def _forget(self) -> None:
+        """Drops this worker's graph and its remembered token."""
+        self._graph = None
+        self._seen_version = None
+
+    async def _current_graph(self, db: AsyncSession) -> Optional[RelationshipGraph]:
+        """The worker's graph, rebuilt if its version is stale; None when the index is off."""
+        if not self.enabled:
+            return None
+        version = await self._version()
+        graph = self._graph
+        if graph is not None and graph.version == version:
+            return graph
+
+        async with self._get_lock():
+            # Another request may have rebuilt it while we waited
+            version = await self._version(fresh=True)
+            graph = self._graph
+            if graph is None or graph.version != version:
+                # The version is read before the links: a write committing in
+                # between makes this graph stale at once instead of hiding it.
+                # Built on the primary: a lagging replica would tag old links with the new version
+                async with primary_read_session(db) as build_db:
+                    graph = self._graph = await self._build(build_db, version)
+        return graph
+
+    async def _build(self, db: AsyncSession, version: str) -> RelationshipGraph:
+        stmt = select(
+            db_models.Tuitions.teacher_id,
+            db_models.TuitionTemplateCharges.student_id,
+            db_models.TuitionTemplateCharges.parent_id
+        ).join(
+            db_models.Tuitions, db_models.Tuitions.id == db_models.TuitionTemplateCharges.tuition_id
+        ).distinct()
+        students: defaultdict[UUID, set[UUID]] = defaultdict(set)
+        parents: defaultdict[UUID, set[UUID]] = defaultdict(set)
+        rows = (await db.execute(stmt)).all()
+        for teacher_id, student_id, parent_id in rows:
+            students[teacher_id].add(student_id)
+            if parent_id is not None:
+                parents[teacher_id].add(parent_id)
+        log.info(f"Built the relationship index from {len(rows)} links of {len(students)} teachers.")
+        return RelationshipGraph(
+            version=version,
+            students_by_teacher={teacher_id: frozenset(ids) for teacher_id, ids in students.items()},
+            parents_by_teacher={teacher_id: frozenset(ids) for teacher_id, ids in parents.items()}
+        )
+
+    # --- Invalidation ---
+
+    async def invalidate(self) -> None:
+        """Rotates the version: every worker rebuilds its graph once it reads the new one."""
+        self._forget()
+        await self.backend.delete([VERSION_KEY])
+
+    def invalidate_on_commit(self, db: AsyncSession) -> None:
+        """
+        Drops this worker's graph now (it may have been built from this session's
+        uncommitted links) and rotates the version once the session commits.
+        """
+        self._forget()
+        if db.info.get(PENDING_INVALIDATION_KEY):
+            return
+        db.info[PENDING_INVALIDATION_KEY] = True
+        event.listen(db.sync_session, "after_commit", self._invalidate_after_commit, once=True)
+        event.listen(db.sync_session, "after_rollback", self._drop_pending, once=True)
+
+    def _invalidate_after_commit(self, session) -> None:
+        if not session.info.pop(PENDING_INVALIDATION_KEY, False):
+            return
+        self._forget()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(self.invalidate())
+        _pending_tasks.add(task)
+        task.add_done_callback(_pending_tasks.discard)
+
+    def _drop_pending(self, session) -> None:
+        if session.info.pop(PENDING_INVALIDATION_KEY, None) is not None:
+            # Links rolled back: a graph built from them must not be used
+            self._forget()
+
+    def clear(self) -> None:
+        """Drops this worker's graph (tests)."""
+        self._forget()
+
+
+relationship_index = RelationshipIndex()
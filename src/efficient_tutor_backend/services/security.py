@@ -11,7 +11,9 @@ from ..common.config import settings
 from ..models.token import TokenPayload
 from ..common.logger import log
 from ..database import models as db_models
+from ..database.engine import primary_read_session
 from .user_service import UserService
+from .principal_cache import principal_cache, verified_token_cache
 from ..common.security_utils import HashedPassword
 
 # --- JWT Handling ---
@@ -52,8 +54,10 @@ async def verify_token_and_get_user(
     user_service: Annotated[UserService, Depends(UserService)]
     ) -> db_models.Users:
     """
-    REFACTORED: Dependency to verify JWT, fetch the full polymorphic
-    user (Parent, Student, or Teacher) via the UserService.
+    REFACTORED: Dependency to verify JWT and return the polymorphic
+    user (Parent, Student, Teacher or Admin) via the UserService.
+    Relationships are not loaded; recently verified users come from the principal cache
+    and already verified tokens skip the JWT decode (verified token cache).
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -61,21 +65,49 @@ async def verify_token_and_get_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    token_data = JWTHandler.decode_token(token)
-    if not token_data or not token_data.sub:
-        log.warning("JWT decode failed or invalid token structure.")
-        raise credentials_exception
+    # Fast path: a token verified earlier (until its exp) skips the JWT decode
+    digest = verified_token_cache.digest(token)
+    verified = verified_token_cache.get(digest)
+    if verified is not None:
+        subject, expires_at = verified.subject, None
+    else:
+        token_data = JWTHandler.decode_token(token)
+        if not token_data or not token_data.sub:
+            log.warning("JWT decode failed or invalid token structure.")
+            raise credentials_exception
+        subject, expires_at = token_data.sub, token_data.exp
 
-    user = await user_service.get_user_by_email(token_data.sub)
-    
-    if user is None:
-        log.warning(f"User '{token_data.sub}' not found during token verification.")
-        raise credentials_exception
-    
-    if not user.is_active:
-        log.warning(f"User '{token_data.sub}' is not active.")
-        raise credentials_exception
+    # Fast path: a recently verified user, attached to the session without queries
+    principal = principal_cache.get(subject)
+    if principal is not None:
+        if expires_at is not None:
+            verified_token_cache.remember(digest, subject, principal.id, expires_at)
+        return await principal_cache.restore(user_service.db, principal)
+
+    # Loaded on the primary: a user read from a lagging replica would be cached as it was
+    # before a deactivation, a password change or a new child, after the commit-time purge
+    async with primary_read_session(user_service.db) as auth_db:
+        loader = user_service if auth_db is user_service.db else UserService(auth_db)
+        user = await loader.get_user_for_auth(subject)
+
+        if user is None:
+            log.warning(f"User '{subject}' not found during token verification.")
+            raise credentials_exception
+
+        if not user.is_active:
+            log.warning(f"User '{subject}' is not active.")
+            raise credentials_exception
+
+        log.info(f"JWT verified successfully for user: {user.email} (Role: {user.role})")
+        principal_cache.remember(subject, user)
+        if expires_at is not None:
+            verified_token_cache.remember(digest, subject, user.id, expires_at)
 
-    log.info(f"JWT verified successfully for user: {user.email} (Role: {user.role})")
-    # This now returns the full Parent, Student, or Teacher object
+        if auth_db is not user_service.db:
+            # Handed to the request's own session, as a cache hit would be
+            principal = principal_cache.snapshot(user)
+            if principal is not None:
+                user = await principal_cache.restore(user_service.db, principal)
+            else:
+                user = await user_service.db.merge(user)
     return user
@@ -0,0 +1,106 @@
+'''
+Cache in front of the financial summaries.
+
+A summary only changes when a tuition log or payment log of that parent or
+teacher changes, so it is cached per (user, parent_id, student_id, teacher_id)
+and the write methods of TuitionLogService and PaymentLogService invalidate the
+users they touch. The backend is chosen by `settings.SUMMARY_CACHE_BACKEND`.
+'''
+import asyncio
+from typing import Annotated, Optional, Iterable
+from uuid import UUID, uuid4
+from fastapi import Depends
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database.engine import get_db_session
+from ..common.cache import CacheBackend, create_cache_backend
+from ..common.config import settings
+from ..common.logger import log
+
+_backend: Optional[CacheBackend] = None
+# Keeps the post-commit invalidation tasks alive until they finish
+_pending_tasks: set[asyncio.Task] = set()
+
+PENDING_INVALIDATIONS_KEY = "summary_cache_invalidations"
+
+
+def get_summary_cache_backend() -> CacheBackend:
+    """Returns the process-wide summary cache backend, creating it on first use."""
+    global _backend
+    if _backend is None:
+        _backend = create_cache_backend(
+            settings.SUMMARY_CACHE_BACKEND,
+            maxsize=settings.SUMMARY_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.SUMMARY_CACHE_TTL_SECONDS
+        )
+        log.info(f"Summary cache backend: {type(_backend).__name__}")
+    return _backend
+
+
+class SummaryCache:
+    """
+    Per-user cache of financial summaries.
+    Every user has a generation token that is part of all their keys. Invalidating
+    a user deletes the token, so every cached filter combination of that user
+    becomes unreachable at once and simply expires from the backend.
+    """
+    def __init__(
+        self,
+        db: Annotated[AsyncSession, Depends(get_db_session)],
+        backend: Annotated[CacheBackend, Depends(get_summary_cache_backend)]
+    ):
+        self.db = db
+        self.backend = backend
+
+    @staticmethod
+    def _generation_key(user_id: UUID) -> str:
+        return f"summary:gen:{user_id}"
+
+    @staticmethod
+    def _entry_key(user_id: UUID, generation: str, filters: tuple[Optional[UUID], ...]) -> str:
+        return f"summary:{user_id}:{generation}:" + ":".join(str(f) if f else "-" for f in filters)
+
+    async def lookup(self, user_id: UUID, filters: tuple[Optional[UUID], ...]) -> tuple[str, Optional[str]]:
+        """
+        Returns (generation, cached value or None).
+        The generation must be passed back to `store`, so a summary computed while
+        an invalidation happens is stored under the old, unreachable generation.
+        """
+        generation = await self.backend.get(self._generation_key(user_id))
+        if generation is None:
+            generation = uuid4().hex
+            await self.backend.set(self._generation_key(user_id), generation)
+            return generation, None
+        return generation, await self.backend.get(self._entry_key(user_id, generation, filters))
+
+    async def store(self, user_id: UUID, generation: str, filters: tuple[Optional[UUID], ...], value: str) -> None:
+        await self.backend.set(self._entry_key(user_id, generation, filters), value)
+
+    async def invalidate(self, user_ids: Iterable[Optional[UUID]]) -> None:
+        """
+        Drops the cached summaries of the given users now, and again once the
+        session commits: a read racing the commit may have re-cached the old figures.
+        """
+        keys = {self._generation_key(user_id) for user_id in user_ids if user_id}
+        if not keys:
+            return
+        log.info(f"Invalidating summary cache for {len(keys)} users.")
+        await self.backend.delete(keys)
+
+        pending = self.db.info.setdefault(PENDING_INVALIDATIONS_KEY, set())
+        if not pending:
+            event.listen(self.db.sync_session, "after_commit", self._invalidate_after_commit, once=True)
+        pending.update(keys)
+
+    def _invalidate_after_commit(self, session) -> None:
+        keys = session.info.pop(PENDING_INVALIDATIONS_KEY, set())
+        if not keys:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(self.backend.delete(keys))
+        _pending_tasks.add(task)
+        task.add_done_callback(_pending_tasks.discard)
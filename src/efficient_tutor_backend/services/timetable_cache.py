@@ -0,0 +1,142 @@
+'''
+Cache in front of the rendered timetables.
+
+The timetable only changes when a new run is written (by the external solver)
+or when slots of the current run disappear (tuition regeneration, availability
+deletions cascade to them). Three layers:
+1- The latest run id, kept for TIMETABLE_LATEST_RUN_TTL_SECONDS: a new run is
+   picked up within that window without a query on every poll.
+2- The visible and masked slots per (generation, run_id, viewer, targets). A new run
+   changes the key by itself; everything else rotates the generation token, which
+   makes every cached timetable unreachable at once.
+3- The rendered calendar feeds, per (generation, run_id, user, feed window). They
+   embed meeting links, so meeting link writes rotate the generation too.
+Next occurrences depend on the current time, so they are computed per request
+from the cached slots.
+'''
+import asyncio
+import hashlib
+import time
+from typing import Annotated, Awaitable, Callable, Iterable, Optional
+from uuid import UUID, uuid4
+from fastapi import Depends
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..common.cache import CacheBackend, create_cache_backend
+from ..common.config import settings
+from ..common.logger import log
+
+_backend: Optional[CacheBackend] = None
+# Keeps the post-commit invalidation tasks alive until they finish
+_pending_tasks: set[asyncio.Task] = set()
+
+GENERATION_KEY = "timetable:gen"
+LATEST_RUN_KEY = "timetable:latest_run"
+PENDING_INVALIDATION_KEY = "timetable_cache_invalidation"
+
+
+def get_timetable_cache_backend() -> CacheBackend:
+    """Returns the process-wide timetable cache backend, creating it on first use."""
+    global _backend
+    if _backend is None:
+        _backend = create_cache_backend(
+            settings.TIMETABLE_CACHE_BACKEND,
+            maxsize=settings.TIMETABLE_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.TIMETABLE_CACHE_TTL_SECONDS
+        )
+        log.info(f"Timetable cache backend: {type(_backend).__name__}")
+    return _backend
+
+
+class TimetableCache:
+    """Versioned cache of per-viewer timetables (see the module docstring)."""
+
+    def __init__(self, backend: Annotated[CacheBackend, Depends(get_timetable_cache_backend)]):
+        self.backend = backend
+
+    async def latest_run_id(self, load: Callable[[], Awaitable[Optional[int]]]) -> Optional[int]:
+        """
+        Returns the cached latest run id, calling `load` when it expired.
+        Stored as "run_id:expires_at" because this TTL is shorter than the backend's.
+        """
+        cached = await self.backend.get(LATEST_RUN_KEY)
+        if cached is not None:
+            run_id, expires_at = cached.split(":")
+            if float(expires_at) > time.time():
+                return int(run_id)
+
+        run_id = await load()
+        if run_id is not None:
+            expires_at = time.time() + settings.TIMETABLE_LATEST_RUN_TTL_SECONDS
+            await self.backend.set(LATEST_RUN_KEY, f"{run_id}:{expires_at}")
+        return run_id
+
+    @staticmethod
+    def _entry_key(generation: str, run_id: int, viewer_id: UUID, target_ids: Iterable[UUID]) -> str:
+        targets = hashlib.sha1(",".join(sorted(str(t) for t in target_ids)).encode()).hexdigest()[:16]
+        return f"timetable:{generation}:{run_id}:{viewer_id}:{targets}"
+
+    async def _generation(self) -> tuple[str, bool]:
+        """Returns (generation, is_new); a new generation has no entries yet."""
+        generation = await self.backend.get(GENERATION_KEY)
+        if generation is None:
+            generation = uuid4().hex
+            await self.backend.set(GENERATION_KEY, generation)
+            return generation, True
+        return generation, False
+
+    async def lookup(self, run_id: int, viewer_id: UUID, target_ids: Iterable[UUID]) -> tuple[str, Optional[str]]:
+        """
+        Returns (generation, cached value or None).
+        The generation must be passed back to `store`, so a timetable rendered while
+        an invalidation happens is stored under the old, unreachable generation.
+        """
+        generation, is_new = await self._generation()
+        if is_new:
+            return generation, None
+        return generation, await self.backend.get(self._entry_key(generation, run_id, viewer_id, target_ids))
+
+    async def store(self, generation: str, run_id: int, viewer_id: UUID, target_ids: Iterable[UUID], value: str) -> None:
+        await self.backend.set(self._entry_key(generation, run_id, viewer_id, target_ids), value)
+
+    @staticmethod
+    def _feed_key(generation: str, run_id: int, user_id: UUID, window_key: str) -> str:
+        return f"timetable_feed:{generation}:{run_id}:{user_id}:{window_key}"
+
+    async def lookup_feed(self, run_id: int, user_id: UUID, window_key: str) -> tuple[str, Optional[str]]:
+        """Same as `lookup`, for a rendered calendar feed (see calendar_feed_service)."""
+        generation, is_new = await self._generation()
+        if is_new:
+            return generation, None
+        return generation, await self.backend.get(self._feed_key(generation, run_id, user_id, window_key))
+
+    async def store_feed(self, generation: str, run_id: int, user_id: UUID, window_key: str, value: str) -> None:
+        await self.backend.set(self._feed_key(generation, run_id, user_id, window_key), value)
+
+    async def invalidate(self) -> None:
+        """Drops every cached timetable and the latest run id."""
+        log.info("Invalidating the timetable cache.")
+        await self.backend.delete([GENERATION_KEY, LATEST_RUN_KEY])
+
+    def invalidate_on_commit(self, db: AsyncSession) -> None:
+        """Invalidates once the session commits (the slots it removed are gone for good)."""
+        if db.info.get(PENDING_INVALIDATION_KEY):
+            return
+        db.info[PENDING_INVALIDATION_KEY] = True
+        event.listen(db.sync_session, "after_commit", self._invalidate_after_commit, once=True)
+        event.listen(db.sync_session, "after_rollback", self._drop_pending, once=True)
+
+    def _invalidate_after_commit(self, session) -> None:
+        if not session.info.pop(PENDING_INVALIDATION_KEY, False):
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(self.invalidate())
+        _pending_tasks.add(task)
+        task.add_done_callback(_pending_tasks.discard)
+
+    def _drop_pending(self, session) -> None:
+        session.info.pop(PENDING_INVALIDATION_KEY, None)
@@ -0,0 +1,115 @@
+'''
+Occurrence engine for the weekly timetable slots.
+
+A slot is a weekly wall-clock interval (day_of_week, start_time, end_time) in the
+viewer's timezone. This module turns slots into concrete timezone-aware datetimes:
+- next_occurrences: the next occurrence of each slot relative to `now`.
+- expand_occurrences: every occurrence starting inside a [window_start, window_end) window.
+Both walk the calendar once for all slots of a zone, and zone objects are cached.
+
+DST: a wall time that does not exist (spring forward) is moved forward by the gap,
+an ambiguous one (fall back) is its first occurrence, and an occurrence the gap would
+shrink to nothing keeps its wall-clock length. Overnight slots
+(end_time <= start_time) end on the next calendar day.
+'''
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
+from typing import Iterable, Optional, Protocol, TypeVar
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:
+    from backports.zoneinfo import ZoneInfo
+
+from ..common.logger import log
+
+
+class WeeklySlot(Protocol):
+    day_of_week: int  # 1=Monday, 7=Sunday
+    start_time: time
+    end_time: time
+
+
+SlotT = TypeVar("SlotT", bound=WeeklySlot)
+
+
+@lru_cache(maxsize=512)
+def get_zone(name: Optional[str]) -> ZoneInfo:
+    """Returns the (cached) zone for `name`, UTC if it is missing or invalid."""
+    try:
+        return ZoneInfo(name)
+    except Exception:
+        log.warning(f"Invalid timezone '{name}', defaulting to UTC.")
+        return ZoneInfo("UTC")
+
+
+def localize(day: date, wall_time: time, zone: ZoneInfo) -> datetime:
+    """Combines a local date and wall time, resolving DST gaps and folds (see module docstring)."""
+    naive = datetime.combine(day, wall_time, tzinfo=zone)
+    # The UTC round trip moves a non-existent time past the gap; valid times are unchanged
+    return naive.astimezone(timezone.utc).astimezone(zone)
+
+
+def occurrence_on(slot: WeeklySlot, day: date, zone: ZoneInfo) -> tuple[datetime, datetime]:
+    """The occurrence of `slot` starting on the local date `day`."""
+    start_dt = localize(day, slot.start_time, zone)
+    end_day = day + timedelta(days=1) if slot.end_time <= slot.start_time else day
+    end_dt = localize(end_day, slot.end_time, zone)
+    if end_dt <= start_dt:
+        # The start was pushed past the gap onto (or beyond) the end: keep the wall-clock length
+        end_dt = start_dt + (datetime.combine(end_day, slot.end_time) - datetime.combine(day, slot.start_time))
+    return start_dt, end_dt
+
+
+def next_occurrences(
+    slots: Iterable[SlotT],
+    zone: ZoneInfo,
+    now: Optional[datetime] = None
+) -> list[tuple[SlotT, datetime, datetime]]:
+    """
+    The next occurrence of every slot, in input order: the first date on or after
+    today (in `zone`) falling on the slot's weekday.
+    """
+    today = (now or datetime.now(zone)).astimezone(zone).date()
+    today_idx = today.weekday()  # 0=Mon, 6=Sun
+    # One date per weekday, shared by all the slots of that day
+    days = [today + timedelta(days=(idx - today_idx) % 7) for idx in range(7)]
+    return [(slot, *occurrence_on(slot, days[slot.day_of_week - 1], zone)) for slot in slots]
+
+
+def expand_occurrences(
+    slots: Iterable[SlotT],
+    zone: ZoneInfo,
+    window_start: datetime,
+    window_end: datetime
+) -> list[tuple[SlotT, datetime, datetime]]:
+    """
+    Every occurrence whose start lies in [window_start, window_end), sorted by start.
+    Naive bounds are read in `zone`. Consecutive windows never repeat an occurrence.
+    """
+    if window_start.tzinfo is None:
+        window_start = localize(window_start.date(), window_start.timetz(), zone)
+    if window_end.tzinfo is None:
+        window_end = localize(window_end.date(), window_end.timetz(), zone)
+    if window_end <= window_start:
+        return []
+
+    by_weekday: dict[int, list[SlotT]] = defaultdict(list)
+    for slot in slots:
+        by_weekday[slot.day_of_week - 1].append(slot)
+    if not by_weekday:
+        return []
+
+    occurrences = []
+    day = window_start.astimezone(zone).date()
+    last_day = window_end.astimezone(zone).date()
+    while day <= last_day:
+        for slot in by_weekday.get(day.weekday(), ()):
+            start_dt, end_dt = occurrence_on(slot, day, zone)
+            if window_start <= start_dt < window_end:
+                occurrences.append((slot, start_dt, end_dt))
+        day += timedelta(days=1)
+
+    # Stable: slots sharing a start keep their input order
+    occurrences.sort(key=lambda occurrence: occurrence[1])
+    return occurrences
@@ -1,39 +1,49 @@
 '''
 Timetable Service
 '''
+from types import SimpleNamespace
 from typing import Annotated, Optional
 from uuid import UUID
-from datetime import datetime, time, timedelta, date
+from datetime import datetime, time, timedelta
 try:
     from zoneinfo import ZoneInfo
 except ImportError:
     from backports.zoneinfo import ZoneInfo
 
 from fastapi import Depends, HTTPException, status
-from sqlalchemy import select
+from pydantic import TypeAdapter
+from sqlalchemy import select, or_, and_, case, func, false, Uuid
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
-from ..database.engine import get_db_session
+from ..database.engine import get_db_session, primary_read_session
 from ..database import models as db_models
 from ..database.db_enums import UserRole, RunStatusEnum
 from ..models import timetable as timetable_models
+from ..common.config import settings
 from ..common.logger import log
 from .user_service import UserService
+from .timetable_cache import TimetableCache
+from . import timetable_occurrences
+
+SLOT_LIST_ADAPTER = TypeAdapter(list[timetable_models.TimeTableSlotBase])
 
 
 class TimeTableService:
     """
     Service for viewing the generated timetable solution.
     Fetches the latest valid timetable run and filters it based on the user's role and permissions.
+    Rendered timetables are cached per run and viewer (see timetable_cache).
     """
     def __init__(
         self, 
         db: Annotated[AsyncSession, Depends(get_db_session)],
-        user_service: Annotated[UserService, Depends(UserService)]
+        user_service: Annotated[UserService, Depends(UserService)],
+        timetable_cache: Annotated[TimetableCache, Depends(TimetableCache)]
     ):
         self.db = db
         self.user_service = user_service
+        self.timetable_cache = timetable_cache
 
     # --- Authorization Helper ---
 
@@ -64,9 +74,7 @@ class TimeTableService:
 
         elif current_user.role == UserRole.PARENT.value:
             # Parent can ONLY view their OWN students
-            # Using the relationship loaded by UserService
-            # (UserService.get_user_by_id eager loads students for Parents)
-            my_student_ids = [s.id for s in getattr(current_user, 'students', [])]
+            my_student_ids = await self.user_service.get_student_ids(current_user)
             
             if target_user_id in my_student_ids:
                 return target_user
@@ -104,31 +112,10 @@ class TimeTableService:
         Calculates the next occurrence of a slot relative to the user's timezone.
         db.day_of_week: 1 (Mon) to 7 (Sun).
         """
-        try:
-            tz = ZoneInfo(user_timezone)
-        except Exception:
-            log.warning(f"Invalid timezone '{user_timezone}', defaulting to UTC.")
-            tz = ZoneInfo("UTC")
-
-        now = datetime.now(tz)
-        today_idx = now.weekday() # 0=Mon, 6=Sun
-        
-        # Convert DB (1-7) to Python (0-6)
-        target_idx = day_of_week - 1
-        
-        # Calculate days ahead
-        days_ahead = (target_idx - today_idx + 7) % 7
-        
-        target_date = now.date() + timedelta(days=days_ahead)
-        
-        # Construct timezone-aware datetimes
-        start_dt = datetime.combine(target_date, start_time).replace(tzinfo=tz)
-        end_dt = datetime.combine(target_date, end_time).replace(tzinfo=tz)
-        
-        # Handle overnight slots (end_time < start_time)
-        if end_time <= start_time:
-            end_dt += timedelta(days=1)
-            
+        [(_, start_dt, end_dt)] = timetable_occurrences.next_occurrences(
+            [SimpleNamespace(day_of_week=day_of_week, start_time=start_time, end_time=end_time)],
+            timetable_occurrences.get_zone(user_timezone)
+        )
         return start_dt, end_dt
 
     def _get_day_name(self, day_of_week: int) -> str:
@@ -143,24 +130,29 @@ class TimeTableService:
     async def get_timetable_for_api(
         self,
         current_user: db_models.Users,
-        target_user_id: Optional[UUID] = None
+        target_user_id: Optional[UUID] = None,
+        window_start: Optional[datetime] = None,
+        window_end: Optional[datetime] = None
     ) -> list[timetable_models.TimeTableSlot]:
         """
         Fetches the latest timetable solution.
         - If Parent and target_user_id is None: Fetches for ALL their students.
         - Otherwise: Fetches for the specific target (or self).
         Applies masking based on the relationship between current_user and solution owner.
+        Without a window, returns each slot once with its next occurrence.
+        With [window_start, window_end), returns one entry per occurrence starting in it.
         """
-        
+        zone = timetable_occurrences.get_zone(current_user.timezone)
+        if window_start is not None or window_end is not None:
+            self._validate_window(window_start, window_end, zone)
+
         target_user_ids = []
 
         # 1. Determine Target Users
         if current_user.role == UserRole.PARENT.value and target_user_id is None:
             # Case: Parent viewing "All"
             log.info(f"Parent {current_user.id} fetching timetable for ALL students.")
-            # UserService loads 'students' for Parents eagerly.
-            students = getattr(current_user, 'students', [])
-            target_user_ids = [s.id for s in students]
+            target_user_ids = list(await self.user_service.get_student_ids(current_user))
             
             if not target_user_ids:
                 return [] # No students found
@@ -172,7 +164,84 @@ class TimeTableService:
             target_user_ids = [actual_target_id]
             log.info(f"User {current_user.id} fetching timetable for single target {actual_target_id}")
 
-        # 2. Fetch Latest Successful Run
+        # 2. Visible & masked slots of the latest run (cached)
+        _, base_slots = await self.get_visible_slots(current_user, target_user_ids)
+
+        # 3. Occurrences in the viewer's timezone (depend on the current time or window)
+        if window_start is None:
+            occurrences = timetable_occurrences.next_occurrences(base_slots, zone)
+        else:
+            occurrences = timetable_occurrences.expand_occurrences(base_slots, zone, window_start, window_end)
+
+        return [
+            timetable_models.TimeTableSlot(
+                **base.model_dump(),
+                next_occurrence_start=start_dt,
+                next_occurrence_end=end_dt
+            )
+            for base, start_dt, end_dt in occurrences
+        ]
+
+    async def get_visible_slots(
+        self,
+        current_user: db_models.Users,
+        target_user_ids: list[UUID]
+    ) -> tuple[Optional[int], list[timetable_models.TimeTableSlotBase]]:
+        """
+        Returns (latest run id, visible & masked slots of the targets) for an already
+        authorized viewer. Both come from the timetable cache when possible.
+        """
+        # 1. Latest Successful Run (cached for a few seconds)
+        run_id = await self.timetable_cache.latest_run_id(self._load_latest_run_id)
+        if not run_id:
+            log.warning("No successful timetable runs found.")
+            return None, []
+
+        # 2. Visible & masked slots for this viewer (cached per run)
+        generation, cached = await self.timetable_cache.lookup(run_id, current_user.id, target_user_ids)
+        if cached is not None:
+            return run_id, SLOT_LIST_ADAPTER.validate_json(cached)
+
+        # Rendered on the primary: slots read from a lagging replica would be cached under the new generation
+        async with primary_read_session(self.db) as fill_db:
+            renderer = self if fill_db is self.db else TimeTableService(
+                fill_db, UserService(fill_db), self.timetable_cache
+            )
+            base_slots = await renderer._render_slots(current_user, run_id, target_user_ids)
+        await self.timetable_cache.store(
+            generation, run_id, current_user.id, target_user_ids, SLOT_LIST_ADAPTER.dump_json(base_slots).decode()
+        )
+        return run_id, base_slots
+
+    def _validate_window(
+        self,
+        window_start: Optional[datetime],
+        window_end: Optional[datetime],
+        zone: ZoneInfo
+    ) -> None:
+        """Both bounds are required, in order, and at most TIMETABLE_MAX_RANGE_DAYS apart."""
+        if window_start is None or window_end is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Both 'from' and 'to' are required for a date range."
+            )
+        # Naive bounds are in the viewer's timezone
+        if window_start.tzinfo is None:
+            window_start = window_start.replace(tzinfo=zone)
+        if window_end.tzinfo is None:
+            window_end = window_end.replace(tzinfo=zone)
+        if window_end <= window_start:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="'to' must be after 'from'."
+            )
+        if window_end - window_start > timedelta(days=settings.TIMETABLE_MAX_RANGE_DAYS):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"The date range cannot exceed {settings.TIMETABLE_MAX_RANGE_DAYS} days."
+            )
+
+    async def _load_latest_run_id(self) -> Optional[int]:
         run_stmt = select(db_models.TimetableRuns.id).filter(
             db_models.TimetableRuns.status.in_([
                 RunStatusEnum.SUCCESS.value, 
@@ -181,107 +250,86 @@ class TimeTableService:
         ).order_by(db_models.TimetableRuns.id.desc()).limit(1)
         
         run_result = await self.db.execute(run_stmt)
-        run_id = run_result.scalar()
-        
-        if not run_id:
-            log.warning("No successful timetable runs found.")
-            return []
+        return run_result.scalar()
 
-        # 3. Fetch Solutions for ALL target IDs
-        solution_stmt = select(db_models.TimetableRunUserSolutions).options(
-            selectinload(db_models.TimetableRunUserSolutions.timetable_solution_slots)
-        ).filter(
-            db_models.TimetableRunUserSolutions.timetable_run_id == run_id,
-            db_models.TimetableRunUserSolutions.user_id.in_(target_user_ids)
-        )
-        
-        sol_result = await self.db.execute(solution_stmt)
-        solutions = sol_result.scalars().all()
-        
-        if not solutions:
-            log.info(f"No timetable solutions found for targets {target_user_ids} in run {run_id}.")
-            return []
+    async def _render_slots(
+        self,
+        current_user: db_models.Users,
+        run_id: int,
+        target_user_ids: list[UUID]
+    ) -> list[timetable_models.TimeTableSlotBase]:
+        """
+        Loads the targets' slots of the run with visibility and masking applied in SQL.
+        Only the returned columns are read. Sorted by day and time, without occurrences.
+        """
+        slots = db_models.TimetableSolutionSlots
+        solutions = db_models.TimetableRunUserSolutions
 
-        # 4. Process Slots
-        api_slots = []
-        
-        # We need to know current_user's children IDs to determine "Parent Proxy" visibility
+        # 1. Visibility Rules
+        # Parent Proxy: a parent sees their children's schedules in full
         my_student_ids = []
         if current_user.role == UserRole.PARENT.value:
-            my_student_ids = [s.id for s in getattr(current_user, 'students', [])]
+            my_student_ids = list(await self.user_service.get_student_ids(current_user))
 
-        for user_solution in solutions:
-            # The owner of this specific schedule (e.g., one of the students)
-            solution_owner_id = user_solution.user_id
-            
-            # Determine Proxy Access for THIS solution
-            # Parent is viewing a child's schedule -> Full Access
-            is_parent_proxy = (
-                current_user.role == UserRole.PARENT.value and
-                solution_owner_id in my_student_ids
-            )
+        is_visible = or_(
+            # Scenario A: Viewer is a direct participant (GIN index on participant_ids)
+            slots.participant_ids.op("@>")(postgresql.array([current_user.id], type_=Uuid)),
+            # Scenario B: Parent Proxy
+            solutions.user_id.in_(my_student_ids) if my_student_ids else false(),
+            # Scenario C: Self View
+            solutions.user_id == current_user.id
+        )
 
-            for slot_orm in user_solution.timetable_solution_slots:
-                
-                # --- VISIBILITY CHECK ---
-                is_visible = False
-                
-                # Scenario A: Viewer is a direct participant
-                if current_user.id in slot_orm.participant_ids:
-                    is_visible = True
-                
-                # Scenario B: Parent Proxy (Viewer is Parent of the Student who owns this slot)
-                elif is_parent_proxy:
-                     is_visible = True
-                
-                # Scenario C: Self View
-                elif current_user.id == solution_owner_id:
-                    is_visible = True
-
-                # --- MASKING LOGIC ---
-                if is_visible:
-                    slot_name = slot_orm.name
-                    
-                    # Determine Type
-                    if slot_orm.tuition_id:
-                        s_type = timetable_models.TimeTableSlotType.TUITION
-                        obj_uuid = slot_orm.tuition_id
-                    elif slot_orm.availability_interval_id:
-                        s_type = timetable_models.TimeTableSlotType.AVAILABILITY
-                        obj_uuid = slot_orm.availability_interval_id
-                    else:
-                        s_type = timetable_models.TimeTableSlotType.OTHER
-                        obj_uuid = None
-                else:
-                    # MASKED
-                    slot_name = "Others"
-                    s_type = timetable_models.TimeTableSlotType.OTHER
-                    obj_uuid = None
-
-                # --- DATE CALCULATION ---
-                # Use the viewer's timezone for display
-                start_dt, end_dt = self._calculate_next_occurrence(
-                    day_of_week=slot_orm.day_of_week,
-                    start_time=slot_orm.start_time,
-                    end_time=slot_orm.end_time,
-                    user_timezone=current_user.timezone
-                )
+        visible_slots = select(
+            slots.id,
+            solutions.user_id,
+            slots.name,
+            slots.day_of_week,
+            slots.start_time,
+            slots.end_time,
+            slots.tuition_id,
+            slots.availability_interval_id,
+            is_visible.label("is_visible")
+        ).join(
+            solutions, solutions.id == slots.solution_id
+        ).filter(
+            solutions.timetable_run_id == run_id,
+            solutions.user_id.in_(target_user_ids)
+        ).subquery()
 
-                api_slots.append(timetable_models.TimeTableSlot(
-                    id=slot_orm.id,
-                    user_id=solution_owner_id, # Added field
-                    name=slot_name,
-                    slot_type=s_type,
-                    day_of_week=slot_orm.day_of_week,
-                    day_name=self._get_day_name(slot_orm.day_of_week),
-                    start_time=slot_orm.start_time,
-                    end_time=slot_orm.end_time,
-                    object_uuid=obj_uuid,
-                    next_occurrence_start=start_dt,
-                    next_occurrence_end=end_dt
-                ))
-        # Sort by day and time for convenience
-        api_slots.sort(key=lambda x: (x.day_of_week, x.start_time))
-        
-        return api_slots
+        # 2. Masking Rules: hidden slots become an anonymous "Others"
+        v = visible_slots.c
+        stmt = select(
+            v.id,
+            v.user_id,
+            case((v.is_visible, v.name), else_="Others").label("name"),
+            case(
+                (and_(v.is_visible, v.tuition_id.is_not(None)), timetable_models.TimeTableSlotType.TUITION.value),
+                (and_(v.is_visible, v.availability_interval_id.is_not(None)), timetable_models.TimeTableSlotType.AVAILABILITY.value),
+                else_=timetable_models.TimeTableSlotType.OTHER.value
+            ).label("slot_type"),
+            v.day_of_week,
+            v.start_time,
+            v.end_time,
+            case((v.is_visible, func.coalesce(v.tuition_id, v.availability_interval_id))).label("object_uuid")
+        ).order_by(v.day_of_week, v.start_time, v.id)
 
+        rows = (await self.db.execute(stmt)).all()
+        if not rows:
+            log.info(f"No timetable solutions found for targets {target_user_ids} in run {run_id}.")
+            return []
+
+        return [
+            timetable_models.TimeTableSlotBase(
+                id=row.id,
+                user_id=row.user_id,
+                name=row.name,
+                slot_type=row.slot_type,
+                day_of_week=row.day_of_week,
+                day_name=self._get_day_name(row.day_of_week),
+                start_time=row.start_time,
+                end_time=row.end_time,
+                object_uuid=row.object_uuid
+            )
+            for row in rows
+        ]
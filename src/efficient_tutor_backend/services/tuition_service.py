@@ -2,13 +2,13 @@
 
 '''
 import hashlib
-from typing import Optional, Annotated, Any
+from typing import Optional, Annotated, Any, Iterable
 from uuid import UUID
 from decimal import Decimal
 from fastapi import Depends, HTTPException, status
-from sqlalchemy import select, delete, text
+from sqlalchemy import select, delete, update, insert, text, or_, exists
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import selectinload, aliased
 
 from ..database.engine import get_db_session
 from ..database import models as db_models
@@ -18,6 +18,8 @@ from ..models import user as user_models
 from ..models import meeting_links as meeting_link_models
 from ..common.logger import log
 from .user_service import UserService
+from .timetable_cache import TimetableCache, get_timetable_cache_backend
+from .relationship_index import relationship_index
 
 
 class TuitionService:
@@ -33,6 +35,14 @@ class TuitionService:
         self.db = db
         self.user_service = user_service
 
+    def _invalidate_timetables(self) -> None:
+        """Drops the cached timetables and feeds (which embed meeting links) once this session commits."""
+        TimetableCache(get_timetable_cache_backend()).invalidate_on_commit(self.db)
+
+    def _invalidate_relationships(self) -> None:
+        """Rotates the teacher/student/parent index once this session commits (charges changed)."""
+        relationship_index.invalidate_on_commit(self.db)
+
     # --- 1. Authorization Helpers ---
 
     def _authorize_write_access(self, tuition: db_models.Tuitions, current_user: db_models.Users):
@@ -124,9 +134,8 @@ class TuitionService:
                 stmt = stmt.filter(db_models.Tuitions.teacher_id == current_user.id)
             
             elif current_user.role == UserRole.PARENT.value:
-                # We must load the parent's students to filter
-                await self.db.refresh(current_user, ['students'])
-                student_ids = [student.id for student in current_user.students]
+                # We must know the parent's students to filter
+                student_ids = list(await self.user_service.get_student_ids(current_user))
                 if not student_ids:
                     return [] # This parent has no students
                 
@@ -293,6 +302,7 @@ class TuitionService:
             )
             self.db.add(new_link)
             await self.db.flush()
+            self._invalidate_timetables()
             
             # 5. Format and return
             return meeting_link_models.MeetingLinkRead.model_validate(new_link)
@@ -339,6 +349,7 @@ class TuitionService:
                 
             self.db.add(link_to_update)
             await self.db.flush()
+            self._invalidate_timetables()
             
             # 5. Format and return
             return meeting_link_models.MeetingLinkRead.model_validate(link_to_update)            
@@ -368,6 +379,7 @@ class TuitionService:
             # 4. Set relationship to None. The ORM's "delete-orphan" cascade will handle the deletion.
             tuition.meeting_link = None
             await self.db.flush()
+            self._invalidate_timetables()
             
             # 5. Return (will be a 204 No Content in the API)
             #TODO: implement an actual check here.
@@ -476,138 +488,21 @@ class TuitionService:
     async def regenerate_all_tuitions(self) -> bool:
         """
         REFACTORED: Regenerates all tuition templates based on the new
-        `StudentSubjects` and `student_subject_sharings` tables,
-        and preserves associated meeting links and costs.
+        `StudentSubjects` and `student_subject_sharings` tables.
+        The result is applied as a diff, so unchanged tuitions keep their meeting
+        links, charge costs and timetable slots.
         """
         log.info("Starting regeneration of all tuitions...")
         
         try:
-            # 1. Preserve old data in memory before deletion.
-            old_links_stmt = select(db_models.MeetingLinks)
-            old_links_result = await self.db.execute(old_links_stmt)
-            old_links = old_links_result.scalars().all()
-            old_links_dict = {link.tuition_id: link for link in old_links}
-            log.info(f"Preserved {len(old_links_dict)} existing meeting links.")
-            for link in old_links:
-                self.db.expunge(link)
-
-            old_charges_stmt = select(db_models.TuitionTemplateCharges)
-            old_charges_result = await self.db.execute(old_charges_stmt)
-            old_charges = old_charges_result.scalars().all()
-            old_charges_dict = {
-                (charge.tuition_id, charge.student_id): charge.cost 
-                for charge in old_charges
-            }
-            log.info(f"Preserved {len(old_charges_dict)} existing tuition charges.")
-            for charge in old_charges:
-                self.db.expunge(charge)
-
-            # 2. Fetch all student subject enrollments with necessary related data.
-            stmt = select(db_models.StudentSubjects).options(
-                selectinload(db_models.StudentSubjects.student).selectinload(db_models.Students.parent),
-                selectinload(db_models.StudentSubjects.teacher),
-                selectinload(db_models.StudentSubjects.shared_with_student).selectinload(db_models.Students.parent) # Critical for grouping
-            )
-            all_student_subjects = list((await self.db.execute(stmt)).scalars().all())
-            
-            if not all_student_subjects:
+            self._invalidate_relationships()
+            student_subjects = await self._load_student_subjects()
+            if not student_subjects:
                 log.warning("No student subjects found. Truncating tuitions and finishing.")
                 await self.db.execute(delete(db_models.Tuitions))
                 return True
 
-            # 3. Group students and generate new ORM objects
-            new_tuitions = []
-            new_charges = []
-            new_meeting_links = []
-            # Use a set to track students already assigned to a group for a specific subject/teacher/system/grade
-            # to avoid creating duplicate tuitions. Key: (student_id, subject, teacher_id, educational_system, grade)
-            processed_students = set()
-
-            for ss in all_student_subjects:
-                process_key = (ss.student_id, ss.subject, ss.teacher_id, ss.educational_system, ss.grade)
-                if process_key in processed_students:
-                    continue # This student has already been added to a group for this subject/teacher/system/grade
-
-                # This is a new group. The group consists of the main student
-                # plus all students they share this subject with.
-                group_students = [ss.student] + ss.shared_with_student
-                
-                # The teacher, subject, educational_system, and grade are the same for the whole group
-                teacher_id = ss.teacher_id
-                subject_name = ss.subject
-                educational_system = ss.educational_system
-                grade_for_group = ss.grade
-
-                # BUG 1 FIX: Calculate the max of min/max durations for the whole group
-                min_duration_for_group = max(s.min_duration_mins for s in group_students)
-                max_duration_for_group = max(s.max_duration_mins for s in group_students)
-
-                student_ids_in_group = sorted([s.id for s in group_students])
-
-                # BUG 2 FIX: Loop from 1 to lessons_per_week
-                for lesson_index in range(1, ss.lessons_per_week + 1):
-                    # Generate the deterministic ID based on all students in the group
-                    tuition_id = self._generate_deterministic_id(
-                        subject=subject_name,
-                        educational_system=educational_system,
-                        grade=grade_for_group,
-                        lesson_index=lesson_index, # Use the loop variable
-                        teacher_id=teacher_id,
-                        student_ids=student_ids_in_group
-                    )
-
-                    # Create the new Tuition object
-                    new_tuition = db_models.Tuitions(
-                        id=tuition_id,
-                        teacher_id=teacher_id,
-                        subject=subject_name,
-                        educational_system=educational_system,
-                        grade=grade_for_group,
-                        lesson_index=lesson_index, # Use the loop variable
-                        min_duration_minutes=min_duration_for_group, # Use calculated value
-                        max_duration_minutes=max_duration_for_group, # Use calculated value
-                    )
-                    new_tuitions.append(new_tuition)
-
-                    # Create charges for every student in the group
-                    for student_in_group in group_students:
-                        # Use preserved cost if available, otherwise fall back to student's current cost
-                        preserved_cost = old_charges_dict.get((tuition_id, student_in_group.id))
-                        cost_to_use = preserved_cost if preserved_cost is not None else student_in_group.cost
-
-                        new_charges.append(db_models.TuitionTemplateCharges(
-                            tuition_id=tuition_id,
-                            student_id=student_in_group.id,
-                            parent_id=student_in_group.parent_id,
-                            cost=cost_to_use
-                        ))
-
-                    # Check if a link existed for this deterministic ID and restore it
-                    if tuition_id in old_links_dict:
-                        old_link = old_links_dict[tuition_id]
-                        new_meeting_links.append(db_models.MeetingLinks(
-                            tuition_id=tuition_id, # Link to the new tuition
-                            meeting_link_type=old_link.meeting_link_type,
-                            meeting_link=old_link.meeting_link,
-                            meeting_id=old_link.meeting_id,
-                            meeting_password=old_link.meeting_password
-                        ))
-
-                # Mark all students in this group as processed for this subject/teacher combo
-                # This happens *after* the lesson_index loop
-                for student_in_group in group_students:
-                    processed_students.add((student_in_group.id, subject_name, teacher_id, educational_system, grade_for_group))
-
-            log.info(f"Generated {len(new_tuitions)} tuitions, {len(new_charges)} charges, and restored {len(new_meeting_links)} links.")
-
-            # 4. Perform the database transaction: wipe and recreate
-            await self.db.execute(delete(db_models.Tuitions))
-            
-            self.db.add_all(new_tuitions)
-            self.db.add_all(new_charges)
-            self.db.add_all(new_meeting_links)
-            
-            await self.db.flush()
+            await self._apply_tuition_plan(self._plan_tuitions(student_subjects), scope=None)
             log.info("Successfully regenerated all tuitions.")
             return True
 
@@ -615,6 +510,234 @@ class TuitionService:
             log.error(f"A critical error occurred during tuition regeneration: {e}", exc_info=True)
             raise
 
+    async def regenerate_tuitions_for_students(self, student_ids: Iterable[UUID]) -> bool:
+        """
+        Regenerates only the tuitions of the given students and of everyone
+        connected to them through sharing or a common tuition.
+        Tuitions outside that group are not touched.
+        """
+        student_ids = set(student_ids)
+        log.info(f"Starting targeted tuition regeneration for {len(student_ids)} students...")
+
+        try:
+            self._invalidate_relationships()
+
+            # 1. Expand to every student whose tuitions can change.
+            scope = await self.collect_regeneration_scope(student_ids)
+
+            # 2. Plan the tuitions of that group from their enrollments.
+            student_subjects = await self._load_student_subjects(scope)
+
+            # 3. Apply the difference against their current tuitions.
+            await self._apply_tuition_plan(self._plan_tuitions(student_subjects), scope=scope)
+            log.info(f"Successfully regenerated tuitions for {len(scope)} students.")
+            return True
+
+        except Exception as e:
+            log.error(f"A critical error occurred during targeted tuition regeneration: {e}", exc_info=True)
+            raise
+
+    async def collect_regeneration_scope(self, student_ids: Iterable[UUID]) -> set[UUID]:
+        """
+        Returns the given students plus every student connected to them, directly
+        or transitively, by a subject sharing or by being charged on the same tuition.
+        Call it *before* deleting a student, since the deletion removes those links.
+        """
+        sharings = db_models.t_student_subject_sharings
+        co_charges = aliased(db_models.TuitionTemplateCharges)
+
+        scope = set(student_ids)
+        frontier = set(scope)
+        while frontier:
+            found = set()
+
+            # Subjects owned by, or shared with, the frontier, and all their members
+            subjects_stmt = select(db_models.StudentSubjects.id, db_models.StudentSubjects.student_id).where(
+                or_(
+                    db_models.StudentSubjects.student_id.in_(frontier),
+                    db_models.StudentSubjects.id.in_(
+                        select(sharings.c.student_subject_id).where(sharings.c.shared_with_student_id.in_(frontier))
+                    )
+                )
+            )
+            subject_rows = (await self.db.execute(subjects_stmt)).all()
+            found.update(row.student_id for row in subject_rows)
+            if subject_rows:
+                partners_stmt = select(sharings.c.shared_with_student_id).where(
+                    sharings.c.student_subject_id.in_([row.id for row in subject_rows])
+                )
+                found.update((await self.db.execute(partners_stmt)).scalars().all())
+
+            # Students charged on the same tuitions as the frontier
+            co_billed_stmt = select(db_models.TuitionTemplateCharges.student_id).where(
+                db_models.TuitionTemplateCharges.tuition_id.in_(
+                    select(co_charges.tuition_id).where(co_charges.student_id.in_(frontier))
+                )
+            )
+            found.update((await self.db.execute(co_billed_stmt)).scalars().all())
+
+            frontier = found - scope
+            scope |= frontier
+
+        return scope
+
+    async def _load_student_subjects(self, student_ids: Optional[set[UUID]] = None) -> list[db_models.StudentSubjects]:
+        """
+        Fetches enrollments with the students needed for grouping, in a stable
+        order so the same groups are formed on every run.
+        """
+        stmt = select(db_models.StudentSubjects).options(
+            selectinload(db_models.StudentSubjects.student),
+            selectinload(db_models.StudentSubjects.shared_with_student) # Critical for grouping
+        ).order_by(db_models.StudentSubjects.id)
+        if student_ids is not None:
+            if not student_ids:
+                return []
+            stmt = stmt.filter(db_models.StudentSubjects.student_id.in_(student_ids))
+        return list((await self.db.execute(stmt)).scalars().all())
+
+    def _plan_tuitions(self, student_subjects: list[db_models.StudentSubjects]) -> dict[UUID, tuple[dict[str, Any], list[db_models.Students]]]:
+        """
+        Groups enrollments into tuitions.
+        Returns {deterministic tuition id: (tuition columns, students in the group)}.
+        """
+        planned = {}
+        # Use a set to track students already assigned to a group for a specific subject/teacher/system/grade
+        # to avoid creating duplicate tuitions. Key: (student_id, subject, teacher_id, educational_system, grade)
+        processed_students = set()
+
+        for ss in student_subjects:
+            process_key = (ss.student_id, ss.subject, ss.teacher_id, ss.educational_system, ss.grade)
+            if process_key in processed_students:
+                continue # This student has already been added to a group for this subject/teacher/system/grade
+
+            # This is a new group. The group consists of the main student
+            # plus all students they share this subject with.
+            group_students = [ss.student] + ss.shared_with_student
+            student_ids_in_group = sorted([s.id for s in group_students])
+
+            # The durations are the max of min/max durations for the whole group
+            min_duration_for_group = max(s.min_duration_mins for s in group_students)
+            max_duration_for_group = max(s.max_duration_mins for s in group_students)
+
+            for lesson_index in range(1, ss.lessons_per_week + 1):
+                tuition_id = self._generate_deterministic_id(
+                    subject=ss.subject,
+                    educational_system=ss.educational_system,
+                    grade=ss.grade,
+                    lesson_index=lesson_index,
+                    teacher_id=ss.teacher_id,
+                    student_ids=student_ids_in_group
+                )
+                planned[tuition_id] = ({
+                    "teacher_id": ss.teacher_id,
+                    "subject": ss.subject,
+                    "educational_system": ss.educational_system,
+                    "grade": ss.grade,
+                    "lesson_index": lesson_index,
+                    "min_duration_minutes": min_duration_for_group,
+                    "max_duration_minutes": max_duration_for_group,
+                }, group_students)
+
+            # Mark all students in this group as processed for this subject/teacher combo
+            for student_in_group in group_students:
+                processed_students.add((student_in_group.id, ss.subject, ss.teacher_id, ss.educational_system, ss.grade))
+
+        return planned
+
+    async def _apply_tuition_plan(
+        self,
+        planned: dict[UUID, tuple[dict[str, Any], list[db_models.Students]]],
+        scope: Optional[set[UUID]]
+    ) -> None:
+        """
+        Makes the stored tuitions match the plan with minimal writes:
+        - tuitions that are no longer planned are deleted (their links and slots cascade),
+        - new tuitions and charges are inserted with the student's current cost,
+        - kept tuitions and charges are only updated where a value changed, so
+          their meeting links, slots and (possibly customized) costs survive.
+        `scope` limits the existing tuitions considered to those charging these
+        students (plus tuitions without any charge). None means all tuitions.
+
+        Reads and writes are plain rows and bulk statements, not ORM objects, so a
+        full regeneration does not pay identity-map and unit-of-work costs per row.
+        """
+        charges = db_models.TuitionTemplateCharges
+        tuition_columns = [
+            db_models.Tuitions.teacher_id, db_models.Tuitions.subject, db_models.Tuitions.educational_system,
+            db_models.Tuitions.grade, db_models.Tuitions.lesson_index,
+            db_models.Tuitions.min_duration_minutes, db_models.Tuitions.max_duration_minutes,
+        ]
+
+        # 1. Fetch the current tuitions in scope, as rows.
+        existing_stmt = select(db_models.Tuitions.id, *tuition_columns)
+        if scope is not None:
+            existing_stmt = existing_stmt.filter(or_(
+                db_models.Tuitions.id.in_(select(charges.tuition_id).where(charges.student_id.in_(scope))),
+                ~exists().where(charges.tuition_id == db_models.Tuitions.id),
+                db_models.Tuitions.id.in_(list(planned.keys()))
+            ))
+        existing = {row.id: row._mapping for row in (await self.db.execute(existing_stmt)).all()}
+
+        kept_ids = existing.keys() & planned.keys()
+        old_charges = {}
+        if kept_ids:
+            charges_stmt = select(charges.id, charges.tuition_id, charges.student_id, charges.parent_id)
+            if scope is not None:
+                charges_stmt = charges_stmt.filter(charges.tuition_id.in_(kept_ids))
+            for row in (await self.db.execute(charges_stmt)).all():
+                if row.tuition_id in kept_ids:
+                    old_charges[(row.tuition_id, row.student_id)] = row
+
+        # 2. Diff the plan against them.
+        tuition_inserts = []
+        tuition_updates = []
+        charge_inserts = []
+        charge_updates = []
+        for tuition_id, (columns, group_students) in planned.items():
+            current = existing.get(tuition_id)
+            if current is None:
+                tuition_inserts.append({"id": tuition_id, **columns})
+            else:
+                changed = {key: value for key, value in columns.items() if current[key] != value}
+                if changed:
+                    tuition_updates.append({"id": tuition_id, **changed})
+
+            for student in group_students:
+                charge = old_charges.pop((tuition_id, student.id), None)
+                if charge is None:
+                    charge_inserts.append({
+                        "tuition_id": tuition_id,
+                        "student_id": student.id,
+                        "parent_id": student.parent_id,
+                        "cost": student.cost
+                    })
+                elif charge.parent_id != student.parent_id:
+                    charge_updates.append({"id": charge.id, "parent_id": student.parent_id})
+
+        stale_tuition_ids = list(existing.keys() - planned.keys())
+        stale_charge_ids = [charge.id for charge in old_charges.values()]
+
+        # 3. Write only the differences, in bulk.
+        if stale_tuition_ids:
+            await self.db.execute(delete(db_models.Tuitions).where(db_models.Tuitions.id.in_(stale_tuition_ids)))
+        if stale_charge_ids:
+            await self.db.execute(delete(charges).where(charges.id.in_(stale_charge_ids)))
+        if tuition_updates:
+            await self.db.execute(update(db_models.Tuitions), tuition_updates)
+        if charge_updates:
+            await self.db.execute(update(charges), charge_updates)
+        # Multi-row INSERT ... VALUES statements (batched by the driver's insertmanyvalues)
+        if tuition_inserts:
+            await self.db.execute(insert(db_models.Tuitions.__table__), tuition_inserts)
+        if charge_inserts:
+            await self.db.execute(insert(charges.__table__), charge_inserts)
+
+        log.info(
+            f"Tuition diff: {len(tuition_inserts)} added, {len(tuition_updates)} updated, {len(stale_tuition_ids)} deleted; "
+            f"charges: {len(charge_inserts)} added, {len(charge_updates)} updated, {len(stale_charge_ids)} deleted."
+        )
+
     def _generate_deterministic_id(self, subject: str, educational_system: str, grade: int, lesson_index: int, teacher_id: UUID, student_ids: list[UUID]) -> UUID:
         """
         Creates a stable, deterministic UUID for a tuition based on its core properties.
@@ -6,17 +6,24 @@ from typing import Optional, Annotated
 import uuid # Added this import
 from uuid import UUID
 from fastapi import Depends, HTTPException, status
-from sqlalchemy import select, delete
+from sqlalchemy import select, delete, update, func, or_, literal, Uuid
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from ..database.engine import get_db_session
 from ..database import models as db_models
 from ..database.db_enums import UserRole, LogStatusEnum, AdminPrivilegeType
+from ..common.config import settings
 from ..common.logger import log
 from ..models import user as user_models
 from ..common.security_utils import HashedPassword
 from .geo_service import GeoService
+from .geo_enrichment import GeoEnrichmentQueue, geo_enrichment_runner
+from .principal_cache import principal_cache, ROLE_CLASSES, STUDENT_IDS_ATTR
+from .timetable_cache import TimetableCache, get_timetable_cache_backend
+from .relationship_index import relationship_index
+from .ledger_service import LedgerService
+from .summary_cache import SummaryCache, get_summary_cache_backend
 
 
 class UserService:
@@ -177,6 +184,130 @@ class UserService:
             log.error(f"Database error fetching full users by ID list: {e}", exc_info=True)
             raise
 
+    async def get_user_for_auth(self, email: str) -> db_models.Users | None:
+        """
+        Lightweight fetch used by token verification: the concrete user (Parent,
+        Student, Teacher or Admin) without its relationships, plus the ids of a
+        parent's students. Handlers that need relationships load them explicitly.
+        """
+        log.info(f"Fetching user for token verification: {email}")
+        try:
+            # 1. Fetch the base user to determine their role.
+            base_stmt = select(db_models.Users).filter(db_models.Users.email == email)
+            base_user = (await self.db.execute(base_stmt)).scalars().first()
+            if not base_user:
+                return None
+
+            user_class = ROLE_CLASSES.get(base_user.role)
+            if user_class is None:
+                return base_user
+
+            # 2. Fetch the specific subclass, columns only.
+            stmt = select(user_class).filter(user_class.id == base_user.id)
+            user = (await self.db.execute(stmt)).scalars().first()
+
+            # 3. Parents: the ids of their students (used by the ownership checks).
+            if user and user.role == UserRole.PARENT.value:
+                ids_stmt = select(db_models.Students.id).filter(db_models.Students.parent_id == user.id)
+                setattr(user, STUDENT_IDS_ATTR, frozenset((await self.db.execute(ids_stmt)).scalars().all()))
+            return user
+
+        except Exception as e:
+            log.error(f"Database error fetching user for auth {email}: {e}", exc_info=True)
+            raise
+
+    async def get_student_ids(self, parent: db_models.Users) -> set[UUID]:
+        """
+        Returns the ids of a parent's students.
+        Uses the ids captured at authentication when present, otherwise a single
+        id-only query (instead of loading the relationship).
+        """
+        cached_ids = getattr(parent, STUDENT_IDS_ATTR, None)
+        if cached_ids is not None:
+            return set(cached_ids)
+        stmt = select(db_models.Students.id).filter(db_models.Students.parent_id == parent.id)
+        return set((await self.db.execute(stmt)).scalars().all())
+
+    def _purge_principals(self, *user_ids: Optional[UUID]) -> None:
+        """Drops cached authenticated users whose profile or children change in this session."""
+        principal_cache.purge_on_commit(self.db, user_ids)
+
+    async def _revoke_refresh_tokens(self, user_id: UUID) -> None:
+        """Revokes every refresh token of a user (after a password change)."""
+        await self.db.execute(
+            update(db_models.RefreshTokens)
+            .where(db_models.RefreshTokens.user_id == user_id, db_models.RefreshTokens.revoked_at.is_(None))
+            .values(revoked_at=func.now())
+        )
+
+    def _invalidate_relationships(self) -> None:
+        """Rotates the teacher/student/parent index once this session commits (deletions cascade to charges)."""
+        relationship_index.invalidate_on_commit(self.db)
+
+    async def _summary_counterparts(self, user_id: UUID) -> set[UUID]:
+        """
+        The users sharing a tuition or payment log with `user_id` (a parent,
+        student or teacher): their financial summaries change when it is deleted.
+        """
+        charges_with_teacher = select(
+            db_models.TuitionLogCharges.parent_id,
+            db_models.TuitionLogCharges.student_id,
+            db_models.TuitionLogs.teacher_id
+        ).join(
+            db_models.TuitionLogs, db_models.TuitionLogs.id == db_models.TuitionLogCharges.tuition_log_id
+        ).filter(or_(
+            db_models.TuitionLogCharges.parent_id == user_id,
+            db_models.TuitionLogCharges.student_id == user_id,
+            db_models.TuitionLogs.teacher_id == user_id
+        ))
+        payments = select(
+            db_models.PaymentLogs.parent_id,
+            literal(None, Uuid).label("student_id"),
+            db_models.PaymentLogs.teacher_id
+        ).filter(or_(
+            db_models.PaymentLogs.parent_id == user_id,
+            db_models.PaymentLogs.teacher_id == user_id
+        ))
+        rows = await self.db.execute(charges_with_teacher.union(payments))
+        return {related_id for row in rows for related_id in row if related_id} | {user_id}
+
+    async def _invalidate_summaries(self, user_ids: set[UUID]) -> None:
+        """Drops cached financial summaries now and once this session commits (deletions cascade to logs)."""
+        await SummaryCache(self.db, get_summary_cache_backend()).invalidate(user_ids)
+
+    def _signup_location(
+        self,
+        geo_service: GeoService,
+        ip_address: str,
+        timezone: Optional[str] = None,
+        currency: Optional[str] = None
+    ) -> tuple[dict, bool]:
+        """
+        The timezone and currency of a new user, without waiting on the network.
+        Returns (location, enrich_later): when the IP is not known offline, the
+        location holds provisional values (the submitted ones, else the defaults)
+        and the user must be queued with `_enrich_location_later` once created.
+        """
+        known = geo_service.get_known_location(ip_address)
+        location = {
+            "timezone": (known or {}).get("timezone") or timezone or settings.GEO_DEFAULT_TIMEZONE,
+            "currency": (known or {}).get("currency") or currency or settings.GEO_DEFAULT_CURRENCY,
+        }
+        return location, known is None
+
+    def _enrich_location_later(self, user: db_models.Users, ip_address: str) -> None:
+        """Queues the background geolocation of a new user (after this session commits)."""
+        GeoEnrichmentQueue(self.db, geo_enrichment_runner).enqueue(user, ip_address)
+
+    def _invalidate_timetables(self) -> None:
+        """Drops the cached timetables once this session commits (deleted intervals cascade to slots)."""
+        TimetableCache(get_timetable_cache_backend()).invalidate_on_commit(self.db)
+
+    def _invalidate_timetables_on_timezone_change(self, user: db_models.Users, update_dict: dict) -> None:
+        """Cached calendar feeds are rendered in the user's timezone."""
+        if update_dict.get("timezone") and update_dict["timezone"] != user.timezone:
+            self._invalidate_timetables()
+
     async def _get_user_by_email_with_password(self, email: str) -> db_models.Users | None:
         """ Fetches the base user object including the password hash. """
         log.info(f"Fetching user with password for auth: {email}")
@@ -217,13 +348,15 @@ class ParentService(UserService):
                 detail="Email already registered."
             )
 
-        # 2. Get timezone and currency from IP address
-        location_info = await self.geo_service.get_location_info(ip_address)
+        # 2. Get timezone and currency from IP address (offline, or provisional until enriched)
+        location_info, enrich_later = self._signup_location(
+            self.geo_service, ip_address, parent_data.timezone, parent_data.currency
+        )
         timezone = location_info["timezone"]
         currency = location_info["currency"]
 
         # 3. Hash password
-        hashed_password = HashedPassword.get_hash(parent_data.password)
+        hashed_password = await HashedPassword.get_hash_async(parent_data.password)
 
         # 4. Create the Parent ORM object
         new_parent = db_models.Parents(
@@ -240,6 +373,8 @@ class ParentService(UserService):
         # 5. Add parent, commit, and refresh
         self.db.add(new_parent)
         await self.db.flush()
+        if enrich_later:
+            self._enrich_location_later(new_parent, ip_address)
         
         # Refresh the new parent to load all relationships for the response model
         await self.db.refresh(new_parent, ['students']) # Eager load students for ParentRead
@@ -291,15 +426,18 @@ class ParentService(UserService):
         # 3. Apply updates
         update_dict = update_data.model_dump(exclude_unset=True)
 
+        self._invalidate_timetables_on_timezone_change(parent_to_update, update_dict)
         for key, value in update_dict.items():
             if key == "password":
                 if value: # Ensure password is not empty
-                    setattr(parent_to_update, key, HashedPassword.get_hash(value))
+                    setattr(parent_to_update, key, await HashedPassword.get_hash_async(value))
+                    await self._revoke_refresh_tokens(parent_to_update.id)
             elif hasattr(parent_to_update, key):
                 setattr(parent_to_update, key, value)
 
         self.db.add(parent_to_update)
         await self.db.flush()
+        self._purge_principals(parent_to_update.id)
         await self.db.refresh(parent_to_update)
 
         # 4. Return updated data using the read model
@@ -339,9 +477,12 @@ class ParentService(UserService):
                 detail="Cannot delete a parent with associated students. Please reassign or delete the students first."
             )
 
-        # 4. Delete the parent
+        # 4. Delete the parent (its logs cascade)
+        summary_user_ids = await self._summary_counterparts(parent_id)
         await self.db.delete(parent_to_delete)
         await self.db.flush()
+        self._purge_principals(parent_id)
+        await self._invalidate_summaries(summary_user_ids)
         
         log.info(f"Successfully deleted parent {parent_id}.")
         return True
@@ -491,7 +632,7 @@ class StudentService(UserService):
 
         # 4. Generate password
         plain_password = secrets.token_urlsafe(6) # 8 characters
-        hashed_password = HashedPassword.get_hash(plain_password)
+        hashed_password = await HashedPassword.get_hash_async(plain_password)
 
         # 5. Create the Student ORM object
         new_student = db_models.Students(
@@ -567,6 +708,7 @@ class StudentService(UserService):
         # 7. Add student, commit, and refresh
         self.db.add(new_student)
         await self.db.flush()
+        self._purge_principals(new_student.parent_id)
         
         # Re-fetch the new student with all necessary relationships eagerly loaded
         new_student = await self.db.execute(
@@ -663,10 +805,12 @@ class StudentService(UserService):
         # which might only load base student fields without relationships.
         # This is crucial for accessing relationships later for deletion/replacement
         student_to_update = await self.get_user_by_id(student_id) # Re-fetch to ensure eager loading
+        old_parent_id = student_to_update.parent_id
 
         # 2. Apply updates to simple fields (on Users and Students tables)
         update_dict = update_data.model_dump(exclude_unset=True)
 
+        self._invalidate_timetables_on_timezone_change(student_to_update, update_dict)
         for key, value in update_dict.items():
             if key in ['email', 'first_name', 'last_name', 'timezone']:
                 setattr(student_to_update, key, value)
@@ -689,6 +833,7 @@ class StudentService(UserService):
             await self.db.execute(
                 delete(db_models.AvailabilityIntervals).filter_by(user_id=student_to_update.id)
             )
+            self._invalidate_timetables()
             # Clear the in-memory collection and flush deletions
             student_to_update.availability_intervals.clear()
             await self.db.flush()
@@ -757,6 +902,9 @@ class StudentService(UserService):
 
         self.db.add(student_to_update)
         await self.db.flush()
+        self._purge_principals(student_id, old_parent_id, student_to_update.parent_id)
+        if student_to_update.parent_id != old_parent_id:
+            self._invalidate_relationships()
 
         # Re-fetch the student to get all updated relationships
         updated_student = await self.get_user_by_id(student_id)
@@ -896,6 +1044,7 @@ class StudentService(UserService):
 
         await self.db.delete(interval)
         await self.db.flush()
+        self._invalidate_timetables()
         return True
 
     async def delete_student(
@@ -933,9 +1082,16 @@ class StudentService(UserService):
                 detail="You do not have permission to delete students."
             )
         
-        # 2. Delete the student
+        # 2. Delete the student (its charges cascade out of the ledger)
+        ledger_service = LedgerService(self.db)
+        ledger_pairs = await ledger_service.pairs_of_student(student_id)
+        summary_user_ids = await self._summary_counterparts(student_id)
         await self.db.delete(student_to_delete)
         await self.db.flush()
+        await ledger_service.resync_pairs(ledger_pairs)
+        self._purge_principals(student_id, student_to_delete.parent_id)
+        await self._invalidate_summaries(summary_user_ids)
+        self._invalidate_relationships()
         
         return True
 
@@ -1152,8 +1308,10 @@ class TeacherService(UserService):
                 detail="Email already registered."
             )
 
-        location_info = await self.geo_service.get_location_info(ip_address)
-        hashed_password = HashedPassword.get_hash(teacher_data.password)
+        location_info, enrich_later = self._signup_location(
+            self.geo_service, ip_address, teacher_data.timezone, teacher_data.currency
+        )
+        hashed_password = await HashedPassword.get_hash_async(teacher_data.password)
 
         new_teacher = db_models.Teachers(
             id=uuid.uuid4(),
@@ -1189,6 +1347,8 @@ class TeacherService(UserService):
 
         self.db.add(new_teacher)
         await self.db.flush()
+        if enrich_later:
+            self._enrich_location_later(new_teacher, ip_address)
         
         # Refresh to load relationships, including the new specialties
         await self.db.refresh(new_teacher, ['teacher_specialties', 'availability_intervals'])
@@ -1225,9 +1385,11 @@ class TeacherService(UserService):
 
         update_dict = update_data.model_dump(exclude_unset=True)
 
+        self._invalidate_timetables_on_timezone_change(teacher_to_update, update_dict)
         for key, value in update_dict.items():
             if key == "password" and value:
-                setattr(teacher_to_update, key, HashedPassword.get_hash(value))
+                setattr(teacher_to_update, key, await HashedPassword.get_hash_async(value))
+                await self._revoke_refresh_tokens(teacher_to_update.id)
             elif key == "availability_intervals":
                 continue # Handled separately
             elif hasattr(teacher_to_update, key):
@@ -1238,6 +1400,7 @@ class TeacherService(UserService):
             await self.db.execute(
                 delete(db_models.AvailabilityIntervals).filter_by(user_id=teacher_to_update.id)
             )
+            self._invalidate_timetables()
             teacher_to_update.availability_intervals.clear()
             await self.db.flush()
 
@@ -1253,6 +1416,7 @@ class TeacherService(UserService):
 
         self.db.add(teacher_to_update)
         await self.db.flush()
+        self._purge_principals(teacher_to_update.id)
         await self.db.refresh(teacher_to_update, ['teacher_specialties', 'availability_intervals'])
 
         return user_models.TeacherRead.model_validate(teacher_to_update)
@@ -1344,6 +1508,7 @@ class TeacherService(UserService):
 
         await self.db.delete(interval)
         await self.db.flush()
+        self._invalidate_timetables()
         return True
 
     async def delete_teacher(self, teacher_id: UUID, current_user: db_models.Users) -> bool:
@@ -1383,8 +1548,16 @@ class TeacherService(UserService):
                 detail="Cannot delete a teacher with active tuition logs. Please void or reassign them first."
             )
 
+        # Its wallets cascade and its payments are detached
+        ledger_service = LedgerService(self.db)
+        ledger_pairs = await ledger_service.pairs_of_teacher(teacher_id)
+        summary_user_ids = await self._summary_counterparts(teacher_id)
         await self.db.delete(teacher_to_delete)
         await self.db.flush()
+        await ledger_service.resync_pairs(ledger_pairs)
+        self._purge_principals(teacher_id)
+        await self._invalidate_summaries(summary_user_ids)
+        self._invalidate_relationships()
 
         # Verify the deletion
         check_user = await self.get_user_by_id(teacher_id)
@@ -1581,8 +1754,8 @@ class AdminService(UserService):
                 detail="Email already registered."
             )
 
-        location_info = await self.geo_service.get_location_info(ip_address)
-        hashed_password = HashedPassword.get_hash(admin_data.password)
+        location_info, enrich_later = self._signup_location(self.geo_service, ip_address, admin_data.timezone)
+        hashed_password = await HashedPassword.get_hash_async(admin_data.password)
 
         new_admin = db_models.Admins(
             id=uuid.uuid4(),
@@ -1597,6 +1770,8 @@ class AdminService(UserService):
 
         self.db.add(new_admin)
         await self.db.flush()
+        if enrich_later:
+            self._enrich_location_later(new_admin, ip_address)
         await self.db.refresh(new_admin)
 
         return user_models.AdminRead.model_validate(new_admin)
@@ -1635,9 +1810,11 @@ class AdminService(UserService):
             if update_data.privileges == AdminPrivilegeType.MASTER.value or update_data.privileges == AdminPrivilegeType.MASTER:
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot assign Master privilege. This must be done via a dedicated transfer process.")
 
+        self._invalidate_timetables_on_timezone_change(admin_to_update, update_dict)
         for key, value in update_dict.items():
             if key == "password" and value:
-                setattr(admin_to_update, key, HashedPassword.get_hash(value))
+                setattr(admin_to_update, key, await HashedPassword.get_hash_async(value))
+                await self._revoke_refresh_tokens(admin_to_update.id)
             elif key == "privileges" and value:
                 setattr(admin_to_update, key, value.value)
             elif value is not None:
@@ -1645,6 +1822,7 @@ class AdminService(UserService):
 
         self.db.add(admin_to_update)
         await self.db.flush()
+        self._purge_principals(admin_to_update.id)
         await self.db.refresh(admin_to_update)
 
         return user_models.AdminRead.model_validate(admin_to_update)
@@ -1676,6 +1854,7 @@ class AdminService(UserService):
         try:
             await self.db.delete(admin_to_delete)
             await self.db.flush()
+            self._purge_principals(admin_id)
             log.info(f"Successfully deleted admin {admin_id}.")
             return True
         except Exception as e:
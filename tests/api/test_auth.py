@@ -136,6 +136,68 @@ class TestAuthLoginAPI:
         print("Login for non-existent user failed as expected.")
 
 
+@pytest.mark.anyio
+class TestAuthRefreshAPI:
+    """
+    Tests for refresh tokens (/auth/refresh and /auth/logout).
+    """
+
+    def _login(self, client: TestClient, user: db_models.Users, password: str) -> dict:
+        response = client.post("/auth/login", data={"username": user.email, "password": password})
+        assert response.status_code == 200, response.json()
+        return response.json()
+
+    async def test_refresh_rotates_the_token(
+        self,
+        client: TestClient,
+        test_parent_orm: db_models.Parents
+    ):
+        """A refresh returns a new pair, and the new access token works."""
+        tokens = self._login(client, test_parent_orm, TEST_PASSWORD_PARENT)
+        assert tokens["refresh_token"]
+
+        response = client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+
+        assert response.status_code == 200, response.json()
+        renewed = response.json()
+        assert renewed["refresh_token"] != tokens["refresh_token"]
+        me = client.get("/users/me", headers={"Authorization": f"Bearer {renewed['access_token']}"})
+        assert me.status_code == 200, me.json()
+
+    async def test_reused_token_revokes_the_family(
+        self,
+        client: TestClient,
+        test_parent_orm: db_models.Parents
+    ):
+        """Presenting a rotated token again revokes every token of that login."""
+        tokens = self._login(client, test_parent_orm, TEST_PASSWORD_PARENT)
+        renewed = client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]}).json()
+
+        reused = client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+        assert reused.status_code == 401
+
+        # The legitimate successor was revoked with the family
+        successor = client.post("/auth/refresh", json={"refresh_token": renewed["refresh_token"]})
+        assert successor.status_code == 401
+
+    async def test_logout_revokes_the_token(
+        self,
+        client: TestClient,
+        test_teacher_orm: db_models.Teachers
+    ):
+        tokens = self._login(client, test_teacher_orm, TEST_PASSWORD_TEACHER)
+
+        response = client.post("/auth/logout", json={"refresh_token": tokens["refresh_token"]})
+        assert response.status_code == 204
+
+        refreshed = client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+        assert refreshed.status_code == 401
+
+    async def test_unknown_token(self, client: TestClient):
+        response = client.post("/auth/refresh", json={"refresh_token": "not-a-token"})
+        assert response.status_code == 401
+
+
 @pytest.mark.anyio
 class TestAuthSignupAPI:
     """
@@ -0,0 +1,50 @@
+"""
+Tests for the operational System API endpoints.
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+from src.efficient_tutor_backend.database import models as db_models
+from src.efficient_tutor_backend.services.security import JWTHandler
+
+
+def auth_headers_for_user(user: db_models.Users) -> dict[str, str]:
+    """Helper to create auth headers for a given user."""
+    token = JWTHandler.create_access_token(subject=user.email)
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.mark.anyio
+class TestSystemAPIDbPool:
+    """Test class for GET /system/db-pool."""
+
+    async def test_db_pool_metrics_as_admin(
+        self,
+        client: TestClient,
+        test_admin_orm: db_models.Users
+    ):
+        headers = auth_headers_for_user(test_admin_orm)
+        # Any request through the app is counted per route
+        client.get("/users/me", headers=headers)
+
+        response = client.get("/system/db-pool", headers=headers)
+        assert response.status_code == 200, response.json()
+        data = response.json()
+        print(data)
+
+        assert data["pool"]["class"] == "InstrumentedAsyncQueuePool"
+        assert data["checkouts"] >= 1
+        assert sum(data["wait_ms"]["histogram"].values()) >= data["checkouts"]
+        assert "GET /users/me" in data["routes"]
+        assert data["config"]["max_connections_per_worker"] == (
+            data["config"]["pool_size"] + data["config"]["max_overflow"]
+        )
+
+    async def test_db_pool_metrics_as_teacher_forbidden(
+        self,
+        client: TestClient,
+        test_teacher_orm: db_models.Users
+    ):
+        headers = auth_headers_for_user(test_teacher_orm)
+        response = client.get("/system/db-pool", headers=headers)
+        assert response.status_code == 403
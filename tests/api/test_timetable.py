@@ -4,6 +4,7 @@ from uuid import UUID, uuid4
 
 from src.efficient_tutor_backend.database import models as db_models
 from src.efficient_tutor_backend.services.security import JWTHandler
+from src.efficient_tutor_backend.services.calendar_feed_service import CalendarFeedService
 from src.efficient_tutor_backend.models import timetable as timetable_models
 from tests.constants import (
     TEST_TUITION_ID, 
@@ -256,6 +257,91 @@ class TestTimetableAPIForbidden:
         assert "Students cannot view other users" in response.json()["detail"]
 
 
+@pytest.mark.anyio
+class TestTimetableAPIRange:
+    """Tests for GET /timetable/?from=...&to=..."""
+
+    async def test_get_timetable_range(
+        self,
+        client: TestClient,
+        test_student_orm: db_models.Students
+    ):
+        """Two weeks of occurrences: every slot twice."""
+        headers = auth_headers_for_user(test_student_orm)
+        weekly = client.get("/timetable/", headers=headers).json()
+
+        response = client.get("/timetable/", headers=headers, params={"from": "2026-01-05", "to": "2026-01-19"})
+
+        assert response.status_code == 200, response.json()
+        data = response.json()
+        assert len(data) == 2 * len(weekly)
+        math_starts = [s["next_occurrence_start"] for s in data if s["id"] == str(TEST_SLOT_ID_STUDENT_MATH)]
+        assert len(math_starts) == 2
+        pprint(math_starts)
+
+    async def test_get_timetable_range_needs_both_bounds(
+        self,
+        client: TestClient,
+        test_student_orm: db_models.Students
+    ):
+        """400 when only one bound is given."""
+        headers = auth_headers_for_user(test_student_orm)
+        response = client.get("/timetable/", headers=headers, params={"from": "2026-01-05"})
+        assert response.status_code == 400
+
+
+@pytest.mark.anyio
+class TestTimetableAPIFeed:
+    """Tests for the iCalendar feed (/timetable/feed-url, /timetable/feed-url/rotate and /timetable/feed/...)."""
+
+    async def test_feed_url_and_conditional_get(
+        self,
+        client: TestClient,
+        test_student_orm: db_models.Students
+    ):
+        """The feed URL serves the calendar, then 304 for the same ETag."""
+        headers = auth_headers_for_user(test_student_orm)
+        url = client.get("/timetable/feed-url", headers=headers).json()["url"]
+
+        # No Authorization header: the token in the URL is the credential
+        response = client.get(url)
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/calendar")
+        assert f"UID:{TEST_SLOT_ID_STUDENT_MATH}-" in response.text
+        etag = response.headers["etag"]
+
+        cached = client.get(url, headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+        assert cached.content == b""
+
+    async def test_feed_with_wrong_token(
+        self,
+        client: TestClient,
+        test_student_orm: db_models.Students
+    ):
+        """404 for a token that belongs to another user."""
+        token = CalendarFeedService.feed_token(uuid4(), 0)
+        response = client.get(f"/timetable/feed/{test_student_orm.id}/{token}.ics")
+        assert response.status_code == 404
+
+    async def test_rotated_feed_url(
+        self,
+        client: TestClient,
+        test_student_orm: db_models.Students
+    ):
+        """POST /feed-url/rotate returns a new URL (the revocation itself is covered by the service tests)."""
+        headers = auth_headers_for_user(test_student_orm)
+        old_url = client.get("/timetable/feed-url", headers=headers).json()["url"]
+
+        response = client.post("/timetable/feed-url/rotate", headers=headers)
+
+        assert response.status_code == 200
+        new_url = response.json()["url"]
+        assert new_url != old_url
+        assert new_url.startswith(old_url.rsplit("/", 1)[0])
+
+
 @pytest.mark.anyio
 class TestTimetableAPIError:
     """Tests for Error scenarios (404, 401)."""
@@ -212,3 +212,24 @@ class TestTuitionRegeneration:
         headers = auth_headers_for_user(test_parent_orm)
         response = client.post("/tuitions/regenerate", headers=headers)
         assert response.status_code == 403
+
+    async def test_regeneration_status_as_admin(
+        self, client: TestClient, test_admin_orm: db_models.Users
+    ):
+        """Test that an admin can read the background regeneration status."""
+        headers = auth_headers_for_user(test_admin_orm)
+        response = client.get("/tuitions/regenerate/status", headers=headers)
+        assert response.status_code == 200, response.json()
+        data = response.json()
+        print(data)
+        assert "running" in data
+        assert "queued" in data
+        assert isinstance(data["recent"], list)
+
+    async def test_regeneration_status_as_teacher_forbidden(
+        self, client: TestClient, test_teacher_orm: db_models.Users
+    ):
+        """Test that a teacher cannot read the regeneration status."""
+        headers = auth_headers_for_user(test_teacher_orm)
+        response = client.get("/tuitions/regenerate/status", headers=headers)
+        assert response.status_code == 403
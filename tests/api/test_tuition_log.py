@@ -1,3 +1,4 @@
+import json
 import pytest
 from fastapi.testclient import TestClient
 from uuid import UUID, uuid4
@@ -6,6 +7,7 @@ from datetime import datetime, timedelta, timezone
 from src.efficient_tutor_backend.database import models as db_models
 from src.efficient_tutor_backend.database.db_enums import LogStatusEnum
 from src.efficient_tutor_backend.services.security import JWTHandler
+from src.efficient_tutor_backend.common.config import settings
 from src.efficient_tutor_backend.models import finance as finance_models
 from src.efficient_tutor_backend.database.db_enums import EducationalSystemEnum
 from tests.constants import (
@@ -636,3 +638,117 @@ class TestTuitionLogsAPIGetListWithFilters:
         print("Parent was correctly forbidden from filtering by another parent.")
 
 
+
+
+@pytest.mark.anyio
+class TestTuitionLogsAPIPagination:
+    """Tests for keyset pagination and NDJSON streaming of the list endpoint."""
+
+    async def test_pages_cover_the_full_list(
+        self, client: TestClient, test_teacher_orm: db_models.Teachers
+    ):
+        """Walking the pages with X-Next-Cursor returns the same logs as the unpaginated list."""
+        headers = auth_headers_for_user(test_teacher_orm)
+        full_ids = [log["id"] for log in client.get("/tuition-logs/", headers=headers).json()]
+
+        paged_ids = []
+        params = {"limit": 2}
+        while True:
+            response = client.get("/tuition-logs/", headers=headers, params=params)
+            assert response.status_code == 200, response.json()
+            paged_ids.extend(log["id"] for log in response.json())
+            next_cursor = response.headers.get("X-Next-Cursor")
+            if not next_cursor:
+                break
+            params = {"limit": 2, "cursor": next_cursor}
+
+        print(f"Collected {len(paged_ids)} logs over pages of 2.")
+        assert paged_ids == full_ids
+
+    async def test_date_range_filter(
+        self, client: TestClient, test_teacher_orm: db_models.Teachers
+    ):
+        """Only logs starting inside [start_from, start_to) are returned."""
+        headers = auth_headers_for_user(test_teacher_orm)
+        all_logs = client.get("/tuition-logs/", headers=headers).json()
+        pivot = all_logs[len(all_logs) // 2]["start_time"]
+
+        response = client.get("/tuition-logs/", headers=headers, params={"start_from": pivot})
+        assert response.status_code == 200, response.json()
+        assert all(
+            datetime.fromisoformat(log["start_time"]) >= datetime.fromisoformat(pivot)
+            for log in response.json()
+        )
+
+    async def test_invalid_cursor_is_rejected(
+        self, client: TestClient, test_teacher_orm: db_models.Teachers
+    ):
+        headers = auth_headers_for_user(test_teacher_orm)
+        response = client.get("/tuition-logs/", headers=headers, params={"cursor": "not-a-cursor"})
+        assert response.status_code == 400
+
+    async def test_stream_returns_ndjson(
+        self, client: TestClient, test_teacher_orm: db_models.Teachers
+    ):
+        """The streamed export has one JSON object per line, in list order."""
+        headers = auth_headers_for_user(test_teacher_orm)
+        full_ids = [log["id"] for log in client.get("/tuition-logs/", headers=headers).json()]
+
+        response = client.get("/tuition-logs/", headers=headers, params={"stream": True})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+
+        streamed_ids = [json.loads(line)["id"] for line in response.text.splitlines() if line]
+        print(f"Streamed {len(streamed_ids)} logs.")
+        assert streamed_ids == full_ids
+
+
+@pytest.mark.anyio
+class TestTuitionLogsAPIQueryBudget:
+    """The endpoints report their query count; keep them within a fixed budget."""
+
+    async def test_list_logs_within_query_budget(
+        self, client: TestClient, test_teacher_orm: db_models.Teachers, query_budget
+    ):
+        headers = auth_headers_for_user(test_teacher_orm)
+        response = client.get("/tuition-logs/", headers=headers)
+        assert response.status_code == 200, response.json()
+        assert "X-DB-Time-Ms" in response.headers
+        query_budget.check(response, 8)
+
+    async def test_create_scheduled_log_within_query_budget(
+        self, client: TestClient, test_teacher_orm: db_models.Teachers,
+        test_tuition_orm: db_models.Tuitions, query_budget
+    ):
+        headers = auth_headers_for_user(test_teacher_orm)
+        start_time = datetime.now(timezone.utc)
+        payload = {
+            "log_type": "SCHEDULED",
+            "tuition_id": str(test_tuition_orm.id),
+            "start_time": start_time.isoformat(),
+            "end_time": (start_time + timedelta(hours=1)).isoformat(),
+        }
+        response = client.post("/tuition-logs/", headers=headers, json=payload)
+        assert response.status_code == 201, response.json()
+        query_budget.check(response, 15)
+
+
+@pytest.mark.anyio
+class TestTuitionLogsAPISerialization:
+    """The fast serialization path returns exactly what the validated path returns."""
+
+    async def test_fast_path_matches_validated_path(
+        self, client: TestClient, test_teacher_orm: db_models.Teachers,
+        test_parent_orm: db_models.Parents, monkeypatch
+    ):
+        for user in (test_teacher_orm, test_parent_orm):
+            headers = auth_headers_for_user(user)
+            monkeypatch.setattr(settings, "FAST_SERIALIZATION", True)
+            fast = client.get("/tuition-logs/", headers=headers)
+
+            monkeypatch.setattr(settings, "FAST_SERIALIZATION", False)
+            validated = client.get("/tuition-logs/", headers=headers)
+
+            assert fast.status_code == validated.status_code == 200
+            print(f"{user.role}: {len(fast.json())} logs, {len(fast.content)} bytes")
+            assert fast.json() == validated.json()
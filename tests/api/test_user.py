@@ -6,6 +6,7 @@ from fastapi.testclient import TestClient
 
 from src.efficient_tutor_backend.database import models as db_models
 from src.efficient_tutor_backend.services.security import JWTHandler
+from src.efficient_tutor_backend.services.principal_cache import principal_cache, verified_token_cache
 from tests.constants import TEST_TEACHER_ID
 
 
@@ -37,3 +38,84 @@ class TestUserAPIGET:
         
         print(f"Successfully retrieved profile for user {test_teacher_orm.email}")
 
+
+
+@pytest.mark.anyio
+class TestUserAPIPrincipalCache:
+    """Repeated requests with the same token are served from the principal cache."""
+
+    async def test_users_me_served_from_principal_cache(
+        self,
+        client: TestClient,
+        test_parent_orm: db_models.Parents,
+    ):
+        headers = auth_headers_for_user(test_parent_orm)
+
+        first = client.get("/users/me", headers=headers)
+        assert first.status_code == 200
+
+        principal = principal_cache.get(test_parent_orm.email)
+        assert principal is not None
+        assert principal.id == test_parent_orm.id
+        assert "password" not in principal.columns
+        print(f"Cached student ids: {principal.student_ids}")
+        assert principal.student_ids == {s.id for s in test_parent_orm.students}
+
+        second = client.get("/users/me", headers=headers)
+        assert second.status_code == 200
+        assert second.json() == first.json()
+
+    async def test_principal_purged_on_update(
+        self,
+        client: TestClient,
+        test_teacher_orm: db_models.Teachers,
+    ):
+        headers = auth_headers_for_user(test_teacher_orm)
+        assert client.get("/users/me", headers=headers).status_code == 200
+        assert principal_cache.get(test_teacher_orm.email) is not None
+
+        response = client.patch(
+            f"/teachers/{test_teacher_orm.id}",
+            json={"first_name": "Cached"},
+            headers=headers
+        )
+        assert response.status_code == 200, response.json()
+        assert principal_cache.get(test_teacher_orm.email) is None
+
+        me = client.get("/users/me", headers=headers)
+        assert me.json()["first_name"] == "Cached"
+
+    async def test_verified_token_skips_decode(
+        self,
+        client: TestClient,
+        test_parent_orm: db_models.Parents,
+        monkeypatch
+    ):
+        headers = auth_headers_for_user(test_parent_orm)
+        assert client.get("/users/me", headers=headers).status_code == 200
+        token = headers["Authorization"].removeprefix("Bearer ")
+        assert verified_token_cache.get(verified_token_cache.digest(token)).user_id == test_parent_orm.id
+
+        def fail_decode(token):
+            raise AssertionError("The token should come from the verified token cache.")
+        monkeypatch.setattr(JWTHandler, "decode_token", staticmethod(fail_decode))
+
+        assert client.get("/users/me", headers=headers).status_code == 200
+
+    async def test_verified_token_purged_on_update(
+        self,
+        client: TestClient,
+        test_teacher_orm: db_models.Teachers,
+    ):
+        headers = auth_headers_for_user(test_teacher_orm)
+        token = headers["Authorization"].removeprefix("Bearer ")
+        assert client.get("/users/me", headers=headers).status_code == 200
+        assert verified_token_cache.get(verified_token_cache.digest(token)) is not None
+
+        response = client.patch(
+            f"/teachers/{test_teacher_orm.id}",
+            json={"first_name": "Purged"},
+            headers=headers
+        )
+        assert response.status_code == 200, response.json()
+        assert verified_token_cache.get(verified_token_cache.digest(token)) is None
@@ -6,6 +6,7 @@ This file sets up fixtures for:
 2. Providing a clean, isolated, and rolled-back database session for each test.
 3. Providing a FastAPI TestClient for endpoint testing.
 4. Providing instances of all service classes, pre-injected with a test db session.
+5. Asserting query budgets (N+1 guard) on services and endpoints.
 '''
 
 import pytest
@@ -13,6 +14,7 @@ import os
 from typing import AsyncGenerator
 from datetime import time
 import uuid
+from contextlib import contextmanager
 from unittest.mock import AsyncMock, MagicMock
 
 # --- FastAPI & Testing Imports ---
@@ -48,6 +50,7 @@ from tests.constants import (
 from src.efficient_tutor_backend.main import app
 from src.efficient_tutor_backend.common.config import settings
 from src.efficient_tutor_backend.database.engine import get_db_session
+from src.efficient_tutor_backend.database.metrics import count_queries
 from src.efficient_tutor_backend.database.db_enums import (
         SubjectEnum,
         UserRole,
@@ -65,13 +68,20 @@ from src.efficient_tutor_backend.services.user_service import (
 )
 from src.efficient_tutor_backend.services.tuition_service import TuitionService
 from src.efficient_tutor_backend.services.timetable_service import TimeTableService
+from src.efficient_tutor_backend.services.calendar_feed_service import CalendarFeedService
 from src.efficient_tutor_backend.services.finance_service import (
     TuitionLogService,
     PaymentLogService,
     FinancialSummaryService
 )
 from src.efficient_tutor_backend.services.notes_service import NotesService
+from src.efficient_tutor_backend.services.ledger_service import LedgerService
 from src.efficient_tutor_backend.services.geo_service import GeoService
+from src.efficient_tutor_backend.services.summary_cache import SummaryCache, get_summary_cache_backend
+from src.efficient_tutor_backend.common.cache import InMemoryCacheBackend
+from src.efficient_tutor_backend.services.principal_cache import principal_cache
+from src.efficient_tutor_backend.services.relationship_index import relationship_index
+from src.efficient_tutor_backend.services.timetable_cache import TimetableCache, get_timetable_cache_backend
 
 
 @pytest.fixture(scope="session")
@@ -124,6 +134,17 @@ def client(mock_geo_service: GeoService) -> TestClient:
     # Create a mock for GeoService and override it
     app.dependency_overrides[GeoService] = lambda: mock_geo_service
 
+    # Each test rolls its data back, so it gets its own empty summary cache
+    summary_cache_backend = InMemoryCacheBackend(maxsize=1000, ttl_seconds=300)
+    app.dependency_overrides[get_summary_cache_backend] = lambda: summary_cache_backend
+    timetable_cache_backend = InMemoryCacheBackend(maxsize=1000, ttl_seconds=300)
+    app.dependency_overrides[get_timetable_cache_backend] = lambda: timetable_cache_backend
+    # Cached principals and relationship links would outlive the rolled back data of the previous test
+    principal_cache.clear()
+    relationship_index.clear()
+    # Lets tests read the query count of a response (see `query_budget`)
+    settings.DB_QUERY_STATS_HEADER = True
+
     # This 'with' block runs the app's startup lifespan,
     # which creates the engine and session factory.
     with TestClient(app) as test_client:
@@ -131,6 +152,37 @@ def client(mock_geo_service: GeoService) -> TestClient:
     
     # The app's shutdown lifespan runs here, and we clear the override.
     app.dependency_overrides.clear()
+    settings.DB_QUERY_STATS_HEADER = False
+
+
+# --- Query Budget Fixture (N+1 guard) ---
+
+class QueryBudget:
+    """
+    Fails a test when code runs more SQL statements than allowed.
+        with query_budget(5):                      # service tests
+            await service.get_all(user)
+        query_budget.check(response, 5)            # API tests (X-DB-Query-Count)
+    """
+
+    @contextmanager
+    def __call__(self, max_queries: int):
+        with count_queries() as queries:
+            yield queries
+        print(f"Ran {queries.count} queries ({queries.total_ms:.1f} ms), budget {max_queries}.")
+        assert queries.count <= max_queries, \
+            f"Ran {queries.count} queries, over the budget of {max_queries}. Slowest: {queries.slowest_statement}"
+
+    def check(self, response, max_queries: int) -> int:
+        count = int(response.headers["X-DB-Query-Count"])
+        print(f"{response.request.method} {response.request.url.path} ran {count} queries, budget {max_queries}.")
+        assert count <= max_queries, f"Ran {count} queries, over the budget of {max_queries}."
+        return count
+
+
+@pytest.fixture(scope="function")
+def query_budget() -> QueryBudget:
+    return QueryBudget()
 
 
 # --- 2. Function-Scoped Session Fixture (For Service Tests) ---
@@ -176,6 +228,11 @@ def mock_geo_service() -> GeoService:
         "timezone": "America/New_York",
         "currency": "USD"
     })
+    # Signups use the offline lookup; the network one is left to the background enrichment
+    mock_service.get_known_location = MagicMock(return_value={
+        "timezone": "America/New_York",
+        "currency": "USD"
+    })
     return mock_service
 
 @pytest.fixture(scope="function")
@@ -205,7 +262,23 @@ def tuition_service(db_session: AsyncSession, user_service: UserService) -> Tuit
 def timetable_service(
     db_session: AsyncSession, user_service: UserService
 ) -> TimeTableService:
-    return TimeTableService(db=db_session, user_service=user_service)
+    return TimeTableService(
+        db=db_session,
+        user_service=user_service,
+        timetable_cache=TimetableCache(InMemoryCacheBackend(maxsize=1000, ttl_seconds=300))
+    )
+
+@pytest.fixture(scope="function")
+def calendar_feed_service(
+    db_session: AsyncSession, user_service: UserService, timetable_service: TimeTableService
+) -> CalendarFeedService:
+    return CalendarFeedService(
+        db=db_session,
+        user_service=user_service,
+        timetable_service=timetable_service,
+        # Shares the timetable service's cache, like the per-request dependency does
+        timetable_cache=timetable_service.timetable_cache
+    )
 
 @pytest.fixture(scope="function")
 def timetable_service_sync() -> TimeTableService:
@@ -214,29 +287,46 @@ def timetable_service_sync() -> TimeTableService:
     for testing utility methods that don't need a real db or other services.
     """
     # Pass None for dependencies, as the formatting methods don't use them.
-    return TimeTableService(db=None, user_service=None)
+    return TimeTableService(db=None, user_service=None, timetable_cache=None)
+
+@pytest.fixture(scope="function")
+def ledger_service(db_session: AsyncSession) -> LedgerService:
+    return LedgerService(db=db_session)
+
+@pytest.fixture(scope="function")
+def summary_cache(db_session: AsyncSession) -> SummaryCache:
+    """Provides a SummaryCache with its own, empty in-memory backend."""
+    return SummaryCache(db=db_session, backend=InMemoryCacheBackend(maxsize=1000, ttl_seconds=300))
 
 @pytest.fixture(scope="function")
 def tuition_log_service(
     db_session: AsyncSession, 
     user_service: UserService, 
-    tuition_service: TuitionService
+    tuition_service: TuitionService,
+    ledger_service: LedgerService,
+    summary_cache: SummaryCache
 ) -> TuitionLogService:
     return TuitionLogService(
         db=db_session, 
         user_service=user_service, 
-        tuition_service=tuition_service
+        tuition_service=tuition_service,
+        ledger_service=ledger_service,
+        summary_cache=summary_cache
     )
 
 @pytest.fixture(scope="function")
 async def payment_log_service(
     db_session: AsyncSession, 
-    user_service: UserService
+    user_service: UserService,
+    ledger_service: LedgerService,
+    summary_cache: SummaryCache
 ) -> PaymentLogService:
     """Provides a PaymentLogService instance with test dependencies."""
     return PaymentLogService(
         db=db_session, 
-        user_service=user_service
+        user_service=user_service,
+        ledger_service=ledger_service,
+        summary_cache=summary_cache
     )
 
 @pytest.fixture(scope="function")
@@ -247,11 +337,19 @@ def payment_log_service_sync() -> PaymentLogService:
     """
     # We pass None for dependencies because the _format_payment_log_for_api
     # method doesn't use them.
-    return PaymentLogService(db=None, user_service=None)
-
-@pytest.fixture(scope="function")
-def financial_summary_service(db_session: AsyncSession, tuition_log_service: TuitionLogService) -> FinancialSummaryService:
-    return FinancialSummaryService(db=db_session, tuition_log_service=tuition_log_service)
+    return PaymentLogService(db=None, user_service=None, ledger_service=None, summary_cache=None)
+
+@pytest.fixture(scope="function")
+def financial_summary_service(
+    db_session: AsyncSession,
+    tuition_log_service: TuitionLogService,
+    summary_cache: SummaryCache
+) -> FinancialSummaryService:
+    return FinancialSummaryService(
+        db=db_session,
+        tuition_log_service=tuition_log_service,
+        summary_cache=summary_cache
+    )
 
 @pytest.fixture(scope="function")
 async def notes_service(db_session: AsyncSession, user_service: UserService) -> NotesService:
@@ -26,6 +26,7 @@ from sqlalchemy import text
 
 from src.efficient_tutor_backend.common.config import settings
 from src.efficient_tutor_backend.database import models as db_models
+from src.efficient_tutor_backend.services.ledger_service import LedgerService
 from tests.database import factories
 from tests.constants import TEST_TUITION_ID, TEST_TIMETABLE_RUN_ID
 
@@ -121,6 +122,9 @@ async def clear_database(session: AsyncSession):
         await session.execute(text('TRUNCATE TABLE "timetable_run_user_solutions" RESTART IDENTITY CASCADE'))
         await session.execute(text('TRUNCATE TABLE "timetable_runs" RESTART IDENTITY CASCADE'))
         
+        await session.execute(text('TRUNCATE TABLE "ledger_charge_statuses" RESTART IDENTITY CASCADE'))
+        await session.execute(text('TRUNCATE TABLE "ledger_wallets" RESTART IDENTITY CASCADE'))
+        await session.execute(text('TRUNCATE TABLE "ledger_parent_wallets" RESTART IDENTITY CASCADE'))
         await session.execute(text('TRUNCATE TABLE "tuition_log_charges" RESTART IDENTITY CASCADE'))
         await session.execute(text('TRUNCATE TABLE "tuition_logs" RESTART IDENTITY CASCADE'))
         await session.execute(text('TRUNCATE TABLE "payment_logs" RESTART IDENTITY CASCADE'))
@@ -220,6 +224,10 @@ async def seed_data(session: AsyncSession):
         
         await session.flush()
 
+    # The materialized payment ledger is derived data; build it from the seeded logs.
+    print("Building payment ledger...")
+    await LedgerService(db=session).rebuild()
+
     await session.commit()
     print("Data seeding complete.")
 
@@ -133,7 +133,7 @@ class TestAdminService:
         assert db_admin.privileges == AdminPrivilegeType.NORMAL.value
         assert HashedPassword.verify(admin_data.password, db_admin.password)
 
-        mock_geo_service.get_location_info.assert_called_once_with(ip_address)
+        mock_geo_service.get_known_location.assert_called_once_with(ip_address)
         print("--- Successfully created new normal admin ---")
         pprint(created_admin.model_dump())
 
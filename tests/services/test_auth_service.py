@@ -1,3 +1,85 @@
 '''
 
 '''
+import time
+import asyncio
+import pytest
+from fastapi import HTTPException
+from unittest.mock import AsyncMock, MagicMock
+
+from src.efficient_tutor_backend.common.security_utils import HashedPassword, PasswordHashPool
+from src.efficient_tutor_backend.database import engine as db_engine
+from src.efficient_tutor_backend.database import models as db_models
+from src.efficient_tutor_backend.services.principal_cache import principal_cache
+from src.efficient_tutor_backend.services.security import JWTHandler, verify_token_and_get_user
+from src.efficient_tutor_backend.services.user_service import UserService
+
+
+@pytest.mark.anyio
+class TestPasswordHashPool:
+    """bcrypt runs on a bounded pool, off the event loop."""
+
+    async def test_verify_async_matches_sync(self):
+        hashed = await HashedPassword.get_hash_async("correct horse")
+        assert await HashedPassword.verify_async("correct horse", hashed)
+        assert not await HashedPassword.verify_async("wrong horse", hashed)
+        assert HashedPassword.verify("correct horse", hashed)
+
+    async def test_concurrency_limit_and_queue_depth(self):
+        pool = PasswordHashPool(workers=2, max_queue=10)
+        await asyncio.gather(*[pool.run(time.sleep, 0.05) for _ in range(6)])
+
+        metrics = pool.snapshot()
+        print(metrics)
+        assert metrics["completed"] == 6
+        assert metrics["queued"] == metrics["running"] == 0
+        assert metrics["max_queued"] >= 4
+        pool.shutdown()
+
+    async def test_full_queue_is_rejected(self):
+        pool = PasswordHashPool(workers=1, max_queue=1)
+        results = await asyncio.gather(
+            *[pool.run(time.sleep, 0.05) for _ in range(3)], return_exceptions=True
+        )
+
+        rejected = [r for r in results if isinstance(r, HTTPException)]
+        assert rejected and all(r.status_code == 503 for r in rejected)
+        assert pool.snapshot()["rejected"] == len(rejected)
+        pool.shutdown()
+
+
+@pytest.mark.anyio
+class TestVerifyTokenPrincipalCache:
+    """The principal cache is filled from the primary, never from the replica."""
+
+    async def test_replica_session_never_fills_the_cache(
+        self,
+        mocker,
+        test_teacher_orm: db_models.Teachers
+    ):
+        principal_cache.clear()
+        replica_db = MagicMock(info={db_engine.REPLICA_SESSION_KEY: True})
+        replica_db.merge = AsyncMock(side_effect=lambda user, load=True: user)
+        primary_db = AsyncMock()
+        mocker.patch.object(db_engine, "AsyncSessionLocal", MagicMock(return_value=primary_db))
+
+        loaded_on = []
+
+        async def get_user_for_auth(self, email):
+            assert self.db is not replica_db, "The replica must not load the user to cache."
+            loaded_on.append(self.db)
+            return test_teacher_orm
+
+        mocker.patch.object(UserService, "get_user_for_auth", get_user_for_auth)
+        token = JWTHandler.create_access_token(subject=test_teacher_orm.email)
+        try:
+            user = await verify_token_and_get_user(token, UserService(replica_db))
+
+            assert loaded_on == [primary_db]
+            primary_db.close.assert_awaited_once()
+            assert principal_cache.get(test_teacher_orm.email).id == test_teacher_orm.id
+            # The user is handed over in the request's own session
+            replica_db.merge.assert_awaited_once()
+            assert user.id == test_teacher_orm.id
+        finally:
+            principal_cache.clear()
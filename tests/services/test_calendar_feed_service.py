@@ -0,0 +1,148 @@
+import pytest
+from uuid import uuid4
+from datetime import datetime, time, timezone
+from fastapi import HTTPException
+
+from src.efficient_tutor_backend.database import models as db_models
+from src.efficient_tutor_backend.models import timetable as timetable_models
+from src.efficient_tutor_backend.services.calendar_feed_service import CalendarFeedService, render_ics
+from src.efficient_tutor_backend.services.timetable_cache import PENDING_INVALIDATION_KEY
+from src.efficient_tutor_backend.services.user_service import UserService
+from tests.constants import TEST_SLOT_ID_STUDENT_MATH
+
+
+@pytest.mark.anyio
+class TestCalendarFeedService:
+
+    async def test_feed_contains_student_slots(
+        self,
+        calendar_feed_service: CalendarFeedService,
+        test_student_orm: db_models.Users
+    ):
+        print(f"\n--- Testing the calendar feed of a student ---")
+        token = CalendarFeedService.feed_token(test_student_orm.id, test_student_orm.calendar_feed_version)
+
+        etag, body = await calendar_feed_service.get_feed(test_student_orm.id, token)
+
+        assert body.startswith("BEGIN:VCALENDAR\r\n")
+        assert body.endswith("END:VCALENDAR\r\n")
+        assert f"UID:{TEST_SLOT_ID_STUDENT_MATH}-" in body
+        assert etag
+
+    async def test_repeated_poll_is_served_from_cache(
+        self,
+        calendar_feed_service: CalendarFeedService,
+        test_student_orm: db_models.Users,
+        query_budget
+    ):
+        print(f"\n--- Testing that a repeated feed poll runs no query ---")
+        token = CalendarFeedService.feed_token(test_student_orm.id, test_student_orm.calendar_feed_version)
+        first = await calendar_feed_service.get_feed(test_student_orm.id, token)
+
+        with query_budget(0):
+            second = await calendar_feed_service.get_feed(test_student_orm.id, token)
+
+        assert second == first
+
+    async def test_invalidation_changes_etag(
+        self,
+        calendar_feed_service: CalendarFeedService,
+        test_student_orm: db_models.Users
+    ):
+        print(f"\n--- Testing that invalidation changes the feed ETag ---")
+        token = CalendarFeedService.feed_token(test_student_orm.id, test_student_orm.calendar_feed_version)
+        first_etag, _ = await calendar_feed_service.get_feed(test_student_orm.id, token)
+        await calendar_feed_service.timetable_cache.invalidate()
+
+        second_etag, _ = await calendar_feed_service.get_feed(test_student_orm.id, token)
+
+        assert second_etag != first_etag
+
+    async def test_timezone_change_rerenders_the_feed(
+        self,
+        calendar_feed_service: CalendarFeedService,
+        user_service: UserService,
+        test_student_orm: db_models.Users
+    ):
+        print(f"\n--- Testing that a timezone change re-renders the feed ---")
+        token = CalendarFeedService.feed_token(test_student_orm.id, test_student_orm.calendar_feed_version)
+        first_etag, _ = await calendar_feed_service.get_feed(test_student_orm.id, token)
+        new_zone = "Asia/Tokyo" if test_student_orm.timezone != "Asia/Tokyo" else "Europe/Berlin"
+
+        user_service._invalidate_timetables_on_timezone_change(test_student_orm, {"timezone": new_zone})
+        assert user_service.db.info.get(PENDING_INVALIDATION_KEY)
+        test_student_orm.timezone = new_zone
+        await user_service.db.flush()
+        # The cached feeds are dropped on commit; the test session never commits
+        await calendar_feed_service.timetable_cache.invalidate()
+
+        second_etag, body = await calendar_feed_service.get_feed(test_student_orm.id, token)
+        assert second_etag != first_etag
+        assert f"X-WR-TIMEZONE:{new_zone}\r\n" in body
+
+    async def test_invalid_token_not_found(
+        self,
+        calendar_feed_service: CalendarFeedService,
+        test_student_orm: db_models.Users
+    ):
+        print(f"\n--- Testing a feed request with another user's token ---")
+        with pytest.raises(HTTPException) as e:
+            await calendar_feed_service.get_feed(test_student_orm.id, CalendarFeedService.feed_token(uuid4(), 0))
+        assert e.value.status_code == 404
+
+    async def test_cached_feed_still_checks_the_token(
+        self,
+        calendar_feed_service: CalendarFeedService,
+        test_student_orm: db_models.Users
+    ):
+        print(f"\n--- Testing a wrong token against a cached feed ---")
+        token = CalendarFeedService.feed_token(test_student_orm.id, test_student_orm.calendar_feed_version)
+        await calendar_feed_service.get_feed(test_student_orm.id, token)
+
+        with pytest.raises(HTTPException) as e:
+            await calendar_feed_service.get_feed(test_student_orm.id, "0" * 32)
+        assert e.value.status_code == 404
+
+    async def test_rotation_revokes_the_old_token(
+        self,
+        calendar_feed_service: CalendarFeedService,
+        test_student_orm: db_models.Users
+    ):
+        print(f"\n--- Testing that rotating the feed token revokes the old URL ---")
+        old_token = CalendarFeedService.feed_token(test_student_orm.id, test_student_orm.calendar_feed_version)
+        await calendar_feed_service.get_feed(test_student_orm.id, old_token)
+
+        new_token = await calendar_feed_service.rotate_feed_token(test_student_orm)
+        # The cached feeds are dropped on commit; the test session never commits
+        await calendar_feed_service.timetable_cache.invalidate()
+
+        assert new_token != old_token
+        with pytest.raises(HTTPException) as e:
+            await calendar_feed_service.get_feed(test_student_orm.id, old_token)
+        assert e.value.status_code == 404
+        _, body = await calendar_feed_service.get_feed(test_student_orm.id, new_token)
+        assert body.startswith("BEGIN:VCALENDAR\r\n")
+
+
+class TestRenderIcs:
+    """The iCalendar rendering on its own (no database)."""
+
+    def test_escaping_and_folding(self):
+        slot = timetable_models.TimeTableSlotBase(
+            id=uuid4(),
+            user_id=uuid4(),
+            name="Math, Physics; and a very long name " + "x" * 80,
+            slot_type=timetable_models.TimeTableSlotType.OTHER,
+            day_of_week=1,
+            day_name="Monday",
+            start_time=time(9, 0),
+            end_time=time(10, 0)
+        )
+        start_dt = datetime(2026, 1, 5, 9, 0, tzinfo=timezone.utc)
+        end_dt = datetime(2026, 1, 5, 10, 0, tzinfo=timezone.utc)
+
+        body = render_ics("Timetable", "UTC", [(slot, start_dt, end_dt)], {}, stamp=start_dt)
+
+        assert "SUMMARY:Math\\, Physics\\; and" in body
+        assert "DTSTART:20260105T090000Z\r\n" in body
+        assert all(len(line.encode()) <= 75 for line in body.split("\r\n"))
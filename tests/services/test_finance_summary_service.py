@@ -1,12 +1,16 @@
 import pytest
 from decimal import Decimal
+from datetime import datetime, timezone
 from pprint import pprint
 from fastapi import HTTPException
+from sqlalchemy import update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 # --- Import models, services, and Pydantic models ---
 from src.efficient_tutor_backend.database import models as db_models
-from src.efficient_tutor_backend.services.finance_service import FinancialSummaryService
+from src.efficient_tutor_backend.database.db_enums import LogStatusEnum
+from src.efficient_tutor_backend.services.finance_service import FinancialSummaryService, PaymentLogService
+from src.efficient_tutor_backend.services.user_service import StudentService
 from src.efficient_tutor_backend.models import finance as finance_models
 
 # --- Import Test Constants ---
@@ -239,6 +243,187 @@ class TestFinancialSummaryParent:
         assert summary.unpaid_count == 2
 
 
+@pytest.mark.anyio
+class TestFinancialSummarySqlEngine:
+    """The single-statement SQL engine must agree with the Python reference implementation."""
+
+    @pytest.mark.parametrize("teacher_id", [FIN_TEACHER_A_ID, FIN_TEACHER_B_ID])
+    async def test_teacher_summaries_match_reference(
+        self,
+        financial_summary_service: FinancialSummaryService,
+        teacher_id
+    ):
+        print(f"\n--- Comparing SQL and reference summaries for teacher {teacher_id} ---")
+        service = financial_summary_service
+
+        sql_summary = await service._get_teacher_summary_sql(teacher_id)
+        pprint(sql_summary)
+        assert sql_summary == await service._get_summary_for_teacher(teacher_id)
+
+        for parent_id in [FIN_PARENT_A_ID, FIN_PARENT_B_ID]:
+            assert (await service._get_teacher_summary_sql(teacher_id, parent_id=parent_id)
+                    == await service._get_summary_for_teacher_for_specific_parent(teacher_id, parent_id))
+
+        for student_id in [FIN_STUDENT_A1_ID, FIN_STUDENT_A2_ID, FIN_STUDENT_B1_ID]:
+            assert (await service._get_teacher_summary_sql(teacher_id, student_id=student_id)
+                    == await service._get_summary_for_teacher_for_specific_student(teacher_id, student_id))
+
+    @pytest.mark.parametrize("parent_id", [FIN_PARENT_A_ID, FIN_PARENT_B_ID])
+    async def test_parent_summaries_match_reference(
+        self,
+        financial_summary_service: FinancialSummaryService,
+        parent_id
+    ):
+        print(f"\n--- Comparing SQL and reference summaries for parent {parent_id} ---")
+        service = financial_summary_service
+
+        sql_summary = await service._get_parent_summary_sql(parent_id)
+        pprint(sql_summary)
+        assert sql_summary == await service._get_summary_for_parent(parent_id)
+
+        for teacher_id in [FIN_TEACHER_A_ID, FIN_TEACHER_B_ID]:
+            assert (await service._get_parent_summary_sql(parent_id, teacher_id=teacher_id)
+                    == await service._get_summary_for_parent_for_specific_teacher(parent_id, teacher_id))
+
+        for student_id in [FIN_STUDENT_A1_ID, FIN_STUDENT_A2_ID, FIN_STUDENT_B1_ID]:
+            assert (await service._get_parent_summary_sql(parent_id, student_id=student_id)
+                    == await service._get_summary_for_parent_for_specific_student(parent_id, student_id))
+
+    @pytest.mark.parametrize("parent_id", [FIN_PARENT_A_ID, FIN_PARENT_B_ID])
+    async def test_deleted_teacher_wallet_matches_reference(
+        self,
+        db_session: AsyncSession,
+        financial_summary_service: FinancialSummaryService,
+        parent_id
+    ):
+        """
+        Deleting a teacher sets the teacher_id of their logs and payments to NULL.
+        That (parent, NULL) wallet still nets its payments against its charges.
+        """
+        print(f"\n--- Comparing SQL and reference summaries after deleting TEACHER B ---")
+        service = financial_summary_service
+        owed_to_b = await service._get_parent_summary_sql(parent_id, teacher_id=FIN_TEACHER_B_ID)
+        owed_to_a = await service._get_parent_summary_sql(parent_id, teacher_id=FIN_TEACHER_A_ID)
+
+        # Settle the wallet in full, then do what ON DELETE SET NULL does
+        db_session.add(db_models.PaymentLogs(
+            parent_id=parent_id,
+            teacher_id=FIN_TEACHER_B_ID,
+            amount_paid=owed_to_b.total_due + Decimal("1.00"),
+            payment_date=datetime.now(timezone.utc),
+            status=LogStatusEnum.ACTIVE.value
+        ))
+        await db_session.flush()
+        for model in (db_models.TuitionLogs, db_models.PaymentLogs):
+            await db_session.execute(
+                update(model).where(model.teacher_id == FIN_TEACHER_B_ID).values(teacher_id=None)
+            )
+
+        sql_summary = await service._get_parent_summary_sql(parent_id)
+        pprint(sql_summary)
+        assert sql_summary == await service._get_summary_for_parent(parent_id)
+        assert sql_summary.total_due == owed_to_a.total_due
+        assert sql_summary.unpaid_count == owed_to_a.unpaid_count
+        assert sql_summary.credit_balance == owed_to_a.credit_balance + owed_to_b.credit_balance + Decimal("1.00")
+
+        for student_id in [FIN_STUDENT_A1_ID, FIN_STUDENT_A2_ID, FIN_STUDENT_B1_ID]:
+            assert (await service._get_parent_summary_sql(parent_id, student_id=student_id)
+                    == await service._get_summary_for_parent_for_specific_student(parent_id, student_id))
+
+
+@pytest.mark.anyio
+class TestFinancialSummaryCache:
+    """Summaries are cached per user and invalidated by the finance write methods."""
+
+    async def test_summary_is_served_from_cache(
+        self,
+        db_session: AsyncSession,
+        financial_summary_service: FinancialSummaryService,
+        fin_teacher_a: db_models.Users
+    ):
+        """A payment written behind the services' back is not seen until the cache is invalidated."""
+        print(f"\n--- Testing cached summary for TEACHER A ---")
+        first = await financial_summary_service.get_financial_summary_for_api(fin_teacher_a)
+
+        db_session.add(db_models.PaymentLogs(
+            parent_id=FIN_PARENT_A_ID,
+            teacher_id=FIN_TEACHER_A_ID,
+            amount_paid=Decimal("30.00"),
+            payment_date=datetime.now(timezone.utc),
+            status=LogStatusEnum.ACTIVE.value
+        ))
+        await db_session.flush()
+
+        second = await financial_summary_service.get_financial_summary_for_api(fin_teacher_a)
+        assert second == first
+
+        await financial_summary_service.summary_cache.invalidate([FIN_TEACHER_A_ID])
+        third = await financial_summary_service.get_financial_summary_for_api(fin_teacher_a)
+        print(f"Summary after invalidation: {third}")
+        assert third.total_owed_to_teacher == first.total_owed_to_teacher - Decimal("30.00")
+
+    async def test_payment_invalidates_parent_and_teacher_summaries(
+        self,
+        financial_summary_service: FinancialSummaryService,
+        payment_log_service: PaymentLogService,
+        fin_teacher_a: db_models.Users,
+        fin_parent_a: db_models.Users
+    ):
+        """T_A <-> P_A owes $130. A $30 payment must show up in both users' next summary."""
+        print(f"\n--- Testing summary invalidation on payment create ---")
+        teacher_before = await financial_summary_service.get_financial_summary_for_api(
+            fin_teacher_a, parent_id=FIN_PARENT_A_ID
+        )
+        parent_before = await financial_summary_service.get_financial_summary_for_api(fin_parent_a)
+        assert teacher_before.total_owed_to_teacher == Decimal("130.00")
+
+        await payment_log_service.create_payment_log({
+            "parent_id": FIN_PARENT_A_ID,
+            "teacher_id": FIN_TEACHER_A_ID,
+            "amount_paid": Decimal("30.00"),
+            "payment_date": datetime.now(timezone.utc).isoformat()
+        }, fin_teacher_a)
+
+        teacher_after = await financial_summary_service.get_financial_summary_for_api(
+            fin_teacher_a, parent_id=FIN_PARENT_A_ID
+        )
+        parent_after = await financial_summary_service.get_financial_summary_for_api(fin_parent_a)
+        pprint(teacher_after)
+        pprint(parent_after)
+        assert teacher_after.total_owed_to_teacher == Decimal("100.00")
+        assert parent_after.total_due == parent_before.total_due - Decimal("30.00")
+
+    async def test_student_deletion_invalidates_related_summaries(
+        self,
+        mocker,
+        db_session: AsyncSession,
+        financial_summary_service: FinancialSummaryService,
+        student_service: StudentService,
+        fin_teacher_a: db_models.Users,
+        fin_parent_a: db_models.Users
+    ):
+        """Deleting Student A1 cascades its logs' charges out of T_A's and P_A's summaries."""
+        print(f"\n--- Testing summary invalidation on student delete ---")
+        mocker.patch(
+            "src.efficient_tutor_backend.services.user_service.get_summary_cache_backend",
+            return_value=financial_summary_service.summary_cache.backend
+        )
+        teacher_before = await financial_summary_service.get_financial_summary_for_api(fin_teacher_a)
+        parent_before = await financial_summary_service.get_financial_summary_for_api(fin_parent_a)
+
+        await student_service.delete_student(FIN_STUDENT_A1_ID, fin_teacher_a)
+        await db_session.flush()
+
+        teacher_after = await financial_summary_service.get_financial_summary_for_api(fin_teacher_a)
+        parent_after = await financial_summary_service.get_financial_summary_for_api(fin_parent_a)
+        pprint(teacher_after)
+        pprint(parent_after)
+        assert teacher_after == await financial_summary_service._get_teacher_summary_sql(FIN_TEACHER_A_ID)
+        assert parent_after == await financial_summary_service._get_parent_summary_sql(FIN_PARENT_A_ID)
+        assert teacher_after != teacher_before
+        assert parent_after != parent_before
+
+
 @pytest.mark.anyio
 class TestFinancialSummaryAuth:
 
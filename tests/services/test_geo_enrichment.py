@@ -0,0 +1,106 @@
+"""
+Tests for the background geolocation enrichment runner.
+"""
+import asyncio
+import pytest
+from uuid import uuid4
+from fastapi import HTTPException
+
+from src.efficient_tutor_backend.services.geo_enrichment import GeoEnrichmentRunner, GeoEnrichmentJob
+from src.efficient_tutor_backend.services.geo_service import GeoService
+
+CAIRO = {"timezone": "Africa/Cairo", "currency": "EGP"}
+
+
+def make_job(ip_address: str) -> GeoEnrichmentJob:
+    return GeoEnrichmentJob(user_id=uuid4(), ip_address=ip_address, timezone="UTC", currency="USD")
+
+
+@pytest.mark.anyio
+class TestGeoEnrichmentRunner:
+    """Batching and retries, with the lookups and the database patch replaced by recorders."""
+
+    @pytest.fixture
+    def runner(self, mocker) -> GeoEnrichmentRunner:
+        runner = GeoEnrichmentRunner(
+            batch_size=10,
+            batch_window_seconds=0.05,
+            max_attempts=3,
+            backoff_seconds=0.05,
+            backoff_max_seconds=1.0
+        )
+        runner.lookups = []
+        runner.applied = []
+        runner.answers = {}
+
+        async def lookup(service, ip_addresses):
+            ip_addresses = list(ip_addresses)
+            runner.lookups.append(ip_addresses)
+            return {ip: runner.answers.get(ip, CAIRO) for ip in ip_addresses}
+
+        async def apply(resolved):
+            runner.applied.extend(resolved)
+
+        mocker.patch.object(GeoService, "get_locations_info", lookup)
+        runner._apply = apply
+        return runner
+
+    async def test_burst_of_signups_is_one_batch(self, runner: GeoEnrichmentRunner):
+        print("\n--- Testing that a burst of signups is resolved in one batch ---")
+        jobs = [make_job("41.32.0.1"), make_job("41.32.0.2"), make_job("41.32.0.1")]
+        runner.start()
+        try:
+            for job in jobs:
+                runner.request([job])
+            await asyncio.sleep(0.2)
+        finally:
+            await runner.stop()
+
+        assert len(runner.lookups) == 1
+        assert sorted(runner.lookups[0]) == sorted(job.ip_address for job in jobs)
+        assert [job for job, _ in runner.applied] == jobs
+        print(runner.status())
+        assert runner.status()["enriched"] == 3
+
+    async def test_unavailable_service_is_retried_with_backoff(self, runner: GeoEnrichmentRunner):
+        print("\n--- Testing retries of a failed lookup ---")
+        job = make_job("8.8.8.8")
+        runner.answers[job.ip_address] = HTTPException(status_code=503, detail="down")
+        runner.start()
+        try:
+            runner.request([job])
+            await asyncio.sleep(0.2)
+            assert job.attempts >= 1
+            assert runner.applied == []
+
+            # The service recovers: the next retry patches the row
+            del runner.answers[job.ip_address]
+            await asyncio.sleep(0.5)
+        finally:
+            await runner.stop()
+
+        assert [patched for patched, _ in runner.applied] == [job]
+        assert runner.status()["retried"] >= 1
+        assert runner.status()["pending"] == 0
+
+    async def test_rejected_address_and_exhausted_retries_give_up(self, runner: GeoEnrichmentRunner):
+        print("\n--- Testing that permanent failures and exhausted retries are dropped ---")
+        rejected, unavailable = make_job("bad-ip"), make_job("8.8.4.4")
+        runner.answers[rejected.ip_address] = HTTPException(status_code=400, detail="invalid query")
+        runner.answers[unavailable.ip_address] = HTTPException(status_code=503, detail="down")
+
+        runner.start()
+        try:
+            runner.request([rejected, unavailable])
+            await asyncio.sleep(1.0)
+        finally:
+            await runner.stop()
+
+        assert rejected.attempts == 0
+        assert unavailable.attempts == 3
+        assert runner.applied == []
+        assert runner.status()["failed"] == 2
+        assert runner.status()["pending"] == 0
+
+    def test_backoff_doubles_up_to_the_cap(self, runner: GeoEnrichmentRunner):
+        assert [runner._backoff(attempt) for attempt in (1, 2, 3, 10)] == [0.05, 0.1, 0.2, 1.0]
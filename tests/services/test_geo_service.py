@@ -2,13 +2,36 @@
 Tests for the GeoService.
 """
 
+import ipaddress
 import pytest
 import httpx
 from unittest.mock import MagicMock, AsyncMock
 from countryinfo import CountryInfo # Import CountryInfo to mock it
 
 from fastapi import HTTPException
-from src.efficient_tutor_backend.services.geo_service import GeoService
+from src.efficient_tutor_backend.services import geo_service as geo_module
+from src.efficient_tutor_backend.services.geo_service import (
+    GeoService,
+    GeoLocation,
+    LocalGeoProvider,
+    write_geo_database
+)
+
+EGYPT = GeoLocation("EG", "Africa/Cairo", "EGP")
+GERMANY = GeoLocation("DE", "Europe/Berlin", "EUR")
+
+
+@pytest.fixture
+def geo_table(tmp_path):
+    """A small IP-range table: 41.32.0.0/12 in Egypt and 5.1.0.0/16 in Germany."""
+    path = tmp_path / "geo.bin"
+    network_eg = ipaddress.ip_network("41.32.0.0/12")
+    network_de = ipaddress.ip_network("5.1.0.0/16")
+    write_geo_database(path, [
+        (int(network_eg[0]), int(network_eg[-1]), EGYPT),
+        (int(network_de[0]), int(network_de[-1]), GERMANY),
+    ])
+    return path
 
 @pytest.mark.anyio
 class TestGeoService:
@@ -17,6 +40,7 @@ class TestGeoService:
     @pytest.fixture
     def geo_service(self) -> GeoService:
         """Provides a GeoService instance for testing."""
+        geo_module.geo_result_cache.clear()
         return GeoService()
 
     @pytest.mark.skip
@@ -273,3 +297,90 @@ class TestGeoService:
         assert location_info["currency"] # Assert it's not an empty string
 
         print(f"--- Successfully received real location data: {location_info} ---")
+
+
+class TestLocalGeoProvider:
+    """The offline IP-range table on its own (no network)."""
+
+    def test_lookup_hits_and_misses(self, geo_table):
+        provider = LocalGeoProvider(str(geo_table))
+        assert provider.load()
+
+        assert provider.find(ipaddress.ip_address("41.32.0.0")) == EGYPT
+        assert provider.find(ipaddress.ip_address("41.47.255.255")) == EGYPT
+        assert provider.find(ipaddress.ip_address("5.1.200.7")) == GERMANY
+        assert provider.find(ipaddress.ip_address("::ffff:5.1.0.1")) == GERMANY
+        assert provider.find(ipaddress.ip_address("41.48.0.0")) is None
+        assert provider.find(ipaddress.ip_address("1.1.1.1")) is None
+        assert provider.find(ipaddress.ip_address("2001:db8::1")) is None
+        assert provider.currencies == {"EG": "EGP", "DE": "EUR"}
+        provider.close()
+
+    def test_missing_or_invalid_table(self, tmp_path):
+        assert not LocalGeoProvider(None).load()
+        assert not LocalGeoProvider(str(tmp_path / "missing.bin")).load()
+        bad = tmp_path / "bad.bin"
+        bad.write_bytes(b"not a table at all")
+        provider = LocalGeoProvider(str(bad))
+        assert not provider.load()
+        assert provider.find(ipaddress.ip_address("41.32.0.1")) is None
+
+    def test_overlapping_ranges_rejected(self, tmp_path):
+        with pytest.raises(ValueError):
+            write_geo_database(tmp_path / "geo.bin", [(10, 20, EGYPT), (15, 30, GERMANY)])
+
+
+@pytest.mark.anyio
+class TestGeoServiceLocalProvider:
+    """GeoService answering from the local table before the HTTP fallback."""
+
+    @pytest.fixture
+    def local_geo_service(self, geo_table, mocker) -> GeoService:
+        provider = LocalGeoProvider(str(geo_table))
+        mocker.patch.object(geo_module, "local_geo_provider", provider)
+        mocker.patch.dict(geo_module.GEO_PROVIDERS, {"local": provider})
+        geo_module.geo_result_cache.clear()
+        yield GeoService()
+        geo_module.geo_result_cache.clear()
+        provider.close()
+
+    async def test_local_lookup_needs_no_network(self, local_geo_service: GeoService, mocker):
+        print("\n--- Testing GeoService lookup from the local table ---")
+        http_get = mocker.patch('httpx.AsyncClient.get', new_callable=AsyncMock)
+
+        location_info = await local_geo_service.get_location_info("41.33.10.20")
+
+        assert location_info == {"timezone": "Africa/Cairo", "currency": "EGP"}
+        http_get.assert_not_called()
+
+    async def test_http_fallback_and_result_cache(self, local_geo_service: GeoService, mocker):
+        print("\n--- Testing GeoService HTTP fallback for an address outside the table ---")
+        mock_response = MagicMock()
+        mock_response.json.return_value = {"status": "success", "countryCode": "DE", "timezone": "Europe/Berlin"}
+        http_get = mocker.patch('httpx.AsyncClient.get', new_callable=AsyncMock, return_value=mock_response)
+
+        first = await local_geo_service.get_location_info("2001:db8::1")
+        second = await local_geo_service.get_location_info("2001:db8::1")
+
+        # Currency comes from the table's country map, the second answer from the cache
+        assert first == second == {"timezone": "Europe/Berlin", "currency": "EUR"}
+        http_get.assert_called_once_with("http://ip-api.com/json/2001:db8::1")
+
+    async def test_batch_lookup(self, local_geo_service: GeoService, mocker):
+        print("\n--- Testing GeoService batch lookup (used by the background enrichment) ---")
+        mock_response = MagicMock()
+        mock_response.json.return_value = [
+            {"status": "success", "countryCode": "DE", "timezone": "Europe/Berlin", "query": "2001:db8::1"},
+            {"status": "fail", "message": "invalid query", "query": "not-an-ip"},
+        ]
+        http_post = mocker.patch('httpx.AsyncClient.post', new_callable=AsyncMock, return_value=mock_response)
+
+        results = await local_geo_service.get_locations_info(["41.33.10.20", "2001:db8::1", "not-an-ip", "41.33.10.20"])
+
+        assert results["41.33.10.20"] == {"timezone": "Africa/Cairo", "currency": "EGP"}
+        assert results["2001:db8::1"] == {"timezone": "Europe/Berlin", "currency": "EUR"}
+        assert isinstance(results["not-an-ip"], HTTPException)
+        assert results["not-an-ip"].status_code == 400
+        # Only the addresses the table does not know, in one request
+        http_post.assert_called_once()
+        assert [item["query"] for item in http_post.call_args.kwargs["json"]] == ["2001:db8::1", "not-an-ip"]
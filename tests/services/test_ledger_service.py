@@ -0,0 +1,207 @@
+import pytest
+from decimal import Decimal
+from datetime import datetime, timezone, timedelta
+from pprint import pprint
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# --- Import models, services, and Pydantic models ---
+from src.efficient_tutor_backend.database import models as db_models
+from src.efficient_tutor_backend.services.ledger_service import LedgerService
+from src.efficient_tutor_backend.services.finance_service import TuitionLogService, PaymentLogService
+from src.efficient_tutor_backend.services.user_service import StudentService
+from src.efficient_tutor_backend.database.db_enums import (
+    PaidStatus,
+    TuitionLogCreateTypeEnum,
+    SubjectEnum,
+    EducationalSystemEnum
+)
+
+# --- Import Test Constants ---
+from tests.constants import (
+    FIN_TEACHER_A_ID, FIN_TEACHER_B_ID,
+    FIN_PARENT_A_ID, FIN_PARENT_B_ID,
+    FIN_STUDENT_A1_ID, FIN_STUDENT_A2_ID,
+    FIN_LOG_1_ID, FIN_LOG_2_ID, FIN_LOG_3_ID
+)
+
+
+@pytest.mark.anyio
+class TestLedgerServiceConsistency:
+    """The materialized ledger must match the full in-memory recompute."""
+
+    @pytest.mark.parametrize("teacher_id", [FIN_TEACHER_A_ID, FIN_TEACHER_B_ID])
+    async def test_teacher_ledger_matches_full_recompute(
+        self,
+        ledger_service: LedgerService,
+        tuition_log_service: TuitionLogService,
+        teacher_id
+    ):
+        print(f"\n--- Comparing materialized teacher ledger for {teacher_id} ---")
+        await ledger_service.rebuild()
+
+        expected = await tuition_log_service._calculate_teacher_ledger(teacher_id)
+        actual = await ledger_service.get_teacher_ledger(list({log_id for log_id, _ in expected}))
+        pprint(actual)
+
+        assert actual == expected
+
+    @pytest.mark.parametrize("parent_id", [FIN_PARENT_A_ID, FIN_PARENT_B_ID])
+    async def test_parent_ledger_matches_full_recompute(
+        self,
+        ledger_service: LedgerService,
+        tuition_log_service: TuitionLogService,
+        parent_id
+    ):
+        print(f"\n--- Comparing materialized parent ledger for {parent_id} ---")
+        await ledger_service.rebuild()
+
+        expected = await tuition_log_service._calculate_parent_ledger(parent_id)
+        actual = await ledger_service.get_parent_ledger(parent_id, list(expected.keys()))
+        pprint(actual)
+
+        assert actual == expected
+
+
+@pytest.mark.anyio
+class TestLedgerServiceIncremental:
+    """Writes through the finance services keep the ledger up to date."""
+
+    async def test_payment_create_and_void_updates_statuses(
+        self,
+        db_session: AsyncSession,
+        ledger_service: LedgerService,
+        payment_log_service: PaymentLogService,
+        fin_teacher_a: db_models.Users
+    ):
+        """
+        T_A <-> P_A: Log 1 ($100), Log 2 ($50), Log 3 ($100). Pay 1 ($120).
+        Adding $30 covers Log 2 (120 + 30 - 100 = 50). Voiding it uncovers it again.
+        """
+        print(f"\n--- Testing incremental ledger update on payment create/void ---")
+        await ledger_service.rebuild()
+
+        before = await ledger_service.get_teacher_ledger([FIN_LOG_1_ID, FIN_LOG_2_ID, FIN_LOG_3_ID])
+        assert before[(FIN_LOG_1_ID, FIN_STUDENT_A1_ID)] == PaidStatus.PAID
+        assert before[(FIN_LOG_2_ID, FIN_STUDENT_A2_ID)] == PaidStatus.UNPAID
+
+        new_payment = await payment_log_service.create_payment_log({
+            "parent_id": FIN_PARENT_A_ID,
+            "teacher_id": FIN_TEACHER_A_ID,
+            "amount_paid": Decimal("30.00"),
+            "payment_date": datetime.now(timezone.utc).isoformat()
+        }, fin_teacher_a)
+        await db_session.flush()
+
+        after_pay = await ledger_service.get_teacher_ledger([FIN_LOG_2_ID, FIN_LOG_3_ID])
+        pprint(after_pay)
+        assert after_pay[(FIN_LOG_2_ID, FIN_STUDENT_A2_ID)] == PaidStatus.PAID
+        assert after_pay[(FIN_LOG_3_ID, FIN_STUDENT_A1_ID)] == PaidStatus.UNPAID
+
+        await payment_log_service.void_payment_log(new_payment.id, fin_teacher_a)
+        await db_session.flush()
+
+        after_void = await ledger_service.get_teacher_ledger([FIN_LOG_2_ID])
+        assert after_void[(FIN_LOG_2_ID, FIN_STUDENT_A2_ID)] == PaidStatus.UNPAID
+
+    async def test_void_tuition_log_removes_it_from_ledger(
+        self,
+        db_session: AsyncSession,
+        ledger_service: LedgerService,
+        tuition_log_service: TuitionLogService,
+        fin_teacher_a: db_models.Users
+    ):
+        """Voiding Log 1 frees $100 of Pay 1, so Log 2 ($50) becomes paid."""
+        print(f"\n--- Testing incremental ledger update on tuition log void ---")
+        await ledger_service.rebuild()
+
+        await tuition_log_service.void_tuition_log(FIN_LOG_1_ID, fin_teacher_a)
+        await db_session.flush()
+
+        ledger = await ledger_service.get_teacher_ledger([FIN_LOG_1_ID, FIN_LOG_2_ID])
+        pprint(ledger)
+        assert (FIN_LOG_1_ID, FIN_STUDENT_A1_ID) not in ledger
+        assert ledger[(FIN_LOG_2_ID, FIN_STUDENT_A2_ID)] == PaidStatus.PAID
+
+    async def test_new_log_appends_to_parent_wallet(
+        self,
+        db_session: AsyncSession,
+        ledger_service: LedgerService,
+        tuition_log_service: TuitionLogService,
+        fin_teacher_b: db_models.Users
+    ):
+        """A log after the parent's cursor is allocated from the pooled balance, not by a replay."""
+        print(f"\n--- Testing the parent wallet cursor on a new log ---")
+        await ledger_service.rebuild()
+
+        start_time = datetime.now(timezone.utc) + timedelta(days=1)
+        new_log = await tuition_log_service.create_tuition_log({
+            "log_type": TuitionLogCreateTypeEnum.CUSTOM.value,
+            "subject": SubjectEnum.MATH.value,
+            "educational_system": EducationalSystemEnum.IGCSE.value,
+            "grade": 10,
+            "start_time": start_time.isoformat(),
+            "end_time": (start_time + timedelta(hours=1)).isoformat(),
+            "lesson_index": 1,
+            "charges": [{"student_id": str(FIN_STUDENT_A2_ID), "cost": 10}]
+        }, fin_teacher_b)
+        await db_session.flush()
+
+        wallet = await db_session.get(db_models.LedgerParentWallets, FIN_PARENT_A_ID, populate_existing=True)
+        assert wallet.cursor_log_id == new_log.id
+
+        expected = await tuition_log_service._calculate_parent_ledger(FIN_PARENT_A_ID)
+        actual = await ledger_service.get_parent_ledger(FIN_PARENT_A_ID, list(expected.keys()))
+        pprint(actual)
+        assert actual == expected
+
+    async def test_deleting_student_resyncs_ledger(
+        self,
+        db_session: AsyncSession,
+        ledger_service: LedgerService,
+        tuition_log_service: TuitionLogService,
+        student_service: StudentService,
+        fin_teacher_a: db_models.Users
+    ):
+        """Deleting Student A1 drops the charges of Logs 1 and 3; Pay 1 ($120) now covers Log 2 ($50)."""
+        print(f"\n--- Testing ledger re-sync after a student deletion ---")
+        await ledger_service.rebuild()
+
+        await student_service.delete_student(FIN_STUDENT_A1_ID, fin_teacher_a)
+        await db_session.flush()
+
+        teacher_expected = await tuition_log_service._calculate_teacher_ledger(FIN_TEACHER_A_ID)
+        teacher_actual = await ledger_service.get_teacher_ledger(list({log_id for log_id, _ in teacher_expected}))
+        pprint(teacher_actual)
+        assert teacher_actual == teacher_expected
+        assert teacher_actual[(FIN_LOG_2_ID, FIN_STUDENT_A2_ID)] == PaidStatus.PAID
+
+        parent_expected = await tuition_log_service._calculate_parent_ledger(FIN_PARENT_A_ID)
+        parent_actual = await ledger_service.get_parent_ledger(FIN_PARENT_A_ID, list(parent_expected.keys()))
+        pprint(parent_actual)
+        assert parent_actual == parent_expected
+
+
+@pytest.mark.anyio
+class TestLedgerServicePointQueries:
+    """Single-log cumulative-sum queries must agree with the full recompute."""
+
+    @pytest.mark.parametrize("log_id", [FIN_LOG_1_ID, FIN_LOG_2_ID, FIN_LOG_3_ID])
+    async def test_point_queries_match_full_recompute(
+        self,
+        ledger_service: LedgerService,
+        tuition_log_service: TuitionLogService,
+        log_id
+    ):
+        print(f"\n--- Comparing point queries for log {log_id} ---")
+        log_obj = await tuition_log_service._get_log_by_id_internal(log_id)
+
+        teacher_expected = await tuition_log_service._calculate_teacher_ledger(log_obj.teacher_id)
+        teacher_actual = await ledger_service.get_teacher_statuses_for_log(log_obj)
+        pprint(teacher_actual)
+        for key, status in teacher_actual.items():
+            assert teacher_expected[key] == status
+
+        parent_expected = await tuition_log_service._calculate_parent_ledger(FIN_PARENT_A_ID)
+        parent_actual = await ledger_service.get_parent_status_for_log(FIN_PARENT_A_ID, log_obj)
+        print(f"Parent status: {parent_actual}")
+        assert parent_expected[log_id] == parent_actual
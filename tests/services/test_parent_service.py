@@ -11,6 +11,7 @@ from src.efficient_tutor_backend.services.user_service import UserService, Paren
 from src.efficient_tutor_backend.models import user as user_models
 from src.efficient_tutor_backend.database.db_enums import UserRole
 from src.efficient_tutor_backend.common.security_utils import HashedPassword
+from src.efficient_tutor_backend.services.geo_enrichment import PENDING_GEO_ENRICHMENT_KEY
 
 from pprint import pp as pprint
 
@@ -110,12 +111,42 @@ class TestParentServiceWRITE:
         assert HashedPassword.verify(parent_data.password, db_user.password) is True
         assert db_user.password != parent_data.password
 
-        # 4. Verify geo_service was called
-        mock_geo_service.get_location_info.assert_called_once_with(ip_address)
+        # 4. Verify geo_service was asked (offline, no network wait)
+        mock_geo_service.get_known_location.assert_called_once_with(ip_address)
 
         print("--- Successfully created parent ---")
         pprint(created_parent.model_dump())
 
+    async def test_create_parent_defers_unknown_location(
+        self,
+        parents_service: ParentService,
+        mock_geo_service: MagicMock
+    ):
+        """An IP not known offline: created with the submitted values, located in the background."""
+        print("\n--- Testing create_parent with deferred geolocation ---")
+        mock_geo_service.get_known_location.return_value = None
+        parent_data = user_models.ParentCreate(
+            email="deferred.parent@example.com",
+            password="strongpassword123",
+            first_name="Deferred",
+            last_name="Parent",
+            timezone="UTC",
+            currency="USD"
+        )
+        ip_address = "5.6.7.8"
+
+        created_parent = await parents_service.create_parent(parent_data, ip_address)
+
+        assert created_parent.timezone == "UTC"
+        assert created_parent.currency == "USD"
+        mock_geo_service.get_location_info.assert_not_called()
+
+        # Queued for the runner once the request commits
+        pending = parents_service.db.info[PENDING_GEO_ENRICHMENT_KEY]
+        assert [(job.user_id, job.ip_address, job.timezone, job.currency) for job in pending] == [
+            (created_parent.id, ip_address, "UTC", "USD")
+        ]
+
     async def test_create_parent_duplicate_email(
         self,
         parents_service: ParentService,
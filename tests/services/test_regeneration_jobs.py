@@ -0,0 +1,104 @@
+"""
+Tests for the background tuition regeneration runner.
+"""
+import asyncio
+import pytest
+from uuid import uuid4
+
+from src.efficient_tutor_backend.services.regeneration_jobs import (
+    TuitionRegenerationRunner,
+    RegenerationJob
+)
+
+
+@pytest.mark.anyio
+class TestTuitionRegenerationRunner:
+    """Queueing and coalescing, with the database work replaced by a recorder."""
+
+    @pytest.fixture
+    def runner(self) -> TuitionRegenerationRunner:
+        runner = TuitionRegenerationRunner(debounce_seconds=0.05, history_size=5)
+        runner.executed = []
+
+        async def record(job: RegenerationJob):
+            runner.executed.append(job)
+            job.status = "succeeded"
+            runner.history.append(job)
+
+        runner.run = record
+        return runner
+
+    async def test_burst_of_triggers_runs_once(self, runner: TuitionRegenerationRunner):
+        print("\n--- Testing that a burst of triggers is coalesced into one job ---")
+        runner.start()
+        try:
+            student_ids = [uuid4() for _ in range(3)]
+            for student_id in student_ids:
+                runner.request({student_id})
+            await asyncio.sleep(0.2)
+        finally:
+            await runner.stop()
+
+        assert len(runner.executed) == 1
+        job = runner.executed[0]
+        print(job)
+        assert job.full is False
+        assert job.student_ids == set(student_ids)
+        assert job.triggers == 3
+
+    async def test_full_request_absorbs_targeted_ones(self, runner: TuitionRegenerationRunner):
+        print("\n--- Testing that a full regeneration absorbs targeted triggers ---")
+        runner.request({uuid4()})
+        runner.request(None)
+        runner.request({uuid4()})
+
+        assert runner.queued.full is True
+        assert runner.queued.student_ids == set()
+
+        runner.start()
+        try:
+            await asyncio.sleep(0.2)
+        finally:
+            await runner.stop()
+
+        assert len(runner.executed) == 1
+        assert runner.status()["recent"][0].full is True
+
+    async def test_stop_drains_the_queued_job(self, runner: TuitionRegenerationRunner):
+        print("\n--- Testing that stopping runs the job still in its debounce window ---")
+        runner.debounce_seconds = 10
+        runner.start()
+        student_id = uuid4()
+        runner.request({student_id})
+        await runner.stop()
+
+        assert len(runner.executed) == 1
+        assert runner.executed[0].student_ids == {student_id}
+        assert runner.queued is None
+
+    async def test_stop_requeues_a_cancelled_run(self, runner: TuitionRegenerationRunner):
+        print("\n--- Testing that a run cancelled by stop is retried before shutdown ---")
+        started = asyncio.Event()
+        record = runner.run
+
+        async def block_first_run(job: RegenerationJob):
+            if not started.is_set():
+                started.set()
+                runner.running = job
+                try:
+                    await asyncio.sleep(10)
+                finally:
+                    runner.running = None
+            await record(job)
+
+        runner.run = block_first_run
+        runner.start()
+        first, second = uuid4(), uuid4()
+        runner.request({first})
+        await asyncio.wait_for(started.wait(), timeout=1)
+        runner.request({second})
+        await runner.stop()
+
+        assert len(runner.executed) == 1
+        assert runner.executed[0].student_ids == {first, second}
+        assert runner.executed[0].triggers == 2
@@ -0,0 +1,153 @@
+"""
+Tests for the teacher/student/parent relationship index.
+"""
+import asyncio
+import pytest
+from uuid import uuid4
+from sqlalchemy.ext.asyncio import AsyncSession
+from unittest.mock import AsyncMock, MagicMock
+
+from src.efficient_tutor_backend.common.cache import InMemoryCacheBackend, NullCacheBackend
+from src.efficient_tutor_backend.common.config import settings
+from src.efficient_tutor_backend.database import engine as db_engine
+from src.efficient_tutor_backend.services.relationship_index import RelationshipIndex, RelationshipGraph
+from tests.constants import TEST_TEACHER_ID, TEST_STUDENT_ID, TEST_PARENT_ID
+
+
+@pytest.mark.anyio
+class TestRelationshipIndex:
+    """The index against the test database."""
+
+    @pytest.fixture
+    def index(self) -> RelationshipIndex:
+        return RelationshipIndex(InMemoryCacheBackend(maxsize=16, ttl_seconds=300))
+
+    async def test_links_match_the_charges(self, index: RelationshipIndex, db_session: AsyncSession):
+        print("\n--- Testing relationship index lookups ---")
+        assert await index.teacher_has_student(db_session, TEST_TEACHER_ID, TEST_STUDENT_ID)
+        assert await index.teacher_has_parent(db_session, TEST_TEACHER_ID, TEST_PARENT_ID)
+        assert not await index.teacher_has_student(db_session, TEST_TEACHER_ID, uuid4())
+        assert not await index.teacher_has_parent(db_session, uuid4(), TEST_PARENT_ID)
+
+    async def test_checks_run_no_query_once_built(
+        self,
+        index: RelationshipIndex,
+        db_session: AsyncSession,
+        query_budget
+    ):
+        print("\n--- Testing that a built index answers without queries ---")
+        await index.teacher_has_student(db_session, TEST_TEACHER_ID, TEST_STUDENT_ID)
+
+        with query_budget(0):
+            assert await index.teacher_has_student(db_session, TEST_TEACHER_ID, TEST_STUDENT_ID)
+            assert await index.teacher_has_parent(db_session, TEST_TEACHER_ID, TEST_PARENT_ID)
+
+
+@pytest.mark.anyio
+class TestRelationshipIndexVersioning:
+    """Rebuilds and invalidation, with the graph query replaced by a counter."""
+
+    @pytest.fixture
+    def backend(self) -> InMemoryCacheBackend:
+        return InMemoryCacheBackend(maxsize=16, ttl_seconds=300)
+
+    @pytest.fixture
+    def teacher_id(self):
+        return uuid4()
+
+    @pytest.fixture
+    def student_id(self):
+        return uuid4()
+
+    def counting_index(self, backend, teacher_id, student_id, version_check_seconds=0) -> RelationshipIndex:
+        index = RelationshipIndex(backend, version_check_seconds=version_check_seconds)
+        index.builds = 0
+        index.built_on = None
+
+        async def build(db, version):
+            index.builds += 1
+            index.built_on = db
+            return RelationshipGraph(version, {teacher_id: frozenset({student_id})}, {})
+
+        index._build = build
+        return index
+
+    async def test_rebuilds_only_when_the_version_rotates(self, backend, teacher_id, student_id):
+        index = self.counting_index(backend, teacher_id, student_id)
+        # A second worker sharing the backend
+        other_worker = self.counting_index(backend, teacher_id, student_id)
+        db = MagicMock(info={})
+
+        for _ in range(3):
+            assert await index.teacher_has_student(db, teacher_id, student_id)
+            assert await other_worker.teacher_has_student(db, teacher_id, student_id)
+        assert (index.builds, other_worker.builds) == (1, 1)
+
+        await index.invalidate()
+
+        assert await other_worker.teacher_has_student(db, teacher_id, student_id)
+        assert await index.teacher_has_student(db, teacher_id, student_id)
+        assert (index.builds, other_worker.builds) == (2, 2)
+
+    async def test_version_is_read_once_per_interval(self, mocker, backend, teacher_id, student_id):
+        index = self.counting_index(backend, teacher_id, student_id, version_check_seconds=0.1)
+        other_worker = self.counting_index(backend, teacher_id, student_id, version_check_seconds=0.1)
+        db = MagicMock(info={})
+        assert await index.teacher_has_student(db, teacher_id, student_id)
+        assert await other_worker.teacher_has_student(db, teacher_id, student_id)
+
+        # Within the interval the checks are answered in memory
+        get = mocker.spy(backend, "get")
+        for _ in range(5):
+            assert await other_worker.teacher_has_student(db, teacher_id, student_id)
+        assert get.call_count == 0
+
+        # The writing worker rebuilds at once, the others once the interval has passed
+        await index.invalidate()
+        assert await index.teacher_has_student(db, teacher_id, student_id)
+        assert index.builds == 2
+        assert await other_worker.teacher_has_student(db, teacher_id, student_id)
+        assert other_worker.builds == 1
+        await asyncio.sleep(0.15)
+        assert await other_worker.teacher_has_student(db, teacher_id, student_id)
+        assert other_worker.builds == 2
+
+    async def test_replica_requests_build_on_the_primary(self, mocker, backend, teacher_id, student_id):
+        index = self.counting_index(backend, teacher_id, student_id)
+        replica_db = MagicMock(info={db_engine.REPLICA_SESSION_KEY: True})
+        primary_db = AsyncMock()
+        mocker.patch.object(db_engine, "AsyncSessionLocal", MagicMock(return_value=primary_db))
+
+        assert await index.teacher_has_student(replica_db, teacher_id, student_id)
+        assert index.built_on is primary_db
+        primary_db.close.assert_awaited_once()
+
+        # A primary session builds on itself
+        await index.invalidate()
+        primary_request_db = MagicMock(info={})
+        assert await index.teacher_has_student(primary_request_db, teacher_id, student_id)
+        assert index.built_on is primary_request_db
+
+    async def test_disabled_index_falls_back_to_the_query(self, teacher_id, student_id):
+        index = self.counting_index(NullCacheBackend(), teacher_id, student_id)
+        db = MagicMock(info={})
+        result = MagicMock()
+        result.scalars.return_value.first.return_value = None
+
+        async def execute(stmt):
+            return result
+
+        db.execute = execute
+
+        assert not index.enabled
+        assert not await index.teacher_has_student(db, teacher_id, student_id)
+        assert index.builds == 0
+
+    @pytest.mark.parametrize("configured", ["memory", "none", "auto"])
+    def test_per_worker_backend_disables_the_index(self, monkeypatch, configured):
+        # A version token one worker cannot share would leave revoked links authorized on the others
+        monkeypatch.setattr(settings, "RELATIONSHIP_INDEX_BACKEND", configured)
+        monkeypatch.setattr(settings, "CACHE_REDIS_URL", None)
+        index = RelationshipIndex()
+        assert isinstance(index.backend, NullCacheBackend)
+        assert not index.enabled
@@ -288,8 +288,8 @@ class TestTeacherServiceCreate:
         assert HashedPassword.verify(teacher_data.password, db_user.password) is True
         assert db_user.password != teacher_data.password
 
-        # 4. Verify geo_service was called
-        mock_geo_service.get_location_info.assert_called_once_with(ip_address)
+        # 4. Verify geo_service was asked (offline, no network wait)
+        mock_geo_service.get_known_location.assert_called_once_with(ip_address)
 
         print("--- Successfully created teacher ---")
         pprint(created_teacher.model_dump())
@@ -1,11 +1,13 @@
 import pytest
 from uuid import UUID
-from datetime import datetime, time
+from datetime import datetime, time, timedelta
+from types import SimpleNamespace
 from pprint import pprint
 from fastapi import HTTPException
 
 from src.efficient_tutor_backend.database import models as db_models
 from src.efficient_tutor_backend.services.timetable_service import TimeTableService
+from src.efficient_tutor_backend.services import timetable_occurrences
 from src.efficient_tutor_backend.models import timetable as timetable_models
 from tests.constants import (
     TEST_TIMETABLE_RUN_ID, 
@@ -240,4 +242,123 @@ class TestTimeTableService:
         
         assert start_dt.time() == start_time
         assert start_dt.weekday() == 0
-        assert start_dt.tzinfo is not None
\ No newline at end of file
+        assert start_dt.tzinfo is not None
+
+@pytest.mark.anyio
+class TestTimeTableServiceCache:
+    """The rendered timetable is cached per run and viewer."""
+
+    async def test_repeated_poll_is_served_from_cache(
+        self,
+        timetable_service: TimeTableService,
+        test_student_orm: db_models.Users,
+        query_budget
+    ):
+        print(f"\n--- Testing that a repeated timetable poll runs no query ---")
+        first = await timetable_service.get_timetable_for_api(current_user=test_student_orm)
+
+        with query_budget(0):
+            second = await timetable_service.get_timetable_for_api(current_user=test_student_orm)
+
+        assert [s.model_dump() for s in second] == [s.model_dump() for s in first]
+
+    async def test_invalidate_renders_again(
+        self,
+        timetable_service: TimeTableService,
+        test_student_orm: db_models.Users,
+        query_budget
+    ):
+        print(f"\n--- Testing that invalidation forces a new render ---")
+        first = await timetable_service.get_timetable_for_api(current_user=test_student_orm)
+        await timetable_service.timetable_cache.invalidate()
+
+        with query_budget(3) as queries:
+            second = await timetable_service.get_timetable_for_api(current_user=test_student_orm)
+
+        # The latest run and the visible slots are loaded again
+        assert queries.count >= 2
+        assert [s.id for s in second] == [s.id for s in first]
+
+
+@pytest.mark.anyio
+class TestTimeTableServiceRange:
+    """Occurrences over a [from, to) window."""
+
+    async def test_range_returns_one_entry_per_occurrence(
+        self,
+        timetable_service: TimeTableService,
+        test_student_orm: db_models.Users
+    ):
+        print(f"\n--- Testing a three-week timetable range ---")
+        weekly = await timetable_service.get_timetable_for_api(current_user=test_student_orm)
+        window_start = datetime(2026, 1, 5)  # a Monday
+        window_end = window_start + timedelta(weeks=3)
+
+        slots = await timetable_service.get_timetable_for_api(
+            current_user=test_student_orm, window_start=window_start, window_end=window_end
+        )
+
+        assert len(slots) == 3 * len(weekly)
+        starts = [s.next_occurrence_start for s in slots]
+        assert starts == sorted(starts)
+        for slot in slots:
+            assert slot.next_occurrence_start.tzinfo is not None
+            assert slot.next_occurrence_start.isoweekday() == slot.day_of_week
+
+    async def test_range_requires_both_bounds_in_order(
+        self,
+        timetable_service: TimeTableService,
+        test_student_orm: db_models.Users
+    ):
+        print(f"\n--- Testing invalid timetable ranges ---")
+        window_start = datetime(2026, 1, 5)
+        for bounds in [(window_start, None), (window_start, window_start), (window_start, window_start + timedelta(days=400))]:
+            with pytest.raises(HTTPException) as e:
+                await timetable_service.get_timetable_for_api(
+                    current_user=test_student_orm, window_start=bounds[0], window_end=bounds[1]
+                )
+            assert e.value.status_code == 400
+
+
+class TestTimetableOccurrences:
+    """The occurrence engine on its own (no database)."""
+
+    zone = timetable_occurrences.get_zone("Europe/Berlin")
+
+    def test_overnight_slot_ends_next_day(self):
+        slot = SimpleNamespace(day_of_week=6, start_time=time(23, 0), end_time=time(1, 0))
+        [(_, start_dt, end_dt)] = timetable_occurrences.expand_occurrences(
+            [slot], self.zone, datetime(2026, 1, 3), datetime(2026, 1, 4)
+        )
+        assert start_dt.isoformat() == "2026-01-03T23:00:00+01:00"
+        assert end_dt - start_dt == timedelta(hours=2)
+
+    def test_dst_gap_and_fold(self):
+        # 2026-03-29 02:00 -> 03:00 and 2026-10-25 03:00 -> 02:00 in Berlin
+        slot = SimpleNamespace(day_of_week=7, start_time=time(2, 30), end_time=time(3, 30))
+        [(_, spring_start, spring_end)] = timetable_occurrences.expand_occurrences(
+            [slot], self.zone, datetime(2026, 3, 29), datetime(2026, 3, 30)
+        )
+        assert spring_start.isoformat() == "2026-03-29T03:30:00+02:00"
+        assert spring_end - spring_start == timedelta(hours=1)
+
+        [(_, fall_start, fall_end)] = timetable_occurrences.expand_occurrences(
+            [slot], self.zone, datetime(2026, 10, 25), datetime(2026, 10, 26)
+        )
+        assert fall_start.isoformat() == "2026-10-25T02:30:00+02:00"
+        assert fall_end.isoformat() == "2026-10-25T03:30:00+01:00"
+
+    def test_consecutive_windows_do_not_overlap(self):
+        slots = [
+            SimpleNamespace(day_of_week=day, start_time=time(9, 0), end_time=time(10, 0)) for day in range(1, 8)
+        ]
+        middle = datetime(2026, 1, 8, 9, 0)
+        first = timetable_occurrences.expand_occurrences(slots, self.zone, datetime(2026, 1, 5), middle)
+        second = timetable_occurrences.expand_occurrences(slots, self.zone, middle, datetime(2026, 1, 12))
+        assert len(first) == 3 and len(second) == 4
+
+    def test_next_occurrence_is_today_or_later(self):
+        now = datetime(2026, 10, 16, 12, 0, tzinfo=self.zone)  # a Friday
+        slots = [SimpleNamespace(day_of_week=day, start_time=time(9, 0), end_time=time(10, 0)) for day in (4, 5, 6)]
+        dates = [start_dt.date().isoformat() for _, start_dt, _ in timetable_occurrences.next_occurrences(slots, self.zone, now)]
+        assert dates == ["2026-10-22", "2026-10-16", "2026-10-17"]
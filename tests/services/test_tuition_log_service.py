@@ -274,6 +274,42 @@ class TestTuitionLogServiceCreate:
         assert e.value.status_code == 403
         print(f"--- Correctly raised 403 FORBIDDEN ---")
 
+@pytest.mark.anyio
+class TestTuitionLogServiceQueryBudget:
+    """N+1 guards: the number of statements must not grow with the number of charges."""
+
+    async def test_create_scheduled_log_within_query_budget(
+        self,
+        db_session: AsyncSession,
+        tuition_log_service: TuitionLogService,
+        test_teacher_orm: db_models.Users,
+        test_tuition_orm: db_models.Tuitions,
+        query_budget
+    ):
+        print(f"\n--- Testing the query budget of create_tuition_log (SCHEDULED) ---")
+        log_data = {
+            "log_type": TuitionLogCreateTypeEnum.SCHEDULED.value,
+            "tuition_id": test_tuition_orm.id,
+            "start_time": datetime.now(timezone.utc).isoformat(),
+            "end_time": datetime.now(timezone.utc).isoformat()
+        }
+
+        with query_budget(12):
+            new_log = await tuition_log_service.create_tuition_log(log_data, test_teacher_orm)
+        assert len(new_log.charges) == len(test_tuition_orm.tuition_template_charges)
+
+    async def test_get_all_logs_within_query_budget(
+        self,
+        tuition_log_service: TuitionLogService,
+        test_teacher_orm: db_models.Users,
+        query_budget
+    ):
+        print(f"\n--- Testing the query budget of get_all_tuition_logs_for_api ---")
+        with query_budget(6):
+            logs = await tuition_log_service.get_all_tuition_logs_for_api(test_teacher_orm)
+        assert len(logs) > 0
+
+
 @pytest.mark.anyio
 class TestTuitionLogServiceVoid:
 
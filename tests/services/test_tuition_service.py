@@ -1022,6 +1022,106 @@ class TestTuitionServiceRegenerate:
 
         print(f"--- Successfully asserted that tuition durations are max of grouped students: Min={expected_min_duration}, Max={expected_max_duration}. ---")
 
+    async def test_regenerate_tuitions_for_students_leaves_other_tuitions_alone(
+        self,
+        tuition_service: TuitionService,
+        student_service: StudentService,
+        db_session: AsyncSession,
+        test_parent_orm: db_models.Parents,
+        test_teacher_orm: db_models.Teachers
+    ):
+        """
+        Tests that a targeted regeneration only rewrites the changed student's
+        tuitions and ends in the same state as a full regeneration.
+        """
+        print("\n--- Testing targeted regeneration for a single student ---")
+
+        await db_session.execute(delete(db_models.Tuitions))
+        await db_session.execute(delete(db_models.StudentSubjects))
+        await db_session.flush()
+
+        def physics(lessons_per_week: int) -> user_models.StudentSubjectWrite:
+            return user_models.StudentSubjectWrite(
+                subject=SubjectEnum.PHYSICS,
+                educational_system=EducationalSystemEnum.SAT,
+                lessons_per_week=lessons_per_week,
+                teacher_id=test_teacher_orm.id,
+                grade=10,
+                shared_with_student_ids=[]
+            )
+
+        student_a = await _create_student_with_subjects(
+            student_service, db_session, test_parent_orm, test_teacher_orm, "student_diff_a@example.com", [physics(1)]
+        )
+        student_b = await _create_student_with_subjects(
+            student_service, db_session, test_parent_orm, test_teacher_orm, "student_diff_b@example.com", [physics(1)]
+        )
+        await tuition_service.regenerate_all_tuitions()
+
+        charges_before = {
+            c.student_id: (c.id, c.tuition_id)
+            for c in (await db_session.execute(select(db_models.TuitionTemplateCharges))).scalars().all()
+        }
+
+        # 1. Student A now takes two lessons a week
+        student_a.student_subjects[0].lessons_per_week = 2
+        await db_session.flush()
+
+        result = await tuition_service.regenerate_tuitions_for_students({student_a.id})
+        assert result is True
+
+        charges_after = (await db_session.execute(select(db_models.TuitionTemplateCharges))).scalars().all()
+        pprint([(c.student_id, c.tuition_id) for c in charges_after])
+
+        # 2. Student B's charge is the very same row; Student A kept lesson 1 and gained lesson 2
+        b_charges = [(c.id, c.tuition_id) for c in charges_after if c.student_id == student_b.id]
+        assert b_charges == [charges_before[student_b.id]]
+        a_charges = {c.id for c in charges_after if c.student_id == student_a.id}
+        assert len(a_charges) == 2
+        assert charges_before[student_a.id][0] in a_charges
+
+        # 3. A full regeneration has nothing left to change
+        tuition_ids = {t.id for t in (await db_session.execute(select(db_models.Tuitions))).scalars().all()}
+        await tuition_service.regenerate_all_tuitions()
+        assert {t.id for t in (await db_session.execute(select(db_models.Tuitions))).scalars().all()} == tuition_ids
+
+    async def test_collect_regeneration_scope_follows_sharing(
+        self,
+        tuition_service: TuitionService,
+        student_service: StudentService,
+        db_session: AsyncSession,
+        test_parent_orm: db_models.Parents,
+        test_teacher_orm: db_models.Teachers
+    ):
+        """Tests that the scope includes students sharing a subject, but not unrelated ones."""
+        print("\n--- Testing collect_regeneration_scope ---")
+
+        partner = await _create_student_with_subjects(
+            student_service, db_session, test_parent_orm, test_teacher_orm, "student_scope_partner@example.com", []
+        )
+        loner = await _create_student_with_subjects(
+            student_service, db_session, test_parent_orm, test_teacher_orm, "student_scope_loner@example.com", []
+        )
+        sharer = await _create_student_with_subjects(
+            student_service, db_session, test_parent_orm, test_teacher_orm, "student_scope_sharer@example.com", [
+                user_models.StudentSubjectWrite(
+                    subject=SubjectEnum.BIOLOGY,
+                    educational_system=EducationalSystemEnum.SAT,
+                    lessons_per_week=1,
+                    teacher_id=test_teacher_orm.id,
+                    grade=10,
+                    shared_with_student_ids=[partner.id]
+                )
+            ]
+        )
+
+        scope = await tuition_service.collect_regeneration_scope({partner.id})
+        pprint(scope)
+
+        assert partner.id in scope
+        assert sharer.id in scope
+        assert loner.id not in scope
+
     ### Tests for _generate_deterministic_id ###
     
     def test_generate_deterministic_id(